@@ -3,6 +3,8 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from ops.refcache import RefCache
+
 DB_CONFIG = {
     'host': 'aws-1-us-east-1.pooler.supabase.com',
     'port': 5432,
@@ -49,13 +51,7 @@ for client in clients:
     print(f"    Type: {client['client_type']}, State: {client['state']}, Active: {client['active']}")
 
 # Check distinct client types
-cursor.execute("""
-    SELECT DISTINCT client_type
-    FROM clients
-    ORDER BY client_type
-""")
-types = cursor.fetchall()
-print(f"\nDistinct client types: {[t['client_type'] for t in types]}")
+print(f"\nDistinct client types: {RefCache(conn).client_types()}")
 
 # Check contacts
 print("\n" + "="*70)
@@ -3,6 +3,8 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from ops.refcache import RefCache
+
 DB_CONFIG = {
     'host': 'aws-1-us-east-1.pooler.supabase.com',
     'port': 5432,
@@ -13,18 +15,14 @@ DB_CONFIG = {
 
 conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
 cursor = conn.cursor()
+# Column lists come from the local reference cache, revalidated by fingerprint
+cache = RefCache(conn)
 
 # Check clients schema
 print("="*70)
 print("CLIENTS TABLE COLUMNS")
 print("="*70)
-cursor.execute("""
-    SELECT column_name, data_type
-    FROM information_schema.columns
-    WHERE table_name = 'clients'
-    ORDER BY ordinal_position
-""")
-columns = cursor.fetchall()
+columns = cache.columns('clients')
 
 for col in columns:
     print(f"  {col['column_name']:<30} {col['data_type']}")
@@ -53,13 +51,7 @@ else:
 print("\n" + "="*70)
 print("CONTACTS TABLE COLUMNS")
 print("="*70)
-cursor.execute("""
-    SELECT column_name, data_type
-    FROM information_schema.columns
-    WHERE table_name = 'contacts'
-    ORDER BY ordinal_position
-""")
-columns = cursor.fetchall()
+columns = cache.columns('contacts')
 
 for col in columns:
     print(f"  {col['column_name']:<30} {col['data_type']}")
@@ -0,0 +1,6 @@
+"""Database ops toolkit for the job system.
+
+Run commands from the repo root with ``python -m ops <command>``.
+Connection settings come from DATABASE_URL (or DIRECT_DATABASE_URL) in the
+environment or .env.local, the same way scripts/run-migration.js does.
+"""
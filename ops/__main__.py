@@ -0,0 +1,54 @@
+"""Command-line entry point: python -m ops <command> [options]"""
+import argparse
+
+from ops import instrument
+
+from ops import (
+    job_metrics, task_latency, run_phases, synthetic, bench, load, pg_stats, watch, task_worker, retry,
+    snapshot, refcache, context_snapshot, fleet, ann, patterns, reclassify, enrich, engagement,
+    send_governor, campaign_rollups,
+)
+
+COMMANDS = [
+    job_metrics,
+    task_latency,
+    run_phases,
+    synthetic,
+    bench,
+    load,
+    pg_stats,
+    watch,
+    task_worker,
+    retry,
+    snapshot,
+    refcache,
+    context_snapshot,
+    fleet,
+    ann,
+    patterns,
+    reclassify,
+    enrich,
+    engagement,
+    send_governor,
+    campaign_rollups,
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ops', description=__doc__)
+    parser.add_argument('--database-url', help='Override DATABASE_URL from .env.local')
+    parser.add_argument('--slow-ms', type=float, help='Slow-query log threshold in ms (default $OPS_SLOW_MS or 500)')
+    parser.add_argument('--slow-log', help='Slow-query log file (default $OPS_SLOW_LOG or ops-slow-queries.log)')
+    parser.add_argument('--no-query-summary', dest='query_summary', action='store_false',
+                        help='Do not print the per-statement summary at exit')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for module in COMMANDS:
+        module.add_parser(subparsers)
+
+    args = parser.parse_args(argv)
+    instrument.enable(args.command, slow_ms=args.slow_ms, slow_log=args.slow_log, summary=args.query_summary)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
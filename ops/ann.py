@@ -0,0 +1,316 @@
+"""Local approximate nearest-neighbour search over exported RAG embeddings
+
+searchRAG costs one search_embeddings RPC per query, so bulk jobs (scoring
+every new email against the knowledge base, finding near-duplicate chat
+memories) pay a network round trip per item. This command exports
+embeddings_index once into an index directory and answers batched top-k
+cosine queries locally:
+
+  vectors.npy      float32 [n, dim], L2-normalized, memory-mapped on load
+  meta.json        id / org_id / source / source_id / title per row
+  ivf.npz          IVF index: spherical k-means centroids, row order, list offsets
+  ivf_vectors.npy  vectors.npy permuted so every inverted list is contiguous
+
+Queries are scored list by list: every query probing a list is multiplied
+against that list's block in one matmul and merged into a running top-k,
+so a batch of thousands of queries costs about nlist matmuls. `eval`
+measures recall@k against exact search and the throughput of both.
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:             # only this command needs NumPy
+    np = None
+
+from ops.db import banner, connect, print_table
+
+EXPORT_SQL = """
+    SELECT id::text, org_id::text, source, source_id::text, title, embedding::text AS embedding
+    FROM embeddings_index
+    WHERE embedding IS NOT NULL
+      AND (%(org)s::uuid IS NULL OR org_id = %(org)s::uuid)
+      AND (%(source)s::text IS NULL OR source = %(source)s)
+    ORDER BY id
+"""
+
+META_COLUMNS = ['id', 'org_id', 'source', 'source_id', 'title']
+
+
+# -- export -------------------------------------------------------------------
+
+def export(conn, directory, org=None, source=None, log=print):
+    params = {'org': org, 'source': source}
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) AS n FROM ({EXPORT_SQL}) e", params)
+    count = cursor.fetchone()['n']
+    if count == 0:
+        raise LookupError("No embeddings match the export filter")
+
+    os.makedirs(directory, exist_ok=True)
+    meta = {column: [] for column in META_COLUMNS}
+    vectors = None
+
+    # Named (server-side) cursor: rows stream in pages instead of one result set
+    stream = conn.cursor(name='ann_export')
+    stream.itersize = 2000
+    stream.execute(EXPORT_SQL, params)
+    for i, row in enumerate(stream):
+        vector = np.array(json.loads(row['embedding']), dtype=np.float32)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(
+                os.path.join(directory, 'vectors.npy'), mode='w+', dtype=np.float32, shape=(count, len(vector)),
+            )
+        vectors[i] = vector / (np.linalg.norm(vector) or 1.0)
+        for column in META_COLUMNS:
+            meta[column].append(row[column])
+        if (i + 1) % 10000 == 0:
+            log(f"   {i + 1:,}/{count:,} rows")
+    stream.close()
+    conn.rollback()
+    vectors.flush()
+
+    with open(os.path.join(directory, 'meta.json'), 'w') as fh:
+        json.dump({
+            'exported_at': datetime.now(timezone.utc).isoformat(),
+            'count': count, 'dim': vectors.shape[1], 'org': org, 'source': source, 'rows': meta,
+        }, fh)
+    return count, vectors.shape[1]
+
+
+def load(directory):
+    vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r')
+    with open(os.path.join(directory, 'meta.json')) as fh:
+        meta = json.load(fh)
+    return vectors, meta
+
+
+# -- top-k helpers ------------------------------------------------------------
+
+def _empty_topk(rows, k):
+    return np.full((rows, k), -np.inf, dtype=np.float32), np.full((rows, k), -1, dtype=np.int64)
+
+
+def _merge_topk(best_s, best_i, scores, ids, k):
+    """Keep the k highest of the running top-k and a new block of scores"""
+    s = np.concatenate([best_s, scores], axis=1)
+    i = np.concatenate([best_i, np.broadcast_to(ids, scores.shape)], axis=1)
+    keep = np.argpartition(-s, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(s, keep, axis=1), np.take_along_axis(i, keep, axis=1)
+
+
+def _sorted(best_s, best_i):
+    order = np.argsort(-best_s, axis=1)
+    return np.take_along_axis(best_s, order, axis=1), np.take_along_axis(best_i, order, axis=1)
+
+
+def exact_search(vectors, queries, k, block=65536):
+    best_s, best_i = _empty_topk(len(queries), k)
+    for start in range(0, len(vectors), block):
+        chunk = np.asarray(vectors[start:start + block])
+        best_s, best_i = _merge_topk(best_s, best_i, queries @ chunk.T,
+                                     np.arange(start, start + len(chunk)), k)
+    return _sorted(best_s, best_i)
+
+
+# -- IVF index ------------------------------------------------------------------
+
+def train_centroids(vectors, nlist, iterations=15, sample=50000, seed=42, block=65536):
+    """Spherical k-means on a sample of rows"""
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False))
+    data = np.asarray(vectors[rows])
+    centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.concatenate([
+            np.argmax(data[s:s + block] @ centroids.T, axis=1) for s in range(0, len(data), block)
+        ])
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def build(directory, nlist=None, iterations=15, seed=42, block=65536):
+    vectors, _ = load(directory)
+    n = len(vectors)
+    nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n))
+    centroids = train_centroids(vectors, nlist, iterations=iterations, seed=seed)
+
+    assign = np.concatenate([
+        np.argmax(np.asarray(vectors[s:s + block]) @ centroids.T, axis=1) for s in range(0, n, block)
+    ])
+    order = np.argsort(assign, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+
+    permuted = np.lib.format.open_memmap(
+        os.path.join(directory, 'ivf_vectors.npy'), mode='w+', dtype=np.float32, shape=vectors.shape,
+    )
+    for s in range(0, n, block):
+        permuted[s:s + block] = vectors[order[s:s + block]]
+    permuted.flush()
+    np.savez(os.path.join(directory, 'ivf.npz'), centroids=centroids, order=order, offsets=offsets)
+    return nlist, np.diff(offsets)
+
+
+class IVFIndex:
+    def __init__(self, directory):
+        with np.load(os.path.join(directory, 'ivf.npz')) as index:
+            self.centroids = index['centroids']
+            self.order = index['order']
+            self.offsets = index['offsets']
+        self.vectors = np.load(os.path.join(directory, 'ivf_vectors.npy'), mmap_mode='r')
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def search(self, queries, k, nprobe=8):
+        nprobe = min(nprobe, self.nlist)
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        # Group (query, list) pairs by list so each list is scored once per batch
+        lists = probes.ravel()
+        query_of = np.repeat(np.arange(len(queries)), nprobe)
+        by_list = np.argsort(lists, kind='stable')
+        lists, query_of = lists[by_list], query_of[by_list]
+        starts = np.flatnonzero(np.r_[True, lists[1:] != lists[:-1]])
+        ends = np.r_[starts[1:], len(lists)]
+
+        best_s, best_i = _empty_topk(len(queries), k)
+        for start, end in zip(starts, ends):
+            lo, hi = self.offsets[lists[start]], self.offsets[lists[start] + 1]
+            if lo == hi:
+                continue
+            qs = query_of[start:end]
+            scores = queries[qs] @ np.asarray(self.vectors[lo:hi]).T
+            best_s[qs], best_i[qs] = _merge_topk(best_s[qs], best_i[qs], scores, np.arange(lo, hi), k)
+
+        best_s, best_i = _sorted(best_s, best_i)
+        found = best_i >= 0
+        best_i[found] = self.order[best_i[found]]   # permuted position -> export row
+        return best_s, best_i
+
+
+def recall(approx_ids, exact_ids):
+    k = exact_ids.shape[1]
+    hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approx_ids, exact_ids))
+    return hits / (len(exact_ids) * k)
+
+
+# -- commands -------------------------------------------------------------------
+
+def _queries(args, vectors):
+    if args.queries:
+        queries = np.load(args.queries).astype(np.float32)
+        return queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12), None
+    rng = np.random.default_rng(args.seed)
+    rows = np.sort(rng.choice(len(vectors), size=min(args.sample, len(vectors)), replace=False))
+    return np.asarray(vectors[rows]), rows
+
+
+def run(args):
+    if np is None:
+        print("❌ The ann command needs NumPy: pip install numpy")
+        return 1
+
+    if args.action == 'export':
+        banner(f"EXPORT EMBEDDINGS → {args.dir}")
+        conn = connect(args.database_url)
+        count, dim = export(conn, args.dir, org=args.org, source=args.source)
+        conn.close()
+        print(f"\n💾 {count:,} vectors x {dim} dims ({count * dim * 4 / 1e6:,.1f} MB float32)")
+        return 0
+
+    if args.action == 'build':
+        banner(f"BUILD IVF INDEX {args.dir}")
+        started = time.perf_counter()
+        nlist, sizes = build(args.dir, nlist=args.nlist, iterations=args.iterations, seed=args.seed)
+        print(f"✅ {nlist} lists in {time.perf_counter() - started:.1f}s "
+              f"(list size min {sizes.min()}, median {int(np.median(sizes))}, max {sizes.max()})")
+        return 0
+
+    vectors, meta = load(args.dir)
+    index = IVFIndex(args.dir)
+    nprobe = int(args.nprobe.split(',')[-1])
+
+    if args.action == 'dupes':
+        banner(f"NEAR-DUPLICATES (cosine >= {args.threshold}, {len(vectors):,} vectors)")
+        org = meta['rows']['org_id']
+        pairs = set()
+        started = time.perf_counter()
+        for start in range(0, len(vectors), args.batch):
+            queries = np.asarray(vectors[start:start + args.batch])
+            scores, ids = index.search(queries, args.k + 1, nprobe=nprobe)
+            for row, s_row, i_row in zip(range(start, start + len(queries)), scores, ids):
+                for score, other in zip(s_row, i_row):
+                    if other >= 0 and other != row and score >= args.threshold and org[other] == org[row]:
+                        pairs.add((min(row, other), max(row, other), round(float(score), 4)))
+        titles, sources = meta['rows']['title'], meta['rows']['source']
+        print_table([
+            {'a': titles[a][:40], 'b': titles[b][:40], 'source': sources[a], 'cosine': score}
+            for a, b, score in sorted(pairs, key=lambda p: -p[2])
+        ], [('source', 'source'), ('a', 'record'), ('b', 'near-duplicate'), ('cosine', 'cosine')])
+        elapsed = time.perf_counter() - started
+        print(f"\n   {len(pairs)} pairs; {len(vectors):,} lookups in {elapsed:.1f}s "
+              f"({len(vectors) / elapsed:,.0f}/s)")
+        return 0
+
+    queries, query_rows = _queries(args, vectors)
+
+    if args.action == 'eval':
+        banner(f"IVF RECALL@{args.k} ({len(queries)} queries, {len(vectors):,} vectors, {index.nlist} lists)")
+        started = time.perf_counter()
+        _, exact_ids = exact_search(vectors, queries, args.k)
+        exact_s = time.perf_counter() - started
+        rows = [{'method': 'exact', 'recall': 1.0, 'qps': len(queries) / exact_s, 'ms': exact_s * 1000}]
+        for probe in (int(p) for p in args.nprobe.split(',')):
+            started = time.perf_counter()
+            _, ids = index.search(queries, args.k, nprobe=probe)
+            elapsed = time.perf_counter() - started
+            rows.append({'method': f'ivf nprobe={probe}', 'recall': recall(ids, exact_ids),
+                         'qps': len(queries) / elapsed, 'ms': elapsed * 1000})
+        print_table(rows, [('method', 'method'), ('recall', f'recall@{args.k}'), ('qps', 'queries/s'), ('ms', 'ms')])
+        return 0
+
+    # query: top-k for each query, as JSON lines
+    scores, ids = index.search(queries, args.k, nprobe=nprobe)
+    rows = meta['rows']
+    for q, (s_row, i_row) in enumerate(zip(scores, ids)):
+        print(json.dumps({
+            'query': int(query_rows[q]) if query_rows is not None else q,
+            'matches': [
+                {'id': rows['id'][i], 'source': rows['source'][i], 'source_id': rows['source_id'][i],
+                 'title': rows['title'][i], 'similarity': round(float(s), 4)}
+                for s, i in zip(s_row, i_row) if i >= 0
+            ],
+        }))
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('ann', help='Export RAG embeddings and run batched top-k search locally')
+    parser.add_argument('action', choices=['export', 'build', 'eval', 'query', 'dupes'],
+                        help='export: embeddings_index to --dir; build: IVF index; eval: recall vs exact; '
+                             'query: top-k as JSON lines; dupes: near-duplicate pairs within each org')
+    parser.add_argument('--dir', default='rag-index', help='Index directory')
+    parser.add_argument('--org', help='export: only this org_id')
+    parser.add_argument('--source', help='export: only this source (chat, activity, client_data, ...)')
+    parser.add_argument('--nlist', type=int, help='build: inverted lists (default 4*sqrt(n))')
+    parser.add_argument('--iterations', type=int, default=15, help='build: k-means iterations')
+    parser.add_argument('--nprobe', default='1,4,8,16,32',
+                        help='Lists probed per query; eval sweeps every value, query/dupes use the last')
+    parser.add_argument('-k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--queries', help='query/eval: .npy file of query embeddings [m, dim]')
+    parser.add_argument('--sample', type=int, default=1000,
+                        help='query/eval without --queries: use this many indexed rows as queries')
+    parser.add_argument('--batch', type=int, default=4096, help='dupes: rows searched per batch')
+    parser.add_argument('--threshold', type=float, default=0.95, help='dupes: minimum cosine similarity')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.set_defaults(func=run)
@@ -0,0 +1,264 @@
+"""Benchmark job-system queries and ops commands against a local Postgres
+
+For each data scale the suite loads a synthetic dataset (ops.synthetic),
+times the core operations, then purges it before the next scale. Write
+operations run inside a transaction that is rolled back, so every
+iteration sees the same data. Results are written as JSON and compared
+against a stored baseline; a median slower than the baseline by more than
+--threshold counts as a regression and makes the command exit non-zero.
+
+Each case mirrors the SQL of the script or code path it stands for.
+"""
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from psycopg2.extras import Json
+
+from ops import synthetic
+from ops.db import LOCAL_DATABASE_URL, banner, connect, print_table, require_local
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+
+
+# -- cases ---------------------------------------------------------------------
+# Each case takes (cursor, ctx) where ctx holds ids from the synthetic load.
+
+def diagnostics_snapshot(cursor, ctx):
+    """diagnose_agent_run.py: latest run, running job, its tasks and cards"""
+    cursor.execute("""
+        SELECT id, org_id, status, started_at, ended_at, mode, planned_actions,
+               approved, sent, errors, job_id
+        FROM agent_runs ORDER BY started_at DESC LIMIT 1
+    """)
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT id, batch, step, kind, status, created_at, started_at, finished_at,
+               error_message, input, output
+        FROM job_tasks WHERE job_id = %s ORDER BY batch, step
+    """, (ctx['job_id'],))
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT id, type, title, state, created_at, job_id, task_id
+        FROM kanban_cards WHERE job_id = %s ORDER BY created_at DESC
+    """, (ctx['job_id'],))
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT id, type, title, state, job_id, created_at
+        FROM kanban_cards ORDER BY created_at DESC LIMIT 10
+    """)
+    cursor.fetchall()
+
+
+def audience_count(cursor, ctx):
+    """job-planner.ts getTargetContacts: eligible contacts not yet carded by the job"""
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM contacts c
+        JOIN clients cl ON cl.id = c.client_id
+        WHERE cl.tenant_id = %(tenant_id)s
+          AND c.email IS NOT NULL
+          AND c.primary_role_code = ANY(%(roles)s)
+          AND cl.is_active = TRUE
+          AND NOT EXISTS (
+              SELECT 1 FROM kanban_cards k
+              WHERE k.job_id = %(job_id)s AND k.contact_id = c.id
+          )
+    """, {**ctx, 'roles': ['amc_contact']})
+    cursor.fetchall()
+
+
+def pending_batch_lookup(cursor, ctx):
+    """orchestrator.ts processActiveJobs: running jobs, current batch, pending tasks"""
+    cursor.execute("""
+        SELECT * FROM jobs WHERE tenant_id = %s AND status = 'running' ORDER BY created_at
+    """, (ctx['tenant_id'],))
+    for job in cursor.fetchall():
+        cursor.execute("""
+            SELECT batch FROM job_tasks WHERE job_id = %s ORDER BY batch DESC LIMIT 1
+        """, (job['id'],))
+        latest = cursor.fetchone()
+        cursor.execute("""
+            SELECT * FROM job_tasks
+            WHERE job_id = %s AND batch <= %s AND status IN ('pending', 'running')
+        """, (job['id'], latest['batch'] if latest else 0))
+        cursor.fetchall()
+
+
+def bulk_reset(cursor, ctx):
+    """clear_error_tasks.py: delete error/pending tasks of running jobs"""
+    cursor.execute("""
+        DELETE FROM job_tasks
+        WHERE job_id IN (SELECT id FROM jobs WHERE status = 'running' AND tenant_id = %s)
+          AND status IN ('error', 'pending')
+        RETURNING id, kind, status
+    """, (ctx['tenant_id'],))
+    cursor.fetchall()
+
+
+def template_repair(cursor, ctx):
+    """fix_templates.py: normalize template bodies and write params back"""
+    cursor.execute("""
+        SELECT id, params FROM jobs WHERE status = 'running' AND tenant_id = %s
+    """, (ctx['tenant_id'],))
+    for job in cursor.fetchall():
+        params = dict(job['params'])
+        templates = {}
+        for name, template in (params.get('templates') or {}).items():
+            body = template['body']
+            if body.startswith('Subject:'):
+                body = '\n'.join(body.split('\n')[1:]).strip()
+            templates[name] = dict(template, body=re.sub(r'\{\{\}(\w+)\}\}', r'{{\1}}', body))
+        params['templates'] = templates
+        cursor.execute("UPDATE jobs SET params = %s WHERE id = %s", (Json(params), job['id']))
+
+
+def card_regeneration(cursor, ctx):
+    """recreate_cards.py: drop a job's cards and its batch 1 tasks"""
+    cursor.execute("DELETE FROM kanban_cards WHERE job_id = %s RETURNING id", (ctx['job_id'],))
+    cursor.execute("DELETE FROM job_tasks WHERE job_id = %s AND batch = 1 RETURNING id", (ctx['job_id'],))
+
+
+CASES = [
+    diagnostics_snapshot,
+    audience_count,
+    pending_batch_lookup,
+    bulk_reset,
+    template_repair,
+    card_regeneration,
+]
+
+
+# -- runner --------------------------------------------------------------------
+
+def time_case(conn, case, ctx, iterations, warmup=1):
+    cursor = conn.cursor()
+    samples = []
+    for i in range(warmup + iterations):
+        started = time.perf_counter()
+        case(cursor, ctx)
+        elapsed = (time.perf_counter() - started) * 1000
+        conn.rollback()
+        if i >= warmup:
+            samples.append(elapsed)
+    cursor.close()
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'min_ms': samples[0],
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'mean_ms': statistics.fmean(samples),
+    }
+
+
+def run_suite(url, scales, iterations, seed=4242, log=print):
+    results = {}
+    conn = connect(url)
+    for factor in scales:
+        scale = synthetic.scaled(factor)
+        log(f"\n📦 Scale {factor:g}: loading synthetic data...")
+        synthetic.purge(conn, seed=seed)
+        synthetic.generate(conn, scale, seed=seed, log=lambda line: None)
+        gen = synthetic.Generator(scale, seed=seed)
+        ctx = {
+            'tenant_id': gen.uid(synthetic.TENANT, 0),
+            'job_id': gen.uid(synthetic.JOB, 0),
+            'org_id': gen.owner(0),
+        }
+        for case in CASES:
+            key = f"{case.__name__}@{factor:g}"
+            results[key] = time_case(conn, case, ctx, iterations)
+            log(f"   {key:<32} median {results[key]['median_ms']:8.2f} ms")
+        synthetic.purge(conn, seed=seed)
+    conn.close()
+    return results
+
+
+def _git_sha():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    rows, regressions = [], []
+    for key, current in results.items():
+        before = baseline.get('results', {}).get(key)
+        row = {'case': key, 'median': current['median_ms'], 'baseline': None, 'delta': '-'}
+        if before:
+            change = (current['median_ms'] - before['median_ms']) / before['median_ms'] if before['median_ms'] else 0.0
+            row['baseline'] = before['median_ms']
+            row['delta'] = f"{change * 100:+.1f}%"
+            if change > threshold:
+                row['delta'] += ' ❌'
+                regressions.append(key)
+        rows.append(row)
+    return rows, regressions
+
+
+def run(args):
+    url = require_local(args.database_url or LOCAL_DATABASE_URL)
+    scales = [float(s) for s in args.scales.split(',')]
+
+    banner("JOB SYSTEM BENCHMARK")
+    conn = connect(url)
+    cursor = conn.cursor()
+    cursor.execute("SHOW server_version")
+    server_version = cursor.fetchone()['server_version']
+    conn.close()
+
+    results = run_suite(url, scales, args.iterations)
+    report = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'git_sha': _git_sha(),
+            'server_version': server_version,
+            'python': platform.python_version(),
+            'scales': scales,
+            'iterations': args.iterations,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+    status = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        rows, regressions = compare(results, baseline, args.threshold)
+        print(f"\n📊 Compared with baseline {args.baseline} ({baseline['meta'].get('git_sha')})")
+        print_table(rows, [('case', 'case'), ('baseline', 'baseline ms'), ('median', 'median ms'), ('delta', 'delta')])
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            status = 1
+    else:
+        print(f"\nNo baseline at {args.baseline} - rerun with --save-baseline to create one")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+    return status
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('bench', help='Time core job-system operations at several data scales (local only)')
+    parser.add_argument('--scales', default='1,10,100', help='Comma-separated synthetic scale factors (default 1,10,100)')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--output', help='Write results JSON here')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Overwrite the baseline with this run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative median slowdown that counts as a regression (default 0.2)')
+    parser.set_defaults(func=run)
@@ -0,0 +1,149 @@
+"""Backfill and reconcile the campaign metrics rollups
+
+campaign_metrics_rollups holds recipient counts per campaign by last_event,
+reply sentiment and disposition, kept current by statement triggers on
+campaign_contact_status (20260110090000_campaign_metrics_rollups.sql).
+
+verify   -> recounts campaign_contact_status through
+            campaign_metrics_rollup_compute and diffs it against the rollups
+            in one snapshot, so in-flight sends cannot show as drift
+repair   -> verify, then rebuild_campaign_metrics_rollups() for each
+            campaign that drifted
+backfill -> rebuild every campaign in scope, one transaction per campaign
+            so each campaign's writes are held off only for its own recount
+"""
+import time
+from collections import defaultdict
+
+from ops.db import banner, connect, print_table
+
+SCOPE_SQL = """
+    SELECT id
+    FROM campaigns
+    WHERE (%(campaign)s::uuid IS NULL OR id = %(campaign)s::uuid)
+      AND (%(org)s::uuid IS NULL OR org_id = %(org)s::uuid)
+"""
+
+DIFF_SQL = f"""
+    WITH scope AS ({SCOPE_SQL}),
+    expected AS (
+        SELECT m.campaign_id, m.dimension, m.value, m.count
+        FROM campaign_metrics_rollup_compute m
+        WHERE m.campaign_id IN (SELECT id FROM scope)
+    ),
+    stored AS (
+        SELECT r.campaign_id, r.dimension, r.value, r.count
+        FROM campaign_metrics_rollups r
+        WHERE r.campaign_id IN (SELECT id FROM scope) AND r.count <> 0
+    )
+    SELECT COALESCE(e.campaign_id, s.campaign_id)::text AS campaign_id,
+           COALESCE(e.dimension, s.dimension) AS dimension,
+           COALESCE(e.value, s.value) AS value,
+           s.count AS stored,
+           e.count AS expected,
+           (SELECT COUNT(*) FROM scope) AS checked
+    FROM expected e
+    FULL JOIN stored s
+      ON s.campaign_id = e.campaign_id AND s.dimension = e.dimension AND s.value = e.value
+    WHERE e.count IS DISTINCT FROM s.count
+    ORDER BY 1, 2, 3
+"""
+
+
+def verify(cursor, campaign=None, org=None):
+    """Return (checked, {campaign_id: [diff rows]}) for campaigns whose rollups drifted"""
+    params = {'campaign': campaign, 'org': org}
+    cursor.execute(DIFF_SQL, params)
+    rows = cursor.fetchall()
+    if rows:
+        checked = rows[0]['checked']
+    else:
+        cursor.execute(f"SELECT COUNT(*) AS checked FROM ({SCOPE_SQL}) scope", params)
+        checked = cursor.fetchone()['checked']
+
+    drifted = defaultdict(list)
+    for row in rows:
+        drifted[row['campaign_id']].append(row)
+    return checked, dict(drifted)
+
+
+def rebuild(conn, campaign_ids):
+    """Rebuild each campaign in its own transaction; returns [{campaign_id, rows, ms}]"""
+    results = []
+    with conn.cursor() as cursor:
+        for campaign_id in campaign_ids:
+            started = time.perf_counter()
+            cursor.execute("SELECT rebuild_campaign_metrics_rollups(%s::uuid) AS rows", (campaign_id,))
+            rows = cursor.fetchone()['rows']
+            conn.commit()
+            results.append({
+                'campaign_id': campaign_id,
+                'rows': rows,
+                'ms': round((time.perf_counter() - started) * 1000, 1),
+            })
+    return results
+
+
+def report_drift(checked, drifted):
+    print(f"\nChecked {checked} campaign(s)")
+    for campaign_id, diffs in drifted.items():
+        print(f"   ❌ {campaign_id}: stale")
+        for d in diffs:
+            print(f"      {d['dimension']}={d['value']}: stored={d['stored'] or 0} expected={d['expected'] or 0}")
+
+
+def run(args):
+    conn = connect(args.database_url)
+    cursor = conn.cursor()
+    status = 0
+
+    if args.action == 'backfill':
+        banner("CAMPAIGN ROLLUPS BACKFILL")
+        cursor.execute(SCOPE_SQL + " ORDER BY id", {'campaign': args.campaign, 'org': args.org})
+        campaign_ids = [str(row['id']) for row in cursor.fetchall()]
+        conn.rollback()
+        results = rebuild(conn, campaign_ids)
+        print_table([r for r in results if r['rows']], [
+            ('campaign_id', 'campaign'), ('rows', 'rollup rows changed'), ('ms', 'ms'),
+        ])
+        print(f"\n✅ Rebuilt {len(results)} campaign(s), "
+              f"{sum(r['rows'] for r in results)} rollup row(s) changed")
+    else:
+        banner(f"CAMPAIGN ROLLUPS {args.action.upper()}")
+        checked, drifted = verify(cursor, campaign=args.campaign, org=args.org)
+        conn.rollback()
+        report_drift(checked, drifted)
+
+        if not drifted:
+            print("\n✅ campaign_metrics_rollups matches campaign_contact_status")
+        elif args.action == 'verify':
+            print(f"\n⚠️  {len(drifted)} campaign(s) out of date - run `campaign-rollups repair`")
+            status = 1
+        else:
+            rebuild(conn, list(drifted))
+            with conn.cursor() as recheck:
+                still = {
+                    campaign_id
+                    for campaign_id in drifted
+                    if verify(recheck, campaign=campaign_id)[1]
+                }
+            conn.rollback()
+            if still:
+                # Rebuild holds off the campaign's status writes, so drift left
+                # over means the triggers are missing or disabled, not a race
+                print(f"\n❌ {len(still)} campaign(s) still differ after rebuild: {', '.join(sorted(still))}")
+                status = 1
+            else:
+                print(f"\n✅ Repaired {len(drifted)} campaign(s)")
+
+    cursor.close()
+    conn.close()
+    return status
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('campaign-rollups', help='Backfill and reconcile campaign metrics rollups')
+    parser.add_argument('action', choices=['verify', 'repair', 'backfill'])
+    parser.add_argument('--campaign', help='Only this campaign id')
+    parser.add_argument('--org', help='Only campaigns in this org id')
+    parser.set_defaults(func=run)
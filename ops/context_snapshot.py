@@ -0,0 +1,232 @@
+"""Maintain per-tenant agent context snapshots from updated_at watermarks
+
+buildContext (src/lib/agent/context-builder.ts) used to re-read every
+active client with nested contacts and orders, the latest 3000 orders and
+every property on each agent run. `refresh` keeps a columnar copy of those
+tables per tenant in agent_context_snapshots instead:
+
+  - each section stores its column list once and a {id: [values]} map
+  - a refresh reads only rows whose updated_at is past the section's
+    watermark (minus --overlap, which catches transactions that committed
+    after a later one moved the watermark) and merges them by id
+  - a COUNT(*) per section detects a net change in row count (deletes,
+    or inserts the watermark missed); only then are ids compared and the
+    difference fetched or dropped. Updates that leave updated_at alone,
+    or a delete offset by such an insert, wait for --full
+  - when no section changed, only the watermarks and refreshed_at are
+    written; the sections document is rewritten only when a row did
+  - a column list that no longer matches the table (migration) rebuilds
+    that section; --full rebuilds all of them
+
+buildContext reads the snapshot in one query, merges the rows changed since
+its watermarks, and falls back to live queries when there is no snapshot.
+"""
+import json
+import time
+from datetime import datetime, timezone
+
+from psycopg2.extras import Json
+
+from ops.db import banner, connect, print_table
+from ops.refcache import RefCache
+
+# Sections and the tables they mirror, all filtered by tenant_id
+SECTIONS = ['clients', 'contacts', 'orders', 'properties']
+
+ROWS_SQL = "SELECT to_jsonb(t) AS row, t.updated_at FROM public.{table} t WHERE t.tenant_id = %s"
+
+
+def _rows_since(cursor, table, tenant_id, since, overlap):
+    if since is None:
+        cursor.execute(ROWS_SQL.format(table=table), (tenant_id,))
+    else:
+        cursor.execute(ROWS_SQL.format(table=table)
+                       + " AND t.updated_at >= %s::timestamptz - make_interval(secs => %s)",
+                       (tenant_id, since, overlap))
+    return cursor.fetchall()
+
+
+def refresh_section(cursor, cache, tenant_id, table, entry, mark, full=False, overlap=300):
+    """Bring one section up to date; returns (entry, mark, stats)"""
+    columns = [c['column_name'] for c in cache.columns(table)]
+    rebuild = full or entry is None or mark is None or entry['columns'] != columns
+    rows = {} if rebuild else entry['rows']
+    since = None if rebuild else mark['at']
+
+    latest = datetime.fromisoformat(since) if since else None
+    fetched = _rows_since(cursor, table, tenant_id, since, overlap)
+    updated = 0
+    for r in fetched:
+        key, values = str(r['row']['id']), [r['row'].get(c) for c in columns]
+        # Rows re-read inside the overlap window usually match the snapshot
+        if rows.get(key) != values:
+            rows[key] = values
+            updated += 1
+        if r['updated_at'] is not None and (latest is None or r['updated_at'] > latest):
+            latest = r['updated_at']
+
+    # Deletes and inserts the watermark missed change the count; in-place updates do not
+    cursor.execute(f"SELECT COUNT(*) AS n FROM public.{table} WHERE tenant_id = %s", (tenant_id,))
+    count = cursor.fetchone()['n']
+    removed = repaired = 0
+    if count != len(rows):
+        cursor.execute(f"SELECT id::text AS id FROM public.{table} WHERE tenant_id = %s", (tenant_id,))
+        ids = {r['id'] for r in cursor.fetchall()}
+        gone = rows.keys() - ids
+        for key in gone:
+            del rows[key]
+        missing = list(ids - rows.keys())
+        if missing:
+            cursor.execute(f"SELECT to_jsonb(t) AS row FROM public.{table} t WHERE t.id::text = ANY(%s)",
+                           (missing,))
+            for r in cursor.fetchall():
+                rows[str(r['row']['id'])] = [r['row'].get(c) for c in columns]
+        removed, repaired = len(gone), len(missing)
+
+    entry = {'columns': columns, 'rows': rows}
+    mark = {'at': latest.isoformat() if latest else None, 'count': len(rows)}
+    stats = {
+        'section': table, 'mode': 'full' if rebuild else 'delta', 'fetched': len(fetched),
+        'updated': updated, 'removed': removed, 'repaired': repaired, 'rows': len(rows),
+        'changed': rebuild or bool(updated or removed or repaired),
+    }
+    return entry, mark, stats
+
+
+def refresh_tenant(conn, cache, tenant_id, full=False, overlap=300):
+    cursor = conn.cursor()
+    # The row lock serializes concurrent refreshes of the same tenant
+    cursor.execute("""
+        INSERT INTO agent_context_snapshots (tenant_id) VALUES (%s) ON CONFLICT (tenant_id) DO NOTHING
+    """, (tenant_id,))
+    cursor.execute("""
+        SELECT sections, watermarks FROM agent_context_snapshots WHERE tenant_id = %s FOR UPDATE
+    """, (tenant_id,))
+    snapshot = cursor.fetchone()
+    sections, watermarks = snapshot['sections'], snapshot['watermarks']
+
+    results = []
+    for table in SECTIONS:
+        sections[table], watermarks[table], stats = refresh_section(
+            cursor, cache, tenant_id, table, sections.get(table), watermarks.get(table),
+            full=full, overlap=overlap,
+        )
+        results.append(stats)
+
+    if any(r['changed'] for r in results):
+        payload = json.dumps(sections)
+        size = len(payload)
+        cursor.execute("""
+            UPDATE agent_context_snapshots
+            SET sections = %s::jsonb,
+                watermarks = %s,
+                refreshed_at = NOW(),
+                built_at = CASE WHEN %s THEN NOW() ELSE built_at END,
+                size_bytes = %s
+            WHERE tenant_id = %s
+        """, (payload, Json(watermarks), full, size, tenant_id))
+    else:
+        cursor.execute("""
+            UPDATE agent_context_snapshots
+            SET watermarks = %s, refreshed_at = NOW()
+            WHERE tenant_id = %s
+            RETURNING size_bytes
+        """, (Json(watermarks), tenant_id))
+        size = cursor.fetchone()['size_bytes']
+    conn.commit()
+    cursor.close()
+    return results, size
+
+
+def refresh(conn, tenant_ids, full=False, overlap=300):
+    cache = RefCache(conn)
+    summary = []
+    for tenant_id in tenant_ids:
+        started = time.perf_counter()
+        results, size = refresh_tenant(conn, cache, tenant_id, full=full, overlap=overlap)
+        summary.append({
+            'tenant_id': tenant_id,
+            'fetched': sum(r['fetched'] for r in results),
+            'updated': sum(r['updated'] for r in results),
+            'removed': sum(r['removed'] for r in results),
+            'repaired': sum(r['repaired'] for r in results),
+            'rows': sum(r['rows'] for r in results),
+            'kb': size / 1024,
+            'ms': (time.perf_counter() - started) * 1000,
+            'sections': results,
+        })
+    return summary
+
+
+def show(cursor):
+    cursor.execute("""
+        SELECT s.tenant_id, t.name, s.size_bytes, s.built_at, s.refreshed_at, s.watermarks
+        FROM agent_context_snapshots s
+        LEFT JOIN tenants t ON t.id = s.tenant_id
+        ORDER BY t.name
+    """)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for r in cursor.fetchall():
+        row = {
+            'tenant': r['name'] or r['tenant_id'], 'kb': r['size_bytes'] / 1024,
+            'age_s': (now - r['refreshed_at']).total_seconds(), 'built_at': r['built_at'],
+        }
+        row.update({table: (r['watermarks'].get(table) or {}).get('count') for table in SECTIONS})
+        rows.append(row)
+    return rows
+
+
+def run(args):
+    conn = connect(args.database_url)
+
+    if args.action == 'show':
+        banner("AGENT CONTEXT SNAPSHOTS")
+        print_table(show(conn.cursor()), [
+            ('tenant', 'tenant'), *((t, t) for t in SECTIONS),
+            ('kb', 'KB'), ('age_s', 'age (s)'), ('built_at', 'last full build'),
+        ])
+        conn.close()
+        return 0
+
+    if args.tenant:
+        tenant_ids = [args.tenant]
+    else:
+        tenant_ids = [str(t['id']) for t in RefCache(conn).tenants() if t['is_active']]
+    banner(f"REFRESH CONTEXT SNAPSHOTS ({len(tenant_ids)} tenants, {'full' if args.full else 'delta'})")
+
+    while True:
+        summary = refresh(conn, tenant_ids, full=args.full, overlap=args.overlap)
+        if args.verbose:
+            for s in summary:
+                print(f"\nTenant {s['tenant_id']}")
+                print_table(s['sections'], [
+                    ('section', 'section'), ('mode', 'mode'), ('fetched', 'fetched'),
+                    ('updated', 'updated'), ('removed', 'removed'), ('repaired', 'repaired'), ('rows', 'rows'),
+                ])
+        print(f"\n{time.strftime('%H:%M:%S')}")
+        print_table(summary, [
+            ('tenant_id', 'tenant'), ('fetched', 'fetched'), ('updated', 'updated'), ('removed', 'removed'),
+            ('repaired', 'repaired'), ('rows', 'rows'), ('kb', 'KB'), ('ms', 'ms'),
+        ])
+        if not args.loop:
+            break
+        args.full = False
+        time.sleep(args.interval)
+
+    conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('context-snapshot',
+                                   help='Refresh per-tenant agent context snapshots from updated_at watermarks')
+    parser.add_argument('action', choices=['refresh', 'show'])
+    parser.add_argument('--tenant', help='refresh: one tenant id (default: every active tenant)')
+    parser.add_argument('--full', action='store_true', help='refresh: rebuild every section from scratch')
+    parser.add_argument('--overlap', type=float, default=300.0,
+                        help='refresh: seconds before each watermark that are re-read')
+    parser.add_argument('--loop', action='store_true', help='refresh: keep refreshing every --interval seconds')
+    parser.add_argument('--interval', type=float, default=60.0)
+    parser.add_argument('--verbose', action='store_true', help='refresh: per-section counts')
+    parser.set_defaults(func=run)
@@ -0,0 +1,296 @@
+"""Backfill contact details from email signatures across the stored mailbox
+
+processEnrichmentQueue (src/lib/agent/contact-enricher.ts) merges one queue
+item at a time, each parsed by parseEmailSignature as mail arrives, so
+contacts whose mail predates the enricher never get filled in. This command
+enriches from the whole gmail_messages history:
+
+  - only contacts with an empty title / phone / mobile (/ linkedin_url, where
+    the column exists) are targeted; their --per-contact newest inbound
+    messages stream through a server-side cursor, grouped by contact
+  - a process pool runs a port of parseEmailSignature with every pattern
+    compiled once per process; per contact, the newest message providing a
+    field wins
+  - each batch is merged with one UPDATE ... FROM (VALUES ...) that only
+    fills empty fields, and a completed contact_enrichment_queue row per
+    merged contact records what was extracted and any field that already
+    held a different value (merge_conflicts)
+
+At most --workers * 2 chunks are in flight, so memory stays flat however
+large the mailbox is.
+"""
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from psycopg2.extras import Json, execute_values
+
+from ops.db import banner, connect, print_table
+from ops.refcache import RefCache
+
+# contacts column -> parseEmailSignature field
+FIELDS = [('title', 'title'), ('phone', 'phone'), ('mobile', 'mobile'), ('linkedin_url', 'linkedin')]
+
+MESSAGES_SQL = """
+    WITH targets AS (
+        SELECT c.id AS contact_id, c.tenant_id, lower(c.email) AS email
+        FROM contacts c
+        WHERE c.email IS NOT NULL AND c.tenant_id IS NOT NULL
+          AND (%(tenant)s::uuid IS NULL OR c.tenant_id = %(tenant)s::uuid)
+          AND ({empty})
+    )
+    SELECT contact_id::text, tenant_id::text, email, gmail_message_id, body_text
+    FROM (
+        SELECT t.contact_id, t.tenant_id, t.email, m.gmail_message_id, m.body_text,
+               ROW_NUMBER() OVER (PARTITION BY t.contact_id ORDER BY m.received_at DESC) AS n
+        FROM targets t
+        JOIN gmail_messages m ON m.tenant_id = t.tenant_id AND lower(m.from_email) = t.email
+        WHERE m.body_text IS NOT NULL AND m.body_text <> ''
+    ) recent
+    WHERE n <= %(per_contact)s
+    ORDER BY contact_id, n
+"""
+
+# -- parseEmailSignature, compiled once ---------------------------------------
+
+MAX_INPUT_LENGTH = 10000
+
+SIGNATURE_PATTERNS = [
+    re.compile(r'(?:--|—|___+|Best regards|Regards|Thanks|Thank you|Sincerely|Cheers)[\s\S]*\Z', re.I),
+    re.compile(r'\n\n\n[\s\S]{50,500}\Z'),
+]
+PHONE_RE = re.compile(r'(?:\+?1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}')
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+LINKEDIN_RE = re.compile(r'(?:linkedin\.com/in/|linkedin\.com/profile/view\?id=)([a-zA-Z0-9_-]+)', re.I)
+TWITTER_RE = re.compile(r'@([a-zA-Z0-9_]{1,15})(?:\s|\Z)')
+TITLE_PATTERNS = [
+    re.compile(r'(?:^|\n)([A-Z][a-z]+ (?:Director|Manager|VP|President|CEO|CFO|CTO|COO|Owner|Partner|Associate|'
+               r'Analyst|Specialist|Coordinator|Administrator|Executive|Consultant|Engineer|Developer|Designer|'
+               r'Architect)[^\n]*)', re.M),
+    re.compile(r'(?:Title|Position|Role):\s*([^\n]+)', re.I),
+]
+COMPANY_PATTERNS = [
+    re.compile(r'(?:Company|Organization|Firm):\s*([^\n]+)', re.I),
+    re.compile(r'(?:^|\n)([A-Z][A-Za-z0-9\s&,.]+ (?:LLC|Inc|Corp|Ltd|Company|Co\.|Group|Partners|Associates|'
+               r'Consulting))', re.M),
+]
+WEBSITE_RE = re.compile(r'(?:https?://)?(?:www\.)?([a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?)')
+NON_DIGIT_RE = re.compile(r'\D')
+
+
+def parse_signature(body):
+    """Port of parseEmailSignature: contact fields from the signature block of an email body"""
+    data = {}
+    if not body:
+        return data
+    body = body[-MAX_INPUT_LENGTH:]
+
+    block = ''
+    for pattern in SIGNATURE_PATTERNS:
+        match = pattern.search(body)
+        if match:
+            block = match.group(0)
+            break
+    if not block:
+        block = body[-500:]
+
+    phones = PHONE_RE.findall(block)
+    if phones:
+        data['phone'] = NON_DIGIT_RE.sub('', phones[0])
+        if len(phones) > 1:
+            data['mobile'] = NON_DIGIT_RE.sub('', phones[1])
+
+    email = EMAIL_RE.search(block)
+    if email:
+        data['email'] = email.group(0).lower()
+
+    linkedin = LINKEDIN_RE.search(block)
+    if linkedin:
+        data['linkedin'] = f'https://linkedin.com/in/{linkedin.group(1)}'
+
+    twitter = TWITTER_RE.search(block)
+    if twitter:
+        data['twitter'] = twitter.group(0).strip()
+
+    for pattern in TITLE_PATTERNS:
+        match = pattern.search(block)
+        if match:
+            data['title'] = match.group(1).strip()
+            break
+
+    for pattern in COMPANY_PATTERNS:
+        match = pattern.search(block)
+        if match:
+            data['company'] = match.group(1).strip()
+            break
+
+    for match in WEBSITE_RE.finditer(block):
+        website = match.group(0)
+        if 'linkedin' not in website and 'twitter' not in website and 'facebook' not in website:
+            data['website'] = website if website.startswith('http') else f'https://{website}'
+            break
+    return data
+
+
+def enrich_chunk(contacts):
+    """[(contact_id, tenant_id, email, [(gmail_message_id, body) newest first])] -> merged extractions, cpu_s"""
+    started = time.process_time()
+    results = []
+    for contact_id, tenant_id, email, messages in contacts:
+        merged, sources = {}, {}
+        for gmail_message_id, body in messages:
+            for field, value in parse_signature(body).items():
+                if value and field not in merged:
+                    merged[field] = value
+                    sources[field] = gmail_message_id
+        if merged:
+            results.append((contact_id, tenant_id, email, merged, sources))
+    return results, time.process_time() - started
+
+
+# -- merge --------------------------------------------------------------------
+
+def merge(conn, columns, results, dry_run=False):
+    """Fill empty contact fields from `results`; returns the number of contacts updated"""
+    rows = [(contact_id,) + tuple(data.get(key) for _, key in columns)
+            for contact_id, _, _, data, _ in results if any(data.get(key) for _, key in columns)]
+    if not rows:
+        return 0
+    names = [column for column, _ in columns]
+    cursor = conn.cursor()
+    updated = execute_values(cursor, f"""
+        WITH v(id, {', '.join(names)}) AS (VALUES %s),
+        current AS (
+            SELECT c.id, {', '.join(f'c.{n} AS old_{n}' for n in names)}
+            FROM contacts c JOIN v ON c.id = v.id::uuid
+            FOR UPDATE OF c
+        )
+        UPDATE contacts c SET
+            {', '.join(f"{n} = COALESCE(NULLIF(cur.old_{n}, ''), v.{n})" for n in names)},
+            updated_at = NOW()
+        FROM v JOIN current cur ON cur.id = v.id::uuid
+        WHERE c.id = cur.id
+          AND ({' OR '.join(f"(NULLIF(cur.old_{n}, '') IS NULL AND v.{n} IS NOT NULL)" for n in names)})
+        RETURNING c.id::text, {', '.join(f'cur.old_{n}' for n in names)}
+    """, rows, page_size=len(rows), fetch=True)
+
+    by_id = {r[0]: r for r in results}
+    queue = []
+    for row in updated:
+        contact_id, tenant_id, email, data, sources = by_id[row['id']]
+        conflicts = [
+            {'field': column, 'existing': row[f'old_{column}'], 'extracted': data[key]}
+            for column, key in columns
+            if data.get(key) and row[f'old_{column}'] and row[f'old_{column}'] != data[key]
+        ]
+        queue.append((tenant_id, contact_id, email, 'email_signature',
+                      sources.get('title') or next(iter(sources.values())), 'completed',
+                      Json(data), contact_id, Json(conflicts)))
+    if queue:
+        execute_values(cursor, """
+            INSERT INTO contact_enrichment_queue (
+                tenant_id, contact_id, email_address, source, source_id, status,
+                extracted_data, merged_to_contact_id, merge_conflicts, processed_at
+            ) VALUES %s
+        """, queue, template='(%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())', page_size=1000)
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    return len(updated)
+
+
+def _contacts(stream, per_chunk):
+    """Group consecutive rows by contact and yield chunks of whole contacts"""
+    chunk, current = [], None
+    for row in stream:
+        if current is None or current[0] != row['contact_id']:
+            if current is not None:
+                chunk.append(current)
+                if len(chunk) == per_chunk:
+                    yield chunk
+                    chunk = []
+            current = (row['contact_id'], row['tenant_id'], row['email'], [])
+        current[3].append((row['gmail_message_id'], row['body_text']))
+    if current is not None:
+        chunk.append(current)
+    if chunk:
+        yield chunk
+
+
+def run(args):
+    read_conn = connect(args.database_url)
+    write_conn = connect(args.database_url)
+    existing = {c['column_name'] for c in RefCache(read_conn).columns('contacts')}
+    columns = [(column, key) for column, key in FIELDS if column in existing]
+    empty = ' OR '.join(f"NULLIF(c.{column}, '') IS NULL" for column, _ in columns)
+
+    banner(f"SIGNATURE ENRICHMENT ({', '.join(c for c, _ in columns)}; {args.workers} workers"
+           f"{', dry run' if args.dry_run else ''})")
+
+    stats = {'contacts': 0, 'messages': 0, 'extracted': 0, 'updated': 0}
+    found = {key: 0 for _, key in columns}
+    pending = []
+    cpu = write_s = 0.0
+    started = time.perf_counter()
+
+    stream = read_conn.cursor(name='enrich_messages')
+    stream.itersize = 5000
+    stream.execute(MESSAGES_SQL.format(empty=empty), {'tenant': args.tenant, 'per_contact': args.per_contact})
+
+    def collect(future):
+        nonlocal cpu, write_s
+        results, chunk_cpu = future.result()
+        cpu += chunk_cpu
+        stats['extracted'] += len(results)
+        for _, _, _, data, _ in results:
+            for key in found:
+                found[key] += key in data
+        pending.extend(results)
+        if len(pending) >= args.write_batch:
+            began = time.perf_counter()
+            stats['updated'] += merge(write_conn, columns, pending, args.dry_run)
+            write_s += time.perf_counter() - began
+            pending.clear()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        in_flight = set()
+        for chunk in _contacts(stream, args.chunk):
+            stats['contacts'] += len(chunk)
+            stats['messages'] += sum(len(c[3]) for c in chunk)
+            in_flight.add(pool.submit(enrich_chunk, chunk))
+            if len(in_flight) >= args.workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+        for future in in_flight:
+            collect(future)
+    stream.close()
+    read_conn.close()
+
+    if pending:
+        began = time.perf_counter()
+        stats['updated'] += merge(write_conn, columns, pending, args.dry_run)
+        write_s += time.perf_counter() - began
+    write_conn.close()
+    elapsed = time.perf_counter() - started
+
+    print_table([{'field': column, 'found': found[key]} for column, key in columns],
+                [('field', 'field'), ('found', 'contacts with a value')])
+    print(f"\n   {stats['contacts']:,} contacts with empty fields, {stats['messages']:,} messages parsed in "
+          f"{elapsed:.1f}s ({stats['messages'] / elapsed if elapsed else 0:,.0f} msgs/s)")
+    print(f"   {stats['extracted']:,} with signature data, {stats['updated']:,} contacts "
+          f"{'would be ' if args.dry_run else ''}updated")
+    print(f"   parsing {cpu:.1f} CPU-s across workers, merges {write_s:.1f}s")
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('enrich', help='Fill empty contact fields from email signatures in stored mail')
+    parser.add_argument('--tenant', help='Only this tenant (default: all)')
+    parser.add_argument('--per-contact', type=int, default=5, help='Newest inbound messages parsed per contact')
+    parser.add_argument('--workers', type=int, default=4, help='Parser processes')
+    parser.add_argument('--chunk', type=int, default=200, help='Contacts per worker task')
+    parser.add_argument('--write-batch', type=int, default=1000, help='Contacts merged per UPDATE')
+    parser.add_argument('--dry-run', action='store_true', help='Run the merge and roll it back')
+    parser.set_defaults(func=run)
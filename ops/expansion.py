@@ -0,0 +1,308 @@
+"""Python port of job-planner.ts expandTaskToCards for out-of-request workers
+
+Mirrors the TypeScript expansion for draft_email, create_task, check_portal
+and send_email tasks: same target selection (getTargetContacts, including
+the bounce-tag, email_suppressions and agent_memories avoidance filters),
+same template substitution and HTML formatting, same card fields. The
+PostgREST round trips collapse into single SQL statements run on the
+caller's cursor, so an expansion can share the worker's transaction.
+
+Keep this in step with src/lib/agent/job-planner.ts.
+"""
+import html
+import os
+import re
+
+BOUNCE_TAGS = ('email_bounced_hard', 'email_bounced_soft')
+ZERO_CARDS_ERROR = 'Expansion returned 0 cards - check target filter and contact query'
+
+
+# -- formatting (formatEmailBody / escapeHtml / replaceVariables) ----------------
+
+_BULLET = re.compile(r'^[•\-*]\s+')
+
+
+def format_email_body(body):
+    """Plain text with line breaks -> <p> paragraphs and <ul> lists"""
+    if not body:
+        return body
+    if '<p>' in body and '</p>' in body:
+        return body
+
+    if re.search(r'^\s*[•\-*]\s+', body, re.M):
+        result, paragraph, in_list = '', '', False
+        for line in body.split('\n'):
+            trimmed = line.strip()
+            if _BULLET.match(trimmed):
+                if paragraph:
+                    result += f"<p>{paragraph.strip()}</p>"
+                    paragraph = ''
+                if not in_list:
+                    result += '<ul>'
+                    in_list = True
+                result += f"<li>{_BULLET.sub('', trimmed, count=1)}</li>"
+            elif trimmed:
+                if in_list:
+                    result += '</ul>'
+                    in_list = False
+                paragraph += (' ' if paragraph else '') + trimmed
+            elif paragraph and not in_list:
+                result += f"<p>{paragraph.strip()}</p>"
+                paragraph = ''
+        if paragraph:
+            result += f"<p>{paragraph.strip()}</p>"
+        if in_list:
+            result += '</ul>'
+        return result
+
+    paragraphs = re.split(r'\n\n+', body)
+    if len(paragraphs) > 1:
+        return ''.join(f"<p>{p.strip().replace(chr(10), ' ')}</p>" for p in paragraphs if p.strip())
+    return f"<p>{body.strip()}</p>"
+
+
+def escape_html(text):
+    # html.escape covers & < > " ' the same way; the TS helper also escapes /
+    return html.escape(text, quote=True).replace('/', '&#x2F;')
+
+
+def replace_variables(template, variables):
+    result = template
+    for key, value in variables.items():
+        escaped = escape_html(value or '')
+        result = re.sub(r'\{\{\s*' + re.escape(key) + r'\s*\}\}', lambda _: escaped, result)
+    return result
+
+
+def card_state(params):
+    if params.get('edit_mode'):
+        return 'in_review'
+    if params.get('review_mode'):
+        return 'suggested'
+    return 'approved'
+
+
+# -- targeting (getTargetContacts) ------------------------------------------------
+
+def _explicit_contacts(cursor, tenant_id, contact_ids):
+    cursor.execute("""
+        SELECT c.id, c.first_name, c.last_name, c.email, c.client_id, cl.company_name
+        FROM contacts c
+        JOIN clients cl ON cl.id = c.client_id
+        WHERE c.id = ANY(%s::uuid[])
+          AND cl.tenant_id = %s
+          AND c.email IS NOT NULL
+    """, (list(contact_ids), tenant_id))
+    return cursor.fetchall()
+
+
+def _target_clients(cursor, tenant_id, flt, job_id, limit):
+    where, values = ['cl.tenant_id = %(tenant_id)s', 'cl.email IS NOT NULL'], {'tenant_id': tenant_id}
+    if flt.get('client_type'):
+        where.append('cl.client_type = %(client_type)s')
+        values['client_type'] = flt['client_type']
+    for key in ('is_active', 'active'):
+        if flt.get(key) is not None:
+            where.append(f'cl.is_active = %({key})s')
+            values[key] = flt[key]
+    if job_id:
+        where.append("""NOT EXISTS (
+            SELECT 1 FROM kanban_cards k WHERE k.job_id = %(job_id)s AND k.client_id = cl.id
+        )""")
+        values['job_id'] = job_id
+    values['limit'] = limit
+    cursor.execute(f"""
+        SELECT cl.id, COALESCE(cl.primary_contact, cl.company_name) AS first_name, '' AS last_name,
+               cl.email, cl.id AS client_id, cl.company_name
+        FROM clients cl
+        WHERE {' AND '.join(where)}
+        LIMIT %(limit)s
+    """, values)
+    return cursor.fetchall()
+
+
+def _target_contacts(cursor, tenant_id, flt, job_id, limit):
+    where, values = ['cl.tenant_id = %(tenant_id)s', 'c.email IS NOT NULL'], {'tenant_id': tenant_id}
+    if flt.get('client_type'):
+        where.append('cl.client_type = %(client_type)s')
+        values['client_type'] = flt['client_type']
+    if flt.get('target_role_codes'):
+        where.append('c.primary_role_code = ANY(%(roles)s)')
+        values['roles'] = list(flt['target_role_codes'])
+    elif flt.get('primary_role_code'):
+        where.append('c.primary_role_code = %(role)s')
+        values['role'] = flt['primary_role_code']
+    for key in ('is_active', 'active'):
+        if flt.get(key) is not None:
+            where.append(f'cl.is_active = %({key})s')
+            values[key] = flt[key]
+    if job_id:
+        where.append("""NOT EXISTS (
+            SELECT 1 FROM kanban_cards k WHERE k.job_id = %(job_id)s AND k.contact_id = c.id
+        )""")
+        values['job_id'] = job_id
+    values['limit'] = limit
+    cursor.execute(f"""
+        SELECT c.id, c.first_name, c.last_name, c.email, c.client_id, c.tags, cl.company_name
+        FROM contacts c
+        JOIN clients cl ON cl.id = c.client_id
+        WHERE {' AND '.join(where)}
+        LIMIT %(limit)s
+    """, values)
+    contacts = [c for c in cursor.fetchall() if not set(c['tags'] or ()) & set(BOUNCE_TAGS)]
+    if not contacts:
+        return []
+
+    cursor.execute("""
+        SELECT contact_id FROM email_suppressions
+        WHERE contact_id = ANY(%s::uuid[]) AND tenant_id = %s
+    """, ([str(c['id']) for c in contacts], tenant_id))
+    suppressed = {r['contact_id'] for r in cursor.fetchall()}
+    contacts = [c for c in contacts if c['id'] not in suppressed]
+
+    patterns = avoidance_patterns(cursor, tenant_id)
+    if not patterns:
+        return contacts
+
+    def avoided(contact):
+        names = [contact['first_name'], contact['last_name'],
+                 f"{contact['first_name']} {contact['last_name']}"]
+        return any(p.search(n) for p in patterns for n in names if n)
+
+    return [c for c in contacts if not avoided(c)]
+
+
+def avoidance_patterns(cursor, tenant_id):
+    """High-importance card feedback patterns from agent_memories, compiled case-insensitively"""
+    cursor.execute("""
+        SELECT content FROM agent_memories
+        WHERE tenant_id = %s
+          AND (scope = 'card_feedback' OR key ILIKE '%%rejection_%%' OR key ILIKE '%%deletion_%%')
+          AND importance >= 0.7
+    """, (tenant_id,))
+    patterns = []
+    for row in cursor.fetchall():
+        pattern = (row['content'] or {}).get('pattern')
+        if not pattern:
+            continue
+        try:
+            patterns.append(re.compile(pattern, re.I))
+        except re.error:
+            pass                                # invalid regex, skip like the TS filter
+    return patterns
+
+
+def target_contacts(cursor, task_input, params, tenant_id):
+    if not tenant_id:
+        return []
+    if task_input.get('contact_ids'):
+        return _explicit_contacts(cursor, tenant_id, task_input['contact_ids'])
+    flt = params.get('target_filter') or task_input.get('target_filter')
+    if not flt:
+        return []
+    limit = params.get('batch_size') or 10
+    if (params.get('target_type') or 'contacts') == 'clients':
+        return _target_clients(cursor, tenant_id, flt, task_input.get('job_id'), limit)
+    return _target_contacts(cursor, tenant_id, flt, task_input.get('job_id'), limit)
+
+
+# -- expansion ---------------------------------------------------------------------
+
+def _draft_email(cursor, task, job, params):
+    task_input = task['input'] or {}
+    targets = target_contacts(cursor, task_input, params, job['tenant_id'])
+    if not targets:
+        return []
+    template = (params.get('templates') or {}).get(task_input.get('template'))
+    if not template:
+        return []
+
+    cards = []
+    for contact in targets:
+        variables = {
+            'first_name': contact['first_name'],
+            'last_name': contact['last_name'],
+            'company_name': contact['company_name'],
+            **(task_input.get('variables') or {}),
+        }
+        subject = replace_variables(template['subject'], variables)
+        body = format_email_body(replace_variables(template['body'], variables))
+        cards.append({
+            'type': 'send_email',
+            'title': f"Email: {contact['first_name']} {contact['last_name']} - {subject[:50]}",
+            'description': f"Send email to {contact['email']}",
+            'rationale': f"Job \"{job['name']}\" - {task_input.get('template')} template (batch {task['batch']})",
+            'priority': 'medium',
+            'action_payload': {
+                'to': contact['email'],
+                'subject': subject,
+                'body': body,
+                'from_name': 'Your Team',
+                'from_email': os.environ.get('RESEND_FROM_EMAIL', ''),
+            },
+            'client_id': contact['client_id'],
+            'contact_id': contact['id'],
+        })
+    return cards
+
+
+def _create_task(cursor, task, job, params):
+    task_input = task['input'] or {}
+    return [{
+        'type': 'create_task',
+        'title': f"Follow-up: {contact['first_name']} {contact['last_name']}",
+        'description': task_input.get('task_description') or 'Follow-up task',
+        'rationale': f"Job \"{job['name']}\" - automated follow-up (batch {task['batch']})",
+        'priority': 'medium',
+        'action_payload': {
+            'title': task_input.get('task_title') or f"Follow up with {contact['first_name']}",
+            'description': task_input.get('task_description') or '',
+            'due_date': task_input.get('due_date'),
+        },
+        'client_id': contact['client_id'],
+        'contact_id': contact['id'],
+    } for contact in target_contacts(cursor, task_input, params, job['tenant_id'])]
+
+
+def _check_portal(cursor, task, job, params):
+    portal_urls = params.get('portal_urls') or {}
+    if not portal_urls:
+        return []
+    # The TS version looks clients up by id only; scoping to the job's tenant
+    # here keeps a worker from reading another tenant's clients.
+    cursor.execute("""
+        SELECT id, company_name FROM clients WHERE id = ANY(%s::uuid[]) AND tenant_id = %s
+    """, (list(portal_urls), job['tenant_id']))
+    return [{
+        'type': 'research',
+        'title': f"Check Portal: {client['company_name']}",
+        'description': f"Verify portal access at {portal_urls[str(client['id'])]}",
+        'rationale': f"Job \"{job['name']}\" - portal verification (batch {task['batch']})",
+        'priority': 'low',
+        'action_payload': {
+            'type': 'portal_check',
+            'portal_url': portal_urls[str(client['id'])],
+            'company_id': str(client['id']),
+        },
+        'client_id': client['id'],
+        'contact_id': None,
+    } for client in cursor.fetchall()]
+
+
+EXPANDERS = {
+    'draft_email': _draft_email,
+    'create_task': _create_task,
+    'check_portal': _check_portal,
+    'send_email': lambda cursor, task, job, params: [],
+}
+
+
+def expand_task(cursor, task, job):
+    """Cards for one task, with job/task/state filled in; [] for kinds that create none"""
+    params = job['params'] or {}
+    expander = EXPANDERS.get(task['kind'])
+    if expander is None:
+        return []
+    state = card_state(params)
+    return [dict(card, job_id=job['id'], task_id=task['id'], state=state)
+            for card in expander(cursor, task, job, params)]
@@ -0,0 +1,209 @@
+"""Run autonomous agent cycles for every enabled tenant through a bounded pool
+
+executeAllTenantCycles runs tenants one after another, so one slow tenant
+delays all the others and a fleet cycle takes the sum of every tenant's
+cycle. This command dispatches each tenant's cycle to the agent cron
+endpoint (/api/cron/agent?tenant=<id>) from --concurrency worker threads,
+so a fleet cycle takes about as long as its slowest tenant.
+
+  - fair queueing: tenants whose last cycle did not complete (failed, timed
+    out, deferred past the previous fleet deadline) go first; the rest are
+    ordered longest expected cycle first (from agent_autonomous_runs), which
+    keeps the slowest tenant from starting last
+  - per-tenant deadlines: each cycle gets --deadline as its internal timeout
+    and an HTTP timeout a little past it; tenants not started before
+    --fleet-deadline are deferred and lead the next fleet cycle
+  - locking: cycles still take acquire_tenant_lock themselves (holder
+    ops-fleet); tenants whose lock is held when the plan is made are skipped
+    without a request
+"""
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+
+from ops.db import banner, connect, print_table
+
+PLAN_SQL = """
+    WITH history AS (
+        SELECT tenant_id,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms) AS expected_ms,
+               COUNT(*) AS runs
+        FROM (
+            SELECT tenant_id, duration_ms,
+                   ROW_NUMBER() OVER (PARTITION BY tenant_id ORDER BY started_at DESC) AS n
+            FROM agent_autonomous_runs
+            WHERE status = 'completed' AND duration_ms IS NOT NULL
+        ) recent
+        WHERE n <= %(history)s
+        GROUP BY tenant_id
+    ),
+    last_run AS (
+        SELECT DISTINCT ON (tenant_id) tenant_id, started_at, status
+        FROM agent_autonomous_runs
+        ORDER BY tenant_id, started_at DESC
+    )
+    SELECT t.id, t.name,
+           h.expected_ms, COALESCE(h.runs, 0) AS runs,
+           l.started_at AS last_started_at, l.status AS last_status,
+           k.lock_holder, k.expires_at AS lock_expires_at
+    FROM tenants t
+    LEFT JOIN history h ON h.tenant_id = t.id
+    LEFT JOIN last_run l ON l.tenant_id = t.id
+    LEFT JOIN agent_tenant_locks k ON k.tenant_id = t.id AND k.expires_at > NOW()
+    WHERE t.is_active AND t.agent_enabled
+    ORDER BY t.id
+    LIMIT %(max_tenants)s
+"""
+
+
+def plan(rows, period):
+    """Split tenants into (queue, locked), queue in dispatch order"""
+    now = time.time()
+    locked = [r for r in rows if r['lock_holder']]
+    runnable = [r for r in rows if not r['lock_holder']]
+    for r in runnable:
+        # Starved: never ran, or the latest cycle failed / timed out / missed a fleet cycle
+        r['starved'] = (
+            r['last_started_at'] is None
+            or r['last_status'] in ('failed', 'timeout')
+            or now - r['last_started_at'].timestamp() > 1.5 * period
+        )
+    queue = sorted(runnable, key=lambda r: (not r['starved'], -(r['expected_ms'] or 0)))
+    return queue, locked
+
+
+def run_cycle(base_url, secret, tenant_id, deadline, holder):
+    url = f"{base_url.rstrip('/')}/api/cron/agent?tenant={tenant_id}&timeout={int(deadline * 1000)}&holder={holder}"
+    request = urllib.request.Request(url, method='POST', headers={'Authorization': f'Bearer {secret}'})
+    try:
+        with urllib.request.urlopen(request, timeout=deadline + 30) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as exc:
+        try:
+            body = json.load(exc)
+        except ValueError:
+            body = {}
+        return {'success': False, 'phase': f'http {exc.code}', 'error': body.get('error') or exc.reason}
+    except (TimeoutError, socket.timeout):
+        return {'success': False, 'phase': 'deadline', 'error': f'no response within {deadline + 30:.0f}s'}
+    except urllib.error.URLError as exc:
+        return {'success': False, 'phase': 'unreachable', 'error': str(exc.reason)}
+
+
+class Dispatcher:
+    def __init__(self, queue, base_url, secret, deadline, fleet_deadline, holder):
+        self.queue = deque(queue)
+        self.lock = threading.Lock()
+        self.base_url = base_url
+        self.secret = secret
+        self.deadline = deadline
+        self.holder = holder
+        self.started = time.perf_counter()
+        self.stop_at = self.started + fleet_deadline
+        self.results = []
+
+    def _next(self):
+        with self.lock:
+            return self.queue.popleft() if self.queue else None
+
+    def worker(self):
+        while True:
+            tenant = self._next()
+            if tenant is None:
+                return
+            queued_s = time.perf_counter() - self.started
+            if time.perf_counter() >= self.stop_at:
+                result, latency = {'success': False, 'phase': 'deferred'}, None
+            else:
+                began = time.perf_counter()
+                result = run_cycle(self.base_url, self.secret, tenant['id'], self.deadline, self.holder)
+                latency = time.perf_counter() - began
+            metrics = result.get('metrics') or {}
+            row = {
+                'tenant': tenant['name'] or tenant['id'],
+                'status': 'ok' if result.get('success') else result.get('phase', 'failed'),
+                'queued_s': queued_s,
+                'latency_s': latency,
+                'expected_s': tenant['expected_ms'] / 1000 if tenant['expected_ms'] else None,
+                'actions': metrics.get('actionsExecuted'),
+                'emails': metrics.get('emailsSent'),
+                'error': (result.get('error') or '')[:60],
+            }
+            with self.lock:
+                self.results.append(row)
+            print(f"{time.strftime('%H:%M:%S')}  {row['tenant']}: {row['status']}"
+                  + (f" in {latency:.1f}s" if latency is not None else ''))
+
+    def run(self, concurrency):
+        threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - self.started
+
+
+def run(args):
+    conn = connect(args.database_url)     # also loads .env.local
+    base_url = args.base_url or os.environ.get('NEXT_PUBLIC_APP_URL')
+    secret = os.environ.get('CRON_SECRET')
+    cursor = conn.cursor()
+    cursor.execute(PLAN_SQL, {'history': args.history, 'max_tenants': args.max_tenants})
+    queue, locked = plan(cursor.fetchall(), args.period)
+    conn.close()
+
+    banner(f"AGENT FLEET CYCLE ({len(queue)} tenants, concurrency {args.concurrency})")
+    print_table([dict(r, position=i + 1) for i, r in enumerate(queue)], [
+        ('position', '#'), ('name', 'tenant'), ('starved', 'starved'), ('expected_ms', 'expected ms'),
+        ('runs', 'runs'), ('last_status', 'last status'), ('last_started_at', 'last started'),
+    ])
+    if locked:
+        print(f"\n🔒 Skipping {len(locked)} locked tenant(s): "
+              + ', '.join(f"{r['name']} ({r['lock_holder']} until {r['lock_expires_at']:%H:%M})" for r in locked))
+    if args.dry_run or not queue:
+        return 0
+    if not base_url or not secret:
+        print("❌ NEXT_PUBLIC_APP_URL (or --base-url) and CRON_SECRET must be set")
+        return 1
+
+    print()
+    dispatcher = Dispatcher(queue, base_url, secret, args.deadline, args.fleet_deadline,
+                            f"ops-fleet:{socket.gethostname()}")
+    wall = dispatcher.run(args.concurrency)
+    results = dispatcher.results + [
+        {'tenant': r['name'] or r['id'], 'status': 'locked'} for r in locked
+    ]
+
+    print("\n⏱️  Per-tenant cycle latency")
+    print_table(sorted(results, key=lambda r: -(r.get('latency_s') or 0)), [
+        ('tenant', 'tenant'), ('status', 'status'), ('queued_s', 'queued s'), ('latency_s', 'latency s'),
+        ('expected_s', 'expected s'), ('actions', 'actions'), ('emails', 'emails'), ('error', 'error'),
+    ])
+    latencies = [r['latency_s'] for r in dispatcher.results if r['latency_s'] is not None]
+    total = sum(latencies)
+    slowest = max(latencies, default=0)
+    print(f"\n   Fleet wall time {wall:.1f}s, slowest tenant {slowest:.1f}s, "
+          f"sequential sum {total:.1f}s ({total / wall if wall else 0:.1f}x)")
+    failed = [r for r in dispatcher.results if r['status'] not in ('ok', 'locked', 'blocked', 'deferred')]
+    return 1 if failed else 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('fleet', help='Run every tenant\'s agent cycle through a bounded worker pool')
+    parser.add_argument('--concurrency', type=int, default=8, help='Tenant cycles in flight at once')
+    parser.add_argument('--deadline', type=float, default=270.0,
+                        help='Per-tenant cycle timeout in seconds (the cron endpoint caps it at 290)')
+    parser.add_argument('--fleet-deadline', type=float, default=50 * 60.0,
+                        help='Seconds after which tenants not yet started are deferred to the next run')
+    parser.add_argument('--period', type=float, default=3600.0,
+                        help='Seconds between fleet cycles; tenants not run for 1.5 periods are queued first')
+    parser.add_argument('--max-tenants', type=int, default=50)
+    parser.add_argument('--history', type=int, default=10, help='Completed runs used for expected duration')
+    parser.add_argument('--base-url', help='App URL (default NEXT_PUBLIC_APP_URL)')
+    parser.add_argument('--dry-run', action='store_true', help='Print the dispatch order and exit')
+    parser.set_defaults(func=run)
@@ -0,0 +1,217 @@
+"""Per-statement timing for ops connections
+
+Every cursor handed out by ops.db.connect is an InstrumentedCursor. Each
+execute records the statement fingerprint, duration,
+rowcount and an estimate of the bytes fetched. Statements slower than the
+threshold are appended to a JSON-lines slow-query log, and a per-fingerprint
+summary is printed when the command exits.
+
+Fingerprints replace string and numeric literals with ? and collapse
+VALUES, IN and ARRAY lists, so SQL rendered client-side (execute_values,
+mogrify) groups with others of the same shape and row data never reaches
+the summary or the slow-query log.
+
+Result size is estimated from a sample of up to SAMPLE_ROWS rows per fetch,
+so large JSONB payloads show up without walking every value. Connection
+setup is recorded under <connect> to separate pooler latency from query
+time.
+"""
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from psycopg2.extras import RealDictCursor
+
+SAMPLE_ROWS = 16
+# Raw-SQL -> fingerprint memo; bulk statements are too large to be worth keeping
+FINGERPRINT_CACHE_SIZE = 4096
+FINGERPRINT_CACHE_MAX_QUERY = 4096
+
+_WS = re.compile(r'\s+')
+_STRING = re.compile(r"(?:\b[EeBbXxNn]|\bU&)?'(?:[^']|'')*'")
+_DOLLAR = re.compile(r'\$([A-Za-z_]\w*|)\$.*?\$\1\$', re.S)
+_NUMBER = re.compile(r'(?<![\w$.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_TUPLE = r'\((?:[^()]|\([^()]*\))*\)'
+_VALUES = re.compile(r'\bVALUES\s*' + _TUPLE + r'(?:\s*,\s*' + _TUPLE + r')*', re.I)
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_ARRAY = re.compile(r'\bARRAY\s*\[[^\[\]]*\]', re.I)
+
+
+def normalize(query):
+    """SQL shape with literals and value lists replaced by placeholders"""
+    query = _STRING.sub('?', query)
+    query = _DOLLAR.sub('?', query)
+    query = _NUMBER.sub('?', query)
+    query = _VALUES.sub('VALUES (...)', query)
+    query = _IN_LIST.sub('IN (?)', query)
+    query = _ARRAY.sub('ARRAY[?]', query)
+    return _WS.sub(' ', query).strip()
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.fingerprints = {}
+        self.slow_ms = float(os.environ.get('OPS_SLOW_MS', 500))
+        self.slow_log = os.environ.get('OPS_SLOW_LOG', 'ops-slow-queries.log')
+        self.command = None
+
+    def fingerprint(self, query):
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        elif not isinstance(query, str):
+            query = str(query)          # psycopg2.sql.Composed
+        fp = self.fingerprints.get(query)
+        if fp is None:
+            fp = normalize(query)
+            if len(query) <= FINGERPRINT_CACHE_MAX_QUERY:
+                if len(self.fingerprints) >= FINGERPRINT_CACHE_SIZE:
+                    self.fingerprints.clear()
+                self.fingerprints[query] = fp
+        return fp
+
+    def record(self, fingerprint, ms, rows=0, nbytes=0):
+        with self.lock:
+            s = self.stats.get(fingerprint)
+            if s is None:
+                s = self.stats[fingerprint] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'bytes': 0}
+            s['calls'] += 1
+            s['total_ms'] += ms
+            s['max_ms'] = max(s['max_ms'], ms)
+            s['rows'] += max(rows, 0)
+            s['bytes'] += nbytes
+        if ms >= self.slow_ms:
+            self._log_slow(fingerprint, ms, rows)
+
+    def add_bytes(self, fingerprint, nbytes):
+        with self.lock:
+            if fingerprint in self.stats:
+                self.stats[fingerprint]['bytes'] += nbytes
+
+    def _log_slow(self, fingerprint, ms, rows):
+        entry = {
+            'at': datetime.now(timezone.utc).isoformat(),
+            'command': self.command,
+            'ms': round(ms, 2),
+            'rows': rows,
+            'query': fingerprint,
+        }
+        try:
+            with self.lock, open(self.slow_log, 'a') as fh:
+                fh.write(json.dumps(entry) + '\n')
+        except OSError:
+            pass
+
+    def summary(self, limit=15):
+        with self.lock:
+            rows = [dict(s, query=fp) for fp, s in self.stats.items()]
+        rows.sort(key=lambda r: r['total_ms'], reverse=True)
+        return rows[:limit]
+
+
+REGISTRY = Registry()
+
+
+def _estimate_bytes(rows):
+    """Approximate wire size of fetched rows from a sample of at most SAMPLE_ROWS"""
+    if not rows:
+        return 0
+    sample = rows[:SAMPLE_ROWS]
+    size = 0
+    for row in sample:
+        values = row.values() if isinstance(row, dict) else row
+        for v in values:
+            if v is None:
+                continue
+            if isinstance(v, (str, bytes, bytearray, memoryview)):
+                size += len(v)
+            elif isinstance(v, (dict, list)):
+                size += len(json.dumps(v, default=str))
+            else:
+                size += 8
+    return size * len(rows) // len(sample)
+
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that reports every statement to REGISTRY"""
+
+    _fp = None
+
+    def execute(self, query, vars=None):
+        self._fp = REGISTRY.fingerprint(query)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            REGISTRY.record(self._fp, (time.perf_counter() - started) * 1000, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        self._fp = REGISTRY.fingerprint(query)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            REGISTRY.record(self._fp, (time.perf_counter() - started) * 1000, self.rowcount)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self._fp:
+            REGISTRY.add_bytes(self._fp, _estimate_bytes([row]))
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        if self._fp:
+            REGISTRY.add_bytes(self._fp, _estimate_bytes(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self._fp:
+            REGISTRY.add_bytes(self._fp, _estimate_bytes(rows))
+        return rows
+
+
+def timed_connect(connect, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+        return connect(*args, **kwargs)
+    finally:
+        REGISTRY.record('<connect>', (time.perf_counter() - started) * 1000)
+
+
+def _format_bytes(n):
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+def print_summary(stream=sys.stderr, width=70):
+    rows = REGISTRY.summary()
+    if not rows:
+        return
+    print(f"\n🔎 Queries ({REGISTRY.command or 'ops'}) - slow log ≥{REGISTRY.slow_ms:g}ms: {REGISTRY.slow_log}",
+          file=stream)
+    print(f"  {'calls':>6} {'total ms':>10} {'max ms':>9} {'rows':>8} {'~bytes':>8}  query", file=stream)
+    for r in rows:
+        query = r['query'] if len(r['query']) <= width else r['query'][:width - 1] + '…'
+        print(f"  {r['calls']:>6} {r['total_ms']:>10.1f} {r['max_ms']:>9.1f} {r['rows']:>8} "
+              f"{_format_bytes(r['bytes']):>8}  {query}", file=stream)
+
+
+def enable(command, slow_ms=None, slow_log=None, summary=True):
+    REGISTRY.command = command
+    if slow_ms is not None:
+        REGISTRY.slow_ms = slow_ms
+    if slow_log:
+        REGISTRY.slow_log = slow_log
+    if summary:
+        atexit.register(print_summary)
@@ -0,0 +1,100 @@
+"""Trigger and verify the incremental job metrics maintainer
+
+refresh  -> refresh_job_metrics_incremental(): upserts only jobs whose row,
+            cards or agent runs changed since the stored watermark
+verify   -> recomputes a set of jobs from job_metrics_compute and diffs them
+            against job_metrics_current to catch drift
+"""
+from ops.db import banner, connect
+
+# duration_seconds depends on NOW() for running jobs and refreshed_at is
+# bookkeeping, so neither is expected to match between two reads.
+VOLATILE_COLUMNS = {'duration_seconds', 'refreshed_at'}
+
+
+def refresh(cursor, full=False):
+    cursor.execute("SELECT refresh_job_metrics_incremental(%s) AS rows", (full,))
+    rows = cursor.fetchone()['rows']
+    cursor.execute("""
+        SELECT high_water, last_run_at, last_rows
+        FROM metrics_refresh_state
+        WHERE name = 'job_metrics'
+    """)
+    return rows, cursor.fetchone()
+
+
+def verify(cursor, limit=None):
+    """Return (checked, missing, mismatched) comparing stored vs recomputed rows"""
+    cursor.execute("""
+        SELECT m.*
+        FROM job_metrics_compute m
+        JOIN jobs j ON j.id = m.job_id
+        ORDER BY j.updated_at DESC
+        LIMIT %s
+    """, (limit,))
+    expected = {row['job_id']: row for row in cursor.fetchall()}
+    if not expected:
+        return 0, [], []
+
+    cursor.execute("""
+        SELECT * FROM job_metrics_current WHERE job_id = ANY(%s::uuid[])
+    """, ([str(job_id) for job_id in expected],))
+    stored = {row['job_id']: row for row in cursor.fetchall()}
+
+    missing = [job_id for job_id in expected if job_id not in stored]
+    mismatched = []
+    for job_id, want in expected.items():
+        have = stored.get(job_id)
+        if have is None:
+            continue
+        diffs = {
+            col: (have.get(col), value)
+            for col, value in want.items()
+            if col not in VOLATILE_COLUMNS and have.get(col) != value
+        }
+        if diffs:
+            mismatched.append((job_id, diffs))
+    return len(expected), missing, mismatched
+
+
+def run(args):
+    conn = connect(args.database_url)
+    cursor = conn.cursor()
+
+    if args.action == 'refresh':
+        banner("JOB METRICS REFRESH" + (" (FULL)" if args.full else ""))
+        rows, state = refresh(cursor, full=args.full)
+        conn.commit()
+        print(f"\n✅ Refreshed {rows} job(s)")
+        print(f"   High water: {state['high_water']}")
+        print(f"   Finished:   {state['last_run_at']}")
+        status = 0
+    else:
+        banner("JOB METRICS VERIFY")
+        checked, missing, mismatched = verify(cursor, limit=args.limit)
+        print(f"\nChecked {checked} job(s)")
+        for job_id in missing:
+            print(f"   ❌ {job_id}: missing from job_metrics_current")
+        for job_id, diffs in mismatched:
+            print(f"   ❌ {job_id}: stale")
+            for col, (have, want) in diffs.items():
+                print(f"      {col}: stored={have} expected={want}")
+        if missing or mismatched:
+            print(f"\n⚠️  {len(missing) + len(mismatched)} job(s) out of date - run `job-metrics refresh`")
+            status = 1
+        else:
+            print("\n✅ job_metrics_current matches live data")
+            status = 0
+
+    cursor.close()
+    conn.close()
+    return status
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('job-metrics', help='Incremental job metrics maintenance')
+    parser.add_argument('action', choices=['refresh', 'verify'])
+    parser.add_argument('--full', action='store_true', help='Ignore the watermark and recompute every job')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='verify: only check the N most recently updated jobs')
+    parser.set_defaults(func=run)
@@ -0,0 +1,363 @@
+"""Concurrent agent-run load harness for job_tasks / kanban_cards contention
+
+Spawns N simulated agent workers against a local database. Each worker
+repeats processActiveJobs' sequence for a tenant: read running jobs, find
+the current batch, expand pending tasks (audience query -> bulk card
+insert -> mark done) or insert the next batch's tasks under the
+UNIQUE (job_id, batch, step) constraint. Statements autocommit, like the
+PostgREST calls they stand in for.
+
+With --tenant-lock, workers take acquire_tenant_lock first (as the
+autonomous cycle does) and skip tenants that are already locked. A sampler
+thread polls pg_locks / pg_stat_activity for lock waiters while a step
+runs. Worker counts ramp up step by step so throughput, conflicts and
+lock waits can be read side by side.
+"""
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+
+from ops import synthetic
+from ops.db import LOCAL_DATABASE_URL, banner, connect, print_table, require_local
+
+ERROR_CLASSES = {
+    '23505': 'conflicts',          # unique_violation on (job_id, batch, step)
+    '40P01': 'deadlocks',
+    '40001': 'serialization',
+    '55P03': 'lock_timeouts',
+    '57014': 'statement_timeouts',
+}
+
+JOB_TABLES = ('jobs', 'job_tasks', 'kanban_cards', 'agent_runs', 'agent_tenant_locks')
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.cycle_ms = []
+
+    def add(self, key, n=1):
+        with self.lock:
+            self.counts[key] += n
+
+    def cycle(self, ms):
+        with self.lock:
+            self.counts['cycles'] += 1
+            self.cycle_ms.append(ms)
+
+
+# Harness rows take counters from here up, above anything generate() uses,
+# so they share the load's id prefix and synthetic.purge() removes them
+HARNESS_ID_BASE = 1 << 40
+HARNESS_TABLES = (('agent_runs', synthetic.RUN), ('kanban_cards', synthetic.CARD))
+
+
+def next_harness_counter(conn, gen):
+    """First unused harness counter, past rows a --keep run left behind"""
+    cursor = conn.cursor()
+    start = HARNESS_ID_BASE
+    for table, kind in HARNESS_TABLES:
+        cursor.execute(
+            f"SELECT MAX(id) AS max_id FROM public.{table} WHERE id BETWEEN %s::uuid AND %s::uuid",
+            (gen.uid(kind, HARNESS_ID_BASE), gen.uid(kind, (1 << 48) - 1)),
+        )
+        max_id = cursor.fetchone()['max_id']
+        if max_id is not None:
+            start = max(start, (uuid.UUID(str(max_id)).int & ((1 << 48) - 1)) + 1)
+    cursor.close()
+    return start
+
+
+class HarnessIds:
+    """Synthetic-prefix ids for rows the workers insert (shared across threads)"""
+
+    def __init__(self, gen, start=HARNESS_ID_BASE):
+        self.gen = gen
+        self.counter = itertools.count(start)    # next() is atomic under the GIL
+
+    def run(self):
+        return self.gen.uid(synthetic.RUN, next(self.counter))
+
+    def card(self):
+        return self.gen.uid(synthetic.CARD, next(self.counter))
+
+
+class Worker(threading.Thread):
+    def __init__(self, url, tenants, stats, stop, use_lock, batch_size, seed, ids):
+        super().__init__(daemon=True)
+        self.url = url
+        self.tenants = tenants
+        self.stats = stats
+        self.ids = ids
+        self.stop = stop
+        self.use_lock = use_lock
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+
+    def run(self):
+        conn = connect(self.url)
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute("SET lock_timeout = '5s'")
+        while not self.stop.is_set():
+            tenant_id, org_id = self.rng.choice(self.tenants)
+            started = time.perf_counter()
+            try:
+                self.cycle(cursor, tenant_id, org_id)
+                self.stats.cycle((time.perf_counter() - started) * 1000)
+            except psycopg2.Error as exc:
+                self.stats.add(ERROR_CLASSES.get(exc.pgcode, 'other_errors'))
+        cursor.close()
+        conn.close()
+
+    def cycle(self, cursor, tenant_id, org_id):
+        lock_run = None
+        if self.use_lock:
+            cursor.execute("SELECT acquire_tenant_lock(%s, %s, 5) AS run_id", (tenant_id, 'load-harness'))
+            lock_run = cursor.fetchone()['run_id']
+            if lock_run is None:
+                self.stats.add('lock_busy')
+                return
+        try:
+            cursor.execute("""
+                INSERT INTO agent_runs (id, org_id, tenant_id, status, mode)
+                VALUES (%s, %s, %s, 'running', 'review') RETURNING id
+            """, (self.ids.run(), org_id, tenant_id))
+            run_id = cursor.fetchone()['id']
+            self.process_active_jobs(cursor, tenant_id, org_id, run_id)
+            cursor.execute("""
+                UPDATE agent_runs SET status = 'completed', ended_at = NOW() WHERE id = %s
+            """, (run_id,))
+        finally:
+            if lock_run is not None:
+                cursor.execute("SELECT release_tenant_lock(%s, %s, 'completed')", (tenant_id, lock_run))
+
+    def process_active_jobs(self, cursor, tenant_id, org_id, run_id):
+        cursor.execute("""
+            SELECT id FROM jobs WHERE tenant_id = %s AND status = 'running' ORDER BY created_at
+        """, (tenant_id,))
+        for job in cursor.fetchall():
+            job_id = job['id']
+            cursor.execute("UPDATE agent_runs SET job_id = %s WHERE id = %s", (job_id, run_id))
+            cursor.execute("""
+                SELECT batch FROM job_tasks WHERE job_id = %s ORDER BY batch DESC LIMIT 1
+            """, (job_id,))
+            latest = cursor.fetchone()
+            batch = latest['batch'] if latest else 0
+            cursor.execute("""
+                SELECT id, kind FROM job_tasks
+                WHERE job_id = %s AND batch <= %s AND status IN ('pending', 'running')
+            """, (job_id, batch))
+            pending = cursor.fetchall()
+
+            if not pending:
+                # Plan the next batch; concurrent workers race on the unique key
+                cursor.execute("""
+                    INSERT INTO job_tasks (job_id, tenant_id, step, batch, kind, input, status)
+                    VALUES (%s, %s, 1, %s, 'draft_email', %s, 'pending')
+                    RETURNING id, kind
+                """, (job_id, tenant_id, batch + 1, Json({'template': 'followup1', 'job_id': str(job_id)})))
+                pending = cursor.fetchall()
+                self.stats.add('tasks_planned', len(pending))
+
+            for task in pending:
+                self.expand(cursor, task, job_id, tenant_id, org_id, run_id)
+            cursor.execute("UPDATE jobs SET last_run_at = NOW() WHERE id = %s", (job_id,))
+
+    def expand(self, cursor, task, job_id, tenant_id, org_id, run_id):
+        cursor.execute("""
+            SELECT c.id, c.client_id
+            FROM contacts c
+            JOIN clients cl ON cl.id = c.client_id
+            WHERE cl.tenant_id = %s
+              AND c.email IS NOT NULL
+              AND cl.is_active = TRUE
+              AND NOT EXISTS (
+                  SELECT 1 FROM kanban_cards k WHERE k.job_id = %s AND k.contact_id = c.id
+              )
+            LIMIT %s
+        """, (tenant_id, job_id, self.batch_size))
+        targets = cursor.fetchall()
+        if not targets:
+            self.stats.add('exhausted')
+            cursor.execute("""
+                UPDATE job_tasks SET status = 'error', finished_at = NOW(),
+                       error_message = 'Expansion returned 0 cards'
+                WHERE id = %s
+            """, (task['id'],))
+            return
+
+        execute_values(cursor, """
+            INSERT INTO kanban_cards
+                (id, org_id, tenant_id, run_id, client_id, contact_id, job_id, task_id,
+                 type, title, rationale, state, action_payload)
+            VALUES %s
+        """, [
+            (self.ids.card(), org_id, tenant_id, run_id, t['client_id'], t['id'], job_id, task['id'],
+             'send_email', 'Load harness email', 'load test', 'suggested', Json({}))
+            for t in targets
+        ])
+        cursor.execute("""
+            UPDATE job_tasks SET status = 'done', finished_at = NOW(), output = %s WHERE id = %s
+        """, (Json({'cards_created': len(targets)}), task['id']))
+        self.stats.add('cards', len(targets))
+        self.stats.add('tasks_done')
+
+
+class LockSampler(threading.Thread):
+    """Poll lock waiters on the job tables every interval seconds
+
+    Relation and tuple locks count only on JOB_TABLES; waits without a
+    relation (transactionid, advisory) are kept, since row contention on
+    those tables shows up as transactionid waits.
+    """
+
+    def __init__(self, url, stop, interval=0.2):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop = stop
+        self.interval = interval
+        self.samples = []
+        self.by_relation = Counter()
+
+    def run(self):
+        conn = connect(self.url)
+        conn.autocommit = True
+        cursor = conn.cursor()
+        while not self.stop.is_set():
+            cursor.execute("""
+                SELECT COALESCE(c.relname, l.locktype) AS target, l.mode, COUNT(*) AS waiting
+                FROM pg_locks l
+                LEFT JOIN pg_class c ON c.oid = l.relation
+                WHERE NOT l.granted
+                  AND (l.relation IS NULL OR c.relname = ANY(%s))
+                GROUP BY 1, 2
+            """, (list(JOB_TABLES),))
+            rows = cursor.fetchall()
+            self.samples.append(sum(r['waiting'] for r in rows))
+            for r in rows:
+                self.by_relation[f"{r['target']} ({r['mode']})"] += r['waiting']
+            time.sleep(self.interval)
+        cursor.close()
+        conn.close()
+
+
+def run_step(url, tenants, workers, duration, use_lock, batch_size, ids):
+    stats = Stats()
+    stop = threading.Event()
+    sampler = LockSampler(url, stop)
+    pool = [
+        Worker(url, tenants, stats, stop, use_lock, batch_size, seed=i, ids=ids)
+        for i in range(workers)
+    ]
+    conn = connect(url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+    deadlocks_before = cursor.fetchone()['deadlocks']
+
+    sampler.start()
+    for w in pool:
+        w.start()
+    time.sleep(duration)
+    stop.set()
+    for w in pool:
+        w.join()
+    sampler.join()
+
+    cursor.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+    stats.counts['server_deadlocks'] = cursor.fetchone()['deadlocks'] - deadlocks_before
+    cursor.close()
+    conn.close()
+
+    latencies = sorted(stats.cycle_ms) or [0.0]
+    waits = sampler.samples or [0]
+    return {
+        'workers': workers,
+        'cycles': stats.counts['cycles'],
+        'cards_per_s': stats.counts['cards'] / duration,
+        'tasks_per_s': stats.counts['tasks_done'] / duration,
+        'p95_cycle_ms': latencies[int(0.95 * (len(latencies) - 1))],
+        'conflicts': stats.counts['conflicts'],
+        'deadlocks': stats.counts['deadlocks'],                 # 40P01 seen by workers
+        'server_deadlocks': stats.counts['server_deadlocks'],   # pg_stat_database delta
+        'lock_busy': stats.counts['lock_busy'],
+        'lock_timeouts': stats.counts['lock_timeouts'],
+        'errors': stats.counts['other_errors'] + stats.counts['serialization'],
+        'avg_waiters': sum(waits) / len(waits),
+        'max_waiters': max(waits),
+        'hot_locks': sampler.by_relation.most_common(3),
+    }
+
+
+def run(args):
+    url = require_local(args.database_url or LOCAL_DATABASE_URL)
+    steps = [int(w) for w in args.workers.split(',')]
+
+    banner("AGENT LOAD HARNESS")
+    scale = synthetic.scaled(
+        args.scale, tenants=args.tenants, jobs_per_tenant=args.jobs_per_tenant, batch_size=args.batch_size,
+    )
+    conn = connect(url)
+    if not args.reuse:
+        print(f"\n📦 Loading synthetic data {dict(scale._asdict())}")
+        synthetic.purge(conn, seed=args.seed)
+        synthetic.generate(conn, scale, seed=args.seed, log=lambda line: None)
+    gen = synthetic.Generator(scale, seed=args.seed)
+    tenants = [(gen.uid(synthetic.TENANT, t), gen.owner(t)) for t in range(scale.tenants)]
+    ids = HarnessIds(gen, next_harness_counter(conn, gen))
+    cursor = conn.cursor()
+    cursor.execute("UPDATE jobs SET status = 'running' WHERE tenant_id = ANY(%s::uuid[])",
+                   ([t for t, _ in tenants],))
+    conn.commit()
+    conn.close()
+
+    results = []
+    for workers in steps:
+        print(f"\n🏃 {workers} worker(s) for {args.duration}s...")
+        result = run_step(url, tenants, workers, args.duration, args.tenant_lock, scale.batch_size, ids)
+        results.append(result)
+        print(f"   {result['cards_per_s']:.1f} cards/s, {result['conflicts']} conflicts, "
+              f"{result['deadlocks']} deadlocks ({result['server_deadlocks']} server-side), max {result['max_waiters']} lock waiters")
+        for target, n in result['hot_locks']:
+            print(f"   hottest wait: {target} x{n}")
+
+    print("\n📊 Scaling summary")
+    print_table(results, [
+        ('workers', 'workers'), ('cycles', 'cycles'), ('cards_per_s', 'cards/s'),
+        ('tasks_per_s', 'tasks/s'), ('p95_cycle_ms', 'p95 cycle ms'), ('conflicts', 'conflicts'),
+        ('deadlocks', 'deadlocks'), ('server_deadlocks', 'server deadlocks'), ('lock_busy', 'lock busy'), ('lock_timeouts', 'lock t/o'),
+        ('errors', 'errors'), ('avg_waiters', 'avg waiters'), ('max_waiters', 'max waiters'),
+    ])
+
+    best = max(results, key=lambda r: r['cards_per_s'])
+    print(f"\nPeak throughput {best['cards_per_s']:.1f} cards/s at {best['workers']} worker(s)")
+
+    if not args.keep:
+        conn = connect(url)
+        synthetic.purge(conn, seed=args.seed)
+        conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('load', help='Concurrent simulated agent workers against a local database')
+    parser.add_argument('--workers', default='1,2,4,8,16', help='Comma-separated worker counts to ramp through')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds per step')
+    parser.add_argument('--tenant-lock', action='store_true',
+                        help='Take acquire_tenant_lock before each cycle, as autonomous-cycle.ts does')
+    parser.add_argument('--scale', type=float, default=20.0)
+    parser.add_argument('--tenants', type=int)
+    parser.add_argument('--jobs-per-tenant', type=int)
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--seed', type=int, default=3131)
+    parser.add_argument('--reuse', action='store_true', help='Reuse data from a previous run with the same seed')
+    parser.add_argument('--keep', action='store_true', help='Leave the synthetic data in place afterwards')
+    parser.set_defaults(func=run)
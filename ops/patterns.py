@@ -0,0 +1,449 @@
+"""Batch pattern detection over warehouse_events with NumPy
+
+detectPatterns (src/lib/agent/pattern-detector.ts) walks up to 5000
+unprocessed events per call in JavaScript loops and saves each pattern with
+a select plus an update or insert, so a tenant with a long history needs
+many calls and many round trips, and nothing looks at history at all. This
+command loads a tenant's events over --days in one COPY into columnar
+arrays (event type code, client code, epoch seconds) and computes:
+
+  - a days x event-types count matrix (one bincount) and rolling window
+    sums from its cumulative sum
+  - the detector's engagement, conversion and failure-rate patterns, with
+    the same names and thresholds, from window sums
+  - per-client activity (event, order and engagement counts) and
+    inter-arrival gaps from a (client, time) sort: mean gap and how overdue
+    the client is against it
+  - a volume anomaly score per event type: the latest day's count as a
+    z-score against the trailing --baseline days
+
+Every pattern of a tenant is written in one INSERT ... ON CONFLICT
+(tenant_id, pattern_name) statement; volume anomalies that no longer hold
+are deactivated. `backfill` runs every tenant with events.
+"""
+import csv
+import io
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:             # only this command needs NumPy
+    np = None
+
+from psycopg2.extras import Json, execute_values
+
+from ops.db import banner, connect, print_table
+
+DAY = 86400.0
+
+EVENTS_SQL = """
+    COPY (
+        SELECT event_type, COALESCE(client_id::text, ''), EXTRACT(EPOCH FROM occurred_at)
+        FROM warehouse_events
+        WHERE tenant_id = {tenant} AND occurred_at >= {since} AND occurred_at < {until}
+    ) TO STDOUT WITH (FORMAT csv)
+"""
+
+TENANTS_SQL = """
+    SELECT t.id, t.name
+    FROM tenants t
+    WHERE EXISTS (SELECT 1 FROM warehouse_events e WHERE e.tenant_id = t.id)
+    ORDER BY t.id
+"""
+
+UPSERT_SQL = """
+    INSERT INTO detected_patterns (
+        tenant_id, pattern_type, pattern_name, description, pattern_config, metrics,
+        confidence_score, sample_size, is_actionable, is_active, first_detected_at, last_validated_at
+    )
+    VALUES %s
+    ON CONFLICT (tenant_id, pattern_name) DO UPDATE SET
+        pattern_type = EXCLUDED.pattern_type,
+        description = EXCLUDED.description,
+        pattern_config = EXCLUDED.pattern_config,
+        metrics = EXCLUDED.metrics,
+        confidence_score = EXCLUDED.confidence_score,
+        sample_size = EXCLUDED.sample_size,
+        is_actionable = EXCLUDED.is_actionable,
+        is_active = TRUE,
+        last_validated_at = EXCLUDED.last_validated_at,
+        updated_at = NOW()
+    RETURNING (xmax = 0) AS inserted
+"""
+
+UPSERT_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, TRUE, %s, %s)"
+
+DEACTIVATE_SQL = """
+    UPDATE detected_patterns
+    SET is_active = FALSE, updated_at = NOW()
+    WHERE tenant_id = %s AND is_active
+      AND pattern_name LIKE 'volume\\_anomaly\\_%%'
+      AND NOT (pattern_name = ANY(%s))
+"""
+
+MARK_PROCESSED_SQL = """
+    UPDATE warehouse_events
+    SET processed_at = NOW()
+    WHERE tenant_id = %s AND processed_at IS NULL AND occurred_at < %s
+"""
+
+# Spikes in these are bad news; drops in the rest are
+FAILURE_TYPES = {'email_bounced', 'card_failed', 'card_blocked', 'cycle_failed', 'deal_lost', 'quote_rejected'}
+ENGAGEMENT_TYPES = ['email_opened', 'email_clicked', 'email_replied']
+
+
+class Events:
+    """A tenant's events as parallel arrays sorted by time"""
+
+    def __init__(self, types, clients, times):
+        order = np.argsort(times, kind='stable')
+        self.times = times[order]
+        self.type_names, codes = np.unique(types, return_inverse=True)
+        self.types = codes[order]
+        client_names, codes = np.unique(clients, return_inverse=True)
+        codes = codes[order]
+        if len(client_names) and client_names[0] == '':
+            # '' is NULL client_id; it sorts first, so shift everyone down one
+            client_names, codes = client_names[1:], codes - 1
+        self.client_names = client_names
+        self.clients = codes
+
+    def __len__(self):
+        return len(self.times)
+
+    def code(self, event_type):
+        i = int(np.searchsorted(self.type_names, event_type))
+        return i if i < len(self.type_names) and self.type_names[i] == event_type else -1
+
+    def is_type(self, *event_types):
+        codes = [c for c in (self.code(t) for t in event_types) if c >= 0]
+        return np.isin(self.types, codes)
+
+
+def load_events(cursor, tenant_id, since, until):
+    buffer = io.StringIO()
+    cursor.copy_expert(EVENTS_SQL.format(
+        tenant=cursor.mogrify('%s', (tenant_id,)).decode(),
+        since=cursor.mogrify('%s', (since,)).decode(),
+        until=cursor.mogrify('%s', (until,)).decode(),
+    ), buffer)
+    buffer.seek(0)
+    rows = list(csv.reader(buffer))
+    if not rows:
+        return Events(np.array([], dtype=str), np.array([], dtype=str), np.array([], dtype=np.float64))
+    types, clients, times = zip(*rows)
+    return Events(np.array(types), np.array(clients), np.array(times, dtype=np.float64))
+
+
+# -- vectorized metrics ---------------------------------------------------------
+
+def daily_counts(events, start, days):
+    """[days, n_types] event counts; day 0 starts at `start` (epoch seconds)"""
+    n_types = len(events.type_names)
+    day = ((events.times - start) // DAY).astype(np.int64)
+    keep = (day >= 0) & (day < days)
+    flat = np.bincount(day[keep] * n_types + events.types[keep], minlength=days * n_types)
+    return flat.reshape(days, n_types)
+
+
+def rolling_sum(counts, window):
+    """Row j is the sum of rows j .. j+window-1"""
+    cs = np.vstack([np.zeros((1,) + counts.shape[1:], dtype=np.float64), np.cumsum(counts, axis=0)])
+    return cs[window:] - cs[:-window]
+
+
+def anomaly_scores(counts, baseline):
+    """z-score of each day against the `baseline` days before it: (z, mean, std), rows from day `baseline`"""
+    counts = counts.astype(np.float64)
+    mean = rolling_sum(counts, baseline)[:-1] / baseline
+    var = rolling_sum(counts ** 2, baseline)[:-1] / baseline - mean ** 2
+    std = np.sqrt(np.maximum(var, 0.0))
+    # A flat baseline still has Poisson noise; never divide by less than sqrt(mean) or 1
+    z = (counts[baseline:] - mean) / np.maximum(std, np.maximum(np.sqrt(mean), 1.0))
+    return z, mean, std
+
+
+def client_activity(events, since, until):
+    """Per-client counts and inter-arrival gaps over [since, until)"""
+    mask = (events.clients >= 0) & (events.times >= since) & (events.times < until)
+    clients, times, types = events.clients[mask], events.times[mask], events.types[mask]
+    if not len(clients):
+        return None
+    order = np.lexsort((times, clients))
+    clients, times, types = clients[order], times[order], types[order]
+    n = len(events.client_names)
+
+    count = np.bincount(clients, minlength=n)
+    is_type = events.is_type   # masks over all events; re-apply this function's mask and order
+    orders = np.bincount(clients, weights=is_type('order_created')[mask][order], minlength=n)
+    emails = np.bincount(clients, weights=is_type('email_sent', 'email_replied')[mask][order], minlength=n)
+    engaged = np.bincount(clients, weights=is_type(*ENGAGEMENT_TYPES)[mask][order], minlength=n)
+
+    same = clients[1:] == clients[:-1]
+    gaps = np.diff(times)[same]
+    gap_clients = clients[1:][same]
+    gap_n = np.bincount(gap_clients, minlength=n)
+    mean_gap = np.bincount(gap_clients, weights=gaps, minlength=n) / np.maximum(gap_n, 1)
+
+    # Last event per client: the end of each client's run in the sorted arrays
+    ends = np.flatnonzero(np.r_[clients[1:] != clients[:-1], True])
+    last = np.zeros(n)
+    last[clients[ends]] = times[ends]
+    overdue = np.where(gap_n > 0, (until - last) / np.maximum(mean_gap, 1.0), 0.0)
+    return {'count': count, 'orders': orders, 'emails': emails, 'engaged': engaged, 'mean_gap': mean_gap,
+            'overdue': overdue, 'last': last}
+
+
+# -- patterns -----------------------------------------------------------------
+
+def _pattern(pattern_type, name, description, config, metrics, confidence, sample_size, actionable):
+    return {
+        'pattern_type': pattern_type, 'pattern_name': name, 'description': description,
+        'pattern_config': config, 'metrics': metrics, 'confidence_score': round(min(float(confidence), 1.0), 2),
+        'sample_size': int(sample_size), 'is_actionable': bool(actionable),
+    }
+
+
+def _config(event_types, time_window, threshold=None, **extra):
+    """patternConfig in the PatternConfig shape pattern-detector.ts writes"""
+    if isinstance(event_types, str):
+        condition = {'field': 'event_type', 'operator': 'eq', 'value': event_types}
+    else:
+        condition = {'field': 'event_type', 'operator': 'in', 'value': list(event_types)}
+    config = {'conditions': [condition], 'timeWindow': time_window}
+    if threshold is not None:
+        config['threshold'] = threshold
+    return dict(config, **extra)
+
+
+def _rate(numerator, denominator):
+    return float(numerator) / float(denominator) if denominator else 0.0
+
+
+def _trend(value, up, stable):
+    return 'up' if value > up else 'stable' if value > stable else 'down'
+
+
+def detect(events, as_of, days=180, baseline=28, z_threshold=3.0, min_client_events=5):
+    """All patterns for one tenant's events as of `as_of` (epoch seconds)"""
+    if not len(events):
+        return []
+    start = as_of - days * DAY
+    counts = daily_counts(events, start, days)
+    patterns = []
+
+    def window(n_days, event_type):
+        code = events.code(event_type)
+        return int(counts[-n_days:, code].sum()) if code >= 0 else 0
+
+    # Email engagement over the last 7 days (detectEngagementPatterns)
+    sent = window(7, 'email_sent')
+    if sent >= 10:
+        opened, clicked, replied = (_rate(window(7, t), sent) for t in ENGAGEMENT_TYPES)
+        patterns.append(_pattern(
+            'engagement', 'email_engagement_trend', 'Email engagement metrics and trends',
+            _config(['email_sent'] + ENGAGEMENT_TYPES, '7d'),
+            {'count': sent, 'trend': _trend(replied, 0.1, 0.05),
+             'percentiles': {'open_rate': round(opened * 100), 'click_rate': round(clicked * 100),
+                             'reply_rate': round(replied * 100)}},
+            min(0.95, sent / 50), sent, replied < 0.05,
+        ))
+
+    # Deal and quote conversion over the last 30 days (detectConversionPatterns)
+    for name, prefix, won, lost, description, key, up, stable, scale in (
+        ('deal_conversion_rate', 'deal', 'won', 'lost', 'Deal win/loss conversion metrics', 'win_rate',
+         0.5, 0.3, 20),
+        ('quote_conversion_rate', 'quote', 'accepted', 'rejected', 'Quote acceptance rate metrics', 'accept_rate',
+         0.6, 0.4, 15),
+    ):
+        created, n_won, n_lost = (window(30, f'{prefix}_{t}') for t in ('created', won, lost))
+        total = created + n_won + n_lost
+        if total >= 5:
+            rate = n_won / max(1, n_won + n_lost)
+            patterns.append(_pattern(
+                'conversion', name, description, _config([f'{prefix}_{won}', f'{prefix}_{lost}'], '30d'),
+                {'count': total, 'average': rate, 'percentiles': {key: round(rate * 100)},
+                 'trend': _trend(rate, up, stable)},
+                min(0.9, total / scale), total, rate < stable,
+            ))
+
+    # Failure rates over the last day (detectAnomalies)
+    failed, executed, blocked = (window(1, t) for t in ('card_failed', 'card_executed', 'card_blocked'))
+    cards = failed + executed + blocked
+    if cards >= 10:
+        for name, count, threshold, label, event_type in (
+            ('high_card_failure_rate', failed, 0.2, 'card failure', 'card_failed'),
+            ('high_policy_block_rate', blocked, 0.3, 'policy block', 'card_blocked'),
+        ):
+            if count / cards > threshold:
+                patterns.append(_pattern(
+                    'anomaly', name, f'Unusually high {label} rate: {round(count / cards * 100)}%',
+                    _config(event_type, '24h', threshold), {'count': count, 'average': count / cards},
+                    min(0.95, cards / 30), cards, True,
+                ))
+    sent_today, bounced = window(1, 'email_sent'), window(1, 'email_bounced')
+    if sent_today >= 10 and bounced / sent_today > 0.1:
+        patterns.append(_pattern(
+            'anomaly', 'high_email_bounce_rate',
+            f'Unusually high email bounce rate: {round(bounced / sent_today * 100)}%',
+            _config('email_bounced', '24h', 0.1), {'count': bounced, 'average': bounced / sent_today},
+            min(0.9, sent_today / 30), sent_today, True,
+        ))
+
+    # Volume anomalies: latest day against the trailing baseline, every event type at once
+    if days > baseline:
+        z, mean, std = anomaly_scores(counts, baseline)
+        latest = counts[-1]
+        flagged_days = (np.abs(z) >= z_threshold).sum(axis=0)
+        for code in np.flatnonzero((np.abs(z[-1]) >= z_threshold) & (latest + mean[-1] >= 5)):
+            event_type = str(events.type_names[code])
+            score, count, average = float(z[-1, code]), int(latest[code]), float(mean[-1, code])
+            spike = score > 0
+            metrics = {'count': count, 'average': round(average, 2), 'stddev': round(float(std[-1, code]), 2),
+                       'trend': 'up' if spike else 'down',
+                       'percentiles': {'z_score': round(score, 2), 'anomalous_days': int(flagged_days[code])}}
+            if average:
+                metrics['percentChange'] = round((count - average) / average * 100)
+            patterns.append(_pattern(
+                'anomaly', f'volume_anomaly_{event_type}',
+                f"{event_type} {'spiked' if spike else 'dropped'} to {count}/day "
+                f"(baseline {average:.1f} ± {std[-1, code]:.1f})",
+                _config(event_type, '24h', z_threshold, baselineDays=baseline), metrics,
+                min(0.95, abs(score) / (2 * z_threshold)), count + round(average * baseline),
+                spike == (event_type in FAILURE_TYPES),
+            ))
+
+    # Client behavior over the last 30 days (detectClientBehaviorPatterns, plus gaps)
+    activity = client_activity(events, as_of - 30 * DAY, as_of)
+    if activity is not None:
+        for c in np.flatnonzero(activity['count'] >= min_client_events):
+            client_id = str(events.client_names[c])
+            engagement = _rate(activity['engaged'][c], activity['emails'][c])
+            overdue = float(activity['overdue'][c])
+            order_count = int(activity['orders'][c])
+            patterns.append(_pattern(
+                'client_behavior', f'client_activity_{client_id[:8]}',
+                f'Activity pattern for client {client_id}',
+                {'conditions': [{'field': 'client_id', 'operator': 'eq', 'value': client_id}],
+                 'timeWindow': '30d', 'entityType': 'client', 'entityId': client_id},
+                {'count': int(activity['count'][c]), 'average': order_count,
+                 'trend': 'up' if order_count > 3 else 'stable' if order_count > 0 else 'down',
+                 'percentiles': {'engagement_rate': round(engagement * 100),
+                                 'mean_gap_hours': round(float(activity['mean_gap'][c]) / 3600, 1),
+                                 'overdue_ratio': round(overdue, 2)}},
+                min(0.9, activity['count'][c] / 20), activity['count'][c], engagement < 0.2 or overdue > 3,
+            ))
+    return patterns
+
+
+def save(cursor, tenant_id, patterns, validated_at):
+    """Upsert every pattern in one statement; returns (inserted, updated, deactivated)"""
+    # ON CONFLICT cannot touch a row twice in one statement, and names can
+    # collide (client_activity_ uses an 8-character id prefix, as the TS
+    # detector does): keep the best-supported pattern per name
+    unique = {}
+    for p in patterns:
+        kept = unique.get(p['pattern_name'])
+        if kept is None or p['sample_size'] > kept['sample_size']:
+            unique[p['pattern_name']] = p
+    patterns = list(unique.values())
+    rows = [(
+        tenant_id, p['pattern_type'], p['pattern_name'], p['description'], Json(p['pattern_config']),
+        Json(p['metrics']), p['confidence_score'], p['sample_size'], p['is_actionable'], validated_at, validated_at,
+    ) for p in patterns]
+    results = execute_values(cursor, UPSERT_SQL, rows, template=UPSERT_TEMPLATE, page_size=1000, fetch=True) \
+        if rows else []
+    inserted = sum(1 for r in results if r['inserted'])
+    anomalies = [p['pattern_name'] for p in patterns if p['pattern_name'].startswith('volume_anomaly_')]
+    cursor.execute(DEACTIVATE_SQL, (tenant_id, anomalies))
+    return inserted, len(results) - inserted, cursor.rowcount
+
+
+def process_tenant(conn, tenant_id, as_of, args):
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    events = load_events(cursor, tenant_id, as_of - timedelta(days=args.days), as_of)
+    loaded = time.perf_counter()
+    patterns = detect(events, as_of.timestamp(), days=args.days, baseline=args.baseline,
+                      z_threshold=args.z, min_client_events=args.min_client_events)
+    detected = time.perf_counter()
+    stats = {'events': len(events), 'patterns': len(patterns), 'inserted': None, 'updated': None,
+             'deactivated': None, 'processed': None}
+    if not args.dry_run:
+        stats['inserted'], stats['updated'], stats['deactivated'] = save(cursor, tenant_id, patterns, as_of)
+        if args.mark_processed:
+            cursor.execute(MARK_PROCESSED_SQL, (tenant_id, as_of))
+            stats['processed'] = cursor.rowcount
+        conn.commit()
+    else:
+        conn.rollback()
+    stats.update(load_ms=(loaded - started) * 1000, detect_ms=(detected - loaded) * 1000,
+                 write_ms=(time.perf_counter() - detected) * 1000)
+    return patterns, stats
+
+
+def run(args):
+    if np is None:
+        print("❌ The patterns command needs NumPy: pip install numpy")
+        return 1
+
+    conn = connect(args.database_url)
+    as_of = datetime.fromisoformat(args.as_of) if args.as_of else datetime.now(timezone.utc)
+    if as_of.tzinfo is None:
+        as_of = as_of.replace(tzinfo=timezone.utc)
+
+    if args.action == 'detect':
+        if not args.tenant:
+            print("❌ detect needs --tenant (use backfill for every tenant)")
+            return 1
+        tenants = [{'id': args.tenant, 'name': args.tenant}]
+    else:
+        cursor = conn.cursor()
+        cursor.execute(TENANTS_SQL)
+        tenants = cursor.fetchall()
+        conn.rollback()
+
+    banner(f"PATTERN DETECTION ({len(tenants)} tenant(s), {args.days} days to {as_of:%Y-%m-%d %H:%M}"
+           f"{', dry run' if args.dry_run else ''})")
+    rows = []
+    started = time.perf_counter()
+    for tenant in tenants:
+        patterns, stats = process_tenant(conn, tenant['id'], as_of, args)
+        rows.append(dict(stats, tenant=tenant['name'] or tenant['id']))
+        if args.action == 'detect' or args.verbose:
+            print_table(patterns, [
+                ('pattern_type', 'type'), ('pattern_name', 'pattern'), ('confidence_score', 'confidence'),
+                ('sample_size', 'sample'), ('is_actionable', 'actionable'), ('description', 'description'),
+            ])
+            print()
+    conn.close()
+
+    print_table(rows, [
+        ('tenant', 'tenant'), ('events', 'events'), ('patterns', 'patterns'), ('inserted', 'new'),
+        ('updated', 'updated'), ('deactivated', 'deactivated'), ('processed', 'marked'),
+        ('load_ms', 'load ms'), ('detect_ms', 'detect ms'), ('write_ms', 'write ms'),
+    ])
+    elapsed = time.perf_counter() - started
+    events = sum(r['events'] for r in rows)
+    print(f"\n   {events:,} events, {sum(r['patterns'] for r in rows):,} patterns in {elapsed:.1f}s "
+          f"({events / elapsed if elapsed else 0:,.0f} events/s)")
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('patterns', help='Detect warehouse event patterns in bulk with NumPy')
+    parser.add_argument('action', choices=['detect', 'backfill'],
+                        help='detect: one --tenant, printing its patterns; backfill: every tenant with events')
+    parser.add_argument('--tenant', help='detect: tenant id')
+    parser.add_argument('--days', type=int, default=180, help='History loaded per tenant')
+    parser.add_argument('--as-of', help='Evaluate as of this ISO timestamp instead of now')
+    parser.add_argument('--baseline', type=int, default=28, help='Days of history behind each anomaly score')
+    parser.add_argument('--z', type=float, default=3.0, help='Volume anomaly threshold (|z-score|)')
+    parser.add_argument('--min-client-events', type=int, default=5,
+                        help='Events in 30 days before a client gets an activity pattern')
+    parser.add_argument('--mark-processed', action='store_true',
+                        help='Mark events up to --as-of processed, so detectPatterns skips them')
+    parser.add_argument('--dry-run', action='store_true', help='Compute patterns without writing them')
+    parser.add_argument('--verbose', action='store_true', help='backfill: print every tenant\'s patterns')
+    parser.set_defaults(func=run)
@@ -0,0 +1,304 @@
+"""Snapshot and diff pg_stat_statements to rank job-system statements
+
+A snapshot captures pg_stat_statements for the current database together
+with pg_stat_user_tables and pg_stat_user_indexes. Diffing two snapshots
+gives the work done in between: statements ranked by total time, calls,
+rows or shared-buffer reads, tables by sequential tuples read and indexes
+by scans. Known query shapes (the PostgREST statements issued by
+job-planner.ts, orchestrator.ts, scheduler.ts, ...) are mapped back to the
+module that issues them.
+
+`window` and `run` take both snapshots themselves; `snapshot` and `diff`
+work with JSON files so the two points can be hours apart. Needs the
+pg_stat_statements extension (enabled by default on Supabase).
+"""
+import json
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from ops.db import banner, connect, print_table
+
+# Queries issued by this command carry this tag so they can be left out of the diff
+TAG = '/* ops:pg-stats */'
+
+# (source, pattern) - matched in order against the statement text lowercased, with
+# identifier quotes and the public. schema prefix stripped (PostgREST qualifies
+# everything as "public"."table"."column").
+SHAPES = [
+    ('scheduler.ts promoteScheduledCards', r'update kanban_cards set .*state.*due_at <='),
+    ('scheduler.ts getScheduledCardStats', r'select .*due_at.* from kanban_cards .*tenant_id = \$\d+.*state = \$\d+'),
+    ('job-planner.ts getTargetContacts (contacts)', r'from contacts .*join.*clients'),
+    ('job-planner.ts getTargetContacts (clients)', r'from clients .*tenant_id = \$\d+'),
+    ('job-planner.ts getTargetContacts (carded contacts)',
+     r'select .*contact_id.* from kanban_cards .*job_id = \$\d+.*contact_id is (not )?null'),
+    ('job-planner.ts getTargetContacts (suppressions)', r'from email_suppressions'),
+    ('job-planner.ts agent_memories', r'from agent_memories'),
+    ('orchestrator.ts processActiveJobs (running jobs)', r'from jobs .*tenant_id = \$\d+.*status = \$\d+'),
+    ('orchestrator.ts processActiveJobs (latest batch)', r'from job_tasks .*job_id = \$\d+.*order by .*batch desc'),
+    ('orchestrator.ts processActiveJobs (pending tasks)', r'from job_tasks .*job_id = \$\d+.*batch <?= \$\d+'),
+    ('orchestrator.ts processActiveJobs (insert tasks)', r'insert into job_tasks'),
+    ('orchestrator.ts processActiveJobs (task status)', r'update job_tasks set'),
+    ('orchestrator.ts card insert', r'insert into kanban_cards'),
+    ('orchestrator.ts agent_runs', r'(insert into|update) agent_runs'),
+    ('job counters / orchestrator.ts jobs update', r'update jobs set'),
+    ('warehouse-writer.ts captureEvents', r'insert into warehouse_events'),
+    ('tenant-lock.ts', r'(acquire|release|extend)_tenant_lock|agent_tenant_locks'),
+    ('refresh_job_metrics', r'refresh_job_metrics|job_metrics_current'),
+]
+_SHAPES = [(source, re.compile(pattern, re.S)) for source, pattern in SHAPES]
+
+STATEMENTS_SQL = TAG + """
+    SELECT s.userid::text || ':' || s.queryid::text AS key,
+           s.query, s.calls, s.total_exec_time AS total_ms, s.rows,
+           s.shared_blks_hit, s.shared_blks_read
+    FROM pg_stat_statements s
+    JOIN pg_database d ON d.oid = s.dbid
+    WHERE d.datname = current_database()
+"""
+
+TABLES_SQL = TAG + """
+    SELECT relname, seq_scan, seq_tup_read, COALESCE(idx_scan, 0) AS idx_scan,
+           COALESCE(idx_tup_fetch, 0) AS idx_tup_fetch,
+           n_tup_ins, n_tup_upd, n_tup_hot_upd, n_tup_del
+    FROM pg_stat_user_tables
+    WHERE schemaname = 'public'
+"""
+
+INDEXES_SQL = TAG + """
+    SELECT relname, indexrelname, idx_scan, idx_tup_read
+    FROM pg_stat_user_indexes
+    WHERE schemaname = 'public'
+"""
+
+TABLE_COUNTERS = ['seq_scan', 'seq_tup_read', 'idx_scan', 'idx_tup_fetch',
+                  'n_tup_ins', 'n_tup_upd', 'n_tup_hot_upd', 'n_tup_del']
+
+SORT_KEYS = {
+    'total': 'total_ms',
+    'calls': 'calls',
+    'rows': 'rows',
+    'reads': 'shared_blks_read',
+}
+
+
+def _normalize(query):
+    q = query.lower().replace('"', '').replace('public.', '')
+    return re.sub(r'\s+', ' ', q)
+
+
+def classify(query):
+    q = _normalize(query)
+    for source, pattern in _SHAPES:
+        if pattern.search(q):
+            return source
+    return None
+
+
+def snapshot(cursor):
+    cursor.execute(TAG + " SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    if cursor.fetchone() is None:
+        raise RuntimeError(
+            "pg_stat_statements is not installed - run "
+            "`CREATE EXTENSION pg_stat_statements WITH SCHEMA extensions;` as a superuser"
+        )
+    cursor.execute(STATEMENTS_SQL)
+    statements = cursor.fetchall()
+    cursor.execute(TABLES_SQL)
+    tables = cursor.fetchall()
+    cursor.execute(INDEXES_SQL)
+    indexes = cursor.fetchall()
+    return {
+        'taken_at': datetime.now(timezone.utc).isoformat(),
+        'statements': [dict(r) for r in statements],
+        'tables': [dict(r) for r in tables],
+        'indexes': [dict(r) for r in indexes],
+    }
+
+
+def diff(before, after, include_own=False):
+    """Counter deltas between two snapshots; statements reset in between count from zero"""
+    prior = {s['key']: s for s in before['statements']}
+    statements = []
+    for s in after['statements']:
+        if not include_own and (TAG in s['query'] or 'pg_stat_' in s['query']):
+            continue
+        b = prior.get(s['key'])
+        if b and b['calls'] > s['calls']:
+            b = None                            # pg_stat_statements_reset() in between
+        d = {
+            'query': s['query'],
+            'source': classify(s['query']),
+            'calls': s['calls'] - (b['calls'] if b else 0),
+            'total_ms': s['total_ms'] - (b['total_ms'] if b else 0.0),
+            'rows': s['rows'] - (b['rows'] if b else 0),
+            'shared_blks_hit': s['shared_blks_hit'] - (b['shared_blks_hit'] if b else 0),
+            'shared_blks_read': s['shared_blks_read'] - (b['shared_blks_read'] if b else 0),
+        }
+        if d['calls'] <= 0:
+            continue
+        d['mean_ms'] = d['total_ms'] / d['calls']
+        blocks = d['shared_blks_hit'] + d['shared_blks_read']
+        d['hit_pct'] = f"{d['shared_blks_hit'] / blocks * 100:.1f}%" if blocks else '-'
+        statements.append(d)
+
+    prior_tables = {t['relname']: t for t in before['tables']}
+    tables = []
+    for t in after['tables']:
+        b = prior_tables.get(t['relname'], {})
+        d = {'relname': t['relname']}
+        d.update({c: t[c] - b.get(c, 0) for c in TABLE_COUNTERS})
+        if any(d[c] for c in TABLE_COUNTERS):
+            tables.append(d)
+
+    prior_indexes = {(i['relname'], i['indexrelname']): i for i in before['indexes']}
+    indexes = []
+    for i in after['indexes']:
+        b = prior_indexes.get((i['relname'], i['indexrelname']), {})
+        indexes.append({
+            'relname': i['relname'],
+            'indexrelname': i['indexrelname'],
+            'idx_scan': i['idx_scan'] - b.get('idx_scan', 0),
+            'idx_tup_read': i['idx_tup_read'] - b.get('idx_tup_read', 0),
+        })
+    return {'statements': statements, 'tables': tables, 'indexes': indexes}
+
+
+def by_source(statements):
+    totals = defaultdict(lambda: {'calls': 0, 'total_ms': 0.0, 'rows': 0, 'shared_blks_read': 0, 'statements': 0})
+    for s in statements:
+        t = totals[s['source'] or '(unmapped)']
+        t['statements'] += 1
+        for key in ('calls', 'total_ms', 'rows', 'shared_blks_read'):
+            t[key] += s[key]
+    rows = [dict(v, source=k) for k, v in totals.items()]
+    return sorted(rows, key=lambda r: r['total_ms'], reverse=True)
+
+
+def report(delta, sort='total', limit=20, width=80):
+    statements = sorted(delta['statements'], key=lambda s: s[SORT_KEYS[sort]], reverse=True)
+    total_ms = sum(s['total_ms'] for s in statements) or 1.0
+
+    print(f"\n📦 By source module ({len(statements)} statements, {total_ms:.0f} ms)")
+    print_table(by_source(statements), [
+        ('source', 'source'), ('statements', 'stmts'), ('calls', 'calls'),
+        ('total_ms', 'total ms'), ('rows', 'rows'), ('shared_blks_read', 'blks read'),
+    ])
+
+    print(f"\n🔥 Top {limit} statements by {sort}")
+    rows = []
+    for rank, s in enumerate(statements[:limit], 1):
+        query = re.sub(r'\s+', ' ', s['query']).strip()
+        rows.append(dict(
+            s, rank=rank,
+            share=f"{s['total_ms'] / total_ms * 100:.1f}%",
+            source=s['source'] or '-',
+            query=query if len(query) <= width else query[:width - 1] + '…',
+        ))
+    print_table(rows, [
+        ('rank', '#'), ('source', 'source'), ('calls', 'calls'), ('total_ms', 'total ms'),
+        ('share', 'share'), ('mean_ms', 'mean ms'), ('rows', 'rows'),
+        ('shared_blks_read', 'blks read'), ('hit_pct', 'hit'), ('query', 'query'),
+    ])
+
+    print("\n📋 Tables by sequential tuples read")
+    tables = sorted(delta['tables'], key=lambda t: t['seq_tup_read'], reverse=True)[:limit]
+    print_table(tables, [
+        ('relname', 'table'), ('seq_scan', 'seq scans'), ('seq_tup_read', 'seq tuples'),
+        ('idx_scan', 'idx scans'), ('n_tup_ins', 'ins'), ('n_tup_upd', 'upd'),
+        ('n_tup_hot_upd', 'hot upd'), ('n_tup_del', 'del'),
+    ])
+
+    touched = {t['relname'] for t in delta['tables']}
+    used = [i for i in delta['indexes'] if i['idx_scan']]
+    unused = [i for i in delta['indexes'] if not i['idx_scan'] and i['relname'] in touched]
+    print("\n🗂️  Indexes used")
+    print_table(sorted(used, key=lambda i: i['idx_scan'], reverse=True)[:limit], [
+        ('relname', 'table'), ('indexrelname', 'index'), ('idx_scan', 'scans'), ('idx_tup_read', 'tuples'),
+    ])
+    if unused:
+        print(f"\n   {len(unused)} index(es) on touched tables were not scanned: "
+              + ', '.join(i['indexrelname'] for i in unused[:10]))
+
+
+def wait_for_run(cursor, since, tenant_id=None, timeout=1800, poll=2.0):
+    """Block until an agent run that started after `since` has ended; returns its row"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        cursor.execute(TAG + """
+            SELECT id, status, started_at, ended_at FROM agent_runs
+            WHERE started_at >= %s
+              AND (%s::uuid IS NULL OR tenant_id = %s::uuid)
+            ORDER BY started_at LIMIT 1
+        """, (since, tenant_id, tenant_id))
+        row = cursor.fetchone()
+        cursor.connection.commit()
+        if row and row['ended_at']:
+            return row
+        time.sleep(poll)
+    return None
+
+
+def _load(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def run(args):
+    conn = connect(args.database_url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    if args.action == 'snapshot':
+        snap = snapshot(cursor)
+        with open(args.out, 'w') as fh:
+            json.dump(snap, fh, default=str)
+        print(f"💾 {len(snap['statements'])} statements written to {args.out}")
+        conn.close()
+        return 0
+
+    if args.action == 'diff':
+        if len(args.files) != 2:
+            print("❌ diff needs two snapshot files: BEFORE.json AFTER.json")
+            conn.close()
+            return 1
+        before, after = _load(args.files[0]), _load(args.files[1])
+        banner(f"PG_STAT_STATEMENTS DIFF {before['taken_at']} → {after['taken_at']}")
+    elif args.action == 'window':
+        before = snapshot(cursor)
+        print(f"⏳ Sampling for {args.seconds}s...")
+        time.sleep(args.seconds)
+        after = snapshot(cursor)
+        banner(f"PG_STAT_STATEMENTS over {args.seconds}s")
+    else:
+        before = snapshot(cursor)
+        print("⏳ Waiting for the next agent run to start and finish...")
+        agent_run = wait_for_run(cursor, before['taken_at'], args.tenant, timeout=args.timeout)
+        if agent_run is None:
+            print(f"❌ No agent run completed within {args.timeout}s")
+            conn.close()
+            return 1
+        after = snapshot(cursor)
+        banner(f"PG_STAT_STATEMENTS for run {agent_run['id']} ({agent_run['status']})")
+        print("   Other sessions active during the run are included.")
+
+    report(diff(before, after, include_own=args.include_own), sort=args.sort, limit=args.limit)
+    conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('pg-stats', help='Diff pg_stat_statements around an agent run or time window')
+    parser.add_argument('action', choices=['run', 'window', 'snapshot', 'diff'],
+                        help='run: around the next agent run; window: over --seconds; '
+                             'snapshot: write one to --out; diff: compare two snapshot files')
+    parser.add_argument('files', nargs='*', help='diff: BEFORE.json AFTER.json')
+    parser.add_argument('--out', default='pg-stats.json', help='snapshot: output file')
+    parser.add_argument('--seconds', type=float, default=60.0, help='window: sampling length')
+    parser.add_argument('--tenant', help='run: wait for a run of this tenant')
+    parser.add_argument('--timeout', type=float, default=1800.0, help='run: give up after this many seconds')
+    parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--include-own', action='store_true', help="Keep this command's and pg_stat_* queries")
+    parser.set_defaults(func=run)
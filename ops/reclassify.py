@@ -0,0 +1,404 @@
+"""Bulk reclassification of stored Gmail messages with a compiled pre-classifier
+
+classifyEmail (src/lib/agent/email-classifier.ts) handles one message at a
+time: it checks the org's classification rules one by one, then asks
+Claude. Reclassifying history that way costs one LLM call per message,
+including the many that a rule settles outright. This command runs the
+deterministic part in bulk:
+
+  - every tenant's rules (agent_memories, scope email_classification) are
+    compiled once: sender_email / sender_domain into dicts, every
+    subject_contains value plus the unsubscribe keyword list
+    (detectUnsubscribeKeywords) into one trie-shaped regex, so a message
+    is scanned once however many rules there are; subject_regex rules are
+    only tried when they outrank the best literal hit
+  - messages stream through a server-side cursor in chunks to a process
+    pool; decided messages come back and are written with one
+    UPDATE ... FROM (VALUES ...) per --write-batch
+  - messages no rule settles are low-confidence; with --llm they are sent
+    in batches to /api/cron/gmail/reclassify, which runs classifyEmail
+
+Rule priority matches classifyEmail: rules ordered by importance, first
+match wins, confidence_override or 0.99. An unsubscribe keyword in the new
+(unquoted) text of a reply is REMOVE at 0.95; anywhere else it is left to
+the LLM. Backfills do not touch rule match statistics.
+"""
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from psycopg2.extras import Json, execute_values
+
+from ops.db import banner, connect, print_table
+
+RULES_SQL = """
+    SELECT tenant_id::text AS tenant_id, key, content
+    FROM agent_memories
+    WHERE scope = 'email_classification' AND importance >= 0.8 AND tenant_id IS NOT NULL
+    ORDER BY tenant_id, importance DESC, key
+"""
+
+MESSAGES_SQL = """
+    SELECT id::text, tenant_id::text, org_id::text, from_email, subject, body_text,
+           COALESCE(is_reply_to_campaign, FALSE) AS is_reply, category::text AS category, confidence
+    FROM gmail_messages
+    WHERE (%(tenant)s::uuid IS NULL OR tenant_id = %(tenant)s::uuid)
+      AND (%(since)s::timestamptz IS NULL OR received_at >= %(since)s::timestamptz)
+      AND (NOT %(unclassified)s OR category IS NULL OR category = 'ESCALATE')
+    ORDER BY tenant_id, received_at
+"""
+
+CATEGORIES_SQL = "SELECT unnest(enum_range(NULL::email_category))::text AS label"
+
+UPDATE_SQL = """
+    UPDATE gmail_messages m
+    SET category = v.category::email_category, confidence = v.confidence, intent = v.intent
+    FROM (VALUES %s) AS v(id, category, confidence, intent)
+    WHERE m.id = v.id::uuid
+      AND (m.category IS DISTINCT FROM v.category::email_category OR m.confidence IS DISTINCT FROM v.confidence)
+"""
+
+# classifyEmail reads at most 50 rules per tenant
+MAX_RULES = 50
+
+# detectUnsubscribeKeywords (src/lib/campaigns/classifier.ts)
+UNSUBSCRIBE_KEYWORDS = ['unsubscribe', 'remove me', 'opt out', 'stop sending', 'do not contact', 'take me off']
+
+RULE_CONFIDENCE = 0.99
+KEYWORD_CONFIDENCE = 0.95       # classifyEmail escalates below 0.95
+
+# Start of the quoted part of a reply
+QUOTE_RE = re.compile(r'^(?:>|On .{0,200}wrote:\s*$|-{2,}\s*Original Message)', re.M)
+
+# Same ReDoS screen as validateRegexPattern in email-classifier.ts
+DANGEROUS_RE = [re.compile(r'(\*|\+|\{)\s*(\*|\+|\{)'), re.compile(r'(\(.*\*.*\))\s*[\*\+]')]
+
+
+def trie_regex(words):
+    """One regex matching any of `words`, factored into a trie; the longest word wins at each position"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def pattern(node):
+        end = '' in node
+        branches = [re.escape(ch) + pattern(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            return '(?:' + body + ')?' if len(body) > 1 else body + '?'
+        return body
+
+    return pattern(trie)
+
+
+class KeywordAutomaton:
+    """Every occurrence of a set of lowercase keywords in one pass
+
+    The trie regex sits in a lookahead, so it is tried at every position and
+    reports the longest keyword starting there. Shorter keywords starting at
+    the same position are prefixes of it and are filled in from a table.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted(set(k for k in keywords if k))
+        self.pattern = re.compile('(?=(' + trie_regex(self.keywords) + '))') if self.keywords else None
+        self.prefixes = {k: [p for p in self.keywords if k.startswith(p)] for k in self.keywords}
+
+    def finditer(self, text):
+        """(keyword, position) for every keyword occurrence"""
+        if self.pattern is None:
+            return
+        for match in self.pattern.finditer(text):
+            for keyword in self.prefixes[match.group(1)]:
+                yield keyword, match.start()
+
+
+def _safe_regex(pattern):
+    if not pattern or len(pattern) > 200 or any(d.search(pattern) for d in DANGEROUS_RE):
+        return None
+    try:
+        return re.compile(pattern, re.I)
+    except re.error:
+        return None
+
+
+class TenantClassifier:
+    """A tenant's rules compiled for bulk matching"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.senders, self.domains, self.subjects, self.regexes = {}, {}, {}, []
+        for i, rule in enumerate(rules):
+            value = str(rule['pattern_value'])
+            kind = rule['pattern_type']
+            if kind == 'sender_email':
+                self.senders.setdefault(value.lower(), i)
+            elif kind == 'sender_domain':
+                self.domains.setdefault(value.lower(), i)
+            elif kind == 'subject_contains':
+                self.subjects.setdefault(value.lower(), []).append(i)
+            elif kind == 'subject_regex':
+                compiled = _safe_regex(value)
+                if compiled is not None:
+                    self.regexes.append((i, compiled))
+        self.automaton = KeywordAutomaton(list(self.subjects) + UNSUBSCRIBE_KEYWORDS)
+
+    def classify(self, from_email, subject, body, is_reply):
+        """(category, confidence, reason, decided_by), or None when the LLM should decide"""
+        from_email = (from_email or '').lower()
+        subject = (subject or '').lower()
+        best = self.senders.get(from_email, len(self.rules))
+        domain = from_email.split('@')[1] if '@' in from_email else None
+        best = min(best, self.domains.get(domain, best))
+
+        # One scan over subject + body; the subject is the first len(subject) characters
+        body = (body or '').lower()
+        quote = QUOTE_RE.search(body)
+        text = subject + '\n' + body
+        new_text_end = len(subject) + 1 + (quote.start() if quote else len(body))
+        unsubscribe = False
+        for keyword, position in self.automaton.finditer(text):
+            if position < len(subject):
+                for i in self.subjects.get(keyword, ()):
+                    best = min(best, i)
+            if keyword in UNSUBSCRIBE_KEYWORDS and position + len(keyword) <= new_text_end:
+                unsubscribe = True
+
+        for i, compiled in self.regexes:
+            if i >= best:
+                break
+            if subject and compiled.search(subject):
+                best = i
+                break
+
+        if best < len(self.rules):
+            rule = self.rules[best]
+            return (rule['correct_category'], float(rule.get('confidence_override') or RULE_CONFIDENCE),
+                    f"User-defined rule: {rule['pattern_type']} = \"{rule['pattern_value']}\" → "
+                    f"{rule['correct_category']}. Reason: {rule.get('reason') or ''}"[:500], rule['_key'])
+        if unsubscribe and (is_reply or subject.startswith('re:')):
+            return 'REMOVE', KEYWORD_CONFIDENCE, 'Unsubscribe request in reply text', 'unsubscribe_keywords'
+        return None
+
+
+def load_rules(cursor):
+    """{tenant_id: [rule]} in classifyEmail's priority order, invalid and disabled rules dropped"""
+    cursor.execute(RULES_SQL)
+    by_tenant = {}
+    for row in cursor.fetchall():
+        by_tenant.setdefault(row['tenant_id'], []).append(row)
+    rules = {}
+    for tenant_id, rows in by_tenant.items():
+        valid = []
+        for row in rows[:MAX_RULES]:
+            content = row['content'] if isinstance(row['content'], dict) else {}
+            if (content.get('pattern_type') and content.get('pattern_value') and content.get('correct_category')
+                    and content.get('enabled') is not False):
+                valid.append(dict(content, _key=row['key']))
+        rules[tenant_id] = valid
+    return rules
+
+
+# -- worker processes -------------------------------------------------------
+
+_classifiers = {}
+_empty = None
+
+
+def _init_worker(rules):
+    global _empty
+    _classifiers.update({tenant_id: TenantClassifier(r) for tenant_id, r in rules.items()})
+    _empty = TenantClassifier([])
+
+
+def classify_chunk(messages):
+    """Classify (id, tenant_id, org_id, from, subject, body, is_reply) tuples; returns (decided, undecided, cpu_s)"""
+    started = time.process_time()
+    decided, undecided = [], []
+    for message_id, tenant_id, org_id, from_email, subject, body, is_reply in messages:
+        result = _classifiers.get(tenant_id, _empty).classify(from_email, subject, body, is_reply)
+        if result is None:
+            undecided.append((message_id, org_id))
+        else:
+            decided.append((message_id,) + result)
+    return decided, undecided, time.process_time() - started
+
+
+def write_results(conn, decided):
+    cursor = conn.cursor()
+    execute_values(cursor, UPDATE_SQL, [
+        (message_id, category, confidence, Json({
+            'description': 'Matched user-defined classification rule' if by != 'unsubscribe_keywords'
+            else 'Unsubscribe request', 'entities': {}, 'reasoning': reason, 'classifier': 'ops-reclassify',
+        }))
+        for message_id, category, confidence, reason, by in decided
+    ], template='(%s, %s, %s::numeric, %s::jsonb)', page_size=1000)
+    updated = cursor.rowcount
+    conn.commit()
+    return updated
+
+
+def reclassify_llm(base_url, secret, org_id, message_ids):
+    request = urllib.request.Request(
+        f"{base_url.rstrip('/')}/api/cron/gmail/reclassify", method='POST',
+        data=json.dumps({'orgId': org_id, 'messageIds': message_ids}).encode(),
+        headers={'Authorization': f'Bearer {secret}', 'Content-Type': 'application/json'},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=330) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as exc:
+        return {'classified': 0, 'failed': len(message_ids), 'error': f'http {exc.code}'}
+    except (urllib.error.URLError, TimeoutError) as exc:
+        return {'classified': 0, 'failed': len(message_ids), 'error': str(getattr(exc, 'reason', exc))}
+
+
+def _chunks(stream, size):
+    chunk = []
+    for row in stream:
+        chunk.append((row['id'], row['tenant_id'], row['org_id'], row['from_email'], row['subject'],
+                      row['body_text'], row['is_reply']))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(args):
+    read_conn = connect(args.database_url)
+    write_conn = connect(args.database_url)
+    cursor = read_conn.cursor()
+    rules = load_rules(cursor)
+    # A rule's correct_category is free text; one value outside the enum
+    # would fail the cast for its whole write batch
+    cursor.execute(CATEGORIES_SQL)
+    categories = {r['label'] for r in cursor.fetchall()}
+    read_conn.rollback()
+
+    banner(f"RECLASSIFY GMAIL MESSAGES ({sum(len(r) for r in rules.values())} rules across {len(rules)} tenants, "
+           f"{args.workers} workers{', dry run' if args.dry_run else ''})")
+
+    stats = {'messages': 0, 'decided': 0, 'written': 0, 'undecided': 0}
+    by_source = {}
+    invalid = {}
+    undecided = []
+    pending_writes = []
+    cpu = write_s = 0.0
+    started = time.perf_counter()
+
+    stream = read_conn.cursor(name='reclassify_messages')
+    stream.itersize = args.chunk * 4
+    stream.execute(MESSAGES_SQL, {'tenant': args.tenant, 'since': args.since, 'unclassified': args.unclassified})
+
+    def collect(future):
+        nonlocal cpu, write_s
+        decided, chunk_undecided, chunk_cpu = future.result()
+        cpu += chunk_cpu
+        stats['decided'] += len(decided)
+        stats['undecided'] += len(chunk_undecided)
+        # Only the first --llm-limit are ever sent
+        if args.llm:
+            undecided.extend(chunk_undecided[:max(args.llm_limit - len(undecided), 0)])
+        for d in decided:
+            if d[1] not in categories:
+                invalid[(d[4], d[1])] = invalid.get((d[4], d[1]), 0) + 1
+                continue
+            key = d[4] if d[4] == 'unsubscribe_keywords' else 'rule'
+            by_source[(key, d[1])] = by_source.get((key, d[1]), 0) + 1
+            pending_writes.append(d)
+        if not args.dry_run and len(pending_writes) >= args.write_batch:
+            began = time.perf_counter()
+            stats['written'] += write_results(write_conn, pending_writes)
+            write_s += time.perf_counter() - began
+            pending_writes.clear()
+
+    # Bounded submission: at most 2 chunks per worker in flight, so memory stays flat
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(rules,)) as pool:
+        in_flight = set()
+        for chunk in _chunks(stream, args.chunk):
+            stats['messages'] += len(chunk)
+            in_flight.add(pool.submit(classify_chunk, chunk))
+            if len(in_flight) >= args.workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+        for future in in_flight:
+            collect(future)
+    stream.close()
+    read_conn.close()
+
+    if pending_writes and not args.dry_run:
+        began = time.perf_counter()
+        stats['written'] += write_results(write_conn, pending_writes)
+        write_s += time.perf_counter() - began
+    write_conn.close()
+    elapsed = time.perf_counter() - started
+
+    print_table([{'source': s, 'category': c, 'messages': n} for (s, c), n in sorted(by_source.items())],
+                [('source', 'decided by'), ('category', 'category'), ('messages', 'messages')])
+    print(f"\n   {stats['messages']:,} messages in {elapsed:.1f}s ({stats['messages'] / elapsed if elapsed else 0:,.0f}/s): "
+          f"{stats['decided']:,} decided, {stats['written']:,} changed, {stats['undecided']:,} low-confidence")
+    print(f"   rule evaluation {cpu:.1f} CPU-s across workers, writes {write_s:.1f}s, "
+          f"reads/transfer {max(elapsed - write_s, 0):.1f}s wall")
+    if invalid:
+        print(f"\n⚠️  {sum(invalid.values()):,} message(s) left unchanged: rule category is not an email_category")
+        print_table([{'rule': r, 'category': c, 'messages': n} for (r, c), n in sorted(invalid.items())],
+                    [('rule', 'rule'), ('category', 'category'), ('messages', 'messages')])
+
+    if not args.llm or not undecided or args.dry_run:
+        if stats['undecided'] and not args.dry_run:
+            print("\n   Low-confidence messages left unchanged; pass --llm to send them to classifyEmail")
+        return 0
+
+    base_url = args.base_url or os.environ.get('NEXT_PUBLIC_APP_URL')
+    secret = os.environ.get('CRON_SECRET')
+    if not base_url or not secret:
+        print("❌ NEXT_PUBLIC_APP_URL (or --base-url) and CRON_SECRET must be set for --llm")
+        return 1
+
+    batches = []
+    by_org = {}
+    for message_id, org_id in undecided:
+        by_org.setdefault(org_id, []).append(message_id)
+    for org_id, ids in by_org.items():
+        batches.extend((org_id, ids[i:i + args.llm_batch]) for i in range(0, len(ids), args.llm_batch))
+
+    print(f"\n🤖 Sending {sum(len(ids) for _, ids in batches):,} messages to classifyEmail "
+          f"in {len(batches)} batches ({args.llm_concurrency} at a time)")
+    classified = failed = 0
+    with ThreadPoolExecutor(max_workers=args.llm_concurrency) as pool:
+        for result in pool.map(lambda b: reclassify_llm(base_url, secret, *b), batches):
+            classified += result.get('classified', 0)
+            failed += result.get('failed', 0)
+            if result.get('error'):
+                print(f"   ⚠️  {result['error']}")
+    print(f"   {classified:,} classified, {failed:,} failed")
+    return 1 if failed else 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('reclassify', help='Re-run email classification rules over stored Gmail messages')
+    parser.add_argument('--tenant', help='Only this tenant (default: all)')
+    parser.add_argument('--since', help='Only messages received at or after this timestamp')
+    parser.add_argument('--unclassified', action='store_true', help='Only messages with no category or ESCALATE')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Classifier processes')
+    parser.add_argument('--chunk', type=int, default=500, help='Messages per worker task')
+    parser.add_argument('--write-batch', type=int, default=2000, help='Decided messages per UPDATE')
+    parser.add_argument('--llm', action='store_true',
+                        help='Send low-confidence messages to /api/cron/gmail/reclassify (classifyEmail)')
+    parser.add_argument('--llm-batch', type=int, default=20, help='Messages per reclassify request (max 50)')
+    parser.add_argument('--llm-concurrency', type=int, default=2, help='Reclassify requests in flight')
+    parser.add_argument('--llm-limit', type=int, default=5000, help='Most messages sent to the LLM per run')
+    parser.add_argument('--base-url', help='App URL (default NEXT_PUBLIC_APP_URL)')
+    parser.add_argument('--dry-run', action='store_true', help='Classify and report without writing')
+    parser.set_defaults(func=run)
@@ -0,0 +1,192 @@
+"""Read-through cache for schema metadata and slowly changing reference data
+
+Entries (table columns, client types, party roles, tenants) are kept in
+memory and in a JSON file per database under ~/.cache/salesmod-ops, each
+stored with the fingerprint it was loaded under:
+
+  schema:<table>  pg_class relfilenode/xmin plus the table's pg_attribute xmins
+                  (any ALTER TABLE rewrites one of them)
+  data entries    MAX(updated_at) and COUNT(*) of the source table, or
+                  MAX(xmin) and COUNT(*) where there is no updated_at
+
+Within `ttl` seconds of the last check a lookup is a dict read. After that,
+the fingerprints of every entry being asked for are fetched in one round
+trip and only the entries whose fingerprint moved are reloaded.
+"""
+import hashlib
+import json
+import os
+import time
+
+from ops.db import banner, connect, print_table
+
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'salesmod-ops')
+
+SCHEMA_FINGERPRINT = """
+    SELECT c.relfilenode::text || ':' || c.xmin::text || ':' || (
+        SELECT md5(string_agg(a.attname || a.xmin::text, ',' ORDER BY a.attnum))
+        FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attnum > 0
+    )
+    FROM pg_class c WHERE c.oid = to_regclass('public.{table}')
+"""
+
+SCHEMA_LOAD = """
+    SELECT column_name, data_type, is_nullable
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = '{table}'
+    ORDER BY ordinal_position
+"""
+
+# name -> (fingerprint expression, loader query)
+DATA_ENTRIES = {
+    'client_types': (
+        "SELECT MAX(updated_at)::text || ':' || COUNT(*) FROM clients",
+        "SELECT client_type, COUNT(*) AS clients FROM clients GROUP BY client_type ORDER BY client_type",
+    ),
+    'party_roles': (
+        "SELECT MAX(xmin::text::bigint)::text || ':' || COUNT(*) FROM party_roles",
+        "SELECT code, label, category, sort_order, is_active FROM party_roles ORDER BY sort_order, code",
+    ),
+    'tenants': (
+        "SELECT MAX(updated_at)::text || ':' || COUNT(*) FROM tenants",
+        "SELECT id, name, is_active FROM tenants ORDER BY name",
+    ),
+}
+
+
+def _entry_sql(name):
+    if name.startswith('schema:'):
+        table = name.split(':', 1)[1]
+        if not table.isidentifier():
+            raise ValueError(f"Bad table name {table!r}")
+        return SCHEMA_FINGERPRINT.format(table=table), SCHEMA_LOAD.format(table=table)
+    if name not in DATA_ENTRIES:
+        raise KeyError(f"Unknown cache entry {name!r} (known: schema:<table>, {', '.join(DATA_ENTRIES)})")
+    return DATA_ENTRIES[name]
+
+
+class RefCache:
+    def __init__(self, conn, ttl=60.0, path=None):
+        self.conn = conn
+        self.ttl = ttl
+        self.path = path or self._default_path(conn)
+        self.entries = {}                       # name -> {'fingerprint', 'value'}
+        self.checked = {}                       # name -> monotonic time of last fingerprint check
+        self.stats = {'hits': 0, 'revalidated': 0, 'reloaded': 0}
+        self._read()
+
+    @staticmethod
+    def _default_path(conn):
+        dsn = conn.get_dsn_parameters()
+        key = ':'.join(dsn.get(k, '') for k in ('host', 'port', 'dbname', 'user'))
+        return os.path.join(CACHE_DIR, f"refcache-{hashlib.sha1(key.encode()).hexdigest()[:12]}.json")
+
+    def _read(self):
+        try:
+            with open(self.path) as fh:
+                self.entries = json.load(fh)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump(self.entries, fh, default=str)
+        os.replace(tmp, self.path)
+
+    def get_many(self, names):
+        now = time.monotonic()
+        stale = [n for n in names if n not in self.entries or now - self.checked.get(n, -1e9) > self.ttl]
+        self.stats['hits'] += len(names) - len(stale)
+        if stale:
+            self._refresh(stale)
+        return {n: self.entries[n]['value'] for n in names}
+
+    def get(self, name):
+        return self.get_many([name])[name]
+
+    def _refresh(self, names):
+        sql = {n: _entry_sql(n) for n in names}
+        cursor = self.conn.cursor()
+        # One round trip for every fingerprint being checked
+        cursor.execute('SELECT ' + ', '.join(
+            f'({fingerprint}) AS "{n}"' for n, (fingerprint, _) in sql.items()
+        ))
+        fingerprints = cursor.fetchone()
+        changed = False
+        for n, (_, load) in sql.items():
+            fp = fingerprints[n]
+            cached = self.entries.get(n)
+            if cached is not None and cached['fingerprint'] == fp:
+                self.stats['revalidated'] += 1
+            else:
+                cursor.execute(load)
+                self.entries[n] = {'fingerprint': fp, 'value': [dict(r) for r in cursor.fetchall()]}
+                self.stats['reloaded'] += 1
+                changed = True
+            self.checked[n] = time.monotonic()
+        cursor.close()
+        if not self.conn.autocommit:
+            self.conn.rollback()
+        if changed:
+            self._write()
+
+    # -- convenience ---------------------------------------------------------
+
+    def columns(self, table):
+        return self.get(f'schema:{table}')
+
+    def client_types(self):
+        return [r['client_type'] for r in self.get('client_types')]
+
+    def role_codes(self, active_only=True):
+        return [r['code'] for r in self.get('party_roles') if r['is_active'] or not active_only]
+
+    def tenants(self):
+        return self.get('tenants')
+
+    def clear(self):
+        self.entries, self.checked = {}, {}
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def run(args):
+    conn = connect(args.database_url)
+    cache = RefCache(conn, ttl=args.ttl)
+    if args.action == 'clear':
+        cache.clear()
+        print(f"🗑️  Cleared {cache.path}")
+        return 0
+
+    names = args.entries.split(',')
+    banner(f"REFERENCE CACHE ({cache.path})")
+    timings = []
+    for attempt in ('cold/revalidate', 'warm'):
+        started = time.perf_counter()
+        values = cache.get_many(names)
+        timings.append({'lookup': attempt, 'us': (time.perf_counter() - started) * 1e6})
+
+    if args.action == 'show':
+        for name, rows in values.items():
+            print(f"\n{name} ({len(rows)} rows, fingerprint {cache.entries[name]['fingerprint']})")
+            if rows:
+                print_table(rows, [(k, k) for k in rows[0]])
+    print("\n⏱️  Lookup cost")
+    print_table(timings, [('lookup', 'lookup'), ('us', 'µs')])
+    print(f"   {cache.stats['reloaded']} reloaded, {cache.stats['revalidated']} revalidated, "
+          f"{cache.stats['hits']} served from memory")
+    conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('refcache', help='Cached schema metadata and reference data')
+    parser.add_argument('action', choices=['show', 'time', 'clear'])
+    parser.add_argument('--entries', default='schema:clients,schema:contacts,client_types,party_roles,tenants',
+                        help='Comma-separated entries: schema:<table>, client_types, party_roles, tenants')
+    parser.add_argument('--ttl', type=float, default=60.0, help='Seconds before a cached entry is revalidated')
+    parser.set_defaults(func=run)
@@ -0,0 +1,126 @@
+"""Retry scheduler and dead-letter tools for failed job_tasks
+
+Scheduling happens in the database (20260110020000_job_task_retries.sql):
+every transition into 'error' increments retry_count, appends to
+error_history and sets next_attempt_at from the error class's backoff
+policy - or dead-letters the task once its retries are used up. This
+command runs the sweep that moves due tasks back to 'pending', and reports
+on what is scheduled and what is dead.
+"""
+import time
+
+from ops.db import banner, connect, print_table
+
+STATUS_SQL = """
+    SELECT
+        COALESCE(t.error_history->-1->>'class', '(unscheduled)') AS error_class,
+        COUNT(*) FILTER (WHERE t.dead_lettered_at IS NULL AND t.next_attempt_at > NOW()) AS waiting,
+        COUNT(*) FILTER (WHERE t.dead_lettered_at IS NULL AND t.next_attempt_at <= NOW()) AS due,
+        COUNT(*) FILTER (WHERE t.dead_lettered_at IS NULL AND t.next_attempt_at IS NULL) AS unscheduled,
+        COUNT(*) FILTER (WHERE t.dead_lettered_at IS NOT NULL) AS dead,
+        MIN(t.next_attempt_at) FILTER (WHERE t.dead_lettered_at IS NULL) AS next_attempt_at
+    FROM job_tasks t
+    WHERE t.status = 'error'
+      AND (%(job_id)s::uuid IS NULL OR t.job_id = %(job_id)s::uuid)
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+DEAD_SQL = """
+    SELECT task_id, job_id, job_name, batch, step, kind, retry_count, error_class,
+           dead_lettered_at, last_error, error_history
+    FROM job_tasks_dead_letter
+    WHERE (%(job_id)s::uuid IS NULL OR job_id = %(job_id)s::uuid)
+    ORDER BY dead_lettered_at DESC
+    LIMIT %(limit)s
+"""
+
+REVIVE_SQL = """
+    UPDATE job_tasks
+    SET status = 'pending', dead_lettered_at = NULL, next_attempt_at = NULL,
+        retry_count = 0, started_at = NULL, finished_at = NULL
+    WHERE dead_lettered_at IS NOT NULL
+      AND status = 'error'
+      AND (%(task_id)s::bigint IS NULL OR id = %(task_id)s::bigint)
+      AND (%(job_id)s::uuid IS NULL OR job_id = %(job_id)s::uuid)
+    RETURNING id
+"""
+
+
+def sweep(cursor, limit):
+    cursor.execute("SELECT requeue_due_job_tasks(%s) AS requeued", (limit,))
+    return cursor.fetchone()['requeued']
+
+
+def run(args):
+    conn = connect(args.database_url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    if args.action == 'sweep':
+        while True:
+            total = requeued = sweep(cursor, args.limit)
+            while requeued == args.limit:       # a full page means more may be due now
+                requeued = sweep(cursor, args.limit)
+                total += requeued
+            if total or not args.loop:
+                print(f"{time.strftime('%H:%M:%S')}  ↻ re-queued {total} task(s)")
+            if not args.loop:
+                break
+            time.sleep(args.interval)
+
+    elif args.action == 'adopt':
+        cursor.execute("SELECT adopt_unscheduled_job_tasks() AS adopted")
+        print(f"✅ Scheduled {cursor.fetchone()['adopted']} errored task(s) recorded before retries existed")
+
+    elif args.action == 'status':
+        banner("JOB TASK RETRIES")
+        cursor.execute(STATUS_SQL, {'job_id': args.job})
+        print_table(cursor.fetchall(), [
+            ('error_class', 'class'), ('waiting', 'waiting'), ('due', 'due'),
+            ('unscheduled', 'unscheduled'), ('dead', 'dead'), ('next_attempt_at', 'next attempt'),
+        ])
+        cursor.execute("SELECT * FROM job_task_retry_policies ORDER BY priority")
+        print("\nPolicies")
+        print_table(cursor.fetchall(), [
+            ('error_class', 'class'), ('base_delay', 'base'), ('max_delay', 'max'),
+            ('max_retries', 'retries'), ('pattern', 'pattern'),
+        ])
+
+    elif args.action == 'dead':
+        banner("DEAD-LETTERED JOB TASKS")
+        cursor.execute(DEAD_SQL, {'job_id': args.job, 'limit': args.limit})
+        rows = cursor.fetchall()
+        print_table(rows, [
+            ('task_id', 'task'), ('job_name', 'job'), ('batch', 'batch'), ('kind', 'kind'),
+            ('retry_count', 'attempts'), ('error_class', 'class'), ('dead_lettered_at', 'dead since'),
+        ])
+        if args.history:
+            for row in rows:
+                print(f"\nTask {row['task_id']} ({row['kind']}, batch {row['batch']})")
+                for attempt in row['error_history']:
+                    print(f"  #{attempt['attempt']} {attempt['at']} [{attempt['class']}] {attempt['error']}")
+
+    elif args.action == 'revive':
+        if not (args.task or args.job):
+            print("❌ revive needs --task or --job")
+            return 1
+        cursor.execute(REVIVE_SQL, {'task_id': args.task, 'job_id': args.job})
+        print(f"✅ Revived {len(cursor.fetchall())} dead-lettered task(s) to pending")
+
+    conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('retry', help='Re-queue due failed job_tasks and inspect the dead letter queue')
+    parser.add_argument('action', choices=['sweep', 'status', 'dead', 'revive', 'adopt'],
+                        help='sweep: re-queue due tasks; status: counts per error class; dead: dead-letter '
+                             'queue; revive: dead-lettered back to pending; adopt: schedule pre-existing errors')
+    parser.add_argument('--loop', action='store_true', help='sweep: keep sweeping every --interval seconds')
+    parser.add_argument('--interval', type=float, default=30.0)
+    parser.add_argument('--limit', type=int, default=500, help='sweep: tasks per statement; dead: rows shown')
+    parser.add_argument('--job', help='Restrict to one job id')
+    parser.add_argument('--task', type=int, help='revive: one task id')
+    parser.add_argument('--history', action='store_true', help='dead: print each error history')
+    parser.set_defaults(func=run)
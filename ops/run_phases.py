@@ -0,0 +1,152 @@
+"""Reconstruct agent run timelines from run_phase warehouse events
+
+runWorkBlock records one warehouse event per phase (promote_scheduled,
+execution, job_processing, context, planning, card_insert, reflection)
+with its start time and duration. This command lays those out against
+the agent_runs row as a flame-style timeline, or aggregates the last N
+runs to show which phase dominates wall time.
+"""
+from collections import defaultdict
+
+from ops.db import banner, connect, print_table
+
+PHASE_ORDER = [
+    'promote_scheduled', 'execution', 'job_processing',
+    'context', 'planning', 'card_insert', 'reflection',
+]
+
+RUNS_SQL = """
+    SELECT id, tenant_id, status, started_at, ended_at,
+           EXTRACT(EPOCH FROM (COALESCE(ended_at, NOW()) - started_at))::float8 * 1000 AS wall_ms
+    FROM agent_runs
+    WHERE (%(run_id)s::uuid IS NULL OR id = %(run_id)s::uuid)
+      AND (%(tenant_id)s::uuid IS NULL OR tenant_id = %(tenant_id)s::uuid)
+    ORDER BY started_at DESC
+    LIMIT %(limit)s
+"""
+
+PHASES_SQL = """
+    SELECT
+        run_id,
+        payload->>'phase' AS phase,
+        (payload->>'started_at')::timestamptz AS started_at,
+        (payload->>'duration_ms')::float8 AS duration_ms,
+        COALESCE((payload->>'ok')::boolean, TRUE) AS ok
+    FROM warehouse_events
+    WHERE run_id = ANY(%s::uuid[])
+      AND event_type = 'run_phase'
+    ORDER BY run_id, started_at
+"""
+
+
+def load(cursor, run_id=None, tenant_id=None, limit=1):
+    cursor.execute(RUNS_SQL, {'run_id': run_id, 'tenant_id': tenant_id, 'limit': limit})
+    runs = cursor.fetchall()
+    if not runs:
+        return []
+    cursor.execute(PHASES_SQL, ([str(r['id']) for r in runs],))
+    phases = defaultdict(list)
+    for row in cursor.fetchall():
+        phases[row['run_id']].append(row)
+    for run in runs:
+        run['phases'] = phases.get(run['id'], [])
+    return runs
+
+
+def render_timeline(run, width=60):
+    """Print each phase as a bar offset from the run start, scaled to wall time"""
+    phases = run['phases']
+    # Reflection is fire-and-forget and can finish after ended_at, so the
+    # scale covers whichever ends last.
+    span_ms = max(
+        [run['wall_ms'] or 0.0] +
+        [(p['started_at'] - run['started_at']).total_seconds() * 1000 + p['duration_ms'] for p in phases]
+    ) or 1.0
+
+    print(f"\nRun {run['id']} ({run['status']}) - wall {run['wall_ms'] / 1000:.1f}s")
+    print(f"  {'':<18}|{'-' * width}|")
+    accounted = 0.0
+    for p in phases:
+        offset_ms = (p['started_at'] - run['started_at']).total_seconds() * 1000
+        start_col = int(offset_ms / span_ms * width)
+        length = max(1, round(p['duration_ms'] / span_ms * width))
+        bar = ' ' * start_col + ('█' if p['ok'] else '▒') * length
+        share = p['duration_ms'] / run['wall_ms'] * 100 if run['wall_ms'] else 0
+        print(f"  {p['phase']:<18}|{bar:<{width}}| {p['duration_ms'] / 1000:7.2f}s {share:5.1f}%")
+        if p['phase'] != 'reflection':
+            accounted += p['duration_ms']
+
+    other = (run['wall_ms'] or 0) - accounted
+    if other > 0:
+        print(f"  {'(untracked)':<18}|{'':<{width}}| {other / 1000:7.2f}s "
+              f"{other / run['wall_ms'] * 100:5.1f}%")
+    if any(not p['ok'] for p in phases):
+        print("  ▒ = phase raised an error")
+
+
+def summarize(runs):
+    """Per-phase totals across runs plus how often each phase was the longest"""
+    totals = defaultdict(list)
+    dominant = defaultdict(int)
+    total_wall = 0.0
+    for run in runs:
+        if not run['phases']:
+            continue
+        total_wall += run['wall_ms'] or 0
+        for p in run['phases']:
+            totals[p['phase']].append(p['duration_ms'])
+        longest = max(run['phases'], key=lambda p: p['duration_ms'])
+        dominant[longest['phase']] += 1
+
+    rows = []
+    for phase in sorted(totals, key=lambda ph: PHASE_ORDER.index(ph) if ph in PHASE_ORDER else len(PHASE_ORDER)):
+        samples = sorted(totals[phase])
+        rows.append({
+            'phase': phase,
+            'runs': len(samples),
+            'mean_s': sum(samples) / len(samples) / 1000,
+            'max_s': samples[-1] / 1000,
+            'share': f"{sum(samples) / total_wall * 100:.1f}%" if total_wall else '-',
+            'dominant': dominant.get(phase, 0),
+        })
+    return rows
+
+
+def run(args):
+    conn = connect(args.database_url)
+    cursor = conn.cursor()
+
+    if args.last:
+        banner(f"RUN PHASE BREAKDOWN (last {args.last} runs)")
+        runs = load(cursor, tenant_id=args.tenant, limit=args.last)
+        profiled = [r for r in runs if r['phases']]
+        print(f"\n{len(profiled)} of {len(runs)} runs have phase events")
+        print_table(summarize(runs), [
+            ('phase', 'phase'), ('runs', 'runs'), ('mean_s', 'mean s'),
+            ('max_s', 'max s'), ('share', 'share of wall'), ('dominant', 'longest in N runs'),
+        ])
+        if args.timelines:
+            for r in profiled:
+                render_timeline(r)
+    else:
+        banner("RUN PHASE TIMELINE")
+        runs = load(cursor, run_id=args.run, tenant_id=args.tenant, limit=1)
+        if not runs:
+            print("\n❌ No agent run found")
+        elif not runs[0]['phases']:
+            print(f"\n⚠️  Run {runs[0]['id']} has no run_phase events (started before phase tracking?)")
+        else:
+            render_timeline(runs[0])
+
+    cursor.close()
+    conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('run-phases', help='Phase timeline of agent runs from warehouse events')
+    parser.add_argument('--run', help='Agent run id (default: latest run)')
+    parser.add_argument('--tenant', help='Restrict to one tenant id')
+    parser.add_argument('--last', type=int, help='Aggregate the last N runs instead of showing one')
+    parser.add_argument('--timelines', action='store_true', help='With --last, also draw each run')
+    parser.set_defaults(func=run)
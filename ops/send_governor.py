@@ -0,0 +1,292 @@
+"""Send-rate governor client and capacity simulator
+
+Campaign executors lease send slots from the token buckets in
+send_rate_buckets (20260110080000_send_rate_buckets.sql): one per campaign,
+one per tenant sender mailbox and one per tenant, all drawn from in a single
+take_send_tokens() call. Callers name buckets only; the database sizes them
+(campaign send settings, send_rate_bucket_defaults, configure_send_bucket()).
+This command is the Python client for the same buckets - for workers outside
+the Next.js executor, checking balances and resizing mailbox / tenant
+buckets - and a simulator that replays executors against the same refill
+arithmetic, so rates and bursts can be sized before they are changed.
+
+A bucket with capacity C refilling R per hour grants at most C + R * t over
+any t hours, whatever the number of executors. Buckets are sized from an
+hourly budget so that C + R stays within it (send_bucket_size() in the
+migration, bucket_size() here); `simulate` reports the busiest rolling hour
+per bucket and fails when it is over that budget.
+"""
+import heapq
+import math
+import random
+from collections import defaultdict, deque
+
+from psycopg2.extras import Json
+
+from ops.db import banner, connect, print_table
+
+SCOPES = ('campaign', 'mailbox', 'tenant')
+
+# send_rate_bucket_defaults.burst_hours, and the campaign burst cap
+SHARED_BURST_HOURS = 0.25
+
+STATUS_SQL = """
+    SELECT scope, scope_key, per_hour, capacity, refill_per_hour, available, taken_total, refilled_at
+    FROM send_rate_bucket_status
+    WHERE (%(scope)s::text IS NULL OR scope = %(scope)s)
+    ORDER BY scope, scope_key
+"""
+
+
+class Bucket:
+    """One send_rate_buckets key as the lease functions expect it"""
+
+    def __init__(self, scope, key):
+        if scope not in SCOPES:
+            raise ValueError(f"unknown bucket scope {scope!r} (expected one of {', '.join(SCOPES)})")
+        self.scope = scope
+        self.key = key
+
+    @classmethod
+    def parse(cls, spec):
+        """scope:key, e.g. tenant:<id> or mailbox:<tenant id>:<address>"""
+        scope, key = spec.split(':', 1)
+        return cls(scope, key)
+
+    def as_json(self):
+        return {'scope': self.scope, 'key': self.key}
+
+
+class SendGovernor:
+    """Lease and release send slots; each call is its own transaction"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def lease(self, buckets, want):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT take_send_tokens(%s, %s) AS granted",
+                           (Json([b.as_json() for b in buckets]), want))
+            granted = cursor.fetchone()['granted']
+        self.conn.commit()
+        return granted
+
+    def release(self, buckets, count):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT release_send_tokens(%s, %s)",
+                           (Json([b.as_json() for b in buckets]), count))
+        self.conn.commit()
+
+    def configure(self, bucket, per_hour, burst=None):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT configure_send_bucket(%s, %s, %s, %s)",
+                           (bucket.scope, bucket.key, per_hour, burst))
+        self.conn.commit()
+
+    def status(self, scope=None):
+        with self.conn.cursor() as cursor:
+            cursor.execute(STATUS_SQL, {'scope': scope})
+            rows = cursor.fetchall()
+        self.conn.rollback()
+        return rows
+
+
+# ---------------------------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------------------------
+
+def bucket_size(per_hour, burst):
+    """(capacity, refill_per_hour) as send_bucket_size() computes them"""
+    capacity = float(max(1, min(math.ceil(burst), math.ceil(per_hour / 2))))
+    return capacity, max(per_hour - capacity, per_hour / 2)
+
+
+class SimBucket:
+    """take_send_tokens() arithmetic over simulated time (hours)"""
+
+    def __init__(self, bucket, per_hour, burst):
+        self.bucket = bucket
+        self.per_hour = float(per_hour)
+        self.capacity, self.refill_per_hour = bucket_size(self.per_hour, burst)
+        self.tokens = self.capacity
+        self.refilled_at = 0.0
+        self.grants = []            # (hour, count)
+
+    @classmethod
+    def shared(cls, scope, key, per_hour):
+        """Mailbox / tenant bucket sized like send_rate_bucket_defaults sizes them"""
+        return cls(Bucket(scope, key), per_hour, per_hour * SHARED_BURST_HOURS)
+
+    @classmethod
+    def campaign(cls, key, rate, batch):
+        """Campaign bucket sized like take_send_tokens() sizes it"""
+        return cls(Bucket('campaign', key), rate, min(batch, rate * SHARED_BURST_HOURS))
+
+    def available(self, now):
+        return min(self.capacity,
+                   self.tokens + self.refill_per_hour * max(now - self.refilled_at, 0.0))
+
+    def take(self, now, count):
+        self.tokens = self.available(now) - count
+        self.refilled_at = now
+        if count:
+            self.grants.append((now, count))
+
+    def peak_hour(self):
+        """Most tokens granted in any rolling 60 minutes"""
+        window, in_window, peak = deque(), 0, 0
+        for hour, count in self.grants:
+            window.append((hour, count))
+            in_window += count
+            while window[0][0] <= hour - 1.0:
+                in_window -= window.popleft()[1]
+            peak = max(peak, in_window)
+        return peak
+
+
+def lease(buckets, now, want):
+    granted = min(want, math.floor(min(b.available(now) for b in buckets)))
+    granted = max(granted, 0)
+    for b in buckets:
+        b.take(now, granted)
+    return granted
+
+
+def simulate(args):
+    rng = random.Random(args.seed)
+    mailbox = SimBucket.shared('mailbox', 'tenant:sender', args.mailbox_rate)
+    tenant = SimBucket.shared('tenant', 'tenant', args.tenant_rate)
+    campaigns = [SimBucket.campaign(f'campaign-{i + 1}', args.rate, args.batch)
+                 for i in range(args.campaigns)]
+    remaining = [args.recipients] * args.campaigns
+    finished_at = [None] * args.campaigns
+    runs = defaultdict(int)
+    throttled = defaultdict(int)
+
+    # Executors tick every --interval minutes from a random phase, as
+    # independent cron invocations would; leases are atomic, so processing
+    # ticks in time order is exactly what the database would serialise
+    interval = args.interval / 60.0
+    ticks = [(rng.uniform(0, interval), e) for e in range(args.executors)]
+    heapq.heapify(ticks)
+    while ticks:
+        now, executor = heapq.heappop(ticks)
+        if now > args.hours:
+            break
+        runs[executor] += 1
+        for i, campaign in enumerate(campaigns):
+            if not remaining[i]:
+                continue
+            granted = lease([campaign, mailbox, tenant], now, min(args.batch, remaining[i]))
+            if not granted:
+                throttled[executor] += 1
+            remaining[i] -= granted
+            if not remaining[i]:
+                finished_at[i] = now
+        heapq.heappush(ticks, (now + interval, executor))
+
+    buckets = campaigns + [mailbox, tenant]
+    bucket_rows = [{
+        'bucket': f"{b.bucket.scope}:{b.bucket.key}",
+        'capacity': b.capacity,
+        'refill': b.refill_per_hour,
+        'granted': sum(c for _, c in b.grants),
+        'peak_hour': b.peak_hour(),
+        'budget': b.per_hour,
+    } for b in buckets]
+    campaign_rows = [{
+        'campaign': c.bucket.key,
+        'sent': args.recipients - remaining[i],
+        'left': remaining[i],
+        'drained_h': round(finished_at[i], 2) if finished_at[i] is not None else None,
+    } for i, c in enumerate(campaigns)]
+    executor_rows = [{'executor': e + 1, 'runs': runs[e], 'throttled': throttled[e]}
+                     for e in range(args.executors)]
+    return bucket_rows, campaign_rows, executor_rows
+
+
+# ---------------------------------------------------------------------------
+# Command
+# ---------------------------------------------------------------------------
+
+def run(args):
+    if args.action == 'simulate':
+        banner(f"SEND GOVERNOR SIMULATION ({args.executors} executor(s) every {args.interval:g} min, "
+               f"{args.hours:g} h)")
+        bucket_rows, campaign_rows, executor_rows = simulate(args)
+        print_table(bucket_rows, [
+            ('bucket', 'bucket'), ('capacity', 'burst'), ('refill', 'refill / h'),
+            ('granted', 'granted'), ('peak_hour', 'busiest hour'), ('budget', 'per hour'),
+        ])
+        print()
+        print_table(campaign_rows, [
+            ('campaign', 'campaign'), ('sent', 'sent'), ('left', 'left'), ('drained_h', 'drained at (h)'),
+        ])
+        print()
+        print_table(executor_rows, [('executor', 'executor'), ('runs', 'runs'), ('throttled', 'throttled leases')])
+        over = [r['bucket'] for r in bucket_rows if r['peak_hour'] > r['budget']]
+        if over:
+            print(f"\n❌ Over budget: {', '.join(over)}")
+            return 1
+        return 0
+
+    conn = connect(args.database_url)
+    governor = SendGovernor(conn)
+
+    if args.action == 'status':
+        banner("SEND RATE BUCKETS")
+        print_table(governor.status(args.scope), [
+            ('scope', 'scope'), ('scope_key', 'key'), ('per_hour', 'per hour'), ('capacity', 'burst'),
+            ('refill_per_hour', 'refill / h'),
+            ('available', 'available'), ('taken_total', 'taken'), ('refilled_at', 'last lease'),
+        ])
+        conn.close()
+        return 0
+
+    if not args.bucket:
+        print("❌ lease / release / configure need at least one --bucket scope:key")
+        conn.close()
+        return 1
+    buckets = [Bucket.parse(spec) for spec in args.bucket]
+
+    if args.action == 'configure':
+        if args.per_hour is None:
+            print("❌ configure needs --per-hour")
+            conn.close()
+            return 1
+        for bucket in buckets:
+            governor.configure(bucket, args.per_hour, args.burst)
+            print(f"   {bucket.scope}:{bucket.key} capped at {args.per_hour:g} per hour")
+    elif args.action == 'lease':
+        granted = governor.lease(buckets, args.count)
+        print(f"   granted {granted} of {args.count} slot(s)")
+    else:
+        governor.release(buckets, args.count)
+        print(f"   released {args.count} slot(s)")
+    conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('send-governor',
+                                   help='Inspect and lease campaign send-rate buckets, or simulate executors')
+    parser.add_argument('action', choices=['status', 'lease', 'release', 'configure', 'simulate'])
+    parser.add_argument('--scope', choices=SCOPES, help='status: only this bucket scope')
+    parser.add_argument('--bucket', action='append',
+                        help='lease/release/configure: scope:key (repeat for each bucket)')
+    parser.add_argument('--count', type=int, default=1, help='lease/release: slots')
+    parser.add_argument('--per-hour', type=float, help='configure: mailbox / tenant sends per rolling hour')
+    parser.add_argument('--burst', type=float,
+                        help=f'configure: bucket capacity (default {SHARED_BURST_HOURS:g} h of --per-hour)')
+    sim = parser.add_argument_group('simulate')
+    sim.add_argument('--campaigns', type=int, default=3, help='Campaigns sending at once')
+    sim.add_argument('--recipients', type=int, default=500, help='Recipients per campaign')
+    sim.add_argument('--rate', type=float, default=75, help='Campaign send_rate_per_hour')
+    sim.add_argument('--batch', type=int, default=25, help='Campaign send_batch_size')
+    sim.add_argument('--mailbox-rate', type=float, default=100, help='Tenant sender mailbox sends per hour')
+    sim.add_argument('--tenant-rate', type=float, default=75, help='Tenant sends per hour')
+    sim.add_argument('--executors', type=int, default=2, help='Concurrent executors')
+    sim.add_argument('--interval', type=float, default=10, help='Minutes between runs of each executor')
+    sim.add_argument('--hours', type=float, default=48, help='Simulated hours')
+    sim.add_argument('--seed', type=int, default=1)
+    parser.set_defaults(func=run)
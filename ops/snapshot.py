@@ -0,0 +1,214 @@
+"""Export one job's rows to a compressed archive and load it into a local database
+
+`export` runs one REPEATABLE READ, read-only transaction and streams each
+related row set with COPY (SELECT ...) TO STDOUT in binary format: the job,
+its tasks, cards and agent runs (plus their run_phase warehouse events),
+the contacts and clients it targeted, and the tenant row, owner profile,
+email suppressions and agent memories that expansion reads. The streams
+and a manifest with every table's column names and types go into one
+tar.gz / tar.xz archive.
+
+`import` recreates each table's exported shape as a temp table, COPYs the
+binary stream into it and inserts the columns the local table also has,
+skipping rows that already exist. Triggers and FK checks are suspended
+while loading (session_replication_role = replica), as in ops.synthetic,
+so it needs a superuser connection and only runs against a local database.
+"""
+import io
+import json
+import os
+import tarfile
+from datetime import datetime, timezone
+
+from ops.db import LOCAL_DATABASE_URL, banner, connect, print_table, require_local
+
+FORMAT_VERSION = 1
+
+# (table, WHERE clause over the table's rows) in load order; %(job)s is the job
+# id and %(tenant)s its tenant. Parents are exported before children.
+TABLES = [
+    ('tenants', 'id = %(tenant)s'),
+    ('profiles', 'id IN (SELECT org_id FROM jobs WHERE id = %(job)s '
+                 'UNION SELECT owner_id FROM jobs WHERE id = %(job)s)'),
+    ('clients', 'id IN (SELECT client_id FROM kanban_cards WHERE job_id = %(job)s '
+                'UNION SELECT c.client_id FROM contacts c JOIN kanban_cards k ON k.contact_id = c.id '
+                'WHERE k.job_id = %(job)s)'),
+    ('contacts', 'id IN (SELECT contact_id FROM kanban_cards WHERE job_id = %(job)s)'),
+    ('jobs', 'id = %(job)s'),
+    ('agent_runs', 'job_id = %(job)s OR id IN (SELECT run_id FROM kanban_cards WHERE job_id = %(job)s)'),
+    ('job_tasks', 'job_id = %(job)s'),
+    ('kanban_cards', 'job_id = %(job)s'),
+    ('email_suppressions', 'tenant_id = %(tenant)s AND contact_id IN '
+                           '(SELECT contact_id FROM kanban_cards WHERE job_id = %(job)s)'),
+    ('agent_memories', "tenant_id = %(tenant)s AND importance >= 0.7"),
+    ('warehouse_events', "event_type = 'run_phase' AND run_id IN "
+                         "(SELECT id FROM agent_runs WHERE job_id = %(job)s)"),
+]
+
+# With --audience, targeting also includes every contact of the tenant that the
+# job could still reach, so getTargetContacts behaves locally as it would in
+# production.
+AUDIENCE = {
+    'clients': 'tenant_id = %(tenant)s',
+    'contacts': 'client_id IN (SELECT id FROM clients WHERE tenant_id = %(tenant)s) AND email IS NOT NULL',
+    'email_suppressions': 'tenant_id = %(tenant)s',
+}
+
+COLUMNS_SQL = """
+    SELECT a.attname AS name, format_type(a.atttypid, a.atttypmod) AS type
+    FROM pg_attribute a
+    WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY a.attnum
+"""
+
+
+def _columns(cursor, table):
+    cursor.execute(COLUMNS_SQL, (f'public.{table}',))
+    return cursor.fetchall()
+
+
+def _open(path, mode):
+    compression = 'xz' if path.endswith('.xz') else 'gz'
+    return tarfile.open(path, f'{mode}:{compression}')
+
+
+def _add(archive, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(datetime.now(timezone.utc).timestamp())
+    archive.addfile(info, io.BytesIO(data))
+
+
+def export(conn, job_id, path, audience=False, log=print):
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, tenant_id, name, status FROM jobs WHERE id = %s", (job_id,))
+    job = cursor.fetchone()
+    if job is None:
+        raise LookupError(f"Job {job_id} not found")
+    params = {'job': str(job['id']), 'tenant': str(job['tenant_id'])}
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'job': {'id': str(job['id']), 'name': job['name'], 'status': job['status']},
+        'tenant_id': str(job['tenant_id']),
+        'audience': audience,
+        'tables': [],
+    }
+    with _open(path, 'w') as archive:
+        for table, where in TABLES:
+            if audience and table in AUDIENCE:
+                where = f"({where}) OR ({AUDIENCE[table]})"
+            columns = _columns(cursor, table)
+            if not columns:
+                continue
+            query = cursor.mogrify(f"SELECT * FROM public.{table} WHERE {where}", params).decode()
+            buffer = io.BytesIO()
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT binary)", buffer)
+            rows = cursor.rowcount
+            if rows < 0:                        # older libpq/psycopg2 don't report COPY counts
+                cursor.execute(f"SELECT COUNT(*) AS n FROM public.{table} WHERE {where}", params)
+                rows = cursor.fetchone()['n']
+            _add(archive, f'{table}.copy', buffer.getvalue())
+            manifest['tables'].append({'name': table, 'rows': rows, 'columns': columns, 'bytes': buffer.tell()})
+            log(f"   {table:<20} {rows:>8} rows {buffer.tell():>12,} bytes")
+        _add(archive, 'manifest.json', json.dumps(manifest, indent=2).encode())
+    conn.rollback()
+    return manifest
+
+
+def import_archive(conn, path, log=print):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET session_replication_role = replica")
+    except Exception as exc:
+        conn.rollback()
+        raise RuntimeError(
+            "Snapshot import needs a superuser connection (session_replication_role); "
+            "use the supabase_admin role on the local database"
+        ) from exc
+
+    results = []
+    with _open(path, 'r') as archive:
+        manifest = json.load(archive.extractfile('manifest.json'))
+        if manifest['format'] != FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported snapshot format {manifest['format']}")
+        for table in manifest['tables']:
+            name = table['name']
+            cursor.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = %s AND is_generated = 'NEVER'
+            """, (name,))
+            local = {r['column_name'] for r in cursor.fetchall()}
+            if not local:
+                log(f"   ⚠️  {name}: no such local table, skipped")
+                continue
+
+            staging = f'_snapshot_{name}'
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(f"CREATE TEMP TABLE {staging} ("
+                           + ', '.join(f'"{c["name"]}" {c["type"]}' for c in table['columns']) + ")")
+            cursor.copy_expert(f"COPY {staging} FROM STDIN WITH (FORMAT binary)",
+                               archive.extractfile(f'{name}.copy'))
+
+            shared = [c['name'] for c in table['columns'] if c['name'] in local]
+            dropped = [c['name'] for c in table['columns'] if c['name'] not in local]
+            column_list = ', '.join(f'"{c}"' for c in shared)
+            cursor.execute(f"""
+                INSERT INTO public.{name} ({column_list})
+                SELECT {column_list} FROM {staging}
+                ON CONFLICT DO NOTHING
+            """)
+            results.append({'table': name, 'archived': table['rows'], 'inserted': cursor.rowcount,
+                            'dropped': ', '.join(dropped) or '-'})
+
+    cursor.execute("SET session_replication_role = DEFAULT")
+    cursor.execute("""
+        SELECT setval(pg_get_serial_sequence('job_tasks', 'id'), GREATEST((SELECT MAX(id) FROM job_tasks), 1))
+    """)
+    conn.commit()
+    cursor.close()
+    return manifest, results
+
+
+def run(args):
+    if args.action == 'export':
+        if not args.job:
+            print("❌ export needs --job")
+            return 1
+        path = args.file or f"job-{args.job[:8]}.tar.xz"
+        banner(f"SNAPSHOT EXPORT job {args.job}")
+        conn = connect(args.database_url)
+        manifest = export(conn, args.job, path, audience=args.audience)
+        conn.close()
+        total = sum(t['rows'] for t in manifest['tables'])
+        print(f"\n💾 {total} rows from {len(manifest['tables'])} tables → {path} "
+              f"({os.path.getsize(path):,} bytes compressed)")
+        print("   The archive holds customer contact data; keep it off shared drives.")
+        return 0
+
+    if not args.file:
+        print("❌ import needs --file")
+        return 1
+    url = require_local(args.database_url or LOCAL_DATABASE_URL)
+    banner(f"SNAPSHOT IMPORT {args.file}")
+    conn = connect(url)
+    manifest, results = import_archive(conn, args.file)
+    conn.close()
+    print(f"\nJob {manifest['job']['name']} ({manifest['job']['id']}), exported {manifest['created_at']}")
+    print_table(results, [
+        ('table', 'table'), ('archived', 'archived'), ('inserted', 'inserted'),
+        ('dropped', 'columns not in local schema'),
+    ])
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('snapshot', help="Export a job's rows to an archive / load one locally")
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('--job', help='export: job id')
+    parser.add_argument('--file', help='Archive path (.tar.xz or .tar.gz; export default job-<id>.tar.xz)')
+    parser.add_argument('--audience', action='store_true',
+                        help="export: include the tenant's whole reachable audience, not just carded contacts")
+    parser.set_defaults(func=run)
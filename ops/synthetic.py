@@ -0,0 +1,601 @@
+"""Generate production-shaped synthetic data into a local Postgres
+
+Fills tenants, profiles, clients, contacts, jobs (with cadence / bulk_mode
+templates), multi-batch job_tasks, agent_runs and kanban_cards using COPY.
+Rows are streamed, never held in memory, and ids are derived from counters
+so relationships (contact -> client -> tenant, card -> task -> job) can be
+computed instead of looked up. Only runs against a local database.
+
+Triggers and FK checks are suspended for the load (session_replication_role
+= replica), so the denormalized job counters are recomputed in one
+set-based pass afterwards.
+"""
+import io
+import json
+import random
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from ops.db import LOCAL_DATABASE_URL, banner, connect, require_local
+
+Scale = namedtuple('Scale', [
+    'tenants', 'users_per_tenant', 'clients_per_tenant', 'contacts_per_client',
+    'jobs_per_tenant', 'batches_per_job', 'batch_size',
+])
+
+# Roughly today's production footprint: a few tenants, ~150 contacts each,
+# one or two jobs with a handful of batches.
+BASE_SCALE = Scale(
+    tenants=3, users_per_tenant=2, clients_per_tenant=50, contacts_per_client=3,
+    jobs_per_tenant=2, batches_per_job=5, batch_size=10,
+)
+
+# Id namespaces: the top 64 bits of every generated UUID are a per-load
+# random prefix, the next 16 bits the entity kind, the rest a counter.
+TENANT, PROFILE, CLIENT, CONTACT, JOB, RUN, CARD = range(1, 8)
+
+ROLE_CODES = [
+    ('amc_contact', 30), ('mortgage_lender', 15), ('loan_officer', 15),
+    ('realtor', 10), ('investor', 8), ('real_estate_investor', 6),
+    ('private_lender', 5), ('amc_billing_contact', 4), ('attorney', 4), (None, 3),
+]
+STATES = ['FL', 'GA', 'TX', 'CA', 'NY', 'NC', 'SC', 'AL', 'TN', 'AZ']
+COMPANY_WORDS = ['Appraisal', 'Valuation', 'Lending', 'Capital', 'Mortgage', 'Realty', 'Partners', 'Group']
+FIRST_NAMES = ['James', 'Maria', 'Robert', 'Linda', 'Michael', 'Patricia', 'David', 'Jennifer', 'Carlos', 'Aisha']
+LAST_NAMES = ['Smith', 'Johnson', 'Garcia', 'Brown', 'Davis', 'Lopez', 'Wilson', 'Nguyen', 'Patel', 'Moore']
+TITLES = ['Vendor Manager', 'Loan Officer', 'Processor', 'Owner', 'Operations Manager', 'Broker', None]
+CARD_STATES = [('suggested', 35), ('approved', 10), ('done', 40), ('rejected', 8), ('blocked', 5), ('executing', 2)]
+
+TEMPLATES = {
+    'intro': {
+        'subject': 'Appraisal coverage in {{state}}',
+        'body': 'Hi {{first_name}},\n\nWe cover {{state}} with fast turn times...',
+    },
+    'followup1': {
+        'subject': 'Following up - {{company_name}}',
+        'body': 'Hi {{first_name}},\n\nJust checking in on my note from last week...',
+    },
+}
+
+
+class _CopyStream(io.TextIOBase):
+    """File-like adapter so copy_expert can pull lines from a generator"""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buf = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        chunks = [self._buf]
+        have = len(self._buf)
+        while size < 0 or have < size:
+            try:
+                line = next(self._lines)
+            except StopIteration:
+                break
+            chunks.append(line)
+            have += len(line)
+        data = ''.join(chunks)
+        if size < 0:
+            self._buf = ''
+            return data
+        self._buf = data[size:]
+        return data[:size]
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, _PgArray):
+        value = '{' + ','.join('"%s"' % v.replace('"', '\\"') for v in value) + '}'
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class _PgArray(list):
+    """Marks a list as a Postgres text[] rather than JSON"""
+
+
+def table_columns(cursor, qualified):
+    schema, table = qualified.split('.')
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s
+    """, (schema, table))
+    return {row['column_name'] for row in cursor.fetchall()}
+
+
+def copy_rows(cursor, qualified, rows):
+    """COPY dict rows into a table, keeping only columns that exist there
+
+    The migrations and production schema have drifted in places (e.g.
+    contacts.tags), so the generator emits a superset and this trims it.
+    """
+    existing = table_columns(cursor, qualified)
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    columns = [c for c in first if c in existing]
+    count = 0
+
+    def lines():
+        nonlocal count
+        for row in _chain(first, rows):
+            count += 1
+            yield '\t'.join(_copy_value(row.get(c)) for c in columns) + '\n'
+
+    cursor.copy_expert(
+        f"COPY {qualified} ({', '.join(columns)}) FROM STDIN",
+        _CopyStream(lines()),
+        size=1 << 16,
+    )
+    return count
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+class Generator:
+    def __init__(self, scale, seed=42, days=90):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.prefix = random.Random(seed).getrandbits(64)
+        self.now = datetime.now(timezone.utc)
+        self.days = days
+        self.task_id_base = 0
+        # (job, batch) -> id of its finished draft_email task, filled while
+        # job_tasks streams so cards can reference it (one int per batch)
+        self.draft_tasks = {}
+        # job -> first batch start, drawn once so agent_runs, job_tasks and
+        # kanban_cards all place a batch at the same time
+        self._job_starts = None
+        self._roles = [code for code, weight in ROLE_CODES for _ in range(weight)]
+        self._card_states = [s for s, weight in CARD_STATES for _ in range(weight)]
+
+    def uid(self, kind, n):
+        return str(uuid.UUID(int=(self.prefix << 64) | (kind << 48) | n))
+
+    def ago(self, max_days):
+        return self.now - timedelta(seconds=self.rng.uniform(0, max_days * 86400))
+
+    # -- ownership -----------------------------------------------------------
+
+    @property
+    def contacts_per_tenant(self):
+        return self.scale.clients_per_tenant * self.scale.contacts_per_client
+
+    def owner(self, tenant):
+        return self.uid(PROFILE, tenant * self.scale.users_per_tenant)
+
+    def user_email(self, n):
+        # profiles.email is UNIQUE, so include the load prefix
+        return f'synthetic-{self.prefix:016x}-{n}@example.test'
+
+    # -- tables --------------------------------------------------------------
+
+    def users(self):
+        for t in range(self.scale.tenants):
+            for u in range(self.scale.users_per_tenant):
+                n = t * self.scale.users_per_tenant + u
+                yield {
+                    'id': self.uid(PROFILE, n),
+                    'instance_id': '00000000-0000-0000-0000-000000000000',
+                    'aud': 'authenticated',
+                    'role': 'authenticated',
+                    'email': self.user_email(n),
+                    'raw_user_meta_data': {'name': f'Synthetic User {n}'},
+                    'created_at': self.now,
+                    'updated_at': self.now,
+                }
+
+    def profiles(self):
+        for t in range(self.scale.tenants):
+            for u in range(self.scale.users_per_tenant):
+                n = t * self.scale.users_per_tenant + u
+                yield {
+                    'id': self.uid(PROFILE, n),
+                    'name': f'Synthetic User {n}',
+                    'email': self.user_email(n),
+                    'role': 'admin' if u == 0 else 'user',
+                    'tenant_id': self.uid(TENANT, t),
+                    'created_at': self.now,
+                    'updated_at': self.now,
+                }
+
+    def tenants(self):
+        for t in range(self.scale.tenants):
+            yield {
+                'id': self.uid(TENANT, t),
+                'name': f'Synthetic Tenant {t}',
+                'type': 'internal',
+                'owner_id': self.owner(t),
+                'created_at': self.now,
+            }
+
+    def clients(self):
+        rng = self.rng
+        for t in range(self.scale.tenants):
+            for i in range(self.scale.clients_per_tenant):
+                n = t * self.scale.clients_per_tenant + i
+                name = f"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)} {n}"
+                state = rng.choice(STATES)
+                created = self.ago(self.days * 4)
+                yield {
+                    'id': self.uid(CLIENT, n),
+                    'company_name': name,
+                    'primary_contact': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    'email': f'client{n}@example.test',
+                    'phone': f'555-{n % 10000:04d}',
+                    'address': f'{100 + n % 9000} Main St, Springfield, {state}',
+                    'billing_address': f'{100 + n % 9000} Main St, Springfield, {state}',
+                    'is_active': rng.random() < 0.85,
+                    'client_type': 'individual' if rng.random() < 0.1 else 'company',
+                    'primary_role_code': rng.choice(self._roles),
+                    'org_id': self.owner(t),
+                    'tenant_id': self.uid(TENANT, t),
+                    'created_at': created,
+                    'updated_at': created + timedelta(days=rng.uniform(0, 30)),
+                }
+
+    def contacts(self):
+        rng = self.rng
+        per_client = self.scale.contacts_per_client
+        for t in range(self.scale.tenants):
+            for i in range(self.contacts_per_tenant):
+                n = t * self.contacts_per_tenant + i
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                tags = _PgArray()
+                roll = rng.random()
+                if roll < 0.02:
+                    tags.append('email_bounced_hard')
+                elif roll < 0.04:
+                    tags.append('email_bounced_soft')
+                created = self.ago(self.days * 4)
+                yield {
+                    'id': self.uid(CONTACT, n),
+                    'client_id': self.uid(CLIENT, n // per_client),
+                    'first_name': first,
+                    'last_name': last,
+                    'title': rng.choice(TITLES),
+                    'email': None if rng.random() < 0.05 else f'{first}.{last}.{n}@example.test'.lower(),
+                    'phone': f'555-{n % 10000:04d}',
+                    'is_primary': n % per_client == 0,
+                    'primary_role_code': rng.choice(self._roles),
+                    'tags': tags,
+                    'org_id': self.owner(t),
+                    'tenant_id': self.uid(TENANT, t),
+                    'created_at': created,
+                    'updated_at': created + timedelta(days=rng.uniform(0, 30)),
+                }
+
+    def job_params(self, bulk_mode):
+        return {
+            'target_type': 'contacts',
+            'target_group': 'AMC',
+            'target_filter': {'target_role_codes': ['amc_contact'], 'is_active': True},
+            'templates': TEMPLATES,
+            'cadence': {'day0': True, 'day4': True, 'day10': not bulk_mode, 'day21': False},
+            'review_mode': True,
+            'edit_mode': False,
+            'bulk_mode': bulk_mode,
+            'batch_size': self.scale.batch_size,
+        }
+
+    def jobs(self):
+        rng = self.rng
+        for t in range(self.scale.tenants):
+            for i in range(self.scale.jobs_per_tenant):
+                n = t * self.scale.jobs_per_tenant + i
+                started = self.job_starts()[n]
+                last_run = started + timedelta(hours=2 * (self.scale.batches_per_job - 1))
+                yield {
+                    'id': self.uid(JOB, n),
+                    'org_id': self.owner(t),
+                    'tenant_id': self.uid(TENANT, t),
+                    'owner_id': self.owner(t),
+                    'name': f'Synthetic campaign {n}',
+                    'description': 'Generated by python -m ops synth',
+                    'status': rng.choice(['running', 'running', 'running', 'succeeded', 'paused']),
+                    'params': self.job_params(bulk_mode=rng.random() < 0.3),
+                    'created_at': started - timedelta(minutes=5),
+                    'started_at': started,
+                    'last_run_at': last_run,
+                    'updated_at': last_run,
+                }
+
+    def job_starts(self):
+        """Start time of each job's first batch, shared by jobs and their runs"""
+        if self._job_starts is None:
+            per_job = self.scale.batches_per_job
+            self._job_starts = [
+                self.now - timedelta(hours=2 * per_job + self.rng.uniform(0, self.days * 24))
+                for _ in range(self.scale.tenants * self.scale.jobs_per_tenant)
+            ]
+        return self._job_starts
+
+    def _batch_plan(self):
+        """Yield (tenant, job, batch, run_no, batch_started) for every job batch"""
+        per_job = self.scale.batches_per_job
+        self.job_starts()
+        for t in range(self.scale.tenants):
+            for i in range(self.scale.jobs_per_tenant):
+                job = t * self.scale.jobs_per_tenant + i
+                start = self._job_starts[job]
+                for b in range(per_job):
+                    yield t, job, b, job * per_job + b, start + timedelta(hours=2 * b)
+
+    def _batch_contacts(self, tenant, job, batch):
+        base = tenant * self.contacts_per_tenant
+        offset = (job * 7919 + batch * self.scale.batch_size) % self.contacts_per_tenant
+        return [
+            base + (offset + k) % self.contacts_per_tenant
+            for k in range(min(self.scale.batch_size, self.contacts_per_tenant))
+        ]
+
+    def agent_runs(self):
+        for t, job, b, run, started in self._batch_plan():
+            yield {
+                'id': self.uid(RUN, run),
+                'org_id': self.owner(t),
+                'tenant_id': self.uid(TENANT, t),
+                'job_id': self.uid(JOB, job),
+                'started_at': started,
+                'ended_at': started + timedelta(seconds=self.rng.uniform(20, 240)),
+                'status': 'completed',
+                'mode': 'review',
+                'planned_actions': self.scale.batch_size,
+                'created_at': started,
+            }
+
+    def _task_status(self, batch):
+        last = batch == self.scale.batches_per_job - 1
+        roll = self.rng.random()
+        if last:
+            return 'pending' if roll < 0.7 else 'running'
+        return 'error' if roll < 0.02 else 'done'
+
+    def job_tasks(self):
+        task_id = self.task_id_base
+        for t, job, b, run, started in self._batch_plan():
+            contacts = self._batch_contacts(t, job, b)
+            steps = [('draft_email', {'template': 'intro' if b == 0 else 'followup1'})]
+            if b % 3 == 2:
+                steps.append(('check_portal', {}))
+            for step, (kind, extra) in enumerate(steps, start=1):
+                task_id += 1
+                status = self._task_status(b)
+                queued = self.rng.expovariate(1 / 30.0)
+                runtime = self.rng.lognormvariate(1.5, 0.8)
+                task_started = started + timedelta(seconds=queued) if status != 'pending' else None
+                finished = (task_started + timedelta(seconds=runtime)
+                            if status in ('done', 'error') else None)
+                contact_ids = [self.uid(CONTACT, c) for c in contacts]
+                if kind == 'draft_email' and status == 'done':
+                    self.draft_tasks[(job, b)] = task_id
+                yield {
+                    'id': task_id,
+                    'job_id': self.uid(JOB, job),
+                    'tenant_id': self.uid(TENANT, t),
+                    'step': step,
+                    'batch': b,
+                    'kind': kind,
+                    'input': dict(extra, target_type='contact_group', contact_ids=contact_ids, job_id=self.uid(JOB, job)),
+                    'output': {'cards_created': len(contacts)} if status == 'done' and kind == 'draft_email' else None,
+                    'status': status,
+                    'created_at': started,
+                    'started_at': task_started,
+                    'finished_at': finished,
+                    'error_message': 'Synthetic expansion failure' if status == 'error' else None,
+                    'retry_count': 1 if status == 'error' else 0,
+                }
+
+    def kanban_cards(self):
+        rng = self.rng
+        card = 0
+        per_client = self.scale.contacts_per_client
+        for t, job, b, run, started in self._batch_plan():
+            task_id = self.draft_tasks.get((job, b))
+            if task_id is None:
+                continue
+            for contact in self._batch_contacts(t, job, b):
+                state = rng.choice(self._card_states)
+                created = started + timedelta(seconds=rng.uniform(5, 60))
+                yield {
+                    'id': self.uid(CARD, card),
+                    'org_id': self.owner(t),
+                    'tenant_id': self.uid(TENANT, t),
+                    'run_id': self.uid(RUN, run),
+                    'client_id': self.uid(CLIENT, contact // per_client),
+                    'contact_id': self.uid(CONTACT, contact),
+                    'job_id': self.uid(JOB, job),
+                    'task_id': task_id,
+                    'type': 'send_email',
+                    'title': f'Email contact {contact} (batch {b})',
+                    'description': 'Synthetic outreach card',
+                    'rationale': f'Job batch {b} outreach',
+                    'priority': 'medium',
+                    'state': state,
+                    'action_payload': {
+                        'to': f'contact{contact}@example.test',
+                        'subject': TEMPLATES['intro']['subject'],
+                        'body': TEMPLATES['intro']['body'],
+                    },
+                    'executed_at': created + timedelta(hours=1) if state == 'done' else None,
+                    'created_at': created,
+                    'updated_at': created,
+                }
+                card += 1
+
+
+def scaled(factor, **overrides):
+    """BASE_SCALE with clients and jobs multiplied by factor, then explicit overrides"""
+    scale = BASE_SCALE._replace(
+        clients_per_tenant=max(1, int(BASE_SCALE.clients_per_tenant * factor)),
+        jobs_per_tenant=max(1, int(BASE_SCALE.jobs_per_tenant * factor)),
+    )
+    return scale._replace(**{k: v for k, v in overrides.items() if v is not None})
+
+
+def generate(conn, scale, seed=42, days=90, log=print):
+    """Load one synthetic dataset; returns {table: rows}"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET session_replication_role = replica")
+    except Exception as exc:
+        conn.rollback()
+        raise RuntimeError(
+            "Bulk load needs a superuser connection (session_replication_role); "
+            "use the supabase_admin role on the local database"
+        ) from exc
+
+    gen = Generator(scale, seed=seed, days=days)
+    cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM job_tasks")
+    gen.task_id_base = cursor.fetchone()['max_id']
+
+    counts = {}
+    steps = [
+        ('auth.users', gen.users),
+        ('public.tenants', gen.tenants),
+        ('public.profiles', gen.profiles),
+        ('public.clients', gen.clients),
+        ('public.contacts', gen.contacts),
+        ('public.jobs', gen.jobs),
+        ('public.agent_runs', gen.agent_runs),
+        ('public.job_tasks', gen.job_tasks),
+        ('public.kanban_cards', gen.kanban_cards),
+    ]
+    for table, rows in steps:
+        started = time.perf_counter()
+        counts[table] = copy_rows(cursor, table, rows())
+        log(f"   {table:<22} {counts[table]:>10,} rows  {time.perf_counter() - started:6.2f}s")
+
+    cursor.execute("SET session_replication_role = DEFAULT")
+    cursor.execute("""
+        SELECT setval(pg_get_serial_sequence('job_tasks', 'id'), GREATEST((SELECT MAX(id) FROM job_tasks), 1))
+    """)
+
+    # Triggers were off during COPY, so rebuild the denormalized counters the
+    # job and card triggers would have maintained.
+    job_ids = [gen.uid(JOB, n) for n in range(scale.tenants * scale.jobs_per_tenant)]
+    cursor.execute("""
+        UPDATE jobs j SET
+            total_tasks = t.total, completed_tasks = t.done, failed_tasks = t.failed,
+            cards_created = c.created, cards_approved = c.approved, cards_executed = c.executed,
+            emails_sent = c.sent, errors_count = c.blocked
+        FROM (
+            SELECT job_id, COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE status = 'done') AS done,
+                   COUNT(*) FILTER (WHERE status = 'error') AS failed
+            FROM job_tasks WHERE job_id = ANY(%(ids)s::uuid[]) GROUP BY job_id
+        ) t
+        LEFT JOIN (
+            SELECT job_id, COUNT(*) AS created,
+                   COUNT(*) FILTER (WHERE state = 'approved') AS approved,
+                   COUNT(*) FILTER (WHERE state IN ('done', 'executing')) AS executed,
+                   COUNT(*) FILTER (WHERE type = 'send_email' AND state = 'done') AS sent,
+                   COUNT(*) FILTER (WHERE state = 'blocked') AS blocked
+            FROM kanban_cards WHERE job_id = ANY(%(ids)s::uuid[]) GROUP BY job_id
+        ) c ON c.job_id = t.job_id
+        WHERE j.id = t.job_id
+    """, {'ids': job_ids})
+    conn.commit()
+
+    for table in ('clients', 'contacts', 'jobs', 'job_tasks', 'kanban_cards', 'agent_runs'):
+        cursor.execute(f"ANALYZE {table}")
+    conn.commit()
+    cursor.close()
+    return counts
+
+
+def purge(conn, seed=42):
+    """Delete every row a load with this seed created (matched by id prefix)"""
+    gen = Generator(BASE_SCALE, seed=seed)
+    lo = str(uuid.UUID(int=gen.prefix << 64))
+    hi = str(uuid.UUID(int=(gen.prefix << 64) | ((1 << 64) - 1)))
+    cursor = conn.cursor()
+    cursor.execute("SET session_replication_role = replica")
+    counts = {}
+    for table, column in [
+        ('public.kanban_cards', 'id'), ('public.job_tasks', 'job_id'), ('public.agent_runs', 'id'),
+        # Written by acquire_tenant_lock during `load --tenant-lock`
+        ('public.agent_tenant_locks', 'tenant_id'), ('public.agent_autonomous_runs', 'tenant_id'),
+        ('public.jobs', 'id'), ('public.contacts', 'id'), ('public.clients', 'id'),
+        ('public.profiles', 'id'), ('public.tenants', 'id'), ('auth.users', 'id'),
+    ]:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} BETWEEN %s AND %s", (lo, hi))
+        counts[table] = cursor.rowcount
+    cursor.execute("SET session_replication_role = DEFAULT")
+    conn.commit()
+    cursor.close()
+    return counts
+
+
+def run(args):
+    url = require_local(args.database_url or LOCAL_DATABASE_URL)
+    scale = scaled(
+        args.scale,
+        tenants=args.tenants,
+        clients_per_tenant=args.clients_per_tenant,
+        contacts_per_client=args.contacts_per_client,
+        jobs_per_tenant=args.jobs_per_tenant,
+        batches_per_job=args.batches_per_job,
+        batch_size=args.batch_size,
+    )
+
+    if args.purge:
+        banner("SYNTHETIC DATA PURGE")
+        conn = connect(url)
+        counts = purge(conn, seed=args.seed)
+        conn.close()
+        for table, rows in counts.items():
+            print(f"   {table:<22} {rows:>10,} rows deleted")
+        return 0
+
+    banner("SYNTHETIC DATA LOAD")
+    contacts = scale.tenants * scale.clients_per_tenant * scale.contacts_per_client
+    cards = scale.tenants * scale.jobs_per_tenant * scale.batches_per_job * scale.batch_size
+    print(f"\nScale: {dict(scale._asdict())}")
+    print(f"Expecting ~{contacts:,} contacts and ~{cards:,} cards (seed {args.seed})\n")
+
+    conn = connect(url)
+    started = time.perf_counter()
+    counts = generate(conn, scale, seed=args.seed, days=args.days)
+    conn.close()
+
+    total = sum(counts.values())
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ Loaded {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('synth', help='Load synthetic jobs/contacts/kanban data into a local Postgres')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply clients and jobs per tenant relative to production size (default 1)')
+    parser.add_argument('--tenants', type=int)
+    parser.add_argument('--clients-per-tenant', type=int)
+    parser.add_argument('--contacts-per-client', type=int)
+    parser.add_argument('--jobs-per-tenant', type=int)
+    parser.add_argument('--batches-per-job', type=int)
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--days', type=int, default=90, help='Spread job activity over this many days')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed; also picks the id prefix, so reuse a seed only on a fresh database')
+    parser.add_argument('--purge', action='store_true', help='Delete the rows a previous load with --seed created')
+    parser.set_defaults(func=run)
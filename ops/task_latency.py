@@ -0,0 +1,179 @@
+"""Profile job_tasks queue wait / execution time and agent run throughput
+
+Queue wait is started_at - created_at (how long a task sat pending) and
+execution time is finished_at - started_at. Percentiles for every grouping
+(per kind, per job+kind, per tenant+kind) come back from one aggregate
+query using GROUPING SETS; histograms are bucketed server-side on a log2
+scale and drawn locally.
+"""
+from ops.db import banner, connect, print_table
+
+LATENCY_SQL = """
+    WITH t AS (
+        SELECT
+            kind,
+            job_id,
+            tenant_id,
+            EXTRACT(EPOCH FROM (started_at - created_at))::float8 AS wait_s,
+            EXTRACT(EPOCH FROM (finished_at - started_at))::float8 AS exec_s
+        FROM job_tasks
+        WHERE created_at >= NOW() - %(window)s::interval
+          AND (%(job_id)s::uuid IS NULL OR job_id = %(job_id)s::uuid)
+          AND (%(tenant_id)s::uuid IS NULL OR tenant_id = %(tenant_id)s::uuid)
+    )
+    SELECT
+        CASE
+            WHEN GROUPING(job_id) = 0 THEN 'job'
+            WHEN GROUPING(tenant_id) = 0 THEN 'tenant'
+            ELSE 'kind'
+        END AS scope,
+        kind,
+        job_id,
+        tenant_id,
+        COUNT(*) AS tasks,
+        COUNT(wait_s) AS started,
+        COUNT(exec_s) AS finished,
+        percentile_cont(0.50) WITHIN GROUP (ORDER BY wait_s) AS wait_p50,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY wait_s) AS wait_p95,
+        percentile_cont(0.99) WITHIN GROUP (ORDER BY wait_s) AS wait_p99,
+        percentile_cont(0.50) WITHIN GROUP (ORDER BY exec_s) AS exec_p50,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY exec_s) AS exec_p95,
+        percentile_cont(0.99) WITHIN GROUP (ORDER BY exec_s) AS exec_p99
+    FROM t
+    GROUP BY GROUPING SETS ((kind), (job_id, kind), (tenant_id, kind))
+    ORDER BY scope, kind, tasks DESC
+"""
+
+# Log2 buckets: bucket b holds durations in [2^b, 2^(b+1)) seconds; anything
+# under 1ms collapses into the lowest bucket.
+HISTOGRAM_SQL = """
+    WITH t AS (
+        SELECT
+            kind,
+            EXTRACT(EPOCH FROM (started_at - created_at))::float8 AS wait_s,
+            EXTRACT(EPOCH FROM (finished_at - started_at))::float8 AS exec_s
+        FROM job_tasks
+        WHERE created_at >= NOW() - %(window)s::interval
+          AND (%(job_id)s::uuid IS NULL OR job_id = %(job_id)s::uuid)
+          AND (%(tenant_id)s::uuid IS NULL OR tenant_id = %(tenant_id)s::uuid)
+    ),
+    samples AS (
+        SELECT kind, 'wait' AS metric, wait_s AS secs FROM t WHERE wait_s IS NOT NULL
+        UNION ALL
+        SELECT kind, 'exec', exec_s FROM t WHERE exec_s IS NOT NULL
+    )
+    SELECT kind, metric,
+           FLOOR(LOG(2, GREATEST(secs, 0.001)::numeric))::int AS bucket,
+           COUNT(*) AS n
+    FROM samples
+    GROUP BY kind, metric, bucket
+    ORDER BY kind, metric, bucket
+"""
+
+THROUGHPUT_SQL = """
+    SELECT
+        r.id AS run_id,
+        r.started_at,
+        EXTRACT(EPOCH FROM (COALESCE(r.ended_at, NOW()) - r.started_at))::float8 AS duration_s,
+        COUNT(c.id) AS cards,
+        COUNT(c.id) / NULLIF(EXTRACT(EPOCH FROM (COALESCE(r.ended_at, NOW()) - r.started_at))::float8, 0)
+            AS cards_per_s
+    FROM agent_runs r
+    LEFT JOIN kanban_cards c ON c.run_id = r.id
+    WHERE r.started_at >= NOW() - %(window)s::interval
+      AND (%(job_id)s::uuid IS NULL OR r.job_id = %(job_id)s::uuid)
+      AND (%(tenant_id)s::uuid IS NULL OR r.tenant_id = %(tenant_id)s::uuid)
+    GROUP BY r.id
+    ORDER BY r.started_at DESC
+    LIMIT %(runs)s
+"""
+
+LATENCY_COLUMNS = [
+    ('kind', 'kind'), ('tasks', 'tasks'), ('finished', 'done'),
+    ('wait_p50', 'wait p50'), ('wait_p95', 'wait p95'), ('wait_p99', 'wait p99'),
+    ('exec_p50', 'exec p50'), ('exec_p95', 'exec p95'), ('exec_p99', 'exec p99'),
+]
+
+
+def _format_bucket(bucket):
+    lo = 2.0 ** bucket
+    if lo < 1:
+        return f"{lo * 1000:.0f}ms"
+    if lo < 60:
+        return f"{lo:.0f}s"
+    if lo < 3600:
+        return f"{lo / 60:.0f}m"
+    return f"{lo / 3600:.1f}h"
+
+
+def print_histograms(rows, width=40):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault((row['kind'], row['metric']), []).append(row)
+
+    for (kind, metric), buckets in grouped.items():
+        total = sum(b['n'] for b in buckets)
+        peak = max(b['n'] for b in buckets)
+        print(f"\n  {kind} / {metric} ({total} samples)")
+        for b in buckets:
+            bar = '█' * max(1, round(b['n'] / peak * width))
+            print(f"    ≥{_format_bucket(b['bucket']):>7}  {bar} {b['n']}")
+
+
+def profile(cursor, window, job_id=None, tenant_id=None, runs=20):
+    params = {'window': window, 'job_id': job_id, 'tenant_id': tenant_id, 'runs': runs}
+    cursor.execute(LATENCY_SQL, params)
+    latency = cursor.fetchall()
+    cursor.execute(HISTOGRAM_SQL, params)
+    histogram = cursor.fetchall()
+    cursor.execute(THROUGHPUT_SQL, params)
+    throughput = cursor.fetchall()
+    return latency, histogram, throughput
+
+
+def run(args):
+    conn = connect(args.database_url)
+    cursor = conn.cursor()
+
+    banner(f"TASK LATENCY PROFILE (last {args.window})")
+    latency, histogram, throughput = profile(
+        cursor, args.window, job_id=args.job, tenant_id=args.tenant, runs=args.runs
+    )
+
+    by_scope = {'kind': [], 'job': [], 'tenant': []}
+    for row in latency:
+        by_scope[row['scope']].append(row)
+
+    print("\n⏱️  Per task kind (seconds)")
+    print_table(by_scope['kind'], LATENCY_COLUMNS)
+
+    if not args.job:
+        print("\n🏢 Per tenant (seconds)")
+        print_table(by_scope['tenant'], [('tenant_id', 'tenant')] + LATENCY_COLUMNS)
+
+    print("\n📋 Per job (seconds)")
+    print_table(by_scope['job'], [('job_id', 'job')] + LATENCY_COLUMNS)
+
+    if args.histogram:
+        print("\n📊 Distribution")
+        print_histograms(histogram)
+
+    print(f"\n🚀 Card throughput (last {args.runs} runs)")
+    print_table(throughput, [
+        ('run_id', 'run'), ('started_at', 'started'), ('duration_s', 'duration s'),
+        ('cards', 'cards'), ('cards_per_s', 'cards/s'),
+    ])
+
+    cursor.close()
+    conn.close()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('task-latency', help='p50/p95/p99 queue wait and execution time of job_tasks')
+    parser.add_argument('--window', default='7 days', help="Postgres interval to look back over (default: '7 days')")
+    parser.add_argument('--job', help='Restrict to one job id')
+    parser.add_argument('--tenant', help='Restrict to one tenant id')
+    parser.add_argument('--runs', type=int, default=20, help='Agent runs to include in the throughput table')
+    parser.add_argument('--no-histogram', dest='histogram', action='store_false')
+    parser.set_defaults(func=run)
@@ -0,0 +1,249 @@
+"""Expand job_tasks outside agent runs with SKIP LOCKED queue workers
+
+Each worker claims one pending task with FOR UPDATE SKIP LOCKED, expands it
+to kanban cards (ops.expansion, a port of expandTaskToCards), inserts the
+cards and marks the task done - all in one transaction. A worker that dies
+mid-task rolls back and the row lock goes with it, so the task is simply
+pending again for the next worker; any number of workers, in one process or
+across hosts, never pick the same task.
+
+Only jobs with params.task_worker = true are served; processActiveJobs still
+plans their batches but leaves expansion to the workers. Failed expansions
+are marked error; the retry trigger counts the attempt and schedules the
+next one (see the retry command). Idle workers sleep until a
+job_progress notification announces a new pending task (or --idle timeout).
+"""
+import json
+import select
+import threading
+import time
+import traceback
+from collections import Counter
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+
+from ops import expansion
+from ops.db import banner, connect, print_table
+
+CLAIM_SQL = """
+    SELECT t.id, t.job_id, t.batch, t.step, t.kind, t.input, t.retry_count,
+           j.name, j.params, j.tenant_id, j.org_id
+    FROM job_tasks t
+    JOIN jobs j ON j.id = t.job_id
+    WHERE t.status = 'pending'
+      AND j.status = 'running'
+      AND COALESCE((j.params->>'task_worker')::boolean, FALSE)
+      AND t.kind = ANY(%s)
+    ORDER BY t.id
+    LIMIT 1
+    FOR UPDATE OF t SKIP LOCKED
+"""
+
+CARD_COLUMNS = [
+    'org_id', 'tenant_id', 'job_id', 'task_id', 'type', 'title', 'description',
+    'rationale', 'priority', 'state', 'action_payload', 'client_id', 'contact_id',
+]
+
+
+def claim(cursor, kinds):
+    cursor.execute(CLAIM_SQL, (list(kinds),))
+    row = cursor.fetchone()
+    if row is None:
+        return None, None
+    job = {k: row[k] for k in ('name', 'params', 'tenant_id', 'org_id')}
+    job['id'] = row['job_id']
+    return row, job
+
+
+def finish(cursor, task_id, status, output=None, error=None):
+    cursor.execute("""
+        UPDATE job_tasks
+        SET status = %s,
+            output = %s,
+            error_message = %s,
+            started_at = COALESCE(started_at, NOW()),
+            finished_at = clock_timestamp()
+        WHERE id = %s
+    """, (status, Json(output) if output is not None else None, error, task_id))
+
+
+def process(cursor, task, job):
+    """Expand and record one claimed task; returns (status, cards created)"""
+    if task['kind'] == 'send_email':
+        finish(cursor, task['id'], 'done', output={
+            'cards_created': 0,
+            'note': 'send_email tasks execute existing cards, no new cards created',
+        })
+        return 'done', 0
+
+    cards = expansion.expand_task(cursor, task, job)
+    if not cards:
+        finish(cursor, task['id'], 'error', error=expansion.ZERO_CARDS_ERROR)
+        return 'error', 0
+
+    rows = [
+        tuple(Json(card[c]) if c == 'action_payload' else card.get(c) for c in CARD_COLUMNS)
+        for card in ({**card, 'org_id': job['org_id'], 'tenant_id': job['tenant_id']} for card in cards)
+    ]
+    inserted = execute_values(cursor, f"""
+        INSERT INTO kanban_cards ({', '.join(CARD_COLUMNS)}) VALUES %s RETURNING id
+    """, rows, fetch=True)
+    finish(cursor, task['id'], 'done', output={
+        'cards_created': len(cards),
+        'card_ids': [str(r['id']) for r in inserted],
+        'worker': True,
+    })
+    return 'done', len(cards)
+
+
+class Worker(threading.Thread):
+    def __init__(self, name, url, kinds, stop, wake, idle, once, stats):
+        super().__init__(name=name, daemon=True)
+        self.url = url
+        self.kinds = kinds
+        self.stop = stop
+        self.wake = wake
+        self.idle = idle
+        self.once = once
+        self.stats = stats
+
+    def run(self):
+        # One bad iteration (lost connection, failed expansion, failed
+        # bookkeeping) must not end the thread; it is logged and the loop
+        # carries on, reconnecting first if the connection is unusable
+        conn = cursor = None
+        while not self.stop.is_set():
+            if conn is None:
+                conn = self._connect()
+                if conn is None:
+                    continue
+                cursor = conn.cursor()
+            task_id = None
+            try:
+                task, job = claim(cursor, self.kinds)
+                if task is None:
+                    conn.rollback()
+                    if self.once:
+                        break
+                    self.wake.wait(self.idle)
+                    self.wake.clear()
+                    continue
+                task_id = task['id']
+                started = time.perf_counter()
+                status, cards = process(cursor, task, job)
+                conn.commit()
+                self.stats[self.name][status] += 1
+                self.stats[self.name]['cards'] += cards
+                print(f"{self.name}: task {task_id} {task['kind']} (job {str(job['id'])[:8]} batch "
+                      f"{task['batch']}) → {status}, {cards} cards in {time.perf_counter() - started:.2f}s")
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                # The claim rolls back with the connection; the task stays pending
+                traceback.print_exc()
+                self._close(conn)
+                conn = cursor = None
+                self.stop.wait(self.idle)
+            except Exception as exc:
+                traceback.print_exc()
+                if not self._record_failure(conn, cursor, task_id, exc):
+                    self._close(conn)
+                    conn = cursor = None
+                if task_id is None:
+                    self.stop.wait(self.idle)     # failing before a claim: don't spin
+        self._close(conn)
+
+    def _connect(self):
+        try:
+            return connect(self.url)
+        except psycopg2.Error:
+            traceback.print_exc()
+            self.stop.wait(self.idle)
+            return None
+
+    @staticmethod
+    def _close(conn):
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _record_failure(self, conn, cursor, task_id, exc):
+        """Roll back and mark the claimed task as errored; False if the connection is unusable"""
+        try:
+            conn.rollback()
+            if task_id is not None:
+                finish(cursor, task_id, 'error', error=str(exc)[:1000])
+                conn.commit()
+        except psycopg2.Error:
+            traceback.print_exc()
+            return False
+        if task_id is not None:
+            self.stats[self.name]['error'] += 1
+            print(f"{self.name}: task {task_id} failed: {exc}")
+        return True
+
+
+class Waker(threading.Thread):
+    """Sets `wake` whenever job_progress announces a pending task"""
+
+    def __init__(self, url, stop, wake):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop = stop
+        self.wake = wake
+
+    def run(self):
+        conn = connect(self.url)
+        conn.autocommit = True
+        conn.cursor().execute('LISTEN job_progress')
+        while not self.stop.is_set():
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                event = json.loads(conn.notifies.pop(0).payload)
+                if event.get('t') == 'task' and event.get('to') == 'pending':
+                    self.wake.set()
+        conn.close()
+
+
+def run(args):
+    kinds = args.kinds.split(',')
+    banner(f"JOB TASK WORKERS x{args.workers} ({', '.join(kinds)})")
+    stop, wake = threading.Event(), threading.Event()
+    stats = {f"worker-{i}": Counter() for i in range(args.workers)}
+    workers = [
+        Worker(name, args.database_url, kinds, stop, wake, args.idle, args.once, stats)
+        for name in stats
+    ]
+    if not args.once:
+        Waker(args.database_url, stop, wake).start()
+    for w in workers:
+        w.start()
+    try:
+        while any(w.is_alive() for w in workers):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopping after in-flight tasks...")
+        stop.set()
+        wake.set()
+        for w in workers:
+            w.join()
+
+    print_table([dict(c, worker=name) for name, c in stats.items()], [
+        ('worker', 'worker'), ('done', 'done'), ('error', 'error'), ('cards', 'cards'),
+    ])
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('task-worker', help='Expand pending job_tasks with SKIP LOCKED queue workers')
+    parser.add_argument('--workers', type=int, default=4, help='Worker threads (each with its own connection)')
+    parser.add_argument('--kinds', default='draft_email,create_task,check_portal,send_email',
+                        help='Comma-separated task kinds to claim')
+    parser.add_argument('--idle', type=float, default=30.0,
+                        help='Seconds an idle worker waits for a notification before checking again')
+    parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+    parser.set_defaults(func=run)
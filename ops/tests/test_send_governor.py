@@ -0,0 +1,34 @@
+"""send-governor sizing: no bucket grants more than its hourly budget in any rolling hour"""
+import argparse
+
+import pytest
+
+from ops.send_governor import bucket_size, simulate
+
+
+def sim_args(**overrides):
+    args = dict(campaigns=1, recipients=500, rate=75, batch=25, mailbox_rate=100, tenant_rate=75,
+                executors=2, interval=10, hours=48, seed=1)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+@pytest.mark.parametrize('overrides', [
+    {'rate': 20, 'batch': 25},                       # batch larger than the hourly rate
+    {'rate': 75, 'batch': 25, 'executors': 8, 'interval': 1},
+    {'campaigns': 3, 'rate': 75, 'tenant_rate': 200},
+    {'campaigns': 3, 'rate': 40, 'batch': 50, 'tenant_rate': 60, 'interval': 15},
+])
+def test_busiest_hour_within_budget(overrides):
+    bucket_rows, _, _ = simulate(sim_args(**overrides))
+    for row in bucket_rows:
+        assert row['peak_hour'] <= row['budget'], row
+
+
+@pytest.mark.parametrize('per_hour, burst', [(1, 1), (2, 25), (20, 25), (75, 18.75), (100, 25)])
+def test_burst_plus_refill_within_budget(per_hour, burst):
+    capacity, refill = bucket_size(per_hour, burst)
+    assert capacity >= 1
+    assert refill > 0
+    # Whole sends only: one hour grants at most floor(capacity + refill)
+    assert int(capacity + refill) <= per_hour
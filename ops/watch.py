@@ -0,0 +1,265 @@
+"""Follow job progress live from job_progress notifications
+
+LISTENs on the job_progress channel (see 20260110010000_job_progress_notify.sql)
+and prints task status transitions, cards created per batch and task errors
+as they commit, keeping running counters per job. Between notifications the
+connection just waits in select(), so following a campaign puts no polling
+load on the database.
+
+Every payload carries the transaction timestamp; the newest one seen is the
+watermark. After a dropped connection the listener reconnects, LISTENs again
+and replays job_tasks / kanban_cards from CATCHUP_OVERLAP before the
+watermark, so nothing committed while it was away is missed - including
+longer transactions that started (and so are stamped) before the newest
+event seen. Transaction timestamps are not commit-ordered, so replayed card
+counts are keyed by (task, transaction timestamp) and matched against what
+was already counted rather than dropped by age.
+"""
+import json
+import select
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from ops.db import banner, connect, print_table
+
+CHANNEL = 'job_progress'
+
+# Replay reaches this far behind the watermark to pick up long transactions
+CATCHUP_OVERLAP = timedelta(minutes=2)
+
+CATCHUP_TASKS_SQL = """
+    SELECT id, job_id, tenant_id, batch, kind, status, error_message,
+           GREATEST(created_at, started_at, finished_at) AS at
+    FROM job_tasks
+    WHERE (created_at > %(since)s OR started_at > %(since)s OR finished_at > %(since)s)
+      AND (%(job_id)s::uuid IS NULL OR job_id = %(job_id)s::uuid)
+      AND (%(tenant_id)s::uuid IS NULL OR tenant_id = %(tenant_id)s::uuid)
+    ORDER BY at
+"""
+
+CATCHUP_CARDS_SQL = """
+    SELECT c.job_id, c.tenant_id, c.task_id, t.batch, COUNT(*) AS n, MAX(c.created_at) AS at
+    FROM kanban_cards c
+    LEFT JOIN job_tasks t ON t.id = c.task_id
+    WHERE c.job_id IS NOT NULL
+      AND c.created_at > %(since)s
+      AND (%(job_id)s::uuid IS NULL OR c.job_id = %(job_id)s::uuid)
+      AND (%(tenant_id)s::uuid IS NULL OR c.tenant_id = %(tenant_id)s::uuid)
+    GROUP BY c.job_id, c.tenant_id, c.task_id, t.batch, c.created_at
+    ORDER BY at
+"""
+
+
+def _parse_ts(value):
+    if isinstance(value, datetime):
+        return value
+    # json_build_object renders timestamptz as 2026-01-10T12:00:00.123456+00:00
+    return datetime.fromisoformat(value)
+
+
+class Progress:
+    """Running counters per job, fed by notifications and catch-up rows"""
+
+    def __init__(self, job_id=None, tenant_id=None):
+        self.job_id = job_id
+        self.tenant_id = tenant_id
+        self.watermark = None
+        self.task_status = {}                   # task id -> last status seen
+        self.tasks = defaultdict(Counter)       # job -> status counts
+        self.cards = defaultdict(Counter)       # job -> batch -> cards
+        self.errors = Counter()                 # job -> error transitions
+        # (task, transaction timestamp) -> cards counted / counted by replay
+        # but not yet seen as a notification; kept for the overlap window
+        self.counted_cards = {}
+        self.replayed_cards = {}
+
+    def wants(self, event):
+        return ((self.job_id is None or event['job'] == self.job_id) and
+                (self.tenant_id is None or event['tenant'] == self.tenant_id))
+
+    def apply(self, event, replay=False):
+        at = _parse_ts(event['at'])
+        if event['t'] == 'cards':
+            event = self._new_cards(event, at, replay)
+            if event is None:
+                return
+        if self.watermark is None or at > self.watermark:
+            self.watermark = at
+        if not self.wants(event):
+            return
+        job = event['job']
+        stamp = at.strftime('%H:%M:%S')
+        tag = ' (catch-up)' if replay else ''
+
+        if event['t'] == 'task':
+            known = self.task_status.get(event['id'])
+            if known == event['to']:
+                return                          # seen in catch-up already
+            if known:
+                self.tasks[job][known] -= 1
+            self.task_status[event['id']] = event['to']
+            self.tasks[job][event['to']] += 1
+            before = known or event.get('from')
+            arrow = f"{before} → {event['to']}" if before else f"new {event['to']}"
+            print(f"{stamp}  job {job[:8]} batch {event['batch']} task {event['id']} "
+                  f"{event['kind']}: {arrow}{tag}")
+            if event['to'] == 'error':
+                self.errors[job] += 1
+                print(f"{stamp}  ❌ {event.get('err') or 'no error message'}")
+        elif event['t'] == 'cards':
+            self.cards[job][event['batch']] += event['n']
+            print(f"{stamp}  job {job[:8]} batch {event['batch']}: +{event['n']} cards "
+                  f"({self.cards[job][event['batch']]} in batch){tag}")
+
+    def _new_cards(self, event, at, replay):
+        """The part of a cards event not counted yet, or None
+
+        A catch-up row is the total for its key; a notification is one
+        statement's share. Notifications queued while catch-up ran arrive
+        after it and are absorbed by what the replay already counted.
+        """
+        key = (str(event['task']), at)
+        counted = self.counted_cards.get(key, 0)
+        if replay:
+            fresh = event['n'] - counted
+            if fresh <= 0:
+                return None
+            self.counted_cards[key] = event['n']
+            self.replayed_cards[key] = self.replayed_cards.get(key, 0) + fresh
+            return {**event, 'n': fresh}
+        absorbed = self.replayed_cards.get(key, 0)
+        if absorbed >= event['n']:
+            self.replayed_cards[key] = absorbed - event['n']
+            return None
+        self.replayed_cards.pop(key, None)
+        self.counted_cards[key] = counted + event['n']
+        return event
+
+    def catchup_since(self, overlap=True):
+        """Start of the replay window; forgets card keys that fall before it"""
+        since = self.watermark - CATCHUP_OVERLAP if overlap else self.watermark
+        for seen in (self.counted_cards, self.replayed_cards):
+            for key in [k for k in seen if k[1] < since]:
+                del seen[key]
+        return since
+
+    def summary(self):
+        rows = []
+        for job in sorted(set(self.tasks) | set(self.cards)):
+            tasks = self.tasks[job]
+            rows.append({
+                'job': job,
+                'pending': tasks['pending'],
+                'running': tasks['running'],
+                'done': tasks['done'],
+                'error': tasks['error'],
+                'cards': sum(self.cards[job].values()),
+                'batches': len(self.cards[job]),
+            })
+        return rows
+
+
+def catch_up(cursor, progress, overlap=True):
+    params = {'since': progress.catchup_since(overlap), 'job_id': progress.job_id, 'tenant_id': progress.tenant_id}
+    cursor.execute(CATCHUP_TASKS_SQL, params)
+    tasks = cursor.fetchall()
+    cursor.execute(CATCHUP_CARDS_SQL, params)
+    cards = cursor.fetchall()
+    events = [{
+        't': 'task', 'at': r['at'], 'job': str(r['job_id']), 'tenant': str(r['tenant_id']),
+        'id': r['id'], 'batch': r['batch'], 'kind': r['kind'], 'from': None,
+        'to': r['status'], 'err': r['error_message'],
+    } for r in tasks] + [{
+        't': 'cards', 'at': r['at'], 'job': str(r['job_id']), 'tenant': str(r['tenant_id']),
+        'task': r['task_id'], 'batch': r['batch'], 'n': r['n'],
+    } for r in cards]
+    for event in sorted(events, key=lambda e: e['at']):
+        progress.apply(event, replay=True)
+    return len(events)
+
+
+def listen(url, progress, since=None):
+    """Connect, LISTEN, then replay from the watermark; LISTEN first so nothing falls in between"""
+    conn = connect(url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"LISTEN {CHANNEL}")
+    if progress.watermark is None:
+        cursor.execute("SELECT NOW() - %s::interval AS since", (since or '0 seconds',))
+        progress.watermark = cursor.fetchone()['since']
+        if since is None:
+            return conn
+        replayed = catch_up(cursor, progress, overlap=False)
+    else:
+        replayed = catch_up(cursor, progress)
+    if replayed:
+        print(f"   ↻ replayed {replayed} change(s) since {progress.watermark:%H:%M:%S}")
+    return conn
+
+
+def drain(conn, progress):
+    """Apply notifications psycopg2 already read, e.g. while running a query"""
+    while conn.notifies:
+        note = conn.notifies.pop(0)
+        progress.apply(json.loads(note.payload))
+
+
+def run(args):
+    banner("JOB PROGRESS (Ctrl-C to stop)")
+    progress = Progress(job_id=args.job, tenant_id=args.tenant)
+    conn = listen(args.database_url, progress, since=args.since)
+    print(f"👂 Listening on {CHANNEL}"
+          + (f" for job {args.job}" if args.job else '')
+          + (f" for tenant {args.tenant}" if args.tenant else ''))
+
+    delay = 1.0
+    try:
+        while True:
+            try:
+                # Queries (replay, heartbeat) can read notifications off the
+                # socket, and select() would not wake for those
+                drain(conn, progress)
+                if select.select([conn], [], [], args.heartbeat) == ([], [], []):
+                    # Idle: a cheap round trip notices a dead connection
+                    conn.cursor().execute('SELECT 1')
+                    drain(conn, progress)
+                    continue
+                conn.poll()
+                drain(conn, progress)
+                delay = 1.0
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as exc:
+                print(f"⚠️  Connection lost ({str(exc).strip() or type(exc).__name__}); reconnecting in {delay:.0f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, 60.0)
+                try:
+                    conn = listen(args.database_url, progress)
+                    print("✅ Reconnected")
+                except psycopg2.OperationalError:
+                    pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    print("\n📊 Totals while watching")
+    print_table(progress.summary(), [
+        ('job', 'job'), ('pending', 'pending'), ('running', 'running'), ('done', 'done'),
+        ('error', 'error'), ('cards', 'cards'), ('batches', 'batches'),
+    ])
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser('watch', help='Live job task/card progress via LISTEN/NOTIFY')
+    parser.add_argument('--job', help='Only show this job id')
+    parser.add_argument('--tenant', help='Only show this tenant id')
+    parser.add_argument('--since', help="Replay changes from this Postgres interval ago first, e.g. '15 minutes'")
+    parser.add_argument('--heartbeat', type=float, default=30.0,
+                        help='Seconds of silence before checking the connection is alive')
+    parser.set_defaults(func=run)
@@ -64,9 +64,9 @@ export async function GET(
       return NextResponse.json({ error: 'Job not found' }, { status: 404 });
     }
 
-    // Fetch metrics from materialized view
+    // Fetch metrics from the incrementally maintained metrics table
     const { data: metricsData, error: metricsError } = await supabase
-      .from('job_metrics')
+      .from('job_metrics_current')
       .select('*')
       .eq('job_id', id)
       .single();
@@ -11,7 +11,7 @@ import {
   handleApiError,
   successResponse,
 } from '@/lib/api-utils';
-import { resolveTargetSegment } from '@/lib/campaigns/audience-resolver';
+import { getAudienceCount, getAudienceSample } from '@/lib/campaigns/audience-resolver';
 import type { PreviewAudienceRequest } from '@/lib/campaigns/types';
 
 export async function POST(request: NextRequest) {
@@ -19,7 +19,7 @@ export async function POST(request: NextRequest) {
     const context = await getApiContext(request);
     await canManageCampaigns(context);
 
-    const { orgId } = context;
+    const { orgId, tenantId } = context;
     const body: PreviewAudienceRequest = await request.json();
 
     if (!body.target_segment) {
@@ -29,14 +29,12 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    // Resolve full audience
-    const recipients = await resolveTargetSegment(body.target_segment, orgId);
-
-    // Return count and first 5 as sample
-    const sample = recipients.slice(0, 5);
+    // Count and first 5 as sample, both answered from the segment index
+    const count = await getAudienceCount(body.target_segment, orgId, tenantId);
+    const sample = await getAudienceSample(body.target_segment, orgId, tenantId, 5);
 
     return successResponse({
-      count: recipients.length,
+      count,
       sample,
     });
   } catch (error) {
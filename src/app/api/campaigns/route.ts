@@ -16,6 +16,7 @@ import {
 } from '@/lib/api-utils';
 import type { CreateCampaignRequest } from '@/lib/campaigns/types';
 import { extractAndValidateTokens } from '@/lib/campaigns/merge-tokens';
+import { getCampaignListMetrics } from '@/lib/campaigns/metrics';
 
 // =====================================================
 // GET - List Campaigns
@@ -48,8 +49,22 @@ export async function GET(request: NextRequest) {
 
     if (error) throw error;
 
+    // Recipient counts from the per-campaign rollups (one read per page)
+    const metrics = await getCampaignListMetrics(
+      (campaigns || []).map((c) => c.id),
+      orgId
+    );
+    const withCounts = (campaigns || []).map((c) => ({
+      ...c,
+      _count: {
+        sent: metrics[c.id]?.sent || 0,
+        replied: metrics[c.id]?.replied || 0,
+        pending: metrics[c.id]?.pending || 0,
+      },
+    }));
+
     return successResponse(
-      buildPaginatedResponse(campaigns || [], count || 0, pagination)
+      buildPaginatedResponse(withCounts, count || 0, pagination)
     );
   } catch (error) {
     return handleApiError(error);
@@ -5,10 +5,14 @@
  * Schedule: "0 * * * *" (every hour at minute 0)
  *
  * Authentication: Requires CRON_SECRET header
+ *
+ * With ?tenant=<id> only that tenant's cycle runs (optional &timeout=<ms>,
+ * &holder=<lock holder>). `python -m ops fleet` uses this to drive tenant
+ * cycles through a bounded worker pool.
  */
 
 import { NextRequest, NextResponse } from 'next/server';
-import { executeAllTenantCycles } from '@/lib/agent/autonomous-cycle';
+import { executeAllTenantCycles, executeAutonomousCycle } from '@/lib/agent/autonomous-cycle';
 import { cleanupExpiredLocks } from '@/lib/agent/tenant-lock';
 import { isAgentGloballyEnabled } from '@/lib/agent/agent-config';
 
@@ -66,6 +70,22 @@ async function handleCron(request: NextRequest) {
       console.log(`[AgentCron] Cleaned up ${cleanedLocks} expired locks`);
     }
 
+    // Single-tenant cycle (fleet scheduler)
+    const tenantId = request.nextUrl.searchParams.get('tenant');
+    if (tenantId) {
+      const timeout = Number(request.nextUrl.searchParams.get('timeout')) || 270 * 1000;
+      const result = await executeAutonomousCycle(tenantId, {
+        timeout: Math.min(timeout, (maxDuration - 10) * 1000),
+        lockHolder: request.nextUrl.searchParams.get('holder') || 'agent-cron',
+      });
+
+      return NextResponse.json({
+        ...result,
+        duration: Date.now() - startTime,
+        cleanedLocks,
+      });
+    }
+
     // Execute cycles for all enabled tenants
     // Note: With Vercel's 5-minute limit, we process a limited number
     const results = await executeAllTenantCycles({
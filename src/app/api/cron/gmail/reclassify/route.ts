@@ -0,0 +1,131 @@
+/**
+ * Gmail Reclassification Endpoint
+ *
+ * Runs classifyEmail (rules, then Claude) over stored gmail_messages and
+ * writes the new category back. Used by `python -m ops reclassify --llm`,
+ * which decides rule matches itself and only sends the messages its
+ * pre-classifier could not settle.
+ *
+ * Body: { orgId: string, messageIds: string[] } (gmail_messages.id, max 50)
+ *
+ * Authentication: Requires CRON_SECRET header
+ */
+
+import { NextRequest, NextResponse } from 'next/server';
+import { createServiceRoleClient } from '@/lib/supabase/server';
+import { classifyEmail } from '@/lib/agent/email-classifier';
+import type { GmailMessage } from '@/lib/gmail/gmail-service';
+
+export const runtime = 'nodejs';
+export const maxDuration = 300; // 5 minutes max (Vercel limit)
+
+const MAX_MESSAGES = 50;
+
+export async function POST(request: NextRequest) {
+  const startTime = Date.now();
+
+  // Verify cron secret
+  const authHeader = request.headers.get('authorization');
+  const cronSecret = process.env.CRON_SECRET;
+
+  if (!cronSecret || cronSecret.length < 32) {
+    console.error('[GmailReclassify] CRON_SECRET not configured or too short (min 32 chars)');
+    return NextResponse.json(
+      { error: 'Cron not configured' },
+      { status: 500 }
+    );
+  }
+
+  if (authHeader !== `Bearer ${cronSecret}`) {
+    console.error('[GmailReclassify] Invalid cron secret');
+    return NextResponse.json(
+      { error: 'Unauthorized' },
+      { status: 401 }
+    );
+  }
+
+  const body = await request.json().catch(() => null);
+  const orgId: string | undefined = body?.orgId;
+  const messageIds: string[] = Array.isArray(body?.messageIds) ? body.messageIds : [];
+
+  if (!orgId || messageIds.length === 0 || messageIds.length > MAX_MESSAGES) {
+    return NextResponse.json(
+      { error: `orgId and 1-${MAX_MESSAGES} messageIds are required` },
+      { status: 400 }
+    );
+  }
+
+  const supabase = createServiceRoleClient();
+
+  const { data: rows, error } = await supabase
+    .from('gmail_messages')
+    .select('*')
+    .eq('org_id', orgId)
+    .in('id', messageIds);
+
+  if (error) {
+    console.error('[GmailReclassify] Failed to load messages:', error);
+    return NextResponse.json({ error: error.message }, { status: 500 });
+  }
+
+  const results: Array<{ id: string; category?: string; confidence?: number; error?: string }> = [];
+
+  for (const row of rows || []) {
+    const message: GmailMessage = {
+      id: row.gmail_message_id,
+      threadId: row.gmail_thread_id,
+      from: { email: row.from_email, name: row.from_name || undefined },
+      to: row.to_email || [],
+      cc: row.cc_email || undefined,
+      bcc: row.bcc_email || undefined,
+      replyTo: row.reply_to || undefined,
+      subject: row.subject || '',
+      bodyText: row.body_text || undefined,
+      bodyHtml: row.body_html || undefined,
+      snippet: row.snippet || '',
+      receivedAt: new Date(row.received_at),
+      labels: row.labels || [],
+      hasAttachments: row.has_attachments || false,
+      attachments: row.attachments || [],
+    };
+
+    try {
+      const classification = await classifyEmail(message, {
+        orgId,
+        isCampaignReply: row.is_reply_to_campaign || false,
+      });
+
+      const { error: updateError } = await supabase
+        .from('gmail_messages')
+        .update({
+          category: classification.category,
+          confidence: classification.confidence,
+          intent: {
+            description: classification.intent,
+            entities: classification.entities,
+            reasoning: classification.reasoning,
+          },
+        })
+        .eq('id', row.id);
+
+      if (updateError) throw new Error(updateError.message);
+
+      results.push({ id: row.id, category: classification.category, confidence: classification.confidence });
+    } catch (err) {
+      console.error(`[GmailReclassify] Failed to reclassify ${row.id}:`, err);
+      results.push({ id: row.id, error: (err as Error).message });
+    }
+  }
+
+  const failed = results.filter((r) => r.error).length;
+  console.log(`[GmailReclassify] ${results.length - failed}/${messageIds.length} reclassified in ${Date.now() - startTime}ms`);
+
+  return NextResponse.json({
+    success: failed === 0,
+    classified: results.length - failed,
+    failed,
+    missing: messageIds.length - results.length,
+    results,
+    duration: Date.now() - startTime,
+  });
+}
@@ -15,7 +15,7 @@ export async function POST(request: NextRequest) {
     // Get org_id from user profile
     const { data: profile } = await supabase
       .from('profiles')
-      .select('id')
+      .select('id, tenant_id')
       .eq('id', user.id)
       .single();
 
@@ -23,6 +23,10 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ error: 'Profile not found' }, { status: 404 });
     }
 
+    if (!profile.tenant_id) {
+      return NextResponse.json({ error: 'User has no tenant_id assigned' }, { status: 403 });
+    }
+
     const orgId = profile.id;
 
     const filter: AudienceFilter = await request.json();
@@ -36,7 +40,7 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    const size = await getAudienceSize(orgId, filter);
+    const size = await getAudienceSize(orgId, profile.tenant_id, filter);
 
     return NextResponse.json({ size, filter });
   } catch (error: any) {
@@ -0,0 +1,216 @@
+/**
+ * RAG Incremental Indexing Tests
+ *
+ * Tests for content-hash based re-indexing:
+ * - Deterministic hash embedder
+ * - Only new or changed records are embedded and upserted
+ * - Records that disappear are deleted (windowed sources: only once the
+ *   source row is gone)
+ * - Switching embedder model re-embeds
+ */
+
+import { describe, it, expect, vi } from 'vitest';
+import { syncIndex, createHashEmbedder, contentHash, type Embedder, type IndexRecord } from '../rag';
+
+vi.mock('@/lib/supabase/server', () => ({
+  createClient: vi.fn(),
+}));
+
+// ============================================================================
+// MOCK SETUP
+// ============================================================================
+
+/**
+ * In-memory embeddings_index (plus any source tables) supporting the query
+ * shapes syncIndex uses
+ */
+function createFakeSupabase(rows: any[] = [], sources: Record<string, any[]> = {}) {
+  const calls = { upserts: [] as any[][], deletes: [] as string[][] };
+
+  const from = (table: string = 'embeddings_index') => {
+    const tableRows = table === 'embeddings_index' ? rows : sources[table] || [];
+    const filters: Array<(row: any) => boolean> = [];
+    let mode: 'select' | 'delete' = 'select';
+    let range: [number, number] | null = null;
+    let deleteIds: string[] = [];
+
+    const builder: any = {
+      select: () => builder,
+      order: () => builder,
+      eq: (column: string, value: any) => {
+        filters.push(row => row[column] === value);
+        return builder;
+      },
+      not: (column: string) => {
+        filters.push(row => row[column] != null);
+        return builder;
+      },
+      in: (column: string, values: any[]) => {
+        deleteIds = values;
+        filters.push(row => values.includes(row[column]));
+        return builder;
+      },
+      range: (start: number, end: number) => {
+        range = [start, end];
+        return builder;
+      },
+      delete: () => {
+        mode = 'delete';
+        return builder;
+      },
+      upsert: async (batch: any[]) => {
+        calls.upserts.push(batch);
+        for (const record of batch) {
+          const i = rows.findIndex(
+            r => r.org_id === record.org_id && r.source === record.source && r.source_id === record.source_id
+          );
+          if (i >= 0) rows[i] = record;
+          else rows.push(record);
+        }
+        return { error: null };
+      },
+      then: (resolve: (value: any) => void) => {
+        const matched = tableRows.filter(row => filters.every(f => f(row)));
+        if (mode === 'delete') {
+          calls.deletes.push(deleteIds);
+          for (const row of matched) rows.splice(rows.indexOf(row), 1);
+          resolve({ error: null });
+        } else {
+          resolve({ data: range ? matched.slice(range[0], range[1] + 1) : matched, error: null });
+        }
+      },
+    };
+    return builder;
+  };
+
+  return { from, calls, rows };
+}
+
+function countingEmbedder(model: string = 'hash-8'): Embedder & { embedded: string[] } {
+  const inner = createHashEmbedder(8);
+  const embedded: string[] = [];
+  return {
+    model,
+    embedded,
+    async embedMany(values: string[]) {
+      embedded.push(...values);
+      return inner.embedMany(values);
+    },
+  };
+}
+
+const records: IndexRecord[] = [
+  { sourceId: 'c1', title: 'Client: Acme', content: 'Acme Lending, net 30', metadata: { clientId: 'c1' } },
+  { sourceId: 'c2', title: 'Client: Birch', content: 'Birch Capital, net 15', metadata: { clientId: 'c2' } },
+  { sourceId: 'c3', title: 'Client: Cedar', content: 'Cedar AMC, net 45', metadata: { clientId: 'c3' } },
+];
+
+// ============================================================================
+// HASH EMBEDDER
+// ============================================================================
+
+describe('createHashEmbedder', () => {
+  it('should return identical vectors for identical text', async () => {
+    const embedder = createHashEmbedder(64);
+    const [a, b] = await embedder.embedMany(['appraisal order due', 'appraisal order due']);
+
+    expect(a).toEqual(b);
+    expect(a).toHaveLength(64);
+  });
+
+  it('should return unit-length vectors', async () => {
+    const [vector] = await createHashEmbedder(64).embedMany(['net 30 payment terms']);
+    const norm = Math.sqrt(vector.reduce((sum, v) => sum + v * v, 0));
+
+    expect(norm).toBeCloseTo(1, 6);
+  });
+});
+
+// ============================================================================
+// INCREMENTAL SYNC
+// ============================================================================
+
+describe('syncIndex', () => {
+  it('should embed every record on the first pass', async () => {
+    const supabase = createFakeSupabase();
+    const embedder = countingEmbedder();
+
+    const result = await syncIndex(supabase, 'org-1', 'client_data', records, embedder);
+
+    expect(result).toEqual({ added: 3, updated: 0, unchanged: 0, deleted: 0 });
+    expect(embedder.embedded).toHaveLength(3);
+    expect(supabase.rows).toHaveLength(3);
+  });
+
+  it('should not embed or write unchanged records', async () => {
+    const supabase = createFakeSupabase();
+    await syncIndex(supabase, 'org-1', 'client_data', records, countingEmbedder());
+    supabase.calls.upserts.length = 0;
+
+    const embedder = countingEmbedder();
+    const result = await syncIndex(supabase, 'org-1', 'client_data', records, embedder);
+
+    expect(result).toEqual({ added: 0, updated: 0, unchanged: 3, deleted: 0 });
+    expect(embedder.embedded).toHaveLength(0);
+    expect(supabase.calls.upserts).toHaveLength(0);
+  });
+
+  it('should re-embed changed records and delete missing ones', async () => {
+    const supabase = createFakeSupabase();
+    await syncIndex(supabase, 'org-1', 'client_data', records, countingEmbedder());
+
+    const embedder = countingEmbedder();
+    const next = [
+      records[0],
+      { ...records[1], content: 'Birch Capital, net 60' },
+    ];
+    const result = await syncIndex(supabase, 'org-1', 'client_data', next, embedder);
+
+    expect(result).toEqual({ added: 0, updated: 1, unchanged: 1, deleted: 1 });
+    expect(embedder.embedded).toEqual(['Birch Capital, net 60']);
+    expect(supabase.calls.deletes).toEqual([['c3']]);
+    expect(supabase.rows.map(r => r.source_id).sort()).toEqual(['c1', 'c2']);
+  });
+
+  it('should keep windowed records whose source row still exists', async () => {
+    const supabase = createFakeSupabase([], { activities: [{ id: 'c1' }, { id: 'c2' }] });
+    await syncIndex(supabase, 'org-1', 'activity', records, countingEmbedder());
+
+    // Only c1 is in the newest window now; c2 is older, c3 was deleted
+    const result = await syncIndex(supabase, 'org-1', 'activity', [records[0]], countingEmbedder(), 'activities');
+
+    expect(result.deleted).toBe(1);
+    expect(supabase.calls.deletes).toEqual([['c3']]);
+    expect(supabase.rows.map(r => r.source_id).sort()).toEqual(['c1', 'c2']);
+  });
+
+  it('should leave other orgs and sources alone', async () => {
+    const supabase = createFakeSupabase([
+      { org_id: 'org-2', source: 'client_data', source_id: 'x1', content_hash: 'h' },
+      { org_id: 'org-1', source: 'activity', source_id: 'a1', content_hash: 'h' },
+    ]);
+
+    const result = await syncIndex(supabase, 'org-1', 'client_data', [], countingEmbedder());
+
+    expect(result.deleted).toBe(0);
+    expect(supabase.rows).toHaveLength(2);
+  });
+
+  it('should re-embed everything when the embedder model changes', async () => {
+    const supabase = createFakeSupabase();
+    await syncIndex(supabase, 'org-1', 'client_data', records, countingEmbedder('model-a'));
+
+    const embedder = countingEmbedder('model-b');
+    const result = await syncIndex(supabase, 'org-1', 'client_data', records, embedder);
+
+    expect(result.updated).toBe(3);
+    expect(embedder.embedded).toHaveLength(3);
+  });
+});
+
+describe('contentHash', () => {
+  it('should change when metadata changes', () => {
+    expect(contentHash('m', 't', 'c', { a: 1 })).not.toBe(contentHash('m', 't', 'c', { a: 2 }));
+    expect(contentHash('m', 't', 'c', { a: 1 })).toBe(contentHash('m', 't', 'c', { a: 1 }));
+  });
+});
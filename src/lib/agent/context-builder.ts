@@ -1,6 +1,7 @@
 import { createClient } from '@/lib/supabase/server';
 import { Client, Order, Deal, Goal, Activity, Contact, Case } from '@/lib/types';
 import { calculateGoalProgress } from '@/hooks/use-goals';
+import { ContextRows, loadContextSnapshot } from './context-snapshot';
 
 export interface AgentContext {
   goals: Array<{
@@ -70,30 +71,6 @@ export async function buildContext(orgId: string): Promise<AgentContext> {
 
   if (goalsError) throw goalsError;
 
-  // Fetch clients with relationships - MUST filter by tenant_id for multi-tenant isolation
-  const { data: clientsData, error: clientsError } = await supabase
-    .from('clients')
-    .select(`
-      *,
-      contacts:contacts!contacts_client_id_fkey(*),
-      orders:orders(*)
-    `)
-    .eq('tenant_id', tenantId)
-    .eq('is_active', true);
-
-  if (clientsError) throw clientsError;
-
-  console.log(`[Context] Found ${clientsData?.length || 0} clients for tenant ${tenantId}`);
-
-  // Fetch orders for goal calculations (up to 3000 most recent)
-  const { data: ordersData, error: ordersError } = await supabase
-    .from('orders')
-    .select('*')
-    .order('ordered_date', { ascending: false })
-    .limit(3000);
-
-  if (ordersError) throw ordersError;
-
   // Fetch recent activities for signal extraction
   const { data: activitiesData, error: activitiesError } = await supabase
     .from('activities')
@@ -111,27 +88,19 @@ export async function buildContext(orgId: string): Promise<AgentContext> {
 
   if (dealsError) throw dealsError;
 
-  // Fetch properties (with pagination for large datasets)
-  let allProperties: any[] = [];
-  let page = 0;
-  const pageSize = 1000;
-
-  while (true) {
-    const { data: propertiesPage, error: propertiesError } = await supabase
-      .from('properties')
-      .select('*')
-      .order('created_at', { ascending: false })
-      .range(page * pageSize, (page + 1) * pageSize - 1);
-
-    if (propertiesError) throw propertiesError;
-
-    if (!propertiesPage || propertiesPage.length === 0) break;
-
-    allProperties = allProperties.concat(propertiesPage);
-
-    if (propertiesPage.length < pageSize) break; // Last page
-    page++;
-  }
+  // Clients (with contacts and orders), orders and properties come from the
+  // tenant's context snapshot plus rows changed since it was refreshed; the
+  // full live queries are only used when there is no usable snapshot
+  const contextRows =
+    (await loadContextSnapshot(supabase, tenantId)) || (await fetchLiveContextRows(supabase, tenantId));
+  const clientsData = contextRows.clients;
+  const ordersData = contextRows.orders.slice(0, 3000);
+  const allProperties = contextRows.properties;
+
+  console.log(
+    `[Context] Found ${clientsData.length} clients for tenant ${tenantId} ` +
+    `(${contextRows.source}${contextRows.source === 'snapshot' ? `, ${contextRows.deltaRows} changed rows` : ''})`
+  );
 
   // Fetch cases (up to 1000 most recent)
   const { data: casesData, error: casesError } = await supabase
@@ -270,6 +239,63 @@ export async function buildContext(orgId: string): Promise<AgentContext> {
   };
 }
 
+/**
+ * Fetch clients, orders and properties directly (no context snapshot)
+ */
+async function fetchLiveContextRows(supabase: any, tenantId: string): Promise<ContextRows> {
+  // Fetch clients with relationships - MUST filter by tenant_id for multi-tenant isolation
+  const { data: clientsData, error: clientsError } = await supabase
+    .from('clients')
+    .select(`
+      *,
+      contacts:contacts!contacts_client_id_fkey(*),
+      orders:orders(*)
+    `)
+    .eq('tenant_id', tenantId)
+    .eq('is_active', true);
+
+  if (clientsError) throw clientsError;
+
+  // Fetch orders for goal calculations (up to 3000 most recent)
+  const { data: ordersData, error: ordersError } = await supabase
+    .from('orders')
+    .select('*')
+    .order('ordered_date', { ascending: false })
+    .limit(3000);
+
+  if (ordersError) throw ordersError;
+
+  // Fetch properties (with pagination for large datasets)
+  let allProperties: any[] = [];
+  let page = 0;
+  const pageSize = 1000;
+
+  while (true) {
+    const { data: propertiesPage, error: propertiesError } = await supabase
+      .from('properties')
+      .select('*')
+      .order('created_at', { ascending: false })
+      .range(page * pageSize, (page + 1) * pageSize - 1);
+
+    if (propertiesError) throw propertiesError;
+
+    if (!propertiesPage || propertiesPage.length === 0) break;
+
+    allProperties = allProperties.concat(propertiesPage);
+
+    if (propertiesPage.length < pageSize) break; // Last page
+    page++;
+  }
+
+  return {
+    clients: clientsData || [],
+    orders: ordersData || [],
+    properties: allProperties,
+    source: 'live',
+    deltaRows: 0,
+  };
+}
+
 /**
  * Calculate pressure score based on progress vs time elapsed
  * Returns 0-1, where 1 = maximum pressure (far behind schedule)
@@ -0,0 +1,169 @@
+/**
+ * Per-tenant context snapshots
+ *
+ * `python -m ops context-snapshot refresh` keeps a columnar copy of the
+ * tenant's clients, contacts, orders and properties in
+ * agent_context_snapshots. Loading one costs a single row read plus, per
+ * section, the rows whose updated_at moved past the snapshot's watermark,
+ * so a run's context cost follows what changed, not how big the tenant is.
+ */
+
+type SectionName = 'clients' | 'contacts' | 'orders' | 'properties';
+
+const SECTIONS: SectionName[] = ['clients', 'contacts', 'orders', 'properties'];
+
+// Deletes only reach the snapshot on refresh; past this age use live queries
+const MAX_SNAPSHOT_AGE_MS = 6 * 60 * 60 * 1000;
+
+// Delta rows are read in keyset pages under PostgREST's row cap; a delta
+// larger than MAX_DELTA_ROWS means the snapshot is too far behind to merge
+const DELTA_PAGE_SIZE = 1000;
+const MAX_DELTA_ROWS = 20000;
+
+// Re-read this far behind each watermark, like the refresher's --overlap,
+// so rows committed late with an earlier updated_at are not missed
+const DELTA_OVERLAP_MS = 300 * 1000;
+
+interface SnapshotSection {
+  columns: string[];
+  rows: Record<string, unknown[]>;
+}
+
+export interface ContextRows {
+  clients: any[]; // active clients with nested contacts and orders
+  orders: any[]; // newest first
+  properties: any[]; // newest first
+  source: 'snapshot' | 'live';
+  deltaRows: number;
+}
+
+function materialize(section: SnapshotSection): Map<string, any> {
+  const rows = new Map<string, any>();
+  for (const [id, values] of Object.entries(section.rows)) {
+    const row: Record<string, unknown> = {};
+    section.columns.forEach((column, i) => {
+      row[column] = values[i];
+    });
+    rows.set(id, row);
+  }
+  return rows;
+}
+
+function byDateDesc(column: string) {
+  return (a: any, b: any) => new Date(b[column] || 0).getTime() - new Date(a[column] || 0).getTime();
+}
+
+/**
+ * Rows of one section changed since the watermark (less DELTA_OVERLAP_MS),
+ * paged on (updated_at, id) and deduplicated by id.
+ * Returns null when the delta is larger than MAX_DELTA_ROWS.
+ */
+async function fetchDelta(
+  supabase: any,
+  name: SectionName,
+  tenantId: string,
+  watermark: string | null
+): Promise<any[] | null> {
+  const changed = new Map<string, any>();
+  let after: { at: string; id: string } | null = null;
+
+  for (;;) {
+    let query = supabase
+      .from(name)
+      .select('*')
+      .eq('tenant_id', tenantId)
+      .order('updated_at', { ascending: true })
+      .order('id', { ascending: true })
+      .limit(DELTA_PAGE_SIZE);
+    if (after) {
+      query = query.or(`updated_at.gt."${after.at}",and(updated_at.eq."${after.at}",id.gt."${after.id}")`);
+    } else if (watermark) {
+      const since = new Date(new Date(watermark).getTime() - DELTA_OVERLAP_MS).toISOString();
+      query = query.gte('updated_at', since);
+    }
+
+    const { data, error } = await query;
+    if (error) throw error;
+
+    const page = data || [];
+    for (const row of page) {
+      changed.set(String(row.id), row);
+    }
+    if (changed.size > MAX_DELTA_ROWS) return null;
+    if (page.length < DELTA_PAGE_SIZE) return Array.from(changed.values());
+
+    const last = page[page.length - 1];
+    after = { at: last.updated_at, id: String(last.id) };
+  }
+}
+
+/**
+ * Load the tenant's snapshot merged with rows changed since it was taken.
+ * Returns null when there is no usable snapshot.
+ */
+export async function loadContextSnapshot(supabase: any, tenantId: string): Promise<ContextRows | null> {
+  const { data: snapshot, error } = await supabase
+    .from('agent_context_snapshots')
+    .select('sections, watermarks, refreshed_at')
+    .eq('tenant_id', tenantId)
+    .maybeSingle();
+
+  if (error || !snapshot) return null;
+  if (Date.now() - new Date(snapshot.refreshed_at).getTime() > MAX_SNAPSHOT_AGE_MS) return null;
+  if (SECTIONS.some(name => !snapshot.sections?.[name] || !snapshot.watermarks?.[name])) return null;
+
+  const tables = {} as Record<SectionName, Map<string, any>>;
+  let deltaRows = 0;
+
+  let tooFarBehind = false;
+
+  await Promise.all(SECTIONS.map(async (name) => {
+    const changed = await fetchDelta(supabase, name, tenantId, snapshot.watermarks[name].at);
+    if (!changed) {
+      tooFarBehind = true;
+      return;
+    }
+
+    const rows = materialize(snapshot.sections[name]);
+    for (const row of changed) {
+      rows.set(String(row.id), row);
+    }
+    deltaRows += changed.length;
+    tables[name] = rows;
+  }));
+
+  if (tooFarBehind) return null;
+
+  const contactsByClient = new Map<string, any[]>();
+  for (const contact of tables.contacts.values()) {
+    if (!contact.client_id) continue;
+    const list = contactsByClient.get(contact.client_id) || [];
+    list.push(contact);
+    contactsByClient.set(contact.client_id, list);
+  }
+
+  const orders = Array.from(tables.orders.values()).sort(byDateDesc('ordered_date'));
+  const ordersByClient = new Map<string, any[]>();
+  for (const order of orders) {
+    if (!order.client_id) continue;
+    const list = ordersByClient.get(order.client_id) || [];
+    list.push(order);
+    ordersByClient.set(order.client_id, list);
+  }
+
+  const clients = Array.from(tables.clients.values())
+    .filter(client => client.is_active)
+    .map(client => ({
+      ...client,
+      contacts: contactsByClient.get(client.id) || [],
+      orders: ordersByClient.get(client.id) || [],
+    }));
+
+  return {
+    clients,
+    orders,
+    properties: Array.from(tables.properties.values()).sort(byDateDesc('created_at')),
+    source: 'snapshot',
+    deltaRows,
+  };
+}
@@ -4,6 +4,7 @@ import { generatePlan, validatePlan, ProposedAction } from './planner';
 import { executeCard, ExecutionResult } from './executor';
 import { planNextBatch, expandTaskToCards } from './job-planner';
 import { promoteScheduledCards } from './scheduler';
+import { captureEvents, EVENT_TYPES, EVENT_SOURCES, WarehouseEvent } from './warehouse-writer';
 import { Job, JobTask } from '@/types/jobs';
 
 /**
@@ -176,6 +177,44 @@ export interface AgentRun {
   errors: any[];
 }
 
+/**
+ * Run one work-block phase and record its timing as a warehouse event.
+ * Events are buffered in `phases` and flushed in one insert by the caller.
+ */
+async function timePhase<T>(
+  phases: WarehouseEvent[],
+  runId: string,
+  phase: string,
+  fn: () => Promise<T>
+): Promise<T> {
+  const started = Date.now();
+  let ok = false;
+  try {
+    const result = await fn();
+    ok = true;
+    return result;
+  } finally {
+    phases.push({
+      eventType: EVENT_TYPES.RUN_PHASE,
+      eventSource: EVENT_SOURCES.WORK_BLOCK,
+      sourceId: runId,
+      runId,
+      payload: {
+        phase,
+        started_at: new Date(started).toISOString(),
+        duration_ms: Date.now() - started,
+        ok,
+      },
+    });
+  }
+}
+
+function flushPhases(tenantId: string, runId: string, phases: WarehouseEvent[]): void {
+  captureEvents(tenantId, phases).catch(err => {
+    console.error(`[${runId}] Failed to record phase timings:`, err);
+  });
+}
+
 /**
  * Main orchestrator: Run a complete work block
  */
@@ -227,30 +266,37 @@ export async function runWorkBlock(orgId: string, mode: 'auto' | 'review' = 'rev
   }
 
   const errors: any[] = [];
+  const phases: WarehouseEvent[] = [];
   let executedCount = 0;
 
   try {
     // Step 0: Promote scheduled cards that are now due
     console.log(`[${run.id}] Promoting scheduled cards...`);
-    const promotedCount = await promoteScheduledCards(tenantId);
+    const promotedCount = await timePhase(phases, run.id, 'promote_scheduled', () =>
+      promoteScheduledCards(tenantId)
+    );
     if (promotedCount > 0) {
       console.log(`[${run.id}] Promoted ${promotedCount} scheduled cards to suggested`);
     }
 
     // Step 1: Execute approved cards first
     console.log(`[${run.id}] Checking for approved cards to execute...`);
-    const approvedResults = await executeApprovedCards(orgId);
+    const approvedResults = await timePhase(phases, run.id, 'execution', () =>
+      executeApprovedCards(orgId)
+    );
     executedCount = approvedResults.filter(r => r.success).length;
     console.log(`[${run.id}] Executed ${executedCount} of ${approvedResults.length} approved cards`);
 
     // Step 2: Process active jobs (generate next batch of tasks/cards)
     console.log(`[${run.id}] Processing active jobs...`);
-    const jobCardsCreated = await processActiveJobs(orgId, run.id);
+    const jobCardsCreated = await timePhase(phases, run.id, 'job_processing', () =>
+      processActiveJobs(orgId, run.id)
+    );
     console.log(`[${run.id}] Created ${jobCardsCreated} cards from jobs`);
 
     // Step 3: Build context
     console.log(`[${run.id}] Building context for org ${orgId}...`);
-    const context = await buildContext(orgId);
+    const context = await timePhase(phases, run.id, 'context', () => buildContext(orgId));
 
     // Calculate average goal pressure
     const avgGoalPressure = context.goals.length > 0
@@ -259,7 +305,7 @@ export async function runWorkBlock(orgId: string, mode: 'auto' | 'review' = 'rev
 
     // Step 4: Generate plan
     console.log(`[${run.id}] Generating plan...`);
-    const plan = await generatePlan(context);
+    const plan = await timePhase(phases, run.id, 'planning', () => generatePlan(context));
 
     // Step 5: Validate plan
     console.log(`[${run.id}] Validating plan...`);
@@ -279,7 +325,9 @@ export async function runWorkBlock(orgId: string, mode: 'auto' | 'review' = 'rev
 
     // Step 6: Create kanban cards
     console.log(`[${run.id}] Creating ${plan.actions.length} kanban cards...`);
-    const cards = await createKanbanCards(orgId, tenantId, run.id, plan.actions);
+    const cards = await timePhase(phases, run.id, 'card_insert', () =>
+      createKanbanCards(orgId, tenantId, run.id, plan.actions)
+    );
 
     // Step 7: Update run with results
     const emailsSent = approvedResults.filter(r => r.success && r.metadata?.simulated === false).length;
@@ -297,10 +345,17 @@ export async function runWorkBlock(orgId: string, mode: 'auto' | 'review' = 'rev
       })
       .eq('id', run.id);
 
+    flushPhases(tenantId, run.id, phases);
+
     // Step 8: Create reflection (async, don't wait)
-    createReflection(run.id, context, plan, validation).catch(err => {
-      console.error(`[${run.id}] Failed to create reflection:`, err);
-    });
+    const reflectionPhases: WarehouseEvent[] = [];
+    timePhase(reflectionPhases, run.id, 'reflection', () =>
+      createReflection(run.id, context, plan, validation)
+    )
+      .catch(err => {
+        console.error(`[${run.id}] Failed to create reflection:`, err);
+      })
+      .finally(() => flushPhases(tenantId, run.id, reflectionPhases));
 
     console.log(`[${run.id}] Work block completed. Executed ${executedCount} approved cards, created ${cards.length} new cards.`);
 
@@ -327,6 +382,8 @@ export async function runWorkBlock(orgId: string, mode: 'auto' | 'review' = 'rev
       })
       .eq('id', run.id);
 
+    flushPhases(tenantId, run.id, phases);
+
     throw error;
   }
 }
@@ -709,14 +766,22 @@ async function processActiveJobs(orgId: string, runId: string): Promise<number>
 
       const currentBatch = latestTask?.batch || 0;
 
-      // Get pending tasks in current batch
+      // Get pending tasks up to the current batch (the retry sweep can
+      // re-queue a failed task from an earlier batch)
       const { data: pendingTasksData } = await supabase
         .from('job_tasks')
         .select('*')
         .eq('job_id', job.id)
-        .eq('batch', currentBatch)
+        .lte('batch', currentBatch)
         .in('status', ['pending', 'running']);
 
+      // Jobs handed to the task workers (python -m ops task-worker) are only
+      // planned here; the workers claim and expand their tasks.
+      if (job.params?.task_worker && pendingTasksData && pendingTasksData.length > 0) {
+        console.log(`[Jobs] Job ${job.name} has ${pendingTasksData.length} pending tasks in batch ${currentBatch}, left to task workers`);
+        continue;
+      }
+
       // Process pending tasks in current batch
       if (pendingTasksData && pendingTasksData.length > 0) {
         console.log(`[Jobs] Job ${job.name} has ${pendingTasksData.length} pending tasks in batch ${currentBatch}, processing them...`);
@@ -851,6 +916,11 @@ async function processActiveJobs(orgId: string, runId: string): Promise<number>
         continue;
       }
 
+      if (job.params?.task_worker) {
+        console.log(`[Jobs] Queued batch ${batch_number} of job ${job.name} for task workers`);
+        continue;
+      }
+
       // Expand each task to cards
       for (const task of (createdTasks as JobTask[])) {
         try {
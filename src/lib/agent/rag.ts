@@ -1,4 +1,5 @@
-import { embed } from 'ai';
+import { createHash } from 'crypto';
+import { embedMany } from 'ai';
 import { openai } from '@ai-sdk/openai';
 import { createClient } from '@/lib/supabase/server';
 
@@ -12,6 +13,81 @@ export interface RAGResult {
   similarity: number;
 }
 
+export interface IndexRecord {
+  sourceId: string;
+  title: string;
+  content: string;
+  metadata: any;
+}
+
+export interface IndexSyncResult {
+  added: number;
+  updated: number;
+  unchanged: number;
+  deleted: number;
+}
+
+// ============================================================================
+// Embedding
+// ============================================================================
+
+/**
+ * Turns text into vectors. The OpenAI embedder is the default; set
+ * RAG_EMBEDDER=hash (or pass createHashEmbedder()) to index and search
+ * without an API key, e.g. locally and in tests.
+ */
+export interface Embedder {
+  model: string;
+  embedMany(values: string[]): Promise<number[][]>;
+}
+
+export const openAIEmbedder: Embedder = {
+  model: 'text-embedding-ada-002',
+  async embedMany(values: string[]) {
+    const { embeddings } = await embedMany({
+      model: openai.embedding('text-embedding-ada-002'),
+      values,
+    });
+    return embeddings;
+  },
+};
+
+/**
+ * Deterministic bag-of-words embedder: every token is hashed to a signed
+ * bucket and the vector is L2-normalized, so identical text always gets the
+ * identical vector and texts sharing words score as similar.
+ */
+export function createHashEmbedder(dimensions: number = 1536): Embedder {
+  return {
+    model: `hash-${dimensions}`,
+    async embedMany(values: string[]) {
+      return values.map(value => {
+        const vector = new Array<number>(dimensions).fill(0);
+        for (const token of value.toLowerCase().match(/[a-z0-9@._-]+/g) || []) {
+          const digest = createHash('sha1').update(token).digest();
+          vector[digest.readUInt32BE(0) % dimensions] += digest[4] & 1 ? 1 : -1;
+        }
+        const norm = Math.sqrt(vector.reduce((sum, v) => sum + v * v, 0)) || 1;
+        return vector.map(v => v / norm);
+      });
+    },
+  };
+}
+
+export function defaultEmbedder(): Embedder {
+  return process.env.RAG_EMBEDDER === 'hash' ? createHashEmbedder() : openAIEmbedder;
+}
+
+/**
+ * Hash of everything an embedding row is built from; the model is included
+ * so switching embedders re-embeds everything once
+ */
+export function contentHash(model: string, title: string, content: string, metadata: any): string {
+  return createHash('sha256')
+    .update(JSON.stringify([model, title, content, metadata]))
+    .digest('hex');
+}
+
 /**
  * Search the knowledge base using semantic similarity
  */
@@ -25,10 +101,7 @@ export async function searchRAG(
     const supabase = await createClient();
 
     // Generate embedding for the query
-    const { embedding } = await embed({
-      model: openai.embedding('text-embedding-ada-002'),
-      value: query,
-    });
+    const [embedding] = await defaultEmbedder().embedMany([query]);
 
     // Search using pgvector cosine similarity
     const { data, error } = await supabase.rpc('search_embeddings', {
@@ -71,12 +144,10 @@ export async function indexContent(
 ): Promise<void> {
   try {
     const supabase = await createClient();
+    const embedder = defaultEmbedder();
 
     // Generate embedding
-    const { embedding } = await embed({
-      model: openai.embedding('text-embedding-ada-002'),
-      value: content,
-    });
+    const [embedding] = await embedder.embedMany([content]);
 
     // Insert or update into embeddings table
     const record: any = {
@@ -86,6 +157,8 @@ export async function indexContent(
       content,
       embedding: JSON.stringify(embedding), // Store as JSON for pgvector
       metadata,
+      content_hash: contentHash(embedder.model, title, content, metadata),
+      updated_at: new Date().toISOString(),
     };
     
     if (sourceId) {
@@ -94,7 +167,7 @@ export async function indexContent(
 
     const { error } = await supabase
       .from('embeddings_index')
-      .upsert(record);
+      .upsert(record, sourceId ? { onConflict: 'org_id,source,source_id' } : undefined);
 
     if (error) {
       console.error('Failed to index content:', error);
@@ -106,6 +179,129 @@ export async function indexContent(
   }
 }
 
+const EMBED_BATCH_SIZE = 100;
+const DELETE_BATCH_SIZE = 500;
+const PAGE_SIZE = 1000;
+
+/**
+ * Make the index for one org and source match `records`: only new or
+ * changed records (by content hash) are embedded and upserted. Cost follows
+ * churn, not the number of records.
+ *
+ * When `records` is the complete set, indexed records missing from it are
+ * deleted. When it is a window (newest N activities, ...), pass
+ * `sourceTable`: records outside the window are then only deleted once
+ * their source row no longer exists.
+ */
+export async function syncIndex(
+  supabase: any,
+  orgId: string,
+  source: string,
+  records: IndexRecord[],
+  embedder: Embedder = defaultEmbedder(),
+  sourceTable?: string
+): Promise<IndexSyncResult> {
+  const existing = new Map<string, string | null>();
+  for (let page = 0; ; page++) {
+    const { data, error } = await supabase
+      .from('embeddings_index')
+      .select('source_id, content_hash')
+      .eq('org_id', orgId)
+      .eq('source', source)
+      .not('source_id', 'is', null)
+      .order('source_id')
+      .range(page * PAGE_SIZE, (page + 1) * PAGE_SIZE - 1);
+
+    if (error) throw error;
+    for (const row of data || []) {
+      existing.set(row.source_id, row.content_hash);
+    }
+    if (!data || data.length < PAGE_SIZE) break;
+  }
+
+  const result: IndexSyncResult = { added: 0, updated: 0, unchanged: 0, deleted: 0 };
+  const current = new Set<string>();
+  const changed: Array<{ record: IndexRecord; hash: string }> = [];
+
+  for (const record of records) {
+    current.add(record.sourceId);
+    const hash = contentHash(embedder.model, record.title, record.content, record.metadata);
+    if (existing.get(record.sourceId) === hash) {
+      result.unchanged++;
+      continue;
+    }
+    if (existing.has(record.sourceId)) {
+      result.updated++;
+    } else {
+      result.added++;
+    }
+    changed.push({ record, hash });
+  }
+
+  for (let i = 0; i < changed.length; i += EMBED_BATCH_SIZE) {
+    const batch = changed.slice(i, i + EMBED_BATCH_SIZE);
+    const embeddings = await embedder.embedMany(batch.map(c => c.record.content));
+    const now = new Date().toISOString();
+
+    const { error } = await supabase
+      .from('embeddings_index')
+      .upsert(
+        batch.map((c, j) => ({
+          org_id: orgId,
+          source,
+          source_id: c.record.sourceId,
+          title: c.record.title,
+          content: c.record.content,
+          embedding: JSON.stringify(embeddings[j]), // Store as JSON for pgvector
+          metadata: c.record.metadata,
+          content_hash: c.hash,
+          updated_at: now,
+        })),
+        { onConflict: 'org_id,source,source_id' }
+      );
+
+    if (error) throw error;
+  }
+
+  let stale = Array.from(existing.keys()).filter(id => !current.has(id));
+  if (sourceTable) {
+    stale = await missingSourceIds(supabase, sourceTable, stale);
+  }
+  for (let i = 0; i < stale.length; i += DELETE_BATCH_SIZE) {
+    const { error } = await supabase
+      .from('embeddings_index')
+      .delete()
+      .eq('org_id', orgId)
+      .eq('source', source)
+      .in('source_id', stale.slice(i, i + DELETE_BATCH_SIZE));
+
+    if (error) throw error;
+  }
+  result.deleted = stale.length;
+
+  console.log(
+    `[RAG] ${source}: ${result.added} added, ${result.updated} updated, ` +
+    `${result.unchanged} unchanged, ${result.deleted} deleted`
+  );
+  return result;
+}
+
+/**
+ * Of `ids`, those with no row left in `table`
+ */
+async function missingSourceIds(supabase: any, table: string, ids: string[]): Promise<string[]> {
+  const missing: string[] = [];
+  for (let i = 0; i < ids.length; i += DELETE_BATCH_SIZE) {
+    const batch = ids.slice(i, i + DELETE_BATCH_SIZE);
+    const { data, error } = await supabase.from(table).select('id').in('id', batch);
+
+    if (error) throw error;
+    const found = new Set((data || []).map((row: any) => String(row.id)));
+    missing.push(...batch.filter(id => !found.has(id)));
+  }
+  return missing;
+}
+
 /**
  * Index all clients for RAG
  */
@@ -126,8 +322,7 @@ export async function indexClients(orgId: string): Promise<number> {
     return 0;
   }
 
-  let indexed = 0;
-  for (const client of clients) {
+  const records: IndexRecord[] = clients.map((client: any) => {
     const content = `
 Client: ${client.company_name}
 Primary Contact: ${client.primary_contact}
@@ -140,23 +335,20 @@ Active Orders: ${client.orders?.length || 0}
 Contacts: ${client.contacts?.map((c: any) => `${c.first_name} ${c.last_name} (${c.email || 'no email'})`).join(', ')}
     `.trim();
 
-    await indexContent(
-      orgId,
-      'client_data',
-      client.id,
-      `Client: ${client.company_name}`,
+    return {
+      sourceId: client.id,
+      title: `Client: ${client.company_name}`,
       content,
-      {
+      metadata: {
         clientId: client.id,
         companyName: client.company_name,
         isActive: client.is_active,
-      }
-    );
-
-    indexed++;
-  }
+      },
+    };
+  });
 
-  return indexed;
+  await syncIndex(supabase, orgId, 'client_data', records);
+  return records.length;
 }
 
 /**
@@ -180,8 +372,7 @@ export async function indexActivities(orgId: string): Promise<number> {
     return 0;
   }
 
-  let indexed = 0;
-  for (const activity of activities) {
+  const records: IndexRecord[] = activities.map((activity: any) => {
     const clientName = activity.client?.company_name || 'Unknown';
     const contactName = activity.contact 
       ? `${activity.contact.first_name} ${activity.contact.last_name}`
@@ -198,24 +389,23 @@ Date: ${new Date(activity.created_at).toLocaleDateString()}
 Status: ${activity.status}
     `.trim();
 
-    await indexContent(
-      orgId,
-      'activity',
-      activity.id,
-      activity.subject,
+    return {
+      sourceId: activity.id,
+      title: activity.subject,
       content,
-      {
+      metadata: {
         activityType: activity.activity_type,
         clientId: activity.client_id,
         outcome: activity.outcome,
         date: activity.created_at,
-      }
-    );
-
-    indexed++;
-  }
+      },
+    };
+  });
 
-  return indexed;
+  // Only the recent window is re-indexed; older activities keep their
+  // embeddings until the activity itself is deleted
+  await syncIndex(supabase, orgId, 'activity', records, defaultEmbedder(), 'activities');
+  return records.length;
 }
 
 /**
@@ -275,9 +465,8 @@ export async function indexChatConversations(orgId: string, minMessages: number
     conversations.push(currentConvo);
   }
 
-  // Index each conversation
-  let indexed = 0;
-  for (const convo of conversations) {
+  // Index each conversation, keyed by its first message
+  const records: IndexRecord[] = conversations.map((convo: any[]) => {
     const firstMsg = convo[0];
     const lastMsg = convo[convo.length - 1];
     const date = new Date(firstMsg.created_at).toLocaleDateString();
@@ -290,23 +479,22 @@ export async function indexChatConversations(orgId: string, minMessages: number
     const title = `Conversation on ${date}`;
     const firstUserMsg = convo.find((m: any) => m.role === 'user')?.content || 'Chat';
     
-    await indexContent(
-      orgId,
-      'chat',
-      firstMsg.id,
-      `${title}: ${firstUserMsg.substring(0, 100)}`,
+    return {
+      sourceId: firstMsg.id,
+      title: `${title}: ${firstUserMsg.substring(0, 100)}`,
       content,
-      {
+      metadata: {
         date: firstMsg.created_at,
         message_count: convo.length,
         first_message: firstUserMsg.substring(0, 200),
-      }
-    );
-    
-    indexed++;
-  }
+      },
+    };
+  });
 
-  return indexed;
+  // Conversations are keyed by their first message, which may fall outside
+  // the fetched window; only drop those whose first message is gone
+  await syncIndex(supabase, orgId, 'chat', records, defaultEmbedder(), 'chat_messages');
+  return records.length;
 }
 
 /**
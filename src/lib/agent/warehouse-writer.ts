@@ -100,6 +100,9 @@ export const EVENT_TYPES = {
   CYCLE_COMPLETED: 'cycle_completed',
   CYCLE_FAILED: 'cycle_failed',
 
+  // Work block timing (one event per orchestrator phase)
+  RUN_PHASE: 'run_phase',
+
   // Compliance
   COMPLIANCE_DUE: 'compliance_due',
   COMPLIANCE_SENT: 'compliance_sent',
@@ -137,6 +140,7 @@ export const EVENT_SOURCES = {
   EMAIL_PROVIDER: 'email_provider',
   GMAIL_POLLER: 'gmail_poller',
   CRON: 'cron',
+  WORK_BLOCK: 'work_block',
 } as const;
 
 export type EventSource = (typeof EVENT_SOURCES)[keyof typeof EVENT_SOURCES];
@@ -0,0 +1,93 @@
+/**
+ * Audience Resolver Tests
+ *
+ * - Filter audiences cover every client of the caller's tenant, whichever
+ *   user created them, and every user of a tenant shares one segment index
+ */
+
+import { describe, it, expect, vi, beforeEach } from 'vitest';
+import { createClient } from '@/lib/supabase/server';
+import { getAudienceCount, resolveTargetSegment } from '../audience-resolver';
+
+vi.mock('@/lib/supabase/server', () => ({
+  createClient: vi.fn(),
+}));
+
+// Clients of tenant-1 created by two different users (org_id = user id)
+const ROWS: Record<string, any[]> = {
+  'tenant-1': [
+    member('client-a', 'user-a', 'a@example.com'),
+    member('client-b', 'user-b', 'b@example.com'),
+  ],
+  'tenant-2': [member('client-c', 'user-c', 'c@example.com')],
+};
+
+function member(clientId: string, orgId: string, email: string) {
+  return {
+    client_id: clientId,
+    org_id: orgId,
+    contact_id: `${clientId}-contact`,
+    row_key: `${clientId}-contact`,
+    email,
+    first_name: null,
+    last_name: null,
+    company_name: clientId,
+    primary_role_code: null,
+    client_type: null,
+    is_active: true,
+    address: null,
+    tags: [],
+    email_bounced: false,
+    last_order_at: null,
+    active_orders: 0,
+    total_revenue: 0,
+    lead_score: null,
+    lead_label: null,
+    snapshot_at: '2026-01-10T00:00:00Z',
+  };
+}
+
+// Table queries resolve to no rows (no suppressions)
+function emptyQuery() {
+  const query: any = {
+    select: () => query,
+    eq: () => query,
+    gt: () => query,
+    order: () => query,
+    range: () => query,
+    then: (resolve: (value: any) => any) => resolve({ data: [], error: null }),
+  };
+  return query;
+}
+
+const rpc = vi.fn(async (_name: string, args: any) => ({
+  data: args.p_after_client ? [] : ROWS[args.p_tenant_id] || [],
+  error: null,
+}));
+
+const filterSegment = { type: 'filter', filters: {} } as any;
+
+describe('resolveTargetSegment', () => {
+  beforeEach(() => {
+    rpc.mockClear();
+    vi.mocked(createClient).mockResolvedValue({ rpc, from: () => emptyQuery() } as any);
+  });
+
+  it('resolves the same audience for two users of one tenant', async () => {
+    const forA = await resolveTargetSegment(filterSegment, 'user-a', 'tenant-1');
+    const forB = await resolveTargetSegment(filterSegment, 'user-b', 'tenant-1');
+
+    expect(forA.map((r) => r.client_id).sort()).toEqual(['client-a', 'client-b']);
+    expect(forB.map((r) => r.client_id).sort()).toEqual(['client-a', 'client-b']);
+    expect(rpc.mock.calls.every(([, args]) => args.p_tenant_id === 'tenant-1')).toBe(true);
+  });
+
+  it('shares one index per tenant and keeps tenants apart', async () => {
+    await getAudienceCount(filterSegment, 'user-a', 'tenant-1');
+    const calls = rpc.mock.calls.length;
+
+    expect(await getAudienceCount(filterSegment, 'user-b', 'tenant-1')).toBe(2);
+    expect(rpc.mock.calls.length).toBe(calls);
+    expect(await getAudienceCount(filterSegment, 'user-c', 'tenant-2')).toBe(1);
+  });
+});
@@ -0,0 +1,186 @@
+/**
+ * Segment Index Tests
+ *
+ * - SegmentBitmap set algebra against plain Set results, across sparse
+ *   (array) and dense (bitset) chunks
+ * - SegmentIndex attribute bitmaps, suppression and incremental replace,
+ *   including suppression reason changes and contacts that move clients
+ */
+
+import { describe, it, expect, vi } from 'vitest';
+import { SegmentBitmap } from '../segment-bitmap';
+import { SegmentIndex, stateFromAddress } from '../segment-index';
+
+vi.mock('@/lib/supabase/server', () => ({
+  createClient: vi.fn(),
+}));
+
+function sorted(values: Iterable<number>): number[] {
+  return Array.from(values).sort((a, b) => a - b);
+}
+
+function randomSet(count: number, max: number): Set<number> {
+  const set = new Set<number>();
+  while (set.size < count) set.add(Math.floor(Math.random() * max));
+  return set;
+}
+
+// ============================================================================
+// BITMAP
+// ============================================================================
+
+describe('SegmentBitmap', () => {
+  it('matches Set semantics for and / or / andNot', () => {
+    // 10k members in the first chunk forces a bitset; the rest stay arrays
+    const a = new Set([...randomSet(10_000, 65_536), ...randomSet(300, 400_000)]);
+    const b = new Set([...randomSet(2_000, 65_536), ...randomSet(3_000, 400_000)]);
+    const bmA = SegmentBitmap.of(sorted(a));
+    const bmB = SegmentBitmap.of(b);
+
+    expect(sorted(bmA)).toEqual(sorted(a));
+    expect(bmA.size).toBe(a.size);
+    expect(sorted(bmA.and(bmB))).toEqual(sorted([...a].filter((x) => b.has(x))));
+    expect(sorted(bmA.or(bmB))).toEqual(sorted(new Set([...a, ...b])));
+    expect(sorted(bmA.andNot(bmB))).toEqual(sorted([...a].filter((x) => !b.has(x))));
+  });
+
+  it('removes members and drops empty chunks', () => {
+    const bitmap = SegmentBitmap.of([1, 2, 70_000]);
+    bitmap.remove(70_000);
+    bitmap.remove(2);
+
+    expect(Array.from(bitmap)).toEqual([1]);
+    expect(bitmap.has(70_000)).toBe(false);
+
+    bitmap.remove(1);
+    expect(bitmap.isEmpty()).toBe(true);
+  });
+
+  it('takes the first members in ordinal order', () => {
+    const bitmap = SegmentBitmap.of([90_000, 5, 3, 70_000]);
+    expect(bitmap.take(3)).toEqual([3, 5, 70_000]);
+  });
+});
+
+// ============================================================================
+// INDEX
+// ============================================================================
+
+function row(overrides: Record<string, any>) {
+  return {
+    client_id: 'client-1',
+    contact_id: 'contact-1',
+    row_key: 'contact-1',
+    email: 'a@example.com',
+    first_name: 'Ann',
+    last_name: 'Lee',
+    company_name: 'Acme Lending',
+    primary_role_code: 'loan_officer',
+    client_type: 'company',
+    is_active: true,
+    address: '1 Main St, Austin, TX 78701',
+    tags: ['High-Volume'],
+    email_bounced: false,
+    last_order_at: null,
+    active_orders: 2,
+    total_revenue: '1500.00',
+    lead_score: 80,
+    lead_label: 'hot',
+    snapshot_at: '2026-01-10T00:00:00Z',
+    ...overrides,
+  };
+}
+
+describe('SegmentIndex', () => {
+  it('indexes attributes per member', () => {
+    const index = new SegmentIndex('org-1');
+    index.apply([
+      row({}),
+      row({ contact_id: 'contact-2', row_key: 'contact-2', email: '', primary_role_code: 'realtor' }),
+      row({ client_id: 'client-2', contact_id: null, row_key: 'nil', primary_role_code: null, tags: [], address: 'Denver, CO' }),
+    ] as any);
+
+    expect(index.size).toBe(3);
+    expect(index.get('role:loan_officer').size).toBe(1);
+    expect(index.any('role', ['loan_officer', 'realtor']).size).toBe(2);
+    expect(index.get('tag:High-Volume').size).toBe(2);
+    expect(index.get('state:TX').size).toBe(2);
+    expect(index.get('state:CO').size).toBe(1);
+    expect(index.get('has_contact').size).toBe(2);
+    expect(index.get('has_email').size).toBe(2);
+  });
+
+  it('flags members whose address is suppressed, before or after they load', () => {
+    const index = new SegmentIndex('org-1');
+    index.suppress([{ email_address: 'A@example.com', reason: 'unsubscribe' }]);
+    index.apply([row({}), row({ client_id: 'client-2', contact_id: 'contact-2', email: 'b@example.com' })] as any);
+    index.suppress([{ email_address: 'b@example.com', reason: 'bounce' }]);
+
+    expect(index.get('suppressed').size).toBe(2);
+    expect(index.get('unsubscribed').size).toBe(1);
+    expect(index.get('bounced').size).toBe(1);
+  });
+
+  it('replaces every row of a changed client', () => {
+    const index = new SegmentIndex('org-1');
+    index.apply([
+      row({}),
+      row({ contact_id: 'contact-2', row_key: 'contact-2' }),
+      row({ client_id: 'client-2', contact_id: 'contact-3' }),
+    ] as any);
+
+    // client-1 now has one contact with a new role and no tags
+    index.apply([row({ primary_role_code: 'realtor', tags: [] })] as any);
+
+    expect(index.size).toBe(2);
+    expect(index.get('role:loan_officer').size).toBe(1);
+    expect(index.get('role:realtor').size).toBe(1);
+    expect(index.get('tag:High-Volume').size).toBe(1);
+    expect(index.resolve(index.all()).map((m) => m.contactId).sort()).toEqual(['contact-1', 'contact-3']);
+  });
+
+  it('moves a contact that changed clients', () => {
+    const index = new SegmentIndex('tenant-1');
+    index.apply([row({}), row({ client_id: 'client-2', contact_id: 'contact-2', row_key: 'contact-2' })] as any);
+
+    // Only the new client is reported as changed
+    index.apply([
+      row({ client_id: 'client-2', contact_id: 'contact-1', row_key: 'contact-1' }),
+      row({ client_id: 'client-2', contact_id: 'contact-2', row_key: 'contact-2' }),
+    ] as any);
+
+    expect(index.size).toBe(2);
+    expect(index.resolve(index.all()).map((m) => m.clientId)).toEqual(['client-2', 'client-2']);
+  });
+
+  it('clears the flags of a suppression whose reason changed', () => {
+    const index = new SegmentIndex('tenant-1');
+    index.apply([
+      row({}),
+      row({ client_id: 'client-2', contact_id: 'contact-2', email: 'b@example.com', email_bounced: true }),
+    ] as any);
+    index.suppress([
+      { email_address: 'a@example.com', reason: 'unsubscribe' },
+      { email_address: 'b@example.com', reason: 'bounce' },
+    ]);
+    index.suppress([
+      { email_address: 'a@example.com', reason: 'bounce' },
+      { email_address: 'b@example.com', reason: 'unsubscribe' },
+    ]);
+
+    expect(index.get('suppressed').size).toBe(2);
+    expect(index.get('unsubscribed').size).toBe(1);
+    // b@ keeps its contact-tag bounce
+    expect(index.get('bounced').size).toBe(2);
+    expect(index.resolve(index.get('unsubscribed')).map((m) => m.email)).toEqual(['b@example.com']);
+  });
+});
+
+describe('stateFromAddress', () => {
+  it('reads the state from the last address part', () => {
+    expect(stateFromAddress('1 Main St, Austin, TX 78701')).toBe('TX');
+    expect(stateFromAddress('Austin, tx')).toBe('TX');
+    expect(stateFromAddress('1 Main St, Austin, TX 78701-1234')).toBe('TX');
+    expect(stateFromAddress(null)).toBeNull();
+  });
+});
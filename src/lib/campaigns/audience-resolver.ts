@@ -4,8 +4,11 @@
  */
 
 import { createClient } from '@/lib/supabase/server';
-import type { TargetSegment, Recipient } from './types';
+import type { TargetSegment, Recipient, FilterCriteria } from './types';
 import { daysSince } from './merge-tokens';
+import { getSegmentIndex } from './segment-index';
+import type { SegmentIndex, SegmentMember } from './segment-index';
+import type { SegmentBitmap } from './segment-bitmap';
 
 // =====================================================
 // Main Resolver
@@ -14,10 +17,14 @@ import { daysSince } from './merge-tokens';
 /**
  * Resolve target segment to list of recipients
  * CRITICAL: Excludes suppressed emails and validates email addresses
+ *
+ * Filter segments cover every client of the tenant, whichever user of the
+ * tenant created them.
  */
 export async function resolveTargetSegment(
   segment: TargetSegment,
-  orgId: string
+  orgId: string,
+  tenantId: string
 ): Promise<Recipient[]> {
   const supabase = await createClient();
 
@@ -38,7 +45,7 @@ export async function resolveTargetSegment(
     recipients = await fetchN8nList(segment.n8n_list_id!);
   } else {
     // Build query from filters
-    recipients = await resolveFromFilters(segment.filters!, orgId);
+    recipients = await resolveFromFilters(segment.filters!, tenantId);
   }
 
   // CRITICAL: Filter out recipients with no email
@@ -63,74 +70,35 @@ export async function resolveTargetSegment(
 // =====================================================
 
 async function resolveFromFilters(
-  filters: any,
-  orgId: string
+  filters: FilterCriteria,
+  tenantId: string
 ): Promise<Recipient[]> {
-  const supabase = await createClient();
-
-  // Build SQL query from filters
-  let query = supabase
-    .from('clients')
-    .select(`
-      id,
-      company_name,
-      email,
-      is_active,
-      contacts (
-        id,
-        first_name,
-        last_name,
-        email,
-        is_primary
-      ),
-      orders (
-        id,
-        created_at,
-        status
-      )
-    `);
-
-  // Apply filters
-  if (filters.client_types?.length > 0) {
-    // Note: You may need to add a 'type' column to clients table
-    // For now, this is a placeholder
-    // query = query.in('type', filters.client_types);
-  }
-
-  if (filters.tags?.length > 0) {
-    // Note: You may need to add a 'tags' column to clients table
-    // query = query.contains('tags', filters.tags);
-  }
-
-  if (filters.states?.length > 0) {
-    // Note: You may need to extract state from address or add state column
-    // For now, this is a placeholder
-  }
+  // Launch resolves against a fresh build so deleted contacts never get tasks
+  const index = await getSegmentIndex(tenantId, { rebuild: true });
+  return index.resolve(matchFilters(index, filters)).map(toRecipient);
+}
 
-  const { data: clients, error } = await query;
+/**
+ * Audience members matching segment filters
+ *
+ * client_types, property_types and has_active_profile are not applied yet:
+ * the wizard's client types (AMC, Direct Lender, ...) have no stored
+ * column to match, and clients carry no property types or profile flag.
+ */
+function matchFilters(index: SegmentIndex, filters: FilterCriteria): SegmentBitmap {
+  let members = index.all();
 
-  if (error) {
-    console.error('[Audience Resolver] Query error:', error);
-    throw new Error(`Failed to resolve audience: ${error.message}`);
+  if (filters.tags?.length) {
+    members = members.and(index.any('tag', filters.tags));
   }
 
-  if (!clients || clients.length === 0) {
-    return [];
+  if (filters.states?.length) {
+    members = members.and(index.any('state', filters.states.map(s => s.toUpperCase())));
   }
 
-  // Post-process for order date filters
-  let filtered = clients;
-
   if (filters.last_order_days_ago_min || filters.last_order_days_ago_max) {
-    filtered = clients.filter(client => {
-      // Sort orders by date DESC to get most recent
-      const orders = (client.orders || [])
-        .filter((o: any) => o.status !== 'cancelled')
-        .sort((a: any, b: any) =>
-          new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
-        );
-
-      const lastOrder = orders[0]?.created_at;
+    members = members.filter(ordinal => {
+      const lastOrder = index.member(ordinal).lastOrderAt;
       if (!lastOrder) return false;
 
       const daysAgo = daysSince(lastOrder);
@@ -146,55 +114,27 @@ async function resolveFromFilters(
     });
   }
 
-  // Map to recipients
-  const recipients: Recipient[] = [];
-
-  for (const client of filtered) {
-    const contacts = client.contacts || [];
-
-    // If client has contacts, use them
-    if (contacts.length > 0) {
-      for (const contact of contacts) {
-        // Calculate stats
-        const orders = (client.orders || []).filter((o: any) => o.status !== 'cancelled');
-        const sortedOrders = [...orders].sort((a: any, b: any) =>
-          new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
-        );
-        const lastOrderDate = sortedOrders[0]?.created_at || null;
-
-        recipients.push({
-          contact_id: contact.id,
-          client_id: client.id,
-          email: contact.email || client.email,
-          first_name: contact.first_name,
-          last_name: contact.last_name,
-          company_name: client.company_name,
-          last_order_date: lastOrderDate,
-          days_since_last_order: lastOrderDate ? daysSince(lastOrderDate) : null,
-        });
-      }
-    } else {
-      // No contacts, use client email
-      const orders = (client.orders || []).filter((o: any) => o.status !== 'cancelled');
-      const sortedOrders = [...orders].sort((a: any, b: any) =>
-        new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
-      );
-      const lastOrderDate = sortedOrders[0]?.created_at || null;
-
-      recipients.push({
-        contact_id: null,
-        client_id: client.id,
-        email: client.email,
-        first_name: null,
-        last_name: null,
-        company_name: client.company_name,
-        last_order_date: lastOrderDate,
-        days_since_last_order: lastOrderDate ? daysSince(lastOrderDate) : null,
-      });
-    }
-  }
+  return members;
+}
 
-  return recipients;
+/**
+ * Members a campaign can send to: an address that is not suppressed
+ */
+function sendable(index: SegmentIndex, members: SegmentBitmap): SegmentBitmap {
+  return members.and(index.get('has_email')).andNot(index.get('suppressed'));
+}
+
+function toRecipient(member: SegmentMember): Recipient {
+  return {
+    contact_id: member.contactId,
+    client_id: member.clientId,
+    email: member.email,
+    first_name: member.firstName,
+    last_name: member.lastName,
+    company_name: member.companyName,
+    last_order_date: member.lastOrderAt,
+    days_since_last_order: member.lastOrderAt ? daysSince(member.lastOrderAt) : null,
+  };
 }
 
 // =====================================================
@@ -217,10 +157,16 @@ async function fetchN8nList(listId: string): Promise<Recipient[]> {
  */
 export async function getAudienceCount(
   segment: TargetSegment,
-  orgId: string
+  orgId: string,
+  tenantId: string
 ): Promise<number> {
-  const recipients = await resolveTargetSegment(segment, orgId);
-  return recipients.length;
+  if (segment.type === 'n8n_list') {
+    const recipients = await resolveTargetSegment(segment, orgId, tenantId);
+    return recipients.length;
+  }
+
+  const index = await getSegmentIndex(tenantId);
+  return sendable(index, matchFilters(index, segment.filters || {})).size;
 }
 
 /**
@@ -229,8 +175,16 @@ export async function getAudienceCount(
 export async function getAudienceSample(
   segment: TargetSegment,
   orgId: string,
+  tenantId: string,
   limit: number = 5
 ): Promise<Recipient[]> {
-  const recipients = await resolveTargetSegment(segment, orgId);
-  return recipients.slice(0, limit);
+  if (segment.type === 'n8n_list') {
+    const recipients = await resolveTargetSegment(segment, orgId, tenantId);
+    return recipients.slice(0, limit);
+  }
+
+  const index = await getSegmentIndex(tenantId);
+  return index
+    .resolve(sendable(index, matchFilters(index, segment.filters || {})), limit)
+    .map(toRecipient);
 }
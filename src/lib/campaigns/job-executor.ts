@@ -2,7 +2,8 @@
  * Campaign Job Executor
  *
  * Processes campaign jobs with rate limiting:
- * - Respects send_rate_per_hour from campaign
+ * - Leases send slots from the shared send-rate governor (campaign
+ *   send_rate_per_hour, per-tenant sender mailbox and tenant buckets)
  * - Processes tasks in batches
  * - Updates campaign_contact_status
  * - Handles scheduled campaigns (start_at)
@@ -16,6 +17,7 @@
 import { createClient } from '@/lib/supabase/server';
 import { sendCampaignEmail } from './email-sender';
 import { replaceMergeTokens } from './merge-tokens';
+import { getCampaignSendBuckets, leaseSendSlots, releaseSendSlots } from './send-governor';
 
 export interface JobExecutionResult {
   jobId: string;
@@ -42,6 +44,7 @@ export async function executeCampaignJobs(): Promise<JobExecutionResult[]> {
       metadata,
       campaigns!inner (
         id,
+        tenant_id,
         status,
         start_at,
         send_rate_per_hour,
@@ -80,6 +83,7 @@ export async function executeCampaignJobs(): Promise<JobExecutionResult[]> {
     const result = await executeJobWithRateLimit({
       jobId: job.id,
       campaignId: campaignData.id,
+      tenantId: campaignData.tenant_id,
       sendRatePerHour: campaignData.send_rate_per_hour || 75,
       batchSize: campaignData.send_batch_size || 25,
       emailSubject: campaignData.email_subject!,
@@ -98,6 +102,7 @@ export async function executeCampaignJobs(): Promise<JobExecutionResult[]> {
 export async function executeJobWithRateLimit({
   jobId,
   campaignId,
+  tenantId = null,
   sendRatePerHour,
   batchSize,
   emailSubject,
@@ -105,6 +110,7 @@ export async function executeJobWithRateLimit({
 }: {
   jobId: string;
   campaignId: string;
+  tenantId?: string | null;
   sendRatePerHour: number;
   batchSize: number;
   emailSubject: string;
@@ -112,22 +118,12 @@ export async function executeJobWithRateLimit({
 }): Promise<JobExecutionResult> {
   const supabase = await createClient();
 
-  // Calculate rate limit window
-  const now = new Date();
-  const oneHourAgo = new Date(now.getTime() - 60 * 60 * 1000);
+  // Lease a batch of send slots (campaign, mailbox and tenant buckets)
+  const buckets = getCampaignSendBuckets({ campaignId, tenantId });
+  const leased = await leaseSendSlots(buckets, batchSize);
 
-  // Check how many emails sent in last hour for this campaign
-  const { data: recentSends, count: sentInLastHour } = await supabase
-    .from('campaign_contact_status')
-    .select('*', { count: 'exact', head: true })
-    .eq('campaign_id', campaignId)
-    .eq('last_event', 'sent')
-    .gte('sent_at', oneHourAgo.toISOString());
-
-  const remainingInWindow = sendRatePerHour - (sentInLastHour || 0);
-
-  if (remainingInWindow <= 0) {
-    console.log(`Rate limit reached for campaign ${campaignId}: ${sentInLastHour}/${sendRatePerHour} in last hour`);
+  if (leased <= 0) {
+    console.log(`Rate limit reached for campaign ${campaignId}: no send slots available (${sendRatePerHour}/hour)`);
     return {
       jobId,
       campaignId,
@@ -138,17 +134,19 @@ export async function executeJobWithRateLimit({
     };
   }
 
-  // Determine batch size (don't exceed rate limit)
-  const actualBatchSize = Math.min(batchSize, remainingInWindow);
+  // Claim pending tasks, one per leased slot. Claimed tasks are 'running',
+  // so a concurrent executor for the same job claims different ones.
+  const { data: tasks, error: claimError } = await supabase.rpc('claim_campaign_send_tasks', {
+    p_job_id: jobId,
+    p_limit: leased,
+  });
 
-  // Get pending tasks
-  const { data: tasks } = await supabase
-    .from('job_tasks')
-    .select('*')
-    .eq('job_id', jobId)
-    .eq('status', 'pending')
-    .order('created_at', { ascending: true })
-    .limit(actualBatchSize);
+  if (claimError) {
+    console.error(`Failed to claim tasks for job ${jobId}:`, claimError);
+  }
+
+  // Slots without a task go back to the buckets
+  await releaseSendSlots(buckets, leased - (tasks?.length || 0));
 
   if (!tasks || tasks.length === 0) {
     console.log(`No pending tasks for job ${jobId}`);
@@ -166,7 +164,7 @@ export async function executeJobWithRateLimit({
     };
   }
 
-  console.log(`Processing ${tasks.length} tasks for campaign ${campaignId} (rate limit: ${remainingInWindow} remaining)`);
+  console.log(`Processing ${tasks.length} tasks for campaign ${campaignId} (${leased}/${batchSize} send slots leased)`);
 
   let emailsSent = 0;
   let errors = 0;
@@ -226,6 +224,13 @@ export async function executeJobWithRateLimit({
     } catch (error) {
       errors++;
       console.error(`Error processing task ${task.id}:`, error);
+
+      // Hand the claim back so a later run retries it
+      await supabase
+        .from('job_tasks')
+        .update({ status: 'pending', started_at: null })
+        .eq('id', task.id)
+        .eq('status', 'running');
     }
   }
 
@@ -238,7 +243,7 @@ export async function executeJobWithRateLimit({
     tasksProcessed: tasks.length,
     emailsSent,
     errors,
-    rateLimitReached: remainingInWindow <= actualBatchSize,
+    rateLimitReached: leased < batchSize,
   };
 }
 
@@ -248,12 +253,12 @@ export async function executeJobWithRateLimit({
 async function checkAndCompleteJob(jobId: string, campaignId: string) {
   const supabase = await createClient();
 
-  // Check if any pending tasks remain
+  // Check if any pending or claimed tasks remain
   const { count: pendingCount } = await supabase
     .from('job_tasks')
     .select('*', { count: 'exact', head: true })
     .eq('job_id', jobId)
-    .eq('status', 'pending');
+    .in('status', ['pending', 'running']);
 
   if (pendingCount === 0) {
     // Mark job as completed
@@ -289,6 +294,7 @@ export async function triggerCampaignExecution(campaignId: string): Promise<JobE
     .from('campaigns')
     .select(`
       id,
+      tenant_id,
       status,
       start_at,
       send_rate_per_hour,
@@ -314,6 +320,7 @@ export async function triggerCampaignExecution(campaignId: string): Promise<JobE
   return executeJobWithRateLimit({
     jobId: campaign.primary_job_id,
     campaignId: campaign.id,
+    tenantId: campaign.tenant_id,
     sendRatePerHour: campaign.send_rate_per_hour || 75,
     batchSize: campaign.send_batch_size || 25,
     emailSubject: campaign.email_subject!,
@@ -37,7 +37,7 @@ export async function launchCampaign(
 
   // Resolve target audience (excludes suppressions)
   console.log('[Launch] Resolving audience for campaign:', campaignId);
-  const recipients = await resolveTargetSegment(campaign.target_segment, orgId);
+  const recipients = await resolveTargetSegment(campaign.target_segment, orgId, tenantId);
 
   if (recipients.length === 0) {
     throw new Error('No valid recipients after filtering suppressions');
@@ -1,14 +1,26 @@
 /**
  * Campaign Metrics Calculation
- * Computes metrics on-demand from campaign_contact_status and other tables
+ * Reads recipient counts from campaign_metrics_rollups, which triggers on
+ * campaign_contact_status keep current (20260110090000), so metrics cost
+ * O(#campaigns) rows rather than a scan of every recipient
  */
 
 import { createClient } from '@/lib/supabase/server';
 import type { CampaignMetrics } from './types';
 
+type RollupDimension = 'event' | 'sentiment' | 'disposition';
+
+interface RollupRow {
+  campaign_id: string;
+  dimension: RollupDimension;
+  value: string;
+  count: number;
+}
+
+const FOLLOW_UP_DISPOSITIONS = ['NO_ACTIVE_PROFILE', 'NEEDS_MORE_INFO', 'ESCALATE_UNCLEAR'];
+
 /**
  * Get comprehensive metrics for a campaign
- * Calculates from campaign_contact_status for performance
  */
 export async function getCampaignMetrics(
   campaignId: string,
@@ -16,22 +28,42 @@ export async function getCampaignMetrics(
 ): Promise<CampaignMetrics> {
   const supabase = await createClient();
 
-  // Get all contact statuses for this campaign
-  const { data: statuses, error: statusError } = await supabase
-    .from('campaign_contact_status')
-    .select('*')
-    .eq('campaign_id', campaignId)
-    .eq('org_id', orgId);
-
-  if (statusError) {
-    console.error('[Metrics] Failed to fetch statuses:', statusError);
+  const [rollupResult, totalTasksResult, completedTasksResult, followUpResult] = await Promise.all([
+    supabase
+      .from('campaign_metrics_rollups')
+      .select('campaign_id, dimension, value, count')
+      .eq('campaign_id', campaignId)
+      .eq('org_id', orgId),
+    supabase
+      .from('cards')
+      .select('id', { count: 'exact', head: true })
+      .eq('campaign_id', campaignId)
+      .eq('org_id', orgId),
+    supabase
+      .from('cards')
+      .select('id', { count: 'exact', head: true })
+      .eq('campaign_id', campaignId)
+      .eq('org_id', orgId)
+      .eq('status', 'completed'),
+    // Contacts that need follow-up (partial index on open_tasks_count > 0)
+    supabase
+      .from('campaign_contact_status')
+      .select('email_address, last_disposition, last_reply_summary')
+      .eq('campaign_id', campaignId)
+      .eq('org_id', orgId)
+      .gt('open_tasks_count', 0)
+      .in('last_disposition', FOLLOW_UP_DISPOSITIONS),
+  ]);
+
+  if (rollupResult.error) {
+    console.error('[Metrics] Failed to fetch rollups:', rollupResult.error);
     throw new Error('Failed to calculate metrics');
   }
 
-  const contacts = statuses || [];
+  const rollups = (rollupResult.data || []) as RollupRow[];
 
   // Calculate basic counts
-  const eventCounts = countBy(contacts, 'last_event');
+  const eventCounts = tally(rollups, 'event');
   const sent = (eventCounts.sent || 0) + (eventCounts.replied || 0);
   const replied = eventCounts.replied || 0;
   const pending = eventCounts.pending || 0;
@@ -41,9 +73,8 @@ export async function getCampaignMetrics(
   // Calculate response rate
   const response_rate = sent > 0 ? replied / sent : 0;
 
-  // Sentiment breakdown (only for replied contacts)
-  const repliedContacts = contacts.filter(c => c.last_event === 'replied');
-  const sentimentCounts = countBy(repliedContacts, 'last_sentiment');
+  // Sentiment breakdown (rollups only count replied contacts)
+  const sentimentCounts = tally(rollups, 'sentiment');
 
   const sentiment = {
     positive: sentimentCounts.POSITIVE || 0,
@@ -52,38 +83,26 @@ export async function getCampaignMetrics(
   };
 
   // Disposition breakdown
-  const dispositionCounts = countBy(
-    contacts.filter(c => c.last_disposition),
-    'last_disposition'
-  );
-
-  // Get task stats
-  const { data: tasks, error: tasksError } = await supabase
-    .from('cards')
-    .select('status')
-    .eq('campaign_id', campaignId)
-    .eq('org_id', orgId);
-
-  if (tasksError) {
-    console.warn('[Metrics] Failed to fetch tasks:', tasksError);
+  const dispositionCounts = tally(rollups, 'disposition');
+
+  // Task stats
+  if (totalTasksResult.error || completedTasksResult.error) {
+    console.warn('[Metrics] Failed to fetch tasks:', totalTasksResult.error || completedTasksResult.error);
   }
 
-  const taskStatusCounts = countBy(tasks || [], 'status');
-  const totalTasks = tasks?.length || 0;
-  const completedTasks = taskStatusCounts.completed || 0;
+  const totalTasks = totalTasksResult.count || 0;
+  const completedTasks = completedTasksResult.count || 0;
   const pendingTasks = totalTasks - completedTasks;
 
-  // Get contacts that need follow-up
-  const needs_follow_up = contacts
-    .filter(c =>
-      c.open_tasks_count > 0 &&
-      ['NO_ACTIVE_PROFILE', 'NEEDS_MORE_INFO', 'ESCALATE_UNCLEAR'].includes(c.last_disposition)
-    )
-    .map(c => ({
-      email_address: c.email_address,
-      last_disposition: c.last_disposition || '',
-      last_reply_summary: c.last_reply_summary || null,
-    }));
+  if (followUpResult.error) {
+    console.warn('[Metrics] Failed to fetch follow-ups:', followUpResult.error);
+  }
+
+  const needs_follow_up = (followUpResult.data || []).map(c => ({
+    email_address: c.email_address,
+    last_disposition: c.last_disposition || '',
+    last_reply_summary: c.last_reply_summary || null,
+  }));
 
   return {
     sent,
@@ -104,14 +123,15 @@ export async function getCampaignMetrics(
 }
 
 /**
- * Helper: Count by field
+ * Helper: Counts for one rollup dimension, keyed by value (zero counts dropped)
  */
-function countBy<T>(array: T[], field: keyof T): Record<string, number> {
+function tally(rows: RollupRow[], dimension: RollupDimension): Record<string, number> {
   const counts: Record<string, number> = {};
 
-  for (const item of array) {
-    const value = String(item[field] || 'unknown');
-    counts[value] = (counts[value] || 0) + 1;
+  for (const row of rows) {
+    const count = Number(row.count);
+    if (row.dimension !== dimension || count === 0) continue;
+    counts[row.value] = (counts[row.value] || 0) + count;
   }
 
   return counts;
@@ -123,42 +143,44 @@ function countBy<T>(array: T[], field: keyof T): Record<string, number> {
 export async function getCampaignListMetrics(
   campaignIds: string[],
   orgId: string
-): Promise<Record<string, { sent: number; replied: number; response_rate: number }>> {
+): Promise<Record<string, { sent: number; replied: number; pending: number; response_rate: number }>> {
   if (campaignIds.length === 0) return {};
 
   const supabase = await createClient();
 
-  const { data: statuses, error } = await supabase
-    .from('campaign_contact_status')
-    .select('campaign_id, last_event')
+  const { data: rollups, error } = await supabase
+    .from('campaign_metrics_rollups')
+    .select('campaign_id, dimension, value, count')
     .in('campaign_id', campaignIds)
-    .eq('org_id', orgId);
+    .eq('org_id', orgId)
+    .eq('dimension', 'event');
 
-  if (error || !statuses) {
+  if (error || !rollups) {
     console.error('[Metrics] Failed to fetch list metrics:', error);
     return {};
   }
 
   // Group by campaign
-  const byCampaign: Record<string, typeof statuses> = {};
-  for (const status of statuses) {
-    if (!byCampaign[status.campaign_id]) {
-      byCampaign[status.campaign_id] = [];
+  const byCampaign: Record<string, RollupRow[]> = {};
+  for (const row of rollups as RollupRow[]) {
+    if (!byCampaign[row.campaign_id]) {
+      byCampaign[row.campaign_id] = [];
     }
-    byCampaign[status.campaign_id].push(status);
+    byCampaign[row.campaign_id].push(row);
   }
 
   // Calculate metrics for each campaign
-  const metrics: Record<string, { sent: number; replied: number; response_rate: number }> = {};
+  const metrics: Record<string, { sent: number; replied: number; pending: number; response_rate: number }> = {};
 
-  for (const [campaignId, contacts] of Object.entries(byCampaign)) {
-    const eventCounts = countBy(contacts, 'last_event');
+  for (const [campaignId, rows] of Object.entries(byCampaign)) {
+    const eventCounts = tally(rows, 'event');
     const sent = (eventCounts.sent || 0) + (eventCounts.replied || 0);
     const replied = eventCounts.replied || 0;
 
     metrics[campaignId] = {
       sent,
       replied,
+      pending: eventCounts.pending || 0,
       response_rate: sent > 0 ? replied / sent : 0,
     };
   }
@@ -0,0 +1,319 @@
+/**
+ * Segment Bitmap
+ * Compressed set of contact ordinals for the segment index
+ *
+ * Roaring-style layout: ordinals are split by their high 16 bits into
+ * chunks of 65,536. A chunk holding up to ARRAY_MAX ordinals stores them
+ * as a sorted array of low bits; a denser chunk switches to a 65,536-bit
+ * bitset (8 KB). Chunks with no members are not stored, so a tag carried by
+ * a few hundred contacts costs a few hundred numbers however large the org.
+ */
+
+const ARRAY_MAX = 4096;
+const BITSET_WORDS = 2048;
+
+type Container = number[] | Uint32Array;
+
+function isBitset(container: Container): container is Uint32Array {
+  return container instanceof Uint32Array;
+}
+
+function popcount(word: number): number {
+  word -= (word >>> 1) & 0x55555555;
+  word = (word & 0x33333333) + ((word >>> 2) & 0x33333333);
+  return (((word + (word >>> 4)) & 0x0f0f0f0f) * 0x01010101) >>> 24;
+}
+
+function bitsetCardinality(bits: Uint32Array): number {
+  let count = 0;
+  for (let i = 0; i < BITSET_WORDS; i++) {
+    if (bits[i]) count += popcount(bits[i]);
+  }
+  return count;
+}
+
+function toBitset(values: number[]): Uint32Array {
+  const bits = new Uint32Array(BITSET_WORDS);
+  for (const v of values) bits[v >>> 5] |= 1 << (v & 31);
+  return bits;
+}
+
+function toArray(bits: Uint32Array): number[] {
+  const values: number[] = [];
+  for (let i = 0; i < BITSET_WORDS; i++) {
+    let word = bits[i];
+    while (word) {
+      const low = word & -word;
+      values.push((i << 5) + (31 - Math.clz32(low)));
+      word ^= low;
+    }
+  }
+  return values;
+}
+
+/** Bitset results go back to arrays once sparse enough; null when empty */
+function shrink(bits: Uint32Array): Container | null {
+  const count = bitsetCardinality(bits);
+  if (count === 0) return null;
+  return count <= ARRAY_MAX ? toArray(bits) : bits;
+}
+
+function hasBit(bits: Uint32Array, v: number): boolean {
+  return (bits[v >>> 5] & (1 << (v & 31))) !== 0;
+}
+
+function andContainers(a: Container, b: Container): Container | null {
+  if (isBitset(a) && isBitset(b)) {
+    const out = new Uint32Array(BITSET_WORDS);
+    for (let i = 0; i < BITSET_WORDS; i++) out[i] = a[i] & b[i];
+    return shrink(out);
+  }
+  if (isBitset(a) || isBitset(b)) {
+    const [values, bits] = isBitset(a) ? [b as number[], a] : [a as number[], b as Uint32Array];
+    const out = values.filter((v) => hasBit(bits, v));
+    return out.length ? out : null;
+  }
+  const out: number[] = [];
+  let i = 0;
+  let j = 0;
+  while (i < a.length && j < b.length) {
+    if (a[i] < b[j]) i++;
+    else if (a[i] > b[j]) j++;
+    else {
+      out.push(a[i]);
+      i++;
+      j++;
+    }
+  }
+  return out.length ? out : null;
+}
+
+function orContainers(a: Container, b: Container): Container {
+  if (isBitset(a) || isBitset(b)) {
+    const out = isBitset(a) ? a.slice() : toBitset(a);
+    if (isBitset(b)) {
+      for (let i = 0; i < BITSET_WORDS; i++) out[i] |= b[i];
+    } else {
+      for (const v of b) out[v >>> 5] |= 1 << (v & 31);
+    }
+    return out;
+  }
+  const out: number[] = [];
+  let i = 0;
+  let j = 0;
+  while (i < a.length || j < b.length) {
+    if (j >= b.length || (i < a.length && a[i] < b[j])) out.push(a[i++]);
+    else if (i >= a.length || b[j] < a[i]) out.push(b[j++]);
+    else {
+      out.push(a[i]);
+      i++;
+      j++;
+    }
+  }
+  return out.length > ARRAY_MAX ? toBitset(out) : out;
+}
+
+function andNotContainers(a: Container, b: Container): Container | null {
+  if (isBitset(a)) {
+    const out = a.slice();
+    if (isBitset(b)) {
+      for (let i = 0; i < BITSET_WORDS; i++) out[i] &= ~b[i];
+    } else {
+      for (const v of b) out[v >>> 5] &= ~(1 << (v & 31));
+    }
+    return shrink(out);
+  }
+  let out: number[];
+  if (isBitset(b)) {
+    out = a.filter((v) => !hasBit(b, v));
+  } else {
+    out = [];
+    let j = 0;
+    for (const v of a) {
+      while (j < b.length && b[j] < v) j++;
+      if (j >= b.length || b[j] !== v) out.push(v);
+    }
+  }
+  return out.length ? out : null;
+}
+
+/** Index of key in sorted keys, or -(insertion point) - 1 */
+function search(keys: number[], key: number): number {
+  let lo = 0;
+  let hi = keys.length - 1;
+  while (lo <= hi) {
+    const mid = (lo + hi) >>> 1;
+    if (keys[mid] < key) lo = mid + 1;
+    else if (keys[mid] > key) hi = mid - 1;
+    else return mid;
+  }
+  return -lo - 1;
+}
+
+export class SegmentBitmap {
+  private keys: number[] = [];
+  private containers: Container[] = [];
+
+  static of(ordinals: Iterable<number>): SegmentBitmap {
+    const bitmap = new SegmentBitmap();
+    for (const ordinal of ordinals) bitmap.add(ordinal);
+    return bitmap;
+  }
+
+  add(ordinal: number): void {
+    const key = ordinal >>> 16;
+    const low = ordinal & 0xffff;
+    let index = search(this.keys, key);
+    if (index < 0) {
+      index = -index - 1;
+      this.keys.splice(index, 0, key);
+      this.containers.splice(index, 0, [low]);
+      return;
+    }
+    const container = this.containers[index];
+    if (isBitset(container)) {
+      container[low >>> 5] |= 1 << (low & 31);
+      return;
+    }
+    // Ordinals mostly arrive in increasing order while an index is built
+    if (!container.length || container[container.length - 1] < low) {
+      container.push(low);
+    } else {
+      const at = search(container, low);
+      if (at >= 0) return;
+      container.splice(-at - 1, 0, low);
+    }
+    if (container.length > ARRAY_MAX) this.containers[index] = toBitset(container);
+  }
+
+  remove(ordinal: number): void {
+    const index = search(this.keys, ordinal >>> 16);
+    if (index < 0) return;
+    const low = ordinal & 0xffff;
+    const container = this.containers[index];
+    let next: Container | null = container;
+    if (isBitset(container)) {
+      container[low >>> 5] &= ~(1 << (low & 31));
+      if (!container[low >>> 5]) next = shrink(container);
+    } else {
+      const at = search(container, low);
+      if (at < 0) return;
+      container.splice(at, 1);
+      if (!container.length) next = null;
+    }
+    if (next) {
+      this.containers[index] = next;
+    } else {
+      this.keys.splice(index, 1);
+      this.containers.splice(index, 1);
+    }
+  }
+
+  has(ordinal: number): boolean {
+    const index = search(this.keys, ordinal >>> 16);
+    if (index < 0) return false;
+    const container = this.containers[index];
+    const low = ordinal & 0xffff;
+    return isBitset(container) ? hasBit(container, low) : search(container, low) >= 0;
+  }
+
+  get size(): number {
+    let count = 0;
+    for (const container of this.containers) {
+      count += isBitset(container) ? bitsetCardinality(container) : container.length;
+    }
+    return count;
+  }
+
+  isEmpty(): boolean {
+    return this.keys.length === 0;
+  }
+
+  and(other: SegmentBitmap): SegmentBitmap {
+    const out = new SegmentBitmap();
+    let i = 0;
+    let j = 0;
+    while (i < this.keys.length && j < other.keys.length) {
+      if (this.keys[i] < other.keys[j]) i++;
+      else if (this.keys[i] > other.keys[j]) j++;
+      else {
+        const container = andContainers(this.containers[i], other.containers[j]);
+        if (container) {
+          out.keys.push(this.keys[i]);
+          out.containers.push(container);
+        }
+        i++;
+        j++;
+      }
+    }
+    return out;
+  }
+
+  or(other: SegmentBitmap): SegmentBitmap {
+    const out = new SegmentBitmap();
+    let i = 0;
+    let j = 0;
+    while (i < this.keys.length || j < other.keys.length) {
+      if (j >= other.keys.length || (i < this.keys.length && this.keys[i] < other.keys[j])) {
+        out.keys.push(this.keys[i]);
+        out.containers.push(this.containers[i++].slice());
+      } else if (i >= this.keys.length || other.keys[j] < this.keys[i]) {
+        out.keys.push(other.keys[j]);
+        out.containers.push(other.containers[j++].slice());
+      } else {
+        out.keys.push(this.keys[i]);
+        out.containers.push(orContainers(this.containers[i++], other.containers[j++]));
+      }
+    }
+    return out;
+  }
+
+  andNot(other: SegmentBitmap): SegmentBitmap {
+    const out = new SegmentBitmap();
+    let j = 0;
+    for (let i = 0; i < this.keys.length; i++) {
+      while (j < other.keys.length && other.keys[j] < this.keys[i]) j++;
+      const container = j < other.keys.length && other.keys[j] === this.keys[i]
+        ? andNotContainers(this.containers[i], other.containers[j])
+        : this.containers[i].slice();
+      if (container) {
+        out.keys.push(this.keys[i]);
+        out.containers.push(container);
+      }
+    }
+    return out;
+  }
+
+  /** Members matching predicate, e.g. a range check against a column array */
+  filter(predicate: (ordinal: number) => boolean): SegmentBitmap {
+    const out = new SegmentBitmap();
+    for (const ordinal of this) {
+      if (predicate(ordinal)) out.add(ordinal);
+    }
+    return out;
+  }
+
+  /** First `limit` members in ordinal order */
+  take(limit: number): number[] {
+    const out: number[] = [];
+    if (limit <= 0) return out;
+    for (const ordinal of this) {
+      out.push(ordinal);
+      if (out.length >= limit) break;
+    }
+    return out;
+  }
+
+  *[Symbol.iterator](): IterableIterator<number> {
+    for (let i = 0; i < this.keys.length; i++) {
+      const high = this.keys[i] << 16;
+      const container = this.containers[i];
+      const values = isBitset(container) ? toArray(container) : container;
+      for (const low of values) yield high + low;
+    }
+  }
+
+  static union(bitmaps: SegmentBitmap[]): SegmentBitmap {
+    return bitmaps.reduce((acc, bitmap) => acc.or(bitmap), new SegmentBitmap());
+  }
+}
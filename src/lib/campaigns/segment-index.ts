@@ -0,0 +1,450 @@
+/**
+ * Segment Index
+ * In-memory bitmap index over a tenant's audience members
+ *
+ * Every audience member (a contact of a tenant's client, or the client itself
+ * when it has no contacts, as resolveFromFilters builds them) gets an
+ * ordinal. Each attribute value keeps a SegmentBitmap of the ordinals that
+ * have it:
+ *
+ *   org:<id>             clients.org_id, for org-scoped audiences
+ *   role:<code>          primary role code
+ *   has_role             any primary role code
+ *   client_type:<type>   clients.client_type
+ *   state:<ST>           state parsed from the client address
+ *   tag:<name>           client tag
+ *   label:<label>        lead score label
+ *   active               client is active
+ *   has_contact          row is a contact (not a client-only row)
+ *   has_email            row has a send address
+ *   bounced              hard bounce (contact tag or bounce suppression)
+ *   unsubscribed         unsubscribe / complaint suppression
+ *   suppressed           address is on email_suppressions for any reason
+ *
+ * Segment counts and samples are bitmap AND/OR/NOT plus, for numeric
+ * ranges, a pass over the surviving ordinals. The index is fed by
+ * segment_index_rows(): a full build pages through every member, and later
+ * calls only fetch clients changed since the last watermark and replace
+ * their rows. Deleted rows are not reported by the watermark query, so the
+ * index is rebuilt from scratch every REBUILD_INTERVAL_MS or once a quarter
+ * of its ordinals are dead.
+ */
+
+import { createClient } from '@/lib/supabase/server';
+import { SegmentBitmap } from './segment-bitmap';
+
+const PAGE_SIZE = 1000;
+const REFRESH_INTERVAL_MS = 5_000;
+const REBUILD_INTERVAL_MS = 15 * 60_000;
+const WATERMARK_OVERLAP_MS = 2 * 60_000;
+const MAX_CACHED_TENANTS = 20;
+const NIL_UUID = '00000000-0000-0000-0000-000000000000';
+
+const BOUNCE_REASONS = ['bounce', 'bounced'];
+const UNSUBSCRIBE_REASONS = ['unsubscribe', 'unsubscribed', 'complaint', 'spam_complaint'];
+
+export interface SegmentMember {
+  contactId: string | null;
+  clientId: string;
+  email: string;
+  firstName: string | null;
+  lastName: string | null;
+  companyName: string;
+  primaryRoleCode: string | null;
+  lastOrderAt: string | null;
+  activeOrders: number;
+  totalRevenue: number;
+  leadScore: number | null;
+}
+
+interface SegmentIndexRow {
+  client_id: string;
+  org_id: string | null;
+  contact_id: string | null;
+  row_key: string;
+  email: string | null;
+  first_name: string | null;
+  last_name: string | null;
+  company_name: string;
+  primary_role_code: string | null;
+  client_type: string | null;
+  is_active: boolean;
+  address: string | null;
+  tags: string[];
+  email_bounced: boolean;
+  last_order_at: string | null;
+  active_orders: number;
+  total_revenue: number | string;
+  lead_score: number | null;
+  lead_label: string | null;
+  snapshot_at: string;
+}
+
+/**
+ * Two-letter state from an address ending in "..., ST" or "..., ST 12345"
+ */
+export function stateFromAddress(address: string | null | undefined): string | null {
+  const tail = address?.split(',').pop()?.trim().toUpperCase();
+  if (!tail) return null;
+  const match = tail.match(/^([A-Z]{2})(\s+\d{5}(-\d{4})?)?$/);
+  return match ? match[1] : tail;
+}
+
+export class SegmentIndex {
+  readonly tenantId: string;
+  readonly builtAt: number;
+  refreshedAt = Date.now();
+  watermark: string | null = null;
+
+  private members: (SegmentMember | null)[] = [];
+  private keysByOrdinal: string[][] = [];
+  private bitmaps = new Map<string, SegmentBitmap>();
+  private live = new SegmentBitmap();
+  private ordinalsByClient = new Map<string, number[]>();
+  private ordinalsByEmail = new Map<string, number[]>();
+  private ordinalByContact = new Map<string, number>();
+  private bouncedByTag = new SegmentBitmap();
+  private suppressions = new Map<string, string | null>();
+  private dead = 0;
+
+  /** builtAt is when the build started reading, so newer builds compare later */
+  constructor(tenantId: string, builtAt: number = Date.now()) {
+    this.tenantId = tenantId;
+    this.builtAt = builtAt;
+  }
+
+  /** Every live member */
+  all(): SegmentBitmap {
+    return this.live;
+  }
+
+  /** Members with an attribute, e.g. get('active') or get('role:realtor') */
+  get(key: string): SegmentBitmap {
+    return this.bitmaps.get(key) || new SegmentBitmap();
+  }
+
+  /** Members with any of the values of an attribute */
+  any(attribute: string, values: string[]): SegmentBitmap {
+    return SegmentBitmap.union(values.map((value) => this.get(`${attribute}:${value}`)));
+  }
+
+  member(ordinal: number): SegmentMember {
+    return this.members[ordinal]!;
+  }
+
+  /** Members of a bitmap in ordinal order, optionally only the first `limit` */
+  resolve(bitmap: SegmentBitmap, limit?: number): SegmentMember[] {
+    const ordinals = limit === undefined ? Array.from(bitmap) : bitmap.take(limit);
+    return ordinals.map((ordinal) => this.members[ordinal]!);
+  }
+
+  /** Attribute keys currently indexed, for diagnostics */
+  keys(): string[] {
+    return Array.from(this.bitmaps.keys()).sort();
+  }
+
+  get size(): number {
+    return this.live.size;
+  }
+
+  get needsRebuild(): boolean {
+    return Date.now() - this.builtAt > REBUILD_INTERVAL_MS || this.dead > this.members.length / 4;
+  }
+
+  private mark(ordinal: number, key: string): void {
+    let bitmap = this.bitmaps.get(key);
+    if (!bitmap) {
+      bitmap = new SegmentBitmap();
+      this.bitmaps.set(key, bitmap);
+    }
+    if (bitmap.has(ordinal)) return;
+    bitmap.add(ordinal);
+    this.keysByOrdinal[ordinal].push(key);
+  }
+
+  private unmark(ordinal: number, key: string): void {
+    const bitmap = this.bitmaps.get(key);
+    if (!bitmap?.has(ordinal)) return;
+    bitmap.remove(ordinal);
+    if (bitmap.isEmpty()) this.bitmaps.delete(key);
+    this.keysByOrdinal[ordinal] = this.keysByOrdinal[ordinal].filter((k) => k !== key);
+  }
+
+  private markSuppression(ordinal: number, reason: string | null): void {
+    this.mark(ordinal, 'suppressed');
+    if (reason && BOUNCE_REASONS.includes(reason)) this.mark(ordinal, 'bounced');
+    if (reason && UNSUBSCRIBE_REASONS.includes(reason)) this.mark(ordinal, 'unsubscribed');
+  }
+
+  /** Drop the flags an earlier suppression reason set (a contact-tag bounce stays) */
+  private clearSuppression(ordinal: number, reason: string | null): void {
+    if (reason && BOUNCE_REASONS.includes(reason) && !this.bouncedByTag.has(ordinal)) {
+      this.unmark(ordinal, 'bounced');
+    }
+    if (reason && UNSUBSCRIBE_REASONS.includes(reason)) this.unmark(ordinal, 'unsubscribed');
+  }
+
+  /**
+   * Replace every row of the clients present in rows. A contact already
+   * indexed under another client (it moved) loses its old row too.
+   */
+  apply(rows: SegmentIndexRow[]): void {
+    const clients = new Set(rows.map((row) => row.client_id));
+    for (const clientId of clients) this.removeClient(clientId);
+    for (const row of rows) {
+      const moved = row.contact_id ? this.ordinalByContact.get(row.contact_id) : undefined;
+      if (moved !== undefined) this.removeOrdinal(moved);
+    }
+
+    for (const row of rows) {
+      const ordinal = this.members.length;
+      const email = row.email?.trim() || '';
+      this.members.push({
+        contactId: row.contact_id,
+        clientId: row.client_id,
+        email,
+        firstName: row.first_name,
+        lastName: row.last_name,
+        companyName: row.company_name,
+        primaryRoleCode: row.primary_role_code,
+        lastOrderAt: row.last_order_at,
+        activeOrders: row.active_orders,
+        totalRevenue: parseFloat(row.total_revenue?.toString() || '0'),
+        leadScore: row.lead_score,
+      });
+      this.keysByOrdinal.push([]);
+      this.live.add(ordinal);
+
+      const byClient = this.ordinalsByClient.get(row.client_id);
+      if (byClient) byClient.push(ordinal);
+      else this.ordinalsByClient.set(row.client_id, [ordinal]);
+      if (row.contact_id) this.ordinalByContact.set(row.contact_id, ordinal);
+
+      if (row.org_id) this.mark(ordinal, `org:${row.org_id}`);
+      if (row.primary_role_code) {
+        this.mark(ordinal, `role:${row.primary_role_code}`);
+        this.mark(ordinal, 'has_role');
+      }
+      if (row.client_type) this.mark(ordinal, `client_type:${row.client_type}`);
+      const state = stateFromAddress(row.address);
+      if (state) this.mark(ordinal, `state:${state}`);
+      for (const tag of row.tags || []) this.mark(ordinal, `tag:${tag}`);
+      if (row.lead_label) this.mark(ordinal, `label:${row.lead_label}`);
+      if (row.is_active) this.mark(ordinal, 'active');
+      if (row.contact_id) this.mark(ordinal, 'has_contact');
+      if (row.email_bounced) {
+        this.bouncedByTag.add(ordinal);
+        this.mark(ordinal, 'bounced');
+      }
+
+      if (email) {
+        this.mark(ordinal, 'has_email');
+        const address = email.toLowerCase();
+        const byEmail = this.ordinalsByEmail.get(address);
+        if (byEmail) byEmail.push(ordinal);
+        else this.ordinalsByEmail.set(address, [ordinal]);
+        if (this.suppressions.has(address)) {
+          this.markSuppression(ordinal, this.suppressions.get(address)!);
+        }
+      }
+    }
+  }
+
+  /** Record suppressed addresses and flag the members sending to them */
+  suppress(suppressions: { email_address: string; reason: string | null }[]): void {
+    for (const { email_address, reason } of suppressions) {
+      const address = email_address.toLowerCase();
+      const known = this.suppressions.has(address);
+      const previous = this.suppressions.get(address) ?? null;
+      if (known && previous === reason) continue;
+      this.suppressions.set(address, reason);
+      for (const ordinal of this.ordinalsByEmail.get(address) || []) {
+        if (!this.members[ordinal]) continue;
+        if (known) this.clearSuppression(ordinal, previous);
+        this.markSuppression(ordinal, reason);
+      }
+    }
+  }
+
+  private removeClient(clientId: string): void {
+    for (const ordinal of [...(this.ordinalsByClient.get(clientId) || [])]) {
+      this.removeOrdinal(ordinal);
+    }
+  }
+
+  private removeOrdinal(ordinal: number): void {
+    const member = this.members[ordinal];
+    if (!member) return;
+
+    for (const key of this.keysByOrdinal[ordinal]) {
+      const bitmap = this.bitmaps.get(key);
+      if (!bitmap) continue;
+      bitmap.remove(ordinal);
+      if (bitmap.isEmpty()) this.bitmaps.delete(key);
+    }
+    this.keysByOrdinal[ordinal] = [];
+    this.live.remove(ordinal);
+    this.bouncedByTag.remove(ordinal);
+
+    const address = member.email.toLowerCase();
+    if (address) {
+      const remaining = (this.ordinalsByEmail.get(address) || []).filter((o) => o !== ordinal);
+      if (remaining.length) this.ordinalsByEmail.set(address, remaining);
+      else this.ordinalsByEmail.delete(address);
+    }
+
+    const siblings = (this.ordinalsByClient.get(member.clientId) || []).filter((o) => o !== ordinal);
+    if (siblings.length) this.ordinalsByClient.set(member.clientId, siblings);
+    else this.ordinalsByClient.delete(member.clientId);
+
+    if (member.contactId && this.ordinalByContact.get(member.contactId) === ordinal) {
+      this.ordinalByContact.delete(member.contactId);
+    }
+
+    this.members[ordinal] = null;
+    this.dead++;
+  }
+}
+
+// =====================================================
+// Loading
+// =====================================================
+
+const indexes = new Map<string, SegmentIndex>();
+const pending = new Map<string, Promise<SegmentIndex>>();
+
+async function fetchRows(
+  supabase: Awaited<ReturnType<typeof createClient>>,
+  tenantId: string,
+  since: string | null
+): Promise<SegmentIndexRow[]> {
+  const rows: SegmentIndexRow[] = [];
+  let after: SegmentIndexRow | null = null;
+
+  for (;;) {
+    const { data, error } = await supabase.rpc('segment_index_rows', {
+      p_tenant_id: tenantId,
+      p_since: since,
+      p_after_client: after?.client_id ?? null,
+      p_after_contact: after?.row_key ?? NIL_UUID,
+      p_limit: PAGE_SIZE,
+    });
+
+    if (error) {
+      throw new Error(`Failed to load segment index rows: ${error.message}`);
+    }
+
+    const page = (data || []) as SegmentIndexRow[];
+    for (const row of page) rows.push(row);
+    if (page.length < PAGE_SIZE) break;
+    after = page[page.length - 1];
+  }
+
+  return rows;
+}
+
+async function fetchSuppressions(
+  supabase: Awaited<ReturnType<typeof createClient>>,
+  tenantId: string,
+  since: string | null
+): Promise<{ email_address: string; reason: string | null }[]> {
+  const suppressions: { email_address: string; reason: string | null }[] = [];
+
+  for (let from = 0; ; from += PAGE_SIZE) {
+    let query = supabase
+      .from('email_suppressions')
+      .select('email_address, reason')
+      .eq('tenant_id', tenantId)
+      .order('id')
+      .range(from, from + PAGE_SIZE - 1);
+    if (since) query = query.gt('created_at', since);
+
+    const { data, error } = await query;
+    if (error) {
+      throw new Error(`Failed to load suppressions: ${error.message}`);
+    }
+
+    for (const row of data || []) suppressions.push(row);
+    if (!data || data.length < PAGE_SIZE) break;
+  }
+
+  return suppressions;
+}
+
+function nextWatermark(rows: SegmentIndexRow[], current: string | null): string | null {
+  if (!rows.length) return current;
+  return new Date(new Date(rows[0].snapshot_at).getTime() - WATERMARK_OVERLAP_MS).toISOString();
+}
+
+async function build(tenantId: string): Promise<SegmentIndex> {
+  const startTime = Date.now();
+  const supabase = await createClient();
+  const [rows, suppressions] = await Promise.all([
+    fetchRows(supabase, tenantId, null),
+    fetchSuppressions(supabase, tenantId, null),
+  ]);
+
+  const index = new SegmentIndex(tenantId, startTime);
+  index.suppress(suppressions);
+  index.apply(rows);
+  index.watermark = nextWatermark(rows, null) ?? new Date(startTime - WATERMARK_OVERLAP_MS).toISOString();
+
+  console.log(`[Segment Index] Built ${tenantId}: ${index.size} members, ${index.keys().length} keys in ${Date.now() - startTime}ms`);
+  return index;
+}
+
+async function refresh(index: SegmentIndex): Promise<SegmentIndex> {
+  const supabase = await createClient();
+  const since = index.watermark;
+  const [rows, suppressions] = await Promise.all([
+    fetchRows(supabase, index.tenantId, since),
+    fetchSuppressions(supabase, index.tenantId, since),
+  ]);
+
+  index.suppress(suppressions);
+  index.apply(rows);
+  index.watermark = nextWatermark(rows, since);
+  index.refreshedAt = Date.now();
+  return index;
+}
+
+/**
+ * Segment index for a tenant, built on first use and refreshed from change
+ * watermarks at most every REFRESH_INTERVAL_MS. `rebuild` forces a full
+ * build, for callers that must not see deleted contacts (campaign launch).
+ * Every user of a tenant shares one index; org-scoped callers narrow it
+ * with get(`org:<id>`).
+ */
+export async function getSegmentIndex(
+  tenantId: string,
+  options: { rebuild?: boolean } = {}
+): Promise<SegmentIndex> {
+  const inFlight = pending.get(tenantId);
+  if (inFlight && !options.rebuild) return inFlight;
+
+  const current = indexes.get(tenantId);
+  if (current && !options.rebuild && !current.needsRebuild &&
+      Date.now() - current.refreshedAt < REFRESH_INTERVAL_MS) {
+    return current;
+  }
+
+  const work = (current && !options.rebuild && !current.needsRebuild ? refresh(current) : build(tenantId))
+    .then((index) => {
+      // A slower refresh or build that started before the stored index
+      // must not replace it
+      const stored = indexes.get(tenantId);
+      if (stored && stored !== index && stored.builtAt > index.builtAt) return stored;
+      indexes.delete(tenantId);
+      indexes.set(tenantId, index);
+      if (indexes.size > MAX_CACHED_TENANTS) {
+        indexes.delete(indexes.keys().next().value!);
+      }
+      return index;
+    })
+    .finally(() => {
+      if (pending.get(tenantId) === work) pending.delete(tenantId);
+    });
+
+  pending.set(tenantId, work);
+  return work;
+}
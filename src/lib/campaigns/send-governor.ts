@@ -0,0 +1,98 @@
+/**
+ * Send Rate Governor
+ * Token buckets shared by every campaign executor
+ *
+ * Each send draws one token from three buckets at once (see
+ * 20260110080000_send_rate_buckets.sql):
+ * - campaign: at most send_rate_per_hour in any rolling hour
+ * - mailbox:  the tenant's campaign sender address (CAMPAIGN_FROM_EMAIL)
+ * - tenant:   every campaign the tenant is sending
+ *
+ * Executors name the buckets; their sizes live in the database (the
+ * campaign's send settings, or send_rate_bucket_defaults and
+ * configure_send_bucket() for mailbox and tenant buckets), so no caller can
+ * resize a budget. Executors lease a batch of slots before sending and hand
+ * back what they do not use. The lease is one row lock per bucket, so
+ * checking the limit costs the same whatever the send history, and
+ * concurrent executors can never be granted more than the buckets hold.
+ */
+
+import { createServiceRoleClient } from '@/lib/supabase/server';
+
+export type SendBucketScope = 'campaign' | 'mailbox' | 'tenant';
+
+export interface SendBucket {
+  scope: SendBucketScope;
+  key: string;
+}
+
+/**
+ * Sender address campaign emails go out from (same default as email-sender)
+ */
+export function campaignMailbox(): string {
+  return (process.env.CAMPAIGN_FROM_EMAIL || 'campaigns@salesmod.com').toLowerCase();
+}
+
+/**
+ * Buckets a campaign's sends are drawn from
+ *
+ * The mailbox bucket is per tenant, so one tenant's campaigns cannot use up
+ * the others' share of the sender address. Campaigns without a tenant get a
+ * mailbox bucket of their own.
+ */
+export function getCampaignSendBuckets({
+  campaignId,
+  tenantId,
+}: {
+  campaignId: string;
+  tenantId: string | null;
+}): SendBucket[] {
+  const buckets: SendBucket[] = [
+    { scope: 'campaign', key: campaignId },
+    { scope: 'mailbox', key: `${tenantId ?? campaignId}:${campaignMailbox()}` },
+  ];
+
+  if (tenantId) {
+    buckets.push({ scope: 'tenant', key: tenantId });
+  }
+
+  return buckets;
+}
+
+/**
+ * Lease up to `want` send slots from every bucket; returns how many were granted
+ */
+export async function leaseSendSlots(buckets: SendBucket[], want: number): Promise<number> {
+  if (want <= 0) return 0;
+
+  const supabase = createServiceRoleClient();
+  const { data, error } = await supabase.rpc('take_send_tokens', {
+    p_buckets: buckets,
+    p_want: want,
+  });
+
+  if (error) {
+    // Fail closed: sending without a lease could exceed a shared budget
+    console.error('[Send Governor] Lease failed:', error);
+    return 0;
+  }
+
+  return typeof data === 'number' ? data : 0;
+}
+
+/**
+ * Hand back leased slots that were not used
+ */
+export async function releaseSendSlots(buckets: SendBucket[], count: number): Promise<void> {
+  if (count <= 0) return;
+
+  const supabase = createServiceRoleClient();
+  const { error } = await supabase.rpc('release_send_tokens', {
+    p_buckets: buckets,
+    p_count: count,
+  });
+
+  if (error) {
+    console.error('[Send Governor] Release failed:', error);
+  }
+}
@@ -0,0 +1,87 @@
+/**
+ * Batch Lead Scoring Tests
+ *
+ * - scoreLeadFeatures applies calculateLeadScore's fit / engagement /
+ *   recency / value rules to aggregated feature rows
+ * - Org ranks follow total score, ties keep input (contact_id) order
+ */
+
+import { describe, it, expect, vi } from 'vitest';
+import { scoreLeadFeatures, type LeadScoreFeatures } from '../lead-scoring';
+
+vi.mock('@/lib/supabase/server', () => ({
+  createClient: vi.fn(),
+}));
+
+const NOW = Date.UTC(2026, 0, 10);
+const DAY = 24 * 60 * 60 * 1000;
+
+function features(overrides: Partial<LeadScoreFeatures>): LeadScoreFeatures {
+  return {
+    contact_id: 'contact-1',
+    primary_role_code: null,
+    has_address: false,
+    active_orders: 0,
+    total_revenue: 0,
+    completed_emails: 0,
+    completed_meetings: 0,
+    other_activities: 0,
+    email_activities: 0,
+    last_activity_at: null,
+    ...overrides,
+  };
+}
+
+describe('scoreLeadFeatures', () => {
+  it('scores each component like calculateLeadScore', () => {
+    const batch = scoreLeadFeatures([
+      features({
+        contact_id: 'a',
+        primary_role_code: 'loan_officer',
+        has_address: true,
+        active_orders: 2,
+        total_revenue: 12000,
+        completed_emails: 3,
+        completed_meetings: 1,
+        other_activities: 2,
+        last_activity_at: new Date(NOW - 3 * DAY).toISOString(),
+      }),
+      features({
+        contact_id: 'b',
+        primary_role_code: 'realtor',
+        total_revenue: '60000.00',
+        completed_emails: 20,
+        completed_meetings: 5,
+        other_activities: 10,
+        last_activity_at: new Date(NOW - 20 * DAY).toISOString(),
+      }),
+    ], NOW);
+
+    // role 15 + address 5 + orders 5; 3 emails 6 + 1 meeting 5 + 2 other 6;
+    // 3 days 15; revenue > 10k 3 + 2 orders 2
+    expect(Array.from(batch.fit)).toEqual([25, 10]);
+    expect(Array.from(batch.engagement)).toEqual([17, 50]);
+    expect(Array.from(batch.recency)).toEqual([15, 10]);
+    expect(Array.from(batch.value)).toEqual([5, 5]);
+    expect(Array.from(batch.total)).toEqual([62, 75]);
+  });
+
+  it('scores contacts without activity or client data as zero', () => {
+    const batch = scoreLeadFeatures([features({})], NOW);
+
+    expect(batch.total[0]).toBe(0);
+    expect(batch.recency[0]).toBe(0);
+  });
+
+  it('ranks by total score and keeps input order for ties', () => {
+    const batch = scoreLeadFeatures([
+      features({ contact_id: 'c1' }),
+      features({ contact_id: 'c2', primary_role_code: 'realtor' }),
+      features({ contact_id: 'c3' }),
+      features({ contact_id: 'c4', primary_role_code: 'amc_contact' }),
+    ], NOW);
+
+    expect(batch.contactIds).toEqual(['c1', 'c2', 'c3', 'c4']);
+    expect(Array.from(batch.rank)).toEqual([3, 2, 4, 1]);
+  });
+});
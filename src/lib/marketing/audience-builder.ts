@@ -1,6 +1,7 @@
 import { createClient } from '@/lib/supabase/server';
 import { AudienceFilter } from '@/lib/types/marketing';
 import { Contact } from '@/lib/types';
+import { getSegmentIndex, stateFromAddress } from '@/lib/campaigns/segment-index';
 
 /**
  * Get contacts matching audience filter criteria
@@ -136,10 +137,13 @@ export async function getAudienceContacts(
   }
 
   // Filter by geography
+  // Same state parsing as the segment index getAudienceSize counts with
   if (filter.states?.length) {
-    filtered = filtered.filter(contact =>
-      filter.states?.includes(contact.client?.address?.split(',').pop()?.trim() || '')
-    );
+    const states = new Set(filter.states.map(s => s.toUpperCase()));
+    filtered = filtered.filter(contact => {
+      const state = stateFromAddress(contact.client?.address);
+      return state !== null && states.has(state);
+    });
   }
 
   return filtered as Contact[];
@@ -150,10 +154,78 @@ export async function getAudienceContacts(
  */
 export async function getAudienceSize(
   orgId: string,
+  tenantId: string,
   filter: AudienceFilter
 ): Promise<number> {
-  const contacts = await getAudienceContacts(orgId, filter);
-  return contacts.length;
+  const index = await getSegmentIndex(tenantId);
+
+  // Same filters as getAudienceContacts, over the campaign segment index
+  let members = index.get('has_contact').and(index.get(`org:${orgId}`));
+
+  if (filter.targetRoleCodes?.length) {
+    members = members.and(index.any('role', filter.targetRoleCodes));
+  }
+
+  if (filter.targetRoleCategories?.length) {
+    const supabase = await createClient();
+    const { data: roles } = await supabase
+      .from('party_roles')
+      .select('code')
+      .in('category', filter.targetRoleCategories);
+
+    if (roles) {
+      members = members.and(index.any('role', roles.map(r => r.code)));
+    }
+  }
+
+  // NOT IN drops contacts without a role code, as the query filter does
+  if (filter.excludeRoleCodes?.length) {
+    members = members
+      .and(index.get('has_role'))
+      .andNot(index.any('role', filter.excludeRoleCodes));
+  }
+
+  if (filter.includeTags?.length) {
+    members = members.and(index.any('tag', filter.includeTags));
+  }
+
+  if (filter.excludeTags?.length) {
+    members = members.andNot(index.any('tag', filter.excludeTags));
+  }
+
+  if (filter.leadLabels?.length) {
+    members = members.and(index.any('label', filter.leadLabels));
+  }
+
+  if (filter.states?.length) {
+    members = members.and(index.any('state', filter.states.map(s => s.toUpperCase())));
+  }
+
+  const ranged =
+    filter.minLeadScore !== undefined ||
+    filter.maxLeadScore !== undefined ||
+    filter.hasOrders !== undefined ||
+    filter.orderCountMin !== undefined ||
+    filter.orderCountMax !== undefined ||
+    filter.totalRevenueMin !== undefined;
+
+  if (ranged) {
+    members = members.filter(ordinal => {
+      const member = index.member(ordinal);
+      const score = member.leadScore || 0;
+
+      if (filter.minLeadScore !== undefined && score < filter.minLeadScore) return false;
+      if (filter.maxLeadScore !== undefined && score > filter.maxLeadScore) return false;
+      if (filter.hasOrders !== undefined && (member.activeOrders > 0) !== filter.hasOrders) return false;
+      if (filter.orderCountMin !== undefined && member.activeOrders < filter.orderCountMin) return false;
+      if (filter.orderCountMax !== undefined && member.activeOrders > filter.orderCountMax) return false;
+      if (filter.totalRevenueMin !== undefined && member.totalRevenue < filter.totalRevenueMin) return false;
+
+      return true;
+    });
+  }
+
+  return members.size;
 }
 
 /**
@@ -44,6 +44,7 @@ export async function calculateLeadScore(
     .from('lead_scores')
     .upsert({
       contact_id: contactId,
+      org_id: contact.client?.org_id,
       fit_score: fitScore,
       engagement_score: engagementScore,
       recency_score: recencyScore,
@@ -72,23 +73,35 @@ export async function calculateLeadScore(
  * Based on role, territory, company profile
  */
 function calculateFitScore(contact: any): number {
+  return fitPoints(
+    contact.primary_role_code,
+    !!contact.client?.address,
+    contact.client?.active_orders || 0
+  );
+}
+
+function fitPoints(
+  roleCode: PartyRoleCode | null | undefined,
+  hasAddress: boolean,
+  activeOrders: number
+): number {
   let score = 0;
 
   // Role-based scoring
-  const roleScore = getRoleScore(contact.primary_role_code);
+  const roleScore = getRoleScore(roleCode);
   score += roleScore;
 
   // Geographic fit (within target territory)
   // TODO: Implement territory matching
   // For now, add 5 points if client has address
-  if (contact.client?.address) {
+  if (hasAddress) {
     score += 5;
   }
 
   // Company size/profile fit
   // TODO: Implement company profile scoring
   // For now, add points based on existing data
-  if (contact.client?.active_orders && contact.client.active_orders > 0) {
+  if (activeOrders > 0) {
     score += 5;
   }
 
@@ -144,28 +157,30 @@ function getRoleScore(roleCode: PartyRoleCode | null | undefined): number {
  * Based on email opens, clicks, website visits, content interactions
  */
 async function calculateEngagementScore(contact: any): Promise<number> {
-  let score = 0;
-
-  // Email engagement (0-20 points)
   const emailActivities = contact.activities?.filter(
     (a: any) => a.activity_type === 'email' && a.status === 'completed'
   ) || [];
-  const emailScore = Math.min(emailActivities.length * 2, 20);
-  score += emailScore;
-
-  // Meeting/call engagement (0-15 points)
   const meetingActivities = contact.activities?.filter(
     (a: any) => ['meeting', 'call'].includes(a.activity_type) && a.status === 'completed'
   ) || [];
-  const meetingScore = Math.min(meetingActivities.length * 5, 15);
-  score += meetingScore;
-
-  // Other interactions (0-15 points)
   const otherActivities = contact.activities?.filter(
     (a: any) => !['email', 'meeting', 'call'].includes(a.activity_type)
   ) || [];
-  const otherScore = Math.min(otherActivities.length * 3, 15);
-  score += otherScore;
+
+  return engagementPoints(emailActivities.length, meetingActivities.length, otherActivities.length);
+}
+
+function engagementPoints(completedEmails: number, completedMeetings: number, otherActivities: number): number {
+  let score = 0;
+
+  // Email engagement (0-20 points)
+  score += Math.min(completedEmails * 2, 20);
+
+  // Meeting/call engagement (0-15 points)
+  score += Math.min(completedMeetings * 5, 15);
+
+  // Other interactions (0-15 points)
+  score += Math.min(otherActivities * 3, 15);
 
   return Math.min(score, 50);
 }
@@ -185,10 +200,11 @@ function calculateRecencyScore(contact: any): number {
     return currentDate > latestDate ? current : latest;
   });
 
-  const daysSince = Math.floor(
-    (Date.now() - new Date(mostRecent.created_at || mostRecent.scheduled_at).getTime()) /
-    (1000 * 60 * 60 * 24)
-  );
+  return recencyPoints(new Date(mostRecent.created_at || mostRecent.scheduled_at).getTime(), Date.now());
+}
+
+function recencyPoints(lastActivityMs: number, now: number): number {
+  const daysSince = Math.floor((now - lastActivityMs) / (1000 * 60 * 60 * 24));
 
   // Scoring based on recency
   if (daysSince <= 7) return 15;      // Last week
@@ -207,10 +223,16 @@ function calculateRecencyScore(contact: any): number {
 function calculateValueScore(client: any): number {
   if (!client) return 0;
 
+  return valuePoints(
+    parseFloat(client.total_revenue?.toString() || '0'),
+    client.active_orders || 0
+  );
+}
+
+function valuePoints(revenue: number, orders: number): number {
   let score = 0;
 
   // Historical revenue (0-5 points)
-  const revenue = parseFloat(client.total_revenue?.toString() || '0');
   if (revenue > 50000) score += 5;
   else if (revenue > 20000) score += 4;
   else if (revenue > 10000) score += 3;
@@ -218,7 +240,6 @@ function calculateValueScore(client: any): number {
   else if (revenue > 0) score += 1;
 
   // Order volume (0-5 points)
-  const orders = client.active_orders || 0;
   if (orders >= 10) score += 5;
   else if (orders >= 5) score += 4;
   else if (orders >= 3) score += 3;
@@ -268,26 +289,181 @@ async function buildLeadSignals(contact: any): Promise<LeadSignals> {
   };
 }
 
+/**
+ * Per-contact scoring inputs, one row of lead_score_features
+ */
+export interface LeadScoreFeatures {
+  contact_id: string;
+  primary_role_code: PartyRoleCode | null;
+  has_address: boolean;
+  active_orders: number;
+  total_revenue: number | string;
+  completed_emails: number;
+  completed_meetings: number;
+  other_activities: number;
+  email_activities: number;
+  last_activity_at: string | null;
+}
+
+/**
+ * Score components for a batch of contacts, one array per column.
+ * rank[i] is contact i's position in the batch by total score (1 = best).
+ */
+export interface LeadScoreBatch {
+  contactIds: string[];
+  fit: Uint8Array;
+  engagement: Uint8Array;
+  recency: Uint8Array;
+  value: Uint8Array;
+  total: Uint8Array;
+  rank: Uint32Array;
+}
+
+const FEATURE_PAGE_SIZE = 1000;
+const UPSERT_CHUNK_SIZE = 500;
+
+/**
+ * Score every contact in a features batch with the same rules as
+ * calculateLeadScore. Ties in total score rank by input order, which is
+ * contact_id order for lead_score_features.
+ */
+export function scoreLeadFeatures(
+  features: LeadScoreFeatures[],
+  now: number = Date.now()
+): LeadScoreBatch {
+  const n = features.length;
+  const batch: LeadScoreBatch = {
+    contactIds: new Array(n),
+    fit: new Uint8Array(n),
+    engagement: new Uint8Array(n),
+    recency: new Uint8Array(n),
+    value: new Uint8Array(n),
+    total: new Uint8Array(n),
+    rank: new Uint32Array(n),
+  };
+
+  for (let i = 0; i < n; i++) {
+    const f = features[i];
+    batch.contactIds[i] = f.contact_id;
+    batch.fit[i] = fitPoints(f.primary_role_code, f.has_address, f.active_orders);
+    batch.engagement[i] = engagementPoints(f.completed_emails, f.completed_meetings, f.other_activities);
+    batch.recency[i] = f.last_activity_at ? recencyPoints(new Date(f.last_activity_at).getTime(), now) : 0;
+    batch.value[i] = valuePoints(parseFloat(f.total_revenue?.toString() || '0'), f.active_orders);
+    batch.total[i] = batch.fit[i] + batch.engagement[i] + batch.recency[i] + batch.value[i];
+  }
+
+  // Array.prototype.sort is stable, so equal totals keep input order
+  const order = Array.from({ length: n }, (_, i) => i).sort(
+    (a, b) => batch.total[b] - batch.total[a]
+  );
+  order.forEach((index, position) => {
+    batch.rank[index] = position + 1;
+  });
+
+  return batch;
+}
+
+/**
+ * Same shape as buildLeadSignals, from aggregated activity counts
+ */
+function signalsFromFeatures(f: LeadScoreFeatures): LeadSignals {
+  return {
+    emailOpens: f.email_activities,
+    emailClicks: 0,
+    websiteVisits: 0,
+    contentDownloads: 0,
+    webinarAttendance: 0,
+    socialInteractions: 0,
+    lastEngagement: f.last_activity_at ?? undefined,
+    preferredChannels: f.email_activities > 0 ? ['email'] : [],
+    topicInterests: [],
+  };
+}
+
 /**
  * Recalculate scores for all contacts in an org
+ *
+ * Reads every contact's inputs from lead_score_features (one keyset page of
+ * FEATURE_PAGE_SIZE contacts per request), scores them in memory and writes
+ * the scores and org ranks back with one upsert per UPSERT_CHUNK_SIZE
+ * contacts.
  */
 export async function recalculateAllScores(orgId: string): Promise<number> {
   const supabase = await createClient();
 
-  // Get all contacts for the org
-  const { data: contacts } = await supabase
-    .from('contacts')
-    .select('id, client:clients!inner(org_id)')
-    .eq('client.org_id', orgId);
+  const features: LeadScoreFeatures[] = [];
+  let after: string | null = null;
+  for (;;) {
+    const { data, error } = await supabase.rpc('lead_score_features', {
+      p_org_id: orgId,
+      p_after: after,
+      p_limit: FEATURE_PAGE_SIZE,
+    });
+
+    if (error) {
+      console.error('Error fetching lead score features:', error);
+      return 0;
+    }
+
+    const page = (data || []) as LeadScoreFeatures[];
+    for (const row of page) features.push(row);
+    if (page.length < FEATURE_PAGE_SIZE) break;
+    after = page[page.length - 1].contact_id;
+  }
+
+  if (features.length === 0) return 0;
 
-  if (!contacts) return 0;
+  const batch = scoreLeadFeatures(features);
+  const calculatedAt = new Date().toISOString();
 
   let successCount = 0;
+  let failedChunks = 0;
+
+  for (let start = 0; start < features.length; start += UPSERT_CHUNK_SIZE) {
+    const rows = [];
+    for (let i = start; i < Math.min(start + UPSERT_CHUNK_SIZE, features.length); i++) {
+      rows.push({
+        contact_id: batch.contactIds[i],
+        org_id: orgId,
+        fit_score: batch.fit[i],
+        engagement_score: batch.engagement[i],
+        recency_score: batch.recency[i],
+        value_score: batch.value[i],
+        total_score: batch.total[i],
+        label: getLeadLabel(batch.total[i]),
+        signals: signalsFromFeatures(features[i]),
+        org_rank: batch.rank[i],
+        last_calculated_at: calculatedAt,
+        updated_at: calculatedAt,
+      });
+    }
+
+    const { error } = await supabase
+      .from('lead_scores')
+      .upsert(rows, { onConflict: 'contact_id' });
+
+    if (error) {
+      console.error('Error upserting lead scores:', error);
+      failedChunks++;
+      continue;
+    }
+    successCount += rows.length;
+  }
+
+  // Scores of contacts that left the org no longer have a place in its
+  // ranking. A failed chunk leaves current contacts looking stale too, so
+  // their previous ranks are kept until a clean run.
+  if (failedChunks > 0) return successCount;
 
-  // Calculate score for each contact
-  for (const contact of contacts) {
-    const score = await calculateLeadScore(contact.id);
-    if (score) successCount++;
+  const { error: staleError } = await supabase
+    .from('lead_scores')
+    .update({ org_rank: null })
+    .eq('org_id', orgId)
+    .lt('last_calculated_at', calculatedAt)
+    .not('org_rank', 'is', null);
+
+  if (staleError) {
+    console.error('Error clearing stale lead ranks:', staleError);
   }
 
   return successCount;
@@ -295,6 +471,10 @@ export async function recalculateAllScores(orgId: string): Promise<number> {
 
 /**
  * Get top leads by score
+ *
+ * Ordered by total score, so contacts rescored one at a time by
+ * calculateLeadScore take their place straight away; org_rank (contact_id
+ * order from the last batch rescore) breaks ties.
  */
 export async function getTopLeads(
   orgId: string,
@@ -311,8 +491,9 @@ export async function getTopLeads(
         client:clients!inner(org_id)
       )
     `)
-    .eq('contact.client.org_id', orgId)
+    .eq('org_id', orgId)
     .order('total_score', { ascending: false })
+    .order('org_rank', { ascending: true, nullsFirst: false })
     .limit(limit);
 
   return (scores || []) as LeadScore[];
@@ -333,9 +514,10 @@ export async function getHotLeads(orgId: string): Promise<LeadScore[]> {
         client:clients!inner(org_id)
       )
     `)
-    .eq('contact.client.org_id', orgId)
+    .eq('org_id', orgId)
     .eq('label', 'hot')
-    .order('total_score', { ascending: false });
+    .order('total_score', { ascending: false })
+    .order('org_rank', { ascending: true, nullsFirst: false });
 
   return (scores || []) as LeadScore[];
 }
@@ -251,6 +251,7 @@ export interface LeadScore {
 
   label: LeadLabel;
   signals?: LeadSignals;
+  orgRank?: number;        // 1 = top lead in the org, set by batch rescoring
 
   lastCalculatedAt: string;
   createdAt: string;
@@ -101,6 +101,7 @@ export const JobParamsSchema = z.object({
   batch_size: z.number().default(10),         // Tasks per batch
   auto_approve: z.boolean().default(false),   // Auto-approve cards
   stop_on_error: z.boolean().default(false),  // Stop job on first error
+  task_worker: z.boolean().optional(),        // Expand tasks in ops task-worker, not agent runs
 
   // Portal checking
   portal_checks: z.boolean().default(false),
@@ -0,0 +1,385 @@
+-- Incremental Job Metrics
+-- Migration: 20260110000000_incremental_job_metrics.sql
+-- Purpose: Replace full REFRESH of the job_metrics materialized view with an
+--          incrementally maintained table that only recomputes changed jobs
+
+-- ============================================================================
+-- 1. CHANGE TRACKING COLUMNS
+-- ============================================================================
+
+-- jobs never got the updated_at column promised in 20251103000000; the
+-- update_jobs_updated_at() function already exists, so wire it up now.
+-- Task status changes and card inserts/updates/deletes all rewrite the
+-- denormalized counters on jobs, so jobs.updated_at moves whenever any of
+-- the job's metrics can change.
+ALTER TABLE public.jobs
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+DROP TRIGGER IF EXISTS trigger_jobs_updated_at ON public.jobs;
+CREATE TRIGGER trigger_jobs_updated_at
+  BEFORE UPDATE ON public.jobs
+  FOR EACH ROW
+  EXECUTE FUNCTION update_jobs_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON public.jobs(updated_at);
+CREATE INDEX IF NOT EXISTS idx_kanban_cards_job_updated_at
+  ON public.kanban_cards(updated_at) WHERE job_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_agent_runs_job_ended_at
+  ON public.agent_runs(ended_at) WHERE job_id IS NOT NULL;
+
+-- ============================================================================
+-- 2. METRICS DEFINITION (plain view, evaluated per job on demand)
+-- ============================================================================
+
+-- Same columns as job_metrics plus tenant_id. Filtering this view by job_id
+-- pushes the predicate below the GROUP BY, so recomputing N jobs costs O(N).
+CREATE OR REPLACE VIEW job_metrics_compute AS
+SELECT
+  j.id AS job_id,
+  j.org_id,
+  j.tenant_id,
+  j.name,
+  j.status,
+  j.created_at,
+  j.started_at,
+  j.finished_at,
+  j.last_run_at,
+
+  j.total_tasks,
+  j.completed_tasks,
+  j.failed_tasks,
+  CASE
+    WHEN j.total_tasks > 0
+    THEN ROUND((j.completed_tasks::NUMERIC / j.total_tasks::NUMERIC) * 100, 2)
+    ELSE 0
+  END AS task_completion_rate,
+
+  j.cards_created,
+  j.cards_approved,
+  j.cards_executed,
+  CASE
+    WHEN j.cards_created > 0
+    THEN ROUND((j.cards_approved::NUMERIC / j.cards_created::NUMERIC) * 100, 2)
+    ELSE 0
+  END AS approval_rate,
+
+  j.emails_sent,
+  j.errors_count,
+
+  COUNT(kc.id) FILTER (WHERE kc.state = 'suggested') AS cards_suggested,
+  COUNT(kc.id) FILTER (WHERE kc.state = 'in_review') AS cards_in_review,
+  COUNT(kc.id) FILTER (WHERE kc.state = 'approved') AS cards_approved_pending,
+  COUNT(kc.id) FILTER (WHERE kc.state = 'executing') AS cards_executing,
+  COUNT(kc.id) FILTER (WHERE kc.state = 'done') AS cards_done,
+  COUNT(kc.id) FILTER (WHERE kc.state = 'blocked') AS cards_blocked,
+  COUNT(kc.id) FILTER (WHERE kc.state = 'rejected') AS cards_rejected,
+
+  COUNT(kc.id) FILTER (WHERE kc.type = 'send_email') AS email_cards,
+  COUNT(kc.id) FILTER (WHERE kc.type = 'create_task') AS task_cards,
+  COUNT(kc.id) FILTER (WHERE kc.type = 'schedule_call') AS call_cards,
+  COUNT(kc.id) FILTER (WHERE kc.type = 'research') AS research_cards,
+  COUNT(kc.id) FILTER (WHERE kc.type = 'follow_up') AS followup_cards,
+  COUNT(kc.id) FILTER (WHERE kc.type = 'create_deal') AS deal_cards,
+
+  CASE
+    WHEN j.started_at IS NOT NULL AND j.finished_at IS NOT NULL
+    THEN EXTRACT(EPOCH FROM (j.finished_at - j.started_at))
+    WHEN j.started_at IS NOT NULL
+    THEN EXTRACT(EPOCH FROM (NOW() - j.started_at))
+    ELSE NULL
+  END AS duration_seconds,
+
+  (SELECT COUNT(*) FROM agent_runs WHERE job_id = j.id) AS total_runs,
+  (SELECT MAX(ended_at) FROM agent_runs WHERE job_id = j.id) AS last_run_ended_at
+
+FROM jobs j
+LEFT JOIN kanban_cards kc ON kc.job_id = j.id
+GROUP BY j.id;
+
+-- ============================================================================
+-- 3. MATERIALIZED METRICS TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.job_metrics_current (
+  job_id UUID PRIMARY KEY REFERENCES public.jobs(id) ON DELETE CASCADE,
+  org_id UUID,
+  tenant_id UUID,
+  name TEXT,
+  status TEXT,
+  created_at TIMESTAMPTZ,
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ,
+  last_run_at TIMESTAMPTZ,
+  total_tasks INTEGER,
+  completed_tasks INTEGER,
+  failed_tasks INTEGER,
+  task_completion_rate NUMERIC,
+  cards_created INTEGER,
+  cards_approved INTEGER,
+  cards_executed INTEGER,
+  approval_rate NUMERIC,
+  emails_sent INTEGER,
+  errors_count INTEGER,
+  cards_suggested BIGINT,
+  cards_in_review BIGINT,
+  cards_approved_pending BIGINT,
+  cards_executing BIGINT,
+  cards_done BIGINT,
+  cards_blocked BIGINT,
+  cards_rejected BIGINT,
+  email_cards BIGINT,
+  task_cards BIGINT,
+  call_cards BIGINT,
+  research_cards BIGINT,
+  followup_cards BIGINT,
+  deal_cards BIGINT,
+  duration_seconds NUMERIC,
+  total_runs BIGINT,
+  last_run_ended_at TIMESTAMPTZ,
+  refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_metrics_current_org ON public.job_metrics_current(org_id);
+CREATE INDEX IF NOT EXISTS idx_job_metrics_current_tenant ON public.job_metrics_current(tenant_id);
+CREATE INDEX IF NOT EXISTS idx_job_metrics_current_status ON public.job_metrics_current(status);
+CREATE INDEX IF NOT EXISTS idx_job_metrics_current_created_at ON public.job_metrics_current(created_at DESC);
+
+ALTER TABLE public.job_metrics_current ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY job_metrics_current_tenant_isolation
+  ON public.job_metrics_current
+  FOR SELECT
+  USING (
+    tenant_id IN (
+      SELECT tenant_id
+      FROM public.profiles
+      WHERE id = auth.uid()
+    )
+  );
+
+-- ============================================================================
+-- 4. WATERMARK STATE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.metrics_refresh_state (
+  name TEXT PRIMARY KEY,
+  high_water TIMESTAMPTZ NOT NULL DEFAULT '-infinity',
+  last_run_at TIMESTAMPTZ,
+  last_rows INTEGER NOT NULL DEFAULT 0
+);
+
+ALTER TABLE public.metrics_refresh_state ENABLE ROW LEVEL SECURITY;
+
+INSERT INTO public.metrics_refresh_state (name)
+VALUES ('job_metrics')
+ON CONFLICT (name) DO NOTHING;
+
+-- ============================================================================
+-- 5. INCREMENTAL REFRESH FUNCTION
+-- ============================================================================
+
+-- Recompute only jobs touched since the stored watermark. p_overlap re-reads
+-- a short window behind the watermark so rows committed late by concurrent
+-- transactions (with updated_at earlier than our start time) are not missed;
+-- re-upserting an unchanged job is harmless.
+CREATE OR REPLACE FUNCTION refresh_job_metrics_incremental(
+  p_full BOOLEAN DEFAULT FALSE,
+  p_overlap INTERVAL DEFAULT INTERVAL '2 minutes'
+)
+RETURNS INTEGER AS $$
+DECLARE
+  v_started TIMESTAMPTZ := clock_timestamp();
+  v_since TIMESTAMPTZ;
+  v_rows INTEGER;
+BEGIN
+  SELECT high_water INTO v_since
+  FROM metrics_refresh_state
+  WHERE name = 'job_metrics'
+  FOR UPDATE;
+
+  IF p_full OR v_since IS NULL THEN
+    v_since := '-infinity';
+  ELSE
+    v_since := v_since - p_overlap;
+  END IF;
+
+  WITH changed AS (
+    SELECT id AS job_id FROM jobs WHERE updated_at > v_since
+    UNION
+    SELECT job_id FROM kanban_cards WHERE job_id IS NOT NULL AND updated_at > v_since
+    UNION
+    SELECT job_id FROM agent_runs WHERE job_id IS NOT NULL AND ended_at > v_since
+  )
+  INSERT INTO job_metrics_current (
+    job_id, org_id, tenant_id, name, status, created_at, started_at, finished_at, last_run_at,
+    total_tasks, completed_tasks, failed_tasks, task_completion_rate,
+    cards_created, cards_approved, cards_executed, approval_rate,
+    emails_sent, errors_count,
+    cards_suggested, cards_in_review, cards_approved_pending, cards_executing,
+    cards_done, cards_blocked, cards_rejected,
+    email_cards, task_cards, call_cards, research_cards, followup_cards, deal_cards,
+    duration_seconds, total_runs, last_run_ended_at, refreshed_at
+  )
+  SELECT
+    m.job_id, m.org_id, m.tenant_id, m.name, m.status, m.created_at, m.started_at, m.finished_at, m.last_run_at,
+    m.total_tasks, m.completed_tasks, m.failed_tasks, m.task_completion_rate,
+    m.cards_created, m.cards_approved, m.cards_executed, m.approval_rate,
+    m.emails_sent, m.errors_count,
+    m.cards_suggested, m.cards_in_review, m.cards_approved_pending, m.cards_executing,
+    m.cards_done, m.cards_blocked, m.cards_rejected,
+    m.email_cards, m.task_cards, m.call_cards, m.research_cards, m.followup_cards, m.deal_cards,
+    m.duration_seconds, m.total_runs, m.last_run_ended_at, v_started
+  FROM job_metrics_compute m
+  WHERE m.job_id IN (SELECT job_id FROM changed)
+  ON CONFLICT (job_id) DO UPDATE SET
+    org_id = EXCLUDED.org_id,
+    tenant_id = EXCLUDED.tenant_id,
+    name = EXCLUDED.name,
+    status = EXCLUDED.status,
+    created_at = EXCLUDED.created_at,
+    started_at = EXCLUDED.started_at,
+    finished_at = EXCLUDED.finished_at,
+    last_run_at = EXCLUDED.last_run_at,
+    total_tasks = EXCLUDED.total_tasks,
+    completed_tasks = EXCLUDED.completed_tasks,
+    failed_tasks = EXCLUDED.failed_tasks,
+    task_completion_rate = EXCLUDED.task_completion_rate,
+    cards_created = EXCLUDED.cards_created,
+    cards_approved = EXCLUDED.cards_approved,
+    cards_executed = EXCLUDED.cards_executed,
+    approval_rate = EXCLUDED.approval_rate,
+    emails_sent = EXCLUDED.emails_sent,
+    errors_count = EXCLUDED.errors_count,
+    cards_suggested = EXCLUDED.cards_suggested,
+    cards_in_review = EXCLUDED.cards_in_review,
+    cards_approved_pending = EXCLUDED.cards_approved_pending,
+    cards_executing = EXCLUDED.cards_executing,
+    cards_done = EXCLUDED.cards_done,
+    cards_blocked = EXCLUDED.cards_blocked,
+    cards_rejected = EXCLUDED.cards_rejected,
+    email_cards = EXCLUDED.email_cards,
+    task_cards = EXCLUDED.task_cards,
+    call_cards = EXCLUDED.call_cards,
+    research_cards = EXCLUDED.research_cards,
+    followup_cards = EXCLUDED.followup_cards,
+    deal_cards = EXCLUDED.deal_cards,
+    duration_seconds = EXCLUDED.duration_seconds,
+    total_runs = EXCLUDED.total_runs,
+    last_run_ended_at = EXCLUDED.last_run_ended_at,
+    refreshed_at = EXCLUDED.refreshed_at;
+
+  GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+  UPDATE metrics_refresh_state
+  SET high_water = v_started,
+      last_run_at = clock_timestamp(),
+      last_rows = v_rows
+  WHERE name = 'job_metrics';
+
+  RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- The old full refresh now delegates to the incremental path so existing
+-- callers stop paying for a whole-table recompute.
+CREATE OR REPLACE FUNCTION refresh_job_metrics()
+RETURNS VOID AS $$
+BEGIN
+  PERFORM refresh_job_metrics_incremental();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Refreshes run from cron and the ops toolkit, never from the API
+REVOKE EXECUTE ON FUNCTION refresh_job_metrics_incremental(BOOLEAN, INTERVAL) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION refresh_job_metrics() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_job_metrics_incremental(BOOLEAN, INTERVAL) TO service_role;
+GRANT EXECUTE ON FUNCTION refresh_job_metrics() TO service_role;
+
+-- ============================================================================
+-- 6. POINT READERS AT THE NEW TABLE
+-- ============================================================================
+
+CREATE OR REPLACE VIEW job_performance_summary AS
+SELECT
+  org_id,
+  COUNT(*) AS total_jobs,
+  COUNT(*) FILTER (WHERE status = 'running') AS running_jobs,
+  COUNT(*) FILTER (WHERE status = 'succeeded') AS succeeded_jobs,
+  COUNT(*) FILTER (WHERE status = 'failed') AS failed_jobs,
+  COUNT(*) FILTER (WHERE status = 'cancelled') AS cancelled_jobs,
+  SUM(cards_created) AS total_cards_created,
+  SUM(cards_executed) AS total_cards_executed,
+  SUM(emails_sent) AS total_emails_sent,
+  AVG(approval_rate) FILTER (WHERE approval_rate > 0) AS avg_approval_rate,
+  AVG(task_completion_rate) FILTER (WHERE task_completion_rate > 0) AS avg_completion_rate
+FROM job_metrics_current
+GROUP BY org_id;
+
+CREATE OR REPLACE VIEW recent_job_activity AS
+SELECT
+  jm.job_id,
+  jm.org_id,
+  jm.name,
+  jm.status,
+  jm.cards_created,
+  jm.cards_executed,
+  jm.emails_sent,
+  jm.approval_rate,
+  jm.last_run_at,
+  jm.last_run_ended_at,
+  jm.created_at
+FROM job_metrics_current jm
+WHERE jm.created_at > NOW() - INTERVAL '30 days'
+ORDER BY jm.last_run_at DESC NULLS LAST, jm.created_at DESC;
+
+CREATE OR REPLACE FUNCTION get_job_metrics_for_org(p_org_id UUID DEFAULT NULL)
+RETURNS TABLE (
+  job_id UUID,
+  name TEXT,
+  status TEXT,
+  total_tasks INTEGER,
+  completed_tasks INTEGER,
+  cards_created INTEGER,
+  cards_executed INTEGER,
+  emails_sent INTEGER,
+  approval_rate NUMERIC,
+  task_completion_rate NUMERIC,
+  last_run_at TIMESTAMPTZ
+) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    jm.job_id,
+    jm.name,
+    jm.status,
+    jm.total_tasks,
+    jm.completed_tasks,
+    jm.cards_created,
+    jm.cards_executed,
+    jm.emails_sent,
+    jm.approval_rate,
+    jm.task_completion_rate,
+    jm.last_run_at
+  FROM job_metrics_current jm
+  WHERE jm.org_id = COALESCE(p_org_id, auth.uid())
+  ORDER BY jm.created_at DESC;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION get_job_metrics_for_org(UUID) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION get_job_metrics_for_org(UUID) TO authenticated, service_role;
+
+-- ============================================================================
+-- 7. INITIAL BACKFILL
+-- ============================================================================
+
+SELECT refresh_job_metrics_incremental(p_full => TRUE);
+
+-- ============================================================================
+-- 8. COMMENTS
+-- ============================================================================
+
+COMMENT ON VIEW job_metrics_compute IS 'Per-job metrics definition; filter by job_id to recompute a subset';
+COMMENT ON TABLE public.job_metrics_current IS 'Incrementally maintained job metrics (replaces the job_metrics materialized view for readers)';
+COMMENT ON TABLE public.metrics_refresh_state IS 'High-water marks for incremental metric maintainers';
+COMMENT ON FUNCTION refresh_job_metrics_incremental(BOOLEAN, INTERVAL) IS 'Upsert metrics for jobs changed since the last watermark; returns rows refreshed';
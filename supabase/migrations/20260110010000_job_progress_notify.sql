@@ -0,0 +1,105 @@
+-- Job Progress Notifications
+-- Migration: 20260110010000_job_progress_notify.sql
+-- Purpose: Publish compact NOTIFY payloads on the job_progress channel for
+--          job_tasks status changes and kanban_cards inserts so campaigns
+--          can be followed live (python -m ops watch) without polling
+
+-- Payloads stay well under the 8000 byte NOTIFY limit:
+--   task:  {"t":"task","at":..,"job":..,"tenant":..,"id":..,"batch":..,"kind":..,"from":..,"to":..,"err":..}
+--   cards: {"t":"cards","at":..,"job":..,"tenant":..,"batch":..,"task":..,"n":..}
+-- "at" is the transaction timestamp, the same value NOW() writes into
+-- created_at/started_at/finished_at, so listeners can use it as a watermark.
+-- Notifications are delivered on commit; rolled back work sends nothing.
+
+-- ============================================================================
+-- 1. JOB TASKS (row level, status transitions only)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION notify_job_task_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify('job_progress', json_build_object(
+    't', 'task',
+    'at', NOW(),
+    'job', NEW.job_id,
+    'tenant', NEW.tenant_id,
+    'id', NEW.id,
+    'batch', NEW.batch,
+    'kind', NEW.kind,
+    'from', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+    'to', NEW.status,
+    'err', LEFT(NEW.error_message, 200)
+  )::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_job_task_insert ON public.job_tasks;
+CREATE TRIGGER trigger_notify_job_task_insert
+  AFTER INSERT ON public.job_tasks
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_job_task_change();
+
+DROP TRIGGER IF EXISTS trigger_notify_job_task_status ON public.job_tasks;
+CREATE TRIGGER trigger_notify_job_task_status
+  AFTER UPDATE OF status ON public.job_tasks
+  FOR EACH ROW
+  WHEN (OLD.status IS DISTINCT FROM NEW.status)
+  EXECUTE FUNCTION notify_job_task_change();
+
+-- ============================================================================
+-- 2. KANBAN CARDS (statement level, one payload per job/task per insert)
+-- ============================================================================
+
+-- processActiveJobs inserts a whole batch of cards in one statement; a
+-- transition table turns that into one notification per task instead of
+-- one per card.
+CREATE OR REPLACE FUNCTION notify_kanban_cards_inserted()
+RETURNS TRIGGER AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  FOR r IN
+    SELECT n.job_id, n.tenant_id, n.task_id, t.batch, COUNT(*) AS n
+    FROM new_cards n
+    LEFT JOIN public.job_tasks t ON t.id = n.task_id
+    WHERE n.job_id IS NOT NULL
+    GROUP BY n.job_id, n.tenant_id, n.task_id, t.batch
+  LOOP
+    PERFORM pg_notify('job_progress', json_build_object(
+      't', 'cards',
+      'at', NOW(),
+      'job', r.job_id,
+      'tenant', r.tenant_id,
+      'batch', r.batch,
+      'task', r.task_id,
+      'n', r.n
+    )::text);
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_kanban_cards_inserted ON public.kanban_cards;
+CREATE TRIGGER trigger_notify_kanban_cards_inserted
+  AFTER INSERT ON public.kanban_cards
+  REFERENCING NEW TABLE AS new_cards
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION notify_kanban_cards_inserted();
+
+-- ============================================================================
+-- 3. CATCH-UP SUPPORT
+-- ============================================================================
+
+-- A reconnecting listener replays task transitions newer than its watermark
+-- (created_at / started_at / finished_at) and cards by created_at.
+CREATE INDEX IF NOT EXISTS idx_job_tasks_finished_at
+  ON public.job_tasks(finished_at) WHERE finished_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_job_tasks_created_at ON public.job_tasks(created_at);
+CREATE INDEX IF NOT EXISTS idx_kanban_cards_job_created_at
+  ON public.kanban_cards(created_at) WHERE job_id IS NOT NULL;
+
+COMMENT ON FUNCTION notify_job_task_change() IS
+  'Publishes job_tasks inserts and status transitions on the job_progress channel';
+COMMENT ON FUNCTION notify_kanban_cards_inserted() IS
+  'Publishes per-task card counts for each kanban_cards insert statement on the job_progress channel';
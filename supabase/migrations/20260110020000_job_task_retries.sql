@@ -0,0 +1,233 @@
+-- Job Task Retries
+-- Migration: 20260110020000_job_task_retries.sql
+-- Purpose: Retry failed job_tasks with exponential backoff and jitter per
+--          error class, and park tasks that exhaust their retries in a
+--          dead-letter view instead of deleting them by hand
+
+-- ============================================================================
+-- 1. COLUMNS
+-- ============================================================================
+
+ALTER TABLE public.job_tasks
+ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS dead_lettered_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS error_history JSONB NOT NULL DEFAULT '[]'::jsonb;
+
+-- The sweep reads only tasks that are due: status = 'error' AND next_attempt_at <= NOW()
+CREATE INDEX IF NOT EXISTS idx_job_tasks_status_next_attempt
+  ON public.job_tasks(status, next_attempt_at)
+  WHERE next_attempt_at IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_job_tasks_dead_lettered
+  ON public.job_tasks(dead_lettered_at)
+  WHERE dead_lettered_at IS NOT NULL;
+
+-- ============================================================================
+-- 2. RETRY POLICIES
+-- ============================================================================
+
+-- error_message is matched case-insensitively against pattern in priority
+-- order; anything unmatched uses 'default'. Delay for attempt n is
+-- min(base_delay * 2^(n-1), max_delay) with equal jitter (half fixed, half
+-- random). A task whose retry_count exceeds max_retries is dead-lettered.
+CREATE TABLE IF NOT EXISTS public.job_task_retry_policies (
+  error_class TEXT PRIMARY KEY,
+  pattern TEXT,
+  priority INTEGER NOT NULL DEFAULT 100,
+  base_delay INTERVAL NOT NULL,
+  max_delay INTERVAL NOT NULL,
+  max_retries INTEGER NOT NULL CHECK (max_retries >= 0)
+);
+
+ALTER TABLE public.job_task_retry_policies ENABLE ROW LEVEL SECURITY;
+
+INSERT INTO public.job_task_retry_policies (error_class, pattern, priority, base_delay, max_delay, max_retries)
+VALUES
+  ('permanent', 'not found|does not exist|violates|invalid input|permission denied|template .* not found', 10,
+   '0 seconds', '0 seconds', 0),
+  ('transient', 'timeout|timed out|econnreset|econnrefused|fetch failed|socket|connection|deadlock|could not serialize|rate limit|429|502|503|504', 20,
+   '30 seconds', '30 minutes', 6),
+  ('empty_audience', 'expansion returned 0 cards', 30,
+   '15 minutes', '6 hours', 3),
+  ('default', NULL, 1000,
+   '1 minute', '1 hour', 4)
+ON CONFLICT (error_class) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION classify_job_task_error(p_error TEXT)
+RETURNS TEXT AS $$
+  SELECT COALESCE(
+    (SELECT error_class FROM public.job_task_retry_policies
+     WHERE pattern IS NOT NULL AND COALESCE(p_error, '') ~* pattern
+     ORDER BY priority
+     LIMIT 1),
+    'default'
+  );
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- Next attempt time for the n-th failure, or NULL once retries are exhausted.
+-- The policy table has RLS and no read policy, and the trigger runs as
+-- whoever updated the task, so the lookups run as the owner. Without a
+-- matching or 'default' row the task still gets the built-in default
+-- (1 minute doubling to 1 hour, 4 retries) rather than being dead-lettered
+-- on its first error.
+CREATE OR REPLACE FUNCTION job_task_next_attempt(p_class TEXT, p_attempt INTEGER)
+RETURNS TIMESTAMPTZ AS $$
+DECLARE
+  v_policy public.job_task_retry_policies%ROWTYPE;
+  v_delay INTERVAL;
+BEGIN
+  SELECT * INTO v_policy FROM public.job_task_retry_policies WHERE error_class = p_class;
+  IF NOT FOUND THEN
+    SELECT * INTO v_policy FROM public.job_task_retry_policies WHERE error_class = 'default';
+  END IF;
+  IF NOT FOUND THEN
+    v_policy.base_delay := INTERVAL '1 minute';
+    v_policy.max_delay := INTERVAL '1 hour';
+    v_policy.max_retries := 4;
+  END IF;
+
+  IF p_attempt > v_policy.max_retries THEN
+    RETURN NULL;
+  END IF;
+
+  v_delay := LEAST(v_policy.base_delay * POWER(2, GREATEST(p_attempt - 1, 0)), v_policy.max_delay);
+  RETURN NOW() + v_delay * (0.5 + random() * 0.5);
+END;
+$$ LANGUAGE plpgsql VOLATILE SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION classify_job_task_error(TEXT) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION job_task_next_attempt(TEXT, INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION classify_job_task_error(TEXT) TO authenticated, service_role;
+GRANT EXECUTE ON FUNCTION job_task_next_attempt(TEXT, INTEGER) TO authenticated, service_role;
+
+-- ============================================================================
+-- 3. SCHEDULE ON FAILURE
+-- ============================================================================
+
+-- Every transition into 'error' (processActiveJobs, ops task-worker, manual
+-- fixes) counts as one failed attempt.
+CREATE OR REPLACE FUNCTION schedule_job_task_retry()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_class TEXT;
+BEGIN
+  NEW.retry_count := COALESCE(OLD.retry_count, 0) + 1;
+  v_class := classify_job_task_error(NEW.error_message);
+  NEW.error_history := COALESCE(OLD.error_history, '[]'::jsonb) || jsonb_build_object(
+    'attempt', NEW.retry_count,
+    'at', NOW(),
+    'class', v_class,
+    'error', LEFT(NEW.error_message, 500)
+  );
+  NEW.next_attempt_at := job_task_next_attempt(v_class, NEW.retry_count);
+  IF NEW.next_attempt_at IS NULL THEN
+    NEW.dead_lettered_at := NOW();
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_schedule_job_task_retry ON public.job_tasks;
+CREATE TRIGGER trigger_schedule_job_task_retry
+  BEFORE UPDATE OF status ON public.job_tasks
+  FOR EACH ROW
+  WHEN (NEW.status = 'error' AND OLD.status IS DISTINCT FROM 'error')
+  EXECUTE FUNCTION schedule_job_task_retry();
+
+-- ============================================================================
+-- 4. SWEEP
+-- ============================================================================
+
+-- Re-queue due tasks of running jobs. Cost is proportional to the number of
+-- due tasks (index range scan on status, next_attempt_at); SKIP LOCKED lets
+-- several schedulers sweep at once.
+CREATE OR REPLACE FUNCTION requeue_due_job_tasks(p_limit INTEGER DEFAULT 500)
+RETURNS INTEGER AS $$
+DECLARE
+  v_count INTEGER;
+BEGIN
+  WITH due AS (
+    SELECT t.id
+    FROM public.job_tasks t
+    JOIN public.jobs j ON j.id = t.job_id
+    WHERE t.status = 'error'
+      AND t.next_attempt_at <= NOW()
+      AND j.status = 'running'
+    ORDER BY t.next_attempt_at
+    LIMIT p_limit
+    FOR UPDATE OF t SKIP LOCKED
+  )
+  UPDATE public.job_tasks t
+  SET status = 'pending',
+      next_attempt_at = NULL,
+      started_at = NULL,
+      finished_at = NULL
+  FROM due
+  WHERE t.id = due.id;
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Errors recorded before this migration have no schedule; give them one
+-- (their existing retry_count counts as attempts already made).
+CREATE OR REPLACE FUNCTION adopt_unscheduled_job_tasks()
+RETURNS INTEGER AS $$
+DECLARE
+  v_count INTEGER;
+BEGIN
+  WITH planned AS (
+    SELECT id, classify_job_task_error(error_message) AS error_class, GREATEST(retry_count, 1) AS attempt
+    FROM public.job_tasks
+    WHERE status = 'error' AND next_attempt_at IS NULL AND dead_lettered_at IS NULL
+  ),
+  scheduled AS (
+    SELECT id, attempt, error_class, job_task_next_attempt(error_class, attempt) AS next_attempt_at
+    FROM planned
+  )
+  UPDATE public.job_tasks t
+  SET retry_count = s.attempt,
+      next_attempt_at = s.next_attempt_at,
+      dead_lettered_at = CASE WHEN s.next_attempt_at IS NULL THEN NOW() END,
+      error_history = t.error_history || jsonb_build_object(
+        'attempt', s.attempt, 'at', COALESCE(t.finished_at, NOW()),
+        'class', s.error_class, 'error', LEFT(t.error_message, 500)
+      )
+  FROM scheduled s
+  WHERE t.id = s.id;
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- 5. DEAD LETTER VIEW
+-- ============================================================================
+
+CREATE OR REPLACE VIEW job_tasks_dead_letter
+WITH (security_invoker = true) AS
+SELECT
+  t.id AS task_id,
+  t.job_id,
+  t.tenant_id,
+  j.name AS job_name,
+  j.status AS job_status,
+  t.batch,
+  t.step,
+  t.kind,
+  t.retry_count,
+  t.dead_lettered_at,
+  t.error_message AS last_error,
+  t.error_history->-1->>'class' AS error_class,
+  t.error_history
+FROM public.job_tasks t
+JOIN public.jobs j ON j.id = t.job_id
+WHERE t.dead_lettered_at IS NOT NULL
+  AND t.status = 'error';
+
+COMMENT ON VIEW job_tasks_dead_letter IS
+  'Tasks that exhausted their retry policy, with the full error history';
+COMMENT ON FUNCTION requeue_due_job_tasks(INTEGER) IS
+  'Moves errored tasks whose next_attempt_at has passed back to pending (running jobs only)';
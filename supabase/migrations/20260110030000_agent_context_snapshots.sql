@@ -0,0 +1,45 @@
+-- Agent Context Snapshots
+-- Migration: 20260110030000_agent_context_snapshots.sql
+-- Purpose: Keep a per-tenant materialized copy of the rows buildContext reads
+--          (clients, contacts, orders, properties) so an agent run only
+--          fetches what changed since the snapshot was last refreshed
+
+-- ============================================================================
+-- 1. SNAPSHOT TABLE
+-- ============================================================================
+
+-- sections holds one compact, columnar entry per source table:
+--   {"orders": {"columns": ["id", "client_id", ...],
+--               "rows": {"<id>": [<values in column order>], ...}}, ...}
+-- watermarks holds, per section, the highest updated_at merged in and the
+-- row count at that point: {"orders": {"at": "...", "count": 1234}, ...}.
+-- Written by `python -m ops context-snapshot refresh`; read by buildContext.
+CREATE TABLE IF NOT EXISTS public.agent_context_snapshots (
+  tenant_id UUID PRIMARY KEY REFERENCES public.tenants(id) ON DELETE CASCADE,
+  sections JSONB NOT NULL DEFAULT '{}'::jsonb,
+  watermarks JSONB NOT NULL DEFAULT '{}'::jsonb,
+  built_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  size_bytes INTEGER NOT NULL DEFAULT 0
+);
+
+ALTER TABLE public.agent_context_snapshots ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS agent_context_snapshots_tenant_select ON public.agent_context_snapshots;
+CREATE POLICY agent_context_snapshots_tenant_select ON public.agent_context_snapshots
+FOR SELECT
+USING (tenant_id IN (SELECT tenant_id FROM public.profiles WHERE id = auth.uid()));
+
+-- ============================================================================
+-- 2. DELTA INDEXES
+-- ============================================================================
+
+-- Both the refresh and buildContext read "rows of this tenant changed since
+-- the watermark"; these keep that a range scan instead of a tenant scan.
+CREATE INDEX IF NOT EXISTS idx_clients_tenant_updated_at ON public.clients(tenant_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_contacts_tenant_updated_at ON public.contacts(tenant_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_orders_tenant_updated_at ON public.orders(tenant_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_properties_tenant_updated_at ON public.properties(tenant_id, updated_at);
+
+COMMENT ON TABLE public.agent_context_snapshots IS
+  'Per-tenant columnar copy of the rows buildContext reads, refreshed from updated_at watermarks';
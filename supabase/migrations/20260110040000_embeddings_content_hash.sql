@@ -0,0 +1,45 @@
+-- Embeddings Content Hash
+-- Migration: 20260110040000_embeddings_content_hash.sql
+-- Purpose: Let the RAG indexer skip unchanged records. Each embedding row
+--          stores a hash of the content it was embedded from, and there is
+--          at most one row per (org_id, source, source_id)
+
+-- ============================================================================
+-- 1. CONTENT HASH
+-- ============================================================================
+
+-- sha256 of model + title + content + metadata (see contentHash in rag.ts);
+-- NULL for rows indexed before this migration, which re-embed once
+ALTER TABLE embeddings_index
+ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Chat conversations have always been indexed with source 'chat', which the
+-- original CHECK rejected
+ALTER TABLE embeddings_index DROP CONSTRAINT IF EXISTS embeddings_index_source_check;
+ALTER TABLE embeddings_index ADD CONSTRAINT embeddings_index_source_check
+  CHECK (source IN ('email', 'note', 'client_data', 'activity', 'order', 'document', 'chat'));
+
+-- ============================================================================
+-- 2. ONE ROW PER SOURCE RECORD
+-- ============================================================================
+
+-- upsert() without a conflict target inserted a fresh row on every indexing
+-- pass; keep the newest row per record. Rows without created_at rank
+-- last, and id breaks ties, so exactly one row per record survives.
+DELETE FROM embeddings_index e
+USING (
+  SELECT id,
+         ROW_NUMBER() OVER (
+           PARTITION BY org_id, source, source_id
+           ORDER BY created_at DESC NULLS LAST, id DESC
+         ) AS rn
+  FROM embeddings_index
+) ranked
+WHERE e.id = ranked.id
+  AND ranked.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embeddings_org_source_record
+  ON embeddings_index(org_id, source, source_id);
+
+COMMENT ON COLUMN embeddings_index.content_hash IS
+  'Hash of the embedded model/title/content/metadata; unchanged records are not re-embedded';
@@ -0,0 +1,21 @@
+-- Detected Patterns Unique Name
+-- Migration: 20260110050000_detected_patterns_unique.sql
+-- Purpose: One detected_patterns row per (tenant_id, pattern_name), so the
+--          batch detector (python -m ops patterns) can write every pattern
+--          of a tenant in one INSERT ... ON CONFLICT statement
+
+-- savePattern in pattern-detector.ts already treats pattern_name as the key
+-- (select ... .single(), then update or insert); drop any duplicates a race
+-- between two detector runs left behind, keeping the most recently updated
+DELETE FROM detected_patterns p
+USING detected_patterns newer
+WHERE p.tenant_id = newer.tenant_id
+  AND p.pattern_name = newer.pattern_name
+  AND (p.updated_at, p.id) < (newer.updated_at, newer.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_patterns_tenant_name
+  ON detected_patterns(tenant_id, pattern_name);
+
+-- The batch detector reads a tenant's events in time order
+CREATE INDEX IF NOT EXISTS idx_warehouse_tenant_occurred
+  ON warehouse_events(tenant_id, occurred_at);
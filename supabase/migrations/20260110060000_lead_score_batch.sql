@@ -0,0 +1,103 @@
+-- Batch Lead Scoring
+-- Migration: 20260110060000_lead_score_batch.sql
+-- Purpose: Let recalculateAllScores score a whole org from keyset-paged
+--          aggregate reads instead of one contact + activities fetch per
+--          contact, and store each lead's position in its org
+
+-- ============================================================================
+-- 1. PRECOMPUTED RANKS
+-- ============================================================================
+
+-- 1 = highest total_score in the org. Written by the batch rescore; a single
+-- contact rescored in between keeps its previous rank until the next batch,
+-- so lists order by total_score and use the rank only to break ties.
+ALTER TABLE public.lead_scores
+ADD COLUMN IF NOT EXISTS org_rank INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_lead_scores_org_score_rank
+  ON public.lead_scores(org_id, total_score DESC, org_rank);
+
+CREATE INDEX IF NOT EXISTS idx_lead_scores_org_label_score_rank
+  ON public.lead_scores(org_id, label, total_score DESC, org_rank);
+
+-- The features query groups an org's activities by contact
+CREATE INDEX IF NOT EXISTS idx_activities_contact_id
+  ON public.activities(contact_id) WHERE contact_id IS NOT NULL;
+
+-- ============================================================================
+-- 2. FEATURES
+-- ============================================================================
+
+-- One row per contact of the org with everything calculateLeadScore reads
+-- from the contact, its client and its activities. Counts follow
+-- calculateEngagementScore (completed emails, completed meetings/calls, any
+-- other activity) and buildLeadSignals (all email activities); the last
+-- activity is by COALESCE(created_at, scheduled_at) as in
+-- calculateRecencyScore.
+--
+-- Keyset-paged on contact_id: the cursor and limit pick the page of
+-- contacts first and activities are aggregated for that page only, so
+-- reading a whole org costs O(contacts) however many pages it takes.
+CREATE OR REPLACE FUNCTION lead_score_features(
+  p_org_id UUID,
+  p_after UUID DEFAULT NULL,
+  p_limit INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+  contact_id UUID,
+  primary_role_code TEXT,
+  has_address BOOLEAN,
+  active_orders INTEGER,
+  total_revenue NUMERIC,
+  completed_emails INTEGER,
+  completed_meetings INTEGER,
+  other_activities INTEGER,
+  email_activities INTEGER,
+  last_activity_at TIMESTAMPTZ
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH page AS (
+    SELECT
+      ct.id,
+      ct.primary_role_code,
+      COALESCE(c.address, '') <> '' AS has_address,
+      COALESCE(c.active_orders, 0) AS active_orders,
+      COALESCE(c.total_revenue, 0) AS total_revenue
+    FROM public.contacts ct
+    JOIN public.clients c ON c.id = ct.client_id
+    WHERE c.org_id = p_org_id
+      AND (p_after IS NULL OR ct.id > p_after)
+    ORDER BY ct.id
+    LIMIT p_limit
+  )
+  SELECT
+    p.id,
+    p.primary_role_code,
+    p.has_address,
+    p.active_orders,
+    p.total_revenue,
+    ac.completed_emails,
+    ac.completed_meetings,
+    ac.other_activities,
+    ac.email_activities,
+    ac.last_activity_at
+  FROM page p
+  CROSS JOIN LATERAL (
+    SELECT
+      COUNT(*) FILTER (WHERE a.activity_type = 'email' AND a.status = 'completed')::INTEGER AS completed_emails,
+      COUNT(*) FILTER (WHERE a.activity_type IN ('meeting', 'call') AND a.status = 'completed')::INTEGER AS completed_meetings,
+      COUNT(*) FILTER (WHERE a.activity_type NOT IN ('email', 'meeting', 'call'))::INTEGER AS other_activities,
+      COUNT(*) FILTER (WHERE a.activity_type = 'email')::INTEGER AS email_activities,
+      MAX(COALESCE(a.created_at, a.scheduled_at)) AS last_activity_at
+    FROM public.activities a
+    WHERE a.contact_id = p.id
+  ) ac
+  ORDER BY p.id;
+$$;
+
+COMMENT ON FUNCTION lead_score_features(UUID, UUID, INTEGER) IS
+  'Per-contact lead scoring inputs for an org, keyset-paged on contact_id; used by recalculateAllScores (lead-scoring.ts)';
+
+GRANT EXECUTE ON FUNCTION lead_score_features(UUID, UUID, INTEGER) TO authenticated;
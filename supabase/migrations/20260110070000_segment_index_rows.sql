@@ -0,0 +1,167 @@
+-- Segment Index Feed
+-- Migration: 20260110070000_segment_index_rows.sql
+-- Purpose: Feed the in-memory segment index (src/lib/campaigns/segment-index.ts)
+--          so audience counts and previews stop re-scanning contacts and
+--          clients for every filter change
+
+-- ============================================================================
+-- 1. CHANGE WATERMARK INDEXES
+-- ============================================================================
+
+-- An incremental refresh asks each source table for rows changed since the
+-- index's watermark (clients(tenant_id, updated_at) comes from
+-- 20260110030000_agent_context_snapshots.sql)
+CREATE INDEX IF NOT EXISTS idx_contacts_updated_at
+  ON public.contacts(updated_at);
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at
+  ON public.orders(updated_at);
+CREATE INDEX IF NOT EXISTS idx_lead_scores_updated_at
+  ON public.lead_scores(updated_at);
+CREATE INDEX IF NOT EXISTS idx_email_suppressions_tenant_created_at
+  ON public.email_suppressions(tenant_id, created_at);
+
+-- A page walks a tenant's clients in id order from the cursor
+CREATE INDEX IF NOT EXISTS idx_clients_tenant_id_id
+  ON public.clients(tenant_id, id);
+
+-- ============================================================================
+-- 2. ROWS
+-- ============================================================================
+
+-- One row per audience member as resolveFromFilters builds them: each
+-- contact of a tenant's client, or the client itself when it has no
+-- contacts. email is the address a campaign would send to (contact, else
+-- client); org_id lets org-scoped callers narrow the tenant's members. The
+-- function runs as the caller, so clients_tenant_isolation still applies.
+--
+-- p_since: only clients with a change after this time (the client, one of
+--          its contacts, orders, tags or lead scores); NULL for every client.
+--          Every row of a returned client is returned, so the caller replaces
+--          the client's rows wholesale. Deletes are not reported; the caller
+--          rebuilds periodically to drop them.
+-- p_after_client / p_after_contact: keyset cursor, the (client_id, row_key)
+--          of the last row of the previous page
+--
+-- The cursor and limit are applied to the client/contact join first (it
+-- walks clients in id order from the cursor), and the orders, tags and lead
+-- score lookups run for that page only, so a full build costs O(members)
+-- rather than re-aggregating everything after the cursor on every page.
+--
+-- snapshot_at is the statement time, for the caller's next watermark.
+CREATE OR REPLACE FUNCTION segment_index_rows(
+  p_tenant_id UUID,
+  p_since TIMESTAMPTZ DEFAULT NULL,
+  p_after_client UUID DEFAULT NULL,
+  p_after_contact UUID DEFAULT NULL,
+  p_limit INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+  client_id UUID,
+  org_id UUID,
+  contact_id UUID,
+  row_key UUID,
+  email TEXT,
+  first_name TEXT,
+  last_name TEXT,
+  company_name TEXT,
+  primary_role_code TEXT,
+  client_type TEXT,
+  is_active BOOLEAN,
+  address TEXT,
+  tags TEXT[],
+  email_bounced BOOLEAN,
+  last_order_at TIMESTAMPTZ,
+  active_orders INTEGER,
+  total_revenue NUMERIC,
+  lead_score INTEGER,
+  lead_label TEXT,
+  snapshot_at TIMESTAMPTZ
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH changed AS (
+    SELECT c.id FROM public.clients c
+    WHERE c.tenant_id = p_tenant_id AND c.updated_at > p_since
+    UNION
+    SELECT ct.client_id FROM public.contacts ct WHERE ct.updated_at > p_since
+    UNION
+    SELECT o.client_id FROM public.orders o WHERE o.updated_at > p_since
+    UNION
+    SELECT t.client_id FROM public.client_tags t WHERE t.created_at > p_since
+    UNION
+    SELECT ct.client_id
+    FROM public.lead_scores ls
+    JOIN public.contacts ct ON ct.id = ls.contact_id
+    WHERE ls.updated_at > p_since
+  ),
+  page AS (
+    SELECT
+      c.id AS client_id,
+      c.org_id,
+      ct.id AS contact_id,
+      -- Client-only rows sort first within their client
+      COALESCE(ct.id, '00000000-0000-0000-0000-000000000000'::UUID) AS row_key,
+      COALESCE(NULLIF(ct.email, ''), c.email) AS email,
+      ct.first_name,
+      ct.last_name,
+      c.company_name,
+      CASE WHEN ct.id IS NULL THEN c.primary_role_code ELSE ct.primary_role_code END AS primary_role_code,
+      c.client_type,
+      COALESCE(c.is_active, TRUE) AS is_active,
+      c.address,
+      COALESCE(ct.tags ? 'email_bounced_hard', FALSE) AS email_bounced,
+      COALESCE(c.active_orders, 0) AS active_orders,
+      COALESCE(c.total_revenue, 0) AS total_revenue
+    FROM public.clients c
+    LEFT JOIN public.contacts ct ON ct.client_id = c.id
+    WHERE c.tenant_id = p_tenant_id
+      AND (p_since IS NULL OR c.id IN (SELECT id FROM changed))
+      AND (p_after_client IS NULL OR c.id >= p_after_client)
+      AND (p_after_client IS NULL
+           OR (c.id, COALESCE(ct.id, '00000000-0000-0000-0000-000000000000'::UUID))
+              > (p_after_client, p_after_contact))
+    ORDER BY client_id, row_key
+    LIMIT p_limit
+  )
+  SELECT
+    m.client_id,
+    m.org_id,
+    m.contact_id,
+    m.row_key,
+    m.email,
+    m.first_name,
+    m.last_name,
+    m.company_name,
+    m.primary_role_code,
+    m.client_type,
+    m.is_active,
+    m.address,
+    COALESCE(tg.names, '{}'),
+    m.email_bounced,
+    lo.last_order_at,
+    m.active_orders,
+    m.total_revenue,
+    ls.total_score,
+    ls.label,
+    NOW()
+  FROM page m
+  LEFT JOIN LATERAL (
+    SELECT MAX(o.created_at) AS last_order_at
+    FROM public.orders o
+    WHERE o.client_id = m.client_id AND o.status <> 'cancelled'
+  ) lo ON TRUE
+  LEFT JOIN LATERAL (
+    SELECT ARRAY_AGG(DISTINCT t.name) AS names
+    FROM public.client_tags ctg
+    JOIN public.tags t ON t.id = ctg.tag_id
+    WHERE ctg.client_id = m.client_id
+  ) tg ON TRUE
+  LEFT JOIN public.lead_scores ls ON ls.contact_id = m.contact_id
+  ORDER BY m.client_id, m.row_key;
+$$;
+
+COMMENT ON FUNCTION segment_index_rows(UUID, TIMESTAMPTZ, UUID, UUID, INTEGER) IS
+  'Audience members of a tenant for the campaign segment index, optionally only clients changed since a watermark';
+
+GRANT EXECUTE ON FUNCTION segment_index_rows(UUID, TIMESTAMPTZ, UUID, UUID, INTEGER) TO authenticated;
@@ -0,0 +1,297 @@
+-- Send Rate Buckets
+-- Migration: 20260110080000_send_rate_buckets.sql
+-- Purpose: Shared token-bucket governor for campaign sends. Executors lease
+--          send slots from a campaign, sender mailbox and tenant bucket in
+--          one atomic call instead of counting last hour's sends in
+--          campaign_contact_status on every run
+
+-- ============================================================================
+-- 1. BUCKETS
+-- ============================================================================
+
+-- One row per bucket. tokens is the balance as of refilled_at; the balance
+-- now is LEAST(capacity, tokens + refill_per_hour * hours since refilled_at),
+-- so a check reads one row whatever the send history. capacity bounds the
+-- burst: over any window of t hours a bucket grants at most
+-- capacity + refill_per_hour * t. per_hour is the budget the bucket is
+-- sized from (send_bucket_size): capacity + refill_per_hour never exceeds
+-- it, so no rolling hour grants more than per_hour.
+CREATE TABLE IF NOT EXISTS public.send_rate_buckets (
+  scope TEXT NOT NULL CHECK (scope IN ('campaign', 'mailbox', 'tenant')),
+  scope_key TEXT NOT NULL,             -- campaign id, tenant id:sender address, tenant id
+  per_hour DOUBLE PRECISION NOT NULL CHECK (per_hour >= 0),
+  capacity DOUBLE PRECISION NOT NULL CHECK (capacity >= 1),
+  refill_per_hour DOUBLE PRECISION NOT NULL CHECK (refill_per_hour >= 0),
+  tokens DOUBLE PRECISION NOT NULL,
+  refilled_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  taken_total BIGINT NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (scope, scope_key)
+);
+
+-- Sizing for mailbox and tenant buckets created by a lease. Campaign buckets
+-- follow the campaign's send_rate_per_hour / send_batch_size instead.
+-- burst_hours is how much of an hour's sends the bucket holds.
+CREATE TABLE IF NOT EXISTS public.send_rate_bucket_defaults (
+  scope TEXT PRIMARY KEY CHECK (scope IN ('mailbox', 'tenant')),
+  per_hour DOUBLE PRECISION NOT NULL CHECK (per_hour >= 0),
+  burst_hours DOUBLE PRECISION NOT NULL DEFAULT 0.25 CHECK (burst_hours > 0)
+);
+
+-- Tenant default matches the campaigns.send_rate_per_hour default, so a
+-- tenant's first campaign is held to the rate it always was
+INSERT INTO public.send_rate_bucket_defaults (scope, per_hour)
+VALUES ('mailbox', 100), ('tenant', 75)
+ON CONFLICT (scope) DO NOTHING;
+
+-- Capacity and refill for a bucket allowed p_per_hour grants in any rolling
+-- hour. It holds p_burst (at most half the hour's budget) and refills the
+-- rest, so a bucket that sat full still cannot go over in the next hour.
+-- The trade-off is that sustained sending runs at the refill rate, the hour's
+-- budget less the burst. Below 2 per hour the refill is kept at half the
+-- budget; grants are whole sends, so one hour still grants at most one.
+CREATE OR REPLACE FUNCTION send_bucket_size(p_per_hour DOUBLE PRECISION, p_burst DOUBLE PRECISION)
+RETURNS TABLE (capacity DOUBLE PRECISION, refill_per_hour DOUBLE PRECISION) AS $$
+  SELECT b.capacity, GREATEST(p_per_hour - b.capacity, p_per_hour / 2)
+  FROM (
+    SELECT GREATEST(1, LEAST(CEIL(p_burst), CEIL(p_per_hour / 2)))::float8 AS capacity
+  ) b;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Only reachable through the functions below
+ALTER TABLE public.send_rate_buckets ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.send_rate_bucket_defaults ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. LEASE / RELEASE
+-- ============================================================================
+
+-- p_buckets: [{"scope": "campaign", "key": "<campaign id>"},
+--             {"scope": "mailbox", "key": "<tenant id>:<sender address>"},
+--             {"scope": "tenant", "key": "<tenant id>"}]
+--
+-- Grants up to p_want slots from every listed bucket at once: the grant is
+-- the smallest refilled balance (rounded down), capped at p_want, and is
+-- taken from each bucket. Callers name buckets only; sizes are read here.
+-- Campaign buckets are sized from the campaign's send_rate_per_hour, with a
+-- burst of one send batch or a quarter hour of sends, whichever is smaller,
+-- re-read on every lease. Missing mailbox / tenant
+-- buckets are created full from send_rate_bucket_defaults and keep their
+-- size until configure_send_bucket() changes it. A bucket that cannot be
+-- sized (unknown campaign or scope) grants nothing. Rows are locked in
+-- (scope, scope_key) order, so concurrent executors sharing a tenant or
+-- mailbox bucket queue behind each other instead of deadlocking, and the
+-- sum of their grants never exceeds what the buckets hold.
+CREATE OR REPLACE FUNCTION take_send_tokens(p_buckets JSONB, p_want INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+  v_now TIMESTAMPTZ;
+  v_wanted INTEGER;
+  v_found INTEGER;
+  v_granted INTEGER;
+BEGIN
+  IF p_want IS NULL OR p_want <= 0 OR jsonb_array_length(p_buckets) = 0 THEN
+    RETURN 0;
+  END IF;
+
+  SELECT COUNT(DISTINCT (b->>'scope', b->>'key'))
+  INTO v_wanted
+  FROM jsonb_array_elements(p_buckets) b;
+
+  -- Locks every bucket (updated or not) for the rest of the transaction
+  INSERT INTO send_rate_buckets AS s (scope, scope_key, per_hour, capacity, refill_per_hour, tokens)
+  SELECT cfg.scope, cfg.scope_key, cfg.per_hour, z.capacity, z.refill_per_hour, z.capacity
+  FROM (
+    SELECT
+      k.scope,
+      k.scope_key,
+      CASE WHEN k.scope = 'campaign'
+           THEN COALESCE(c.send_rate_per_hour, 75)
+           ELSE d.per_hour
+      END::float8 AS per_hour,
+      CASE WHEN k.scope = 'campaign'
+           THEN LEAST(COALESCE(c.send_batch_size, 25), COALESCE(c.send_rate_per_hour, 75) * 0.25)
+           ELSE d.per_hour * d.burst_hours
+      END::float8 AS burst,
+      (c.id IS NOT NULL OR d.scope IS NOT NULL) AS sized
+    FROM (
+      SELECT DISTINCT b->>'scope' AS scope, b->>'key' AS scope_key
+      FROM jsonb_array_elements(p_buckets) b
+    ) k
+    LEFT JOIN campaigns c
+      ON c.id = CASE WHEN k.scope = 'campaign' THEN k.scope_key::UUID END
+    LEFT JOIN send_rate_bucket_defaults d ON d.scope = k.scope
+  ) cfg
+  CROSS JOIN LATERAL send_bucket_size(cfg.per_hour, cfg.burst) z
+  WHERE cfg.sized
+  ORDER BY cfg.scope, cfg.scope_key
+  ON CONFLICT (scope, scope_key) DO UPDATE
+    SET per_hour = EXCLUDED.per_hour,
+        capacity = EXCLUDED.capacity,
+        refill_per_hour = EXCLUDED.refill_per_hour
+    WHERE s.scope = 'campaign'
+      AND (s.per_hour, s.capacity, s.refill_per_hour)
+          IS DISTINCT FROM (EXCLUDED.per_hour, EXCLUDED.capacity, EXCLUDED.refill_per_hour);
+
+  -- Time is read after the locks so a lease that waited refills from when
+  -- it actually ran
+  v_now := clock_timestamp();
+
+  SELECT COUNT(*),
+         LEAST(p_want, FLOOR(MIN(
+           LEAST(s.capacity, s.tokens + s.refill_per_hour
+                 * GREATEST(EXTRACT(EPOCH FROM (v_now - s.refilled_at)), 0) / 3600)
+         )))::INTEGER
+  INTO v_found, v_granted
+  FROM send_rate_buckets s
+  WHERE (s.scope, s.scope_key) IN (
+    SELECT b->>'scope', b->>'key' FROM jsonb_array_elements(p_buckets) b
+  );
+
+  -- Fail closed rather than lease past a bucket that does not exist
+  IF v_found < v_wanted THEN
+    RETURN 0;
+  END IF;
+
+  v_granted := GREATEST(COALESCE(v_granted, 0), 0);
+
+  UPDATE send_rate_buckets s
+  SET tokens = LEAST(s.capacity, s.tokens + s.refill_per_hour
+                     * GREATEST(EXTRACT(EPOCH FROM (v_now - s.refilled_at)), 0) / 3600) - v_granted,
+      refilled_at = GREATEST(s.refilled_at, v_now),
+      taken_total = s.taken_total + v_granted
+  WHERE (s.scope, s.scope_key) IN (
+    SELECT b->>'scope', b->>'key' FROM jsonb_array_elements(p_buckets) b
+  );
+
+  RETURN v_granted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Hands back slots a lease did not use (fewer pending tasks than granted).
+-- Rows are locked in (scope, scope_key) order first, as take_send_tokens()
+-- locks them, so a release and a lease on overlapping buckets cannot
+-- deadlock.
+CREATE OR REPLACE FUNCTION release_send_tokens(p_buckets JSONB, p_count INTEGER)
+RETURNS VOID AS $$
+BEGIN
+  IF p_count IS NULL OR p_count <= 0 THEN
+    RETURN;
+  END IF;
+
+  PERFORM 1
+  FROM send_rate_buckets s
+  WHERE (s.scope, s.scope_key) IN (
+    SELECT b->>'scope', b->>'key' FROM jsonb_array_elements(p_buckets) b
+  )
+  ORDER BY s.scope, s.scope_key
+  FOR UPDATE;
+
+  UPDATE send_rate_buckets s
+  SET tokens = LEAST(s.capacity, s.tokens + p_count),
+      taken_total = GREATEST(s.taken_total - p_count, 0)
+  WHERE (s.scope, s.scope_key) IN (
+    SELECT b->>'scope', b->>'key' FROM jsonb_array_elements(p_buckets) b
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Resize one mailbox or tenant bucket to p_per_hour sends in any rolling
+-- hour (campaign buckets follow the campaign's own send settings). p_burst
+-- defaults to burst_hours of the new budget; the balance is capped at the
+-- new capacity.
+CREATE OR REPLACE FUNCTION configure_send_bucket(
+  p_scope TEXT,
+  p_key TEXT,
+  p_per_hour DOUBLE PRECISION,
+  p_burst DOUBLE PRECISION DEFAULT NULL
+)
+RETURNS VOID AS $$
+DECLARE
+  v_burst DOUBLE PRECISION;
+BEGIN
+  SELECT COALESCE(p_burst, p_per_hour * d.burst_hours)
+  INTO v_burst
+  FROM send_rate_bucket_defaults d
+  WHERE d.scope = p_scope;
+
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'send bucket scope % is not configurable', p_scope;
+  END IF;
+
+  INSERT INTO send_rate_buckets AS s (scope, scope_key, per_hour, capacity, refill_per_hour, tokens)
+  SELECT p_scope, p_key, p_per_hour, z.capacity, z.refill_per_hour, z.capacity
+  FROM send_bucket_size(p_per_hour, v_burst) z
+  ON CONFLICT (scope, scope_key) DO UPDATE
+    SET per_hour = EXCLUDED.per_hour,
+        capacity = EXCLUDED.capacity,
+        refill_per_hour = EXCLUDED.refill_per_hour,
+        tokens = LEAST(s.tokens, EXCLUDED.capacity);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Executors lease with the service role; nobody else may spend or resize a
+-- tenant's budget
+REVOKE EXECUTE ON FUNCTION take_send_tokens(JSONB, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION release_send_tokens(JSONB, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION configure_send_bucket(TEXT, TEXT, DOUBLE PRECISION, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION take_send_tokens(JSONB, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION release_send_tokens(JSONB, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION configure_send_bucket(TEXT, TEXT, DOUBLE PRECISION, DOUBLE PRECISION) TO service_role;
+
+-- ============================================================================
+-- 3. TASK CLAIM
+-- ============================================================================
+
+-- Claims up to p_limit pending tasks of a job for one executor run, oldest
+-- first, by flipping them to 'running'. SKIP LOCKED lets concurrent
+-- executors holding leases on the same campaign claim disjoint tasks
+-- instead of sending the same ones. Tasks left 'running' by an executor
+-- that died are claimable again after p_stale_after. Runs as the caller, so
+-- job_tasks RLS applies as it does to the executor's other queries.
+CREATE OR REPLACE FUNCTION claim_campaign_send_tasks(
+  p_job_id UUID,
+  p_limit INTEGER,
+  p_stale_after INTERVAL DEFAULT INTERVAL '30 minutes'
+)
+RETURNS SETOF public.job_tasks AS $$
+  WITH claimable AS (
+    SELECT t.id
+    FROM public.job_tasks t
+    WHERE t.job_id = p_job_id
+      AND (t.status = 'pending'
+           OR (t.status = 'running' AND t.started_at < NOW() - p_stale_after))
+    ORDER BY t.created_at
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE public.job_tasks t
+  SET status = 'running',
+      started_at = NOW()
+  FROM claimable c
+  WHERE t.id = c.id
+  RETURNING t.*;
+$$ LANGUAGE sql;
+
+-- ============================================================================
+-- 4. STATUS
+-- ============================================================================
+
+-- Current balances without taking anything (service role / ops only)
+CREATE OR REPLACE VIEW send_rate_bucket_status
+WITH (security_invoker = true) AS
+SELECT
+  scope,
+  scope_key,
+  per_hour,
+  capacity,
+  refill_per_hour,
+  LEAST(capacity, tokens + refill_per_hour
+        * GREATEST(EXTRACT(EPOCH FROM (NOW() - refilled_at)), 0) / 3600) AS available,
+  taken_total,
+  refilled_at,
+  created_at
+FROM send_rate_buckets;
+
+COMMENT ON TABLE send_rate_buckets IS
+  'Token buckets shared by campaign executors; lease with take_send_tokens(), inspect with send_rate_bucket_status';
@@ -0,0 +1,271 @@
+-- Campaign Metrics Rollups
+-- Migration: 20260110090000_campaign_metrics_rollups.sql
+-- Purpose: Keep per-campaign recipient counts (by last_event, reply sentiment
+--          and disposition) up to date from campaign_contact_status writes,
+--          so campaign metrics read O(#campaigns) rows instead of scanning
+--          every recipient
+
+-- ============================================================================
+-- 1. ROLLUP KEYS (single definition of what each status row counts towards)
+-- ============================================================================
+
+-- Mirrors getCampaignMetrics: every row counts once under its last_event;
+-- replied rows also count under their sentiment ('unknown' when missing);
+-- rows with a disposition count under it.
+CREATE OR REPLACE FUNCTION campaign_rollup_keys(
+  p_last_event TEXT,
+  p_last_sentiment TEXT,
+  p_last_disposition TEXT
+)
+RETURNS TABLE (dimension TEXT, value TEXT) AS $$
+  SELECT k.dimension, k.value
+  FROM (VALUES
+    ('event', COALESCE(NULLIF(p_last_event, ''), 'unknown')),
+    ('sentiment', CASE WHEN p_last_event = 'replied'
+                       THEN COALESCE(NULLIF(p_last_sentiment, ''), 'unknown') END),
+    ('disposition', NULLIF(p_last_disposition, ''))
+  ) AS k(dimension, value)
+  WHERE k.value IS NOT NULL;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Recipient counts per campaign computed from campaign_contact_status.
+-- Filtering by campaign_id pushes the predicate below the GROUP BY, so this
+-- is both the backfill source and the reference the rollups are checked
+-- against. It runs with the caller's rights, so campaign_contact_status RLS
+-- still applies to anyone reading it through the API.
+CREATE OR REPLACE VIEW campaign_metrics_rollup_compute
+WITH (security_invoker = true) AS
+SELECT
+  s.campaign_id,
+  k.dimension,
+  k.value,
+  COUNT(*) AS count
+FROM campaign_contact_status s
+CROSS JOIN LATERAL campaign_rollup_keys(s.last_event, s.last_sentiment, s.last_disposition) k
+GROUP BY s.campaign_id, k.dimension, k.value;
+
+-- ============================================================================
+-- 2. ROLLUP TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.campaign_metrics_rollups (
+  campaign_id UUID NOT NULL REFERENCES public.campaigns(id) ON DELETE CASCADE,
+  org_id UUID,
+  tenant_id UUID,
+  dimension TEXT NOT NULL CHECK (dimension IN ('event', 'sentiment', 'disposition')),
+  value TEXT NOT NULL,
+  count BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (campaign_id, dimension, value)
+);
+
+CREATE INDEX IF NOT EXISTS idx_campaign_metrics_rollups_org
+  ON public.campaign_metrics_rollups(org_id, campaign_id);
+
+ALTER TABLE public.campaign_metrics_rollups ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS campaign_metrics_rollups_tenant_isolation ON public.campaign_metrics_rollups;
+CREATE POLICY campaign_metrics_rollups_tenant_isolation
+  ON public.campaign_metrics_rollups
+  FOR SELECT
+  USING (
+    tenant_id IN (
+      SELECT tenant_id
+      FROM public.profiles
+      WHERE id = auth.uid()
+    )
+  );
+
+-- needs_follow_up reads only recipients with open tasks
+CREATE INDEX IF NOT EXISTS idx_campaign_contact_status_follow_up
+  ON public.campaign_contact_status(campaign_id)
+  WHERE open_tasks_count > 0;
+
+-- ============================================================================
+-- 3. MAINTENANCE TRIGGERS
+-- ============================================================================
+
+-- Statement-level, so a launch inserting thousands of recipients or an
+-- executor batch updating 25 does one grouped upsert. Old rows count -1 and
+-- new rows +1 per key; keys whose changes cancel out (reply_count,
+-- open_tasks_count, updated_at ...) are not written at all. Upserts touch
+-- rollup rows in primary-key order, so concurrent statements on the same
+-- campaign queue rather than deadlock. Campaigns deleted in the same
+-- statement (the cascade onto campaign_contact_status) are skipped.
+--
+-- Each statement first takes the shared rollup lock of every campaign it
+-- touched (in campaign order), so a rebuild of one of those campaigns waits
+-- for it to commit, and it waits for a running rebuild.
+CREATE OR REPLACE FUNCTION maintain_campaign_metrics_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM pg_advisory_xact_lock_shared(hashtext('campaign_metrics_rollups'), hashtext(t.campaign_id::TEXT))
+    FROM (SELECT DISTINCT campaign_id FROM new_rows ORDER BY 1) t;
+
+    INSERT INTO campaign_metrics_rollups AS r (campaign_id, org_id, tenant_id, dimension, value, count)
+    SELECT d.campaign_id, c.org_id, c.tenant_id, d.dimension, d.value, d.delta
+    FROM (
+      SELECT n.campaign_id, k.dimension, k.value, COUNT(*) AS delta
+      FROM new_rows n
+      CROSS JOIN LATERAL campaign_rollup_keys(n.last_event, n.last_sentiment, n.last_disposition) k
+      GROUP BY 1, 2, 3
+    ) d
+    JOIN campaigns c ON c.id = d.campaign_id
+    ORDER BY d.campaign_id, d.dimension, d.value
+    ON CONFLICT (campaign_id, dimension, value) DO UPDATE
+      SET count = r.count + EXCLUDED.count,
+          updated_at = NOW();
+
+  ELSIF TG_OP = 'UPDATE' THEN
+    PERFORM pg_advisory_xact_lock_shared(hashtext('campaign_metrics_rollups'), hashtext(t.campaign_id::TEXT))
+    FROM (
+      SELECT campaign_id FROM new_rows
+      UNION
+      SELECT campaign_id FROM old_rows
+      ORDER BY 1
+    ) t;
+
+    INSERT INTO campaign_metrics_rollups AS r (campaign_id, org_id, tenant_id, dimension, value, count)
+    SELECT d.campaign_id, c.org_id, c.tenant_id, d.dimension, d.value, d.delta
+    FROM (
+      SELECT campaign_id, dimension, value, SUM(delta) AS delta
+      FROM (
+        SELECT n.campaign_id, k.dimension, k.value, 1 AS delta
+        FROM new_rows n
+        CROSS JOIN LATERAL campaign_rollup_keys(n.last_event, n.last_sentiment, n.last_disposition) k
+        UNION ALL
+        SELECT o.campaign_id, k.dimension, k.value, -1
+        FROM old_rows o
+        CROSS JOIN LATERAL campaign_rollup_keys(o.last_event, o.last_sentiment, o.last_disposition) k
+      ) changes
+      GROUP BY 1, 2, 3
+      HAVING SUM(delta) <> 0
+    ) d
+    JOIN campaigns c ON c.id = d.campaign_id
+    ORDER BY d.campaign_id, d.dimension, d.value
+    ON CONFLICT (campaign_id, dimension, value) DO UPDATE
+      SET count = r.count + EXCLUDED.count,
+          updated_at = NOW();
+
+  ELSE
+    PERFORM pg_advisory_xact_lock_shared(hashtext('campaign_metrics_rollups'), hashtext(t.campaign_id::TEXT))
+    FROM (SELECT DISTINCT campaign_id FROM old_rows ORDER BY 1) t;
+
+    UPDATE campaign_metrics_rollups r
+    SET count = r.count - d.delta,
+        updated_at = NOW()
+    FROM (
+      SELECT o.campaign_id, k.dimension, k.value, COUNT(*) AS delta
+      FROM old_rows o
+      CROSS JOIN LATERAL campaign_rollup_keys(o.last_event, o.last_sentiment, o.last_disposition) k
+      GROUP BY 1, 2, 3
+    ) d
+    WHERE r.campaign_id = d.campaign_id
+      AND r.dimension = d.dimension
+      AND r.value = d.value;
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS trigger_campaign_rollups_insert ON public.campaign_contact_status;
+CREATE TRIGGER trigger_campaign_rollups_insert
+  AFTER INSERT ON public.campaign_contact_status
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION maintain_campaign_metrics_rollups();
+
+DROP TRIGGER IF EXISTS trigger_campaign_rollups_update ON public.campaign_contact_status;
+CREATE TRIGGER trigger_campaign_rollups_update
+  AFTER UPDATE ON public.campaign_contact_status
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION maintain_campaign_metrics_rollups();
+
+DROP TRIGGER IF EXISTS trigger_campaign_rollups_delete ON public.campaign_contact_status;
+CREATE TRIGGER trigger_campaign_rollups_delete
+  AFTER DELETE ON public.campaign_contact_status
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION maintain_campaign_metrics_rollups();
+
+-- ============================================================================
+-- 4. REBUILD FUNCTION
+-- ============================================================================
+
+-- Recompute rollups from campaign_contact_status (one campaign, or each
+-- campaign in turn when p_campaign_id is NULL). Each campaign's exclusive
+-- rollup lock (the advisory lock the triggers share) holds off writes to
+-- that campaign's recipients only, so no transition can land between its
+-- count and its write while other campaigns keep sending. Returns the
+-- number of rollup rows written or removed.
+CREATE OR REPLACE FUNCTION rebuild_campaign_metrics_rollups(p_campaign_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+  v_campaign_id UUID;
+  v_rows INTEGER;
+  v_changed INTEGER := 0;
+BEGIN
+  FOR v_campaign_id IN
+    SELECT id
+    FROM campaigns
+    WHERE p_campaign_id IS NULL OR id = p_campaign_id
+    ORDER BY id
+  LOOP
+    PERFORM pg_advisory_xact_lock(hashtext('campaign_metrics_rollups'), hashtext(v_campaign_id::TEXT));
+
+    INSERT INTO campaign_metrics_rollups AS r (campaign_id, org_id, tenant_id, dimension, value, count)
+    SELECT m.campaign_id, c.org_id, c.tenant_id, m.dimension, m.value, m.count
+    FROM campaign_metrics_rollup_compute m
+    JOIN campaigns c ON c.id = m.campaign_id
+    WHERE m.campaign_id = v_campaign_id
+    ORDER BY m.dimension, m.value
+    ON CONFLICT (campaign_id, dimension, value) DO UPDATE
+      SET count = EXCLUDED.count,
+          org_id = EXCLUDED.org_id,
+          tenant_id = EXCLUDED.tenant_id,
+          updated_at = NOW()
+      WHERE (r.count, r.org_id, r.tenant_id) IS DISTINCT FROM (EXCLUDED.count, EXCLUDED.org_id, EXCLUDED.tenant_id);
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_changed := v_changed + v_rows;
+
+    DELETE FROM campaign_metrics_rollups r
+    WHERE r.campaign_id = v_campaign_id
+      AND NOT EXISTS (
+        SELECT 1
+        FROM campaign_metrics_rollup_compute m
+        WHERE m.campaign_id = r.campaign_id
+          AND m.dimension = r.dimension
+          AND m.value = r.value
+      );
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_changed := v_changed + v_rows;
+  END LOOP;
+
+  RETURN v_changed;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Ops and the migration backfill only: a caller that can rebuild can hold
+-- off a campaign's status writes
+REVOKE EXECUTE ON FUNCTION rebuild_campaign_metrics_rollups(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION rebuild_campaign_metrics_rollups(UUID) TO service_role;
+
+-- ============================================================================
+-- 5. INITIAL BACKFILL
+-- ============================================================================
+
+SELECT rebuild_campaign_metrics_rollups();
+
+-- ============================================================================
+-- 6. COMMENTS
+-- ============================================================================
+
+COMMENT ON VIEW campaign_metrics_rollup_compute IS 'Per-campaign recipient counts from campaign_contact_status; filter by campaign_id to recompute a subset';
+COMMENT ON TABLE public.campaign_metrics_rollups IS 'Trigger-maintained recipient counts per campaign by last_event, sentiment (replied only) and disposition';
+COMMENT ON FUNCTION rebuild_campaign_metrics_rollups(UUID) IS 'Recount rollups for one campaign (or all); returns rollup rows written or removed';